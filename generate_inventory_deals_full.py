@@ -4,14 +4,23 @@
 """
 完整的 inventory_deals 库存点快照表生成器
 从 product_analytics 表数据生成库存点快照，包含四个时间窗口的聚合数据
+
+用法:
+    python generate_inventory_deals_full.py                                  # 回填默认日期区间（一次扫描）
+    python generate_inventory_deals_full.py --start 2025-07-01 --end 2025-07-30
+    python generate_inventory_deals_full.py --start 2025-07-01 --end 2025-07-30 --per-date   # 逐日生成（旧方式）
 """
 
+import argparse
 import psycopg2
 import psycopg2.extras
+from bisect import bisect_left, bisect_right
 from datetime import datetime, date, timedelta
+from decimal import Decimal
+from itertools import accumulate, groupby
 import sys
 import json
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 
 # 数据库连接配置
 DB_CONFIG = {
@@ -31,6 +40,43 @@ TIME_WINDOWS = [
     {'code': 'T30', 'days': 30, 'description': 'T-30到T-1 (30天)'}
 ]
 
+# 每个快照日期回看的数据天数（T-60 到 T），以及入选所需的最少记录数
+LOOKBACK_DAYS = 60
+MIN_RECORD_COUNT = 5
+
+# 窗口内累加的字段：(源字段, 快照字段, 类型)
+SUM_FIELDS = [
+    ('sales_amount', 'total_sales_amount', float),
+    ('sales_quantity', 'total_sales_quantity', int),
+    ('impressions', 'total_ad_impressions', int),
+    ('clicks', 'total_ad_clicks', int),
+    ('ad_cost', 'total_ad_spend', float),
+    ('ad_orders', 'total_ad_orders', int),
+]
+
+
+def exact_value(value: Any, cast) -> Decimal:
+    """累加用的精确值：按字段类型转换后转为十进制，避免浮点累加误差"""
+    return Decimal(str(cast(value)))
+
+
+DETAIL_COLUMNS_SQL = """
+                asin,
+                data_date,
+                COALESCE(marketplace_id, 'default') as marketplace_id,
+                COALESCE(dev_name, '') as dev_name,
+                COALESCE(spu_name, '') as spu_name,
+                COALESCE(fba_inventory, 0) as fba_inventory,
+                COALESCE(total_inventory, 0) as total_inventory,
+                COALESCE(sales_amount, 0) as sales_amount,
+                COALESCE(sales_quantity, 0) as sales_quantity,
+                COALESCE(impressions, 0) as impressions,
+                COALESCE(clicks, 0) as clicks,
+                COALESCE(ad_cost, 0) as ad_cost,
+                COALESCE(ad_orders, 0) as ad_orders,
+                COALESCE(ad_conversion_rate, 0) as ad_conversion_rate,
+                COALESCE(acos, 0) as acos"""
+
 class InventoryDealsGenerator:
     """库存点快照生成器"""
     
@@ -91,23 +137,8 @@ class InventoryDealsGenerator:
     
     def get_asin_detailed_data(self, start_date: date, end_date: date, asin: str, marketplace_id: str) -> List[Dict[str, Any]]:
         """获取指定ASIN的详细数据"""
-        self.cursor.execute("""
-            SELECT 
-                asin,
-                data_date,
-                COALESCE(marketplace_id, 'default') as marketplace_id,
-                COALESCE(dev_name, '') as dev_name,
-                COALESCE(spu_name, '') as spu_name,
-                COALESCE(fba_inventory, 0) as fba_inventory,
-                COALESCE(total_inventory, 0) as total_inventory,
-                COALESCE(sales_amount, 0) as sales_amount,
-                COALESCE(sales_quantity, 0) as sales_quantity,
-                COALESCE(impressions, 0) as impressions,
-                COALESCE(clicks, 0) as clicks,
-                COALESCE(ad_cost, 0) as ad_cost,
-                COALESCE(ad_orders, 0) as ad_orders,
-                COALESCE(ad_conversion_rate, 0) as ad_conversion_rate,
-                COALESCE(acos, 0) as acos
+        self.cursor.execute(f"""
+            SELECT {DETAIL_COLUMNS_SQL}
             FROM product_analytics 
             WHERE data_date >= %s 
               AND data_date <= %s
@@ -139,13 +170,26 @@ class InventoryDealsGenerator:
         # 获取最新记录
         latest_record = max(window_records, key=lambda x: x['data_date'])
         
-        # 聚合计算
-        total_sales_amount = sum(float(r['sales_amount']) for r in window_records)
-        total_sales_quantity = sum(int(r['sales_quantity']) for r in window_records)
-        total_ad_impressions = sum(int(r['impressions']) for r in window_records)
-        total_ad_clicks = sum(int(r['clicks']) for r in window_records)
-        total_ad_spend = sum(float(r['ad_cost']) for r in window_records)
-        total_ad_orders = sum(int(r['ad_orders']) for r in window_records)
+        # 聚合计算（十进制精确累加后再转换回字段类型）
+        totals = {
+            target: cast(sum(exact_value(r[source], cast) for r in window_records))
+            for source, target, cast in SUM_FIELDS
+        }
+        
+        return self.build_deal(latest_record, totals, len(window_records), time_window, target_date)
+    
+    def build_deal(self, latest_record: Dict[str, Any], totals: Dict[str, Any], record_count: int,
+                   time_window: Dict[str, Any], target_date: date) -> Dict[str, Any]:
+        """由窗口累加值和最新记录生成一条快照记录"""
+        window_end_date = target_date
+        window_start_date = target_date - timedelta(days=time_window['days'] - 1)
+        
+        total_sales_amount = totals['total_sales_amount']
+        total_sales_quantity = totals['total_sales_quantity']
+        total_ad_impressions = totals['total_ad_impressions']
+        total_ad_clicks = totals['total_ad_clicks']
+        total_ad_spend = totals['total_ad_spend']
+        total_ad_orders = totals['total_ad_orders']
         
         # 计算衍生指标
         avg_daily_sales = total_sales_amount / time_window['days'] if time_window['days'] > 0 else 0
@@ -205,10 +249,79 @@ class InventoryDealsGenerator:
             'inventory_status': inventory_status,
             
             # 元数据
-            'source_records_count': len(window_records),
+            'source_records_count': record_count,
             'calculation_method': 'sum_aggregate',
-            'data_completeness_score': 1.00 if window_records else 0.00
+            'data_completeness_score': 1.00 if record_count else 0.00
+        }
+    
+    def slide_time_windows(self, asin_data: List[Dict[str, Any]], snapshot_dates: List[date]) -> Dict[date, List[Dict[str, Any]]]:
+        """在一个 ASIN×站点 的连续数据上滑动时间窗口，一次生成多个快照日期的记录
+        
+        asin_data 需按 data_date 升序；窗口累加值由前缀和相减得到，避免对每个快照日期重新扫描。
+        前缀和以十进制精确累加，相减结果与逐条累加完全相同（浮点前缀和在长区间上会残留误差）。
+        入选规则与逐日生成一致：T-60..T 内至少 MIN_RECORD_COUNT 条记录，且四个时间窗口都有数据。
+        """
+        dates = [record['data_date'] for record in asin_data]
+        prefix = {
+            target: (cast, [Decimal(0)] + list(accumulate(exact_value(record[source], cast) for record in asin_data)))
+            for source, target, cast in SUM_FIELDS
         }
+        
+        deals_by_date: Dict[date, List[Dict[str, Any]]] = {}
+        for target_date in snapshot_dates:
+            end = bisect_right(dates, target_date)
+            lookback_start = bisect_left(dates, target_date - timedelta(days=LOOKBACK_DAYS))
+            if end - lookback_start < MIN_RECORD_COUNT:
+                continue
+            
+            deals = []
+            for time_window in TIME_WINDOWS:
+                start = bisect_left(dates, target_date - timedelta(days=time_window['days'] - 1))
+                if start == end:
+                    break
+                # 窗口内最新日期的第一条记录（与 max(..., key=data_date) 一致）
+                latest_record = asin_data[bisect_left(dates, dates[end - 1])]
+                totals = {target: cast(values[end] - values[start]) for target, (cast, values) in prefix.items()}
+                deals.append(self.build_deal(latest_record, totals, end - start, time_window, target_date))
+            
+            if len(deals) == len(TIME_WINDOWS):
+                deals_by_date[target_date] = deals
+        
+        return deals_by_date
+    
+    def iter_span_data(self, start_date: date, end_date: date, batch_size: int = 5000) -> Iterable[List[Dict[str, Any]]]:
+        """一次扫描 start_date..end_date 的全部数据，按 ASIN×站点 逐组产出（组内按日期升序）
+        
+        使用服务端游标流式读取，内存中只保留当前一组的数据。
+        """
+        cursor = self.conn.cursor(name='inventory_deals_backfill_scan')
+        cursor.itersize = batch_size
+        try:
+            cursor.execute(f"""
+                SELECT {DETAIL_COLUMNS_SQL}
+                FROM product_analytics 
+                WHERE data_date >= %s 
+                  AND data_date <= %s
+                  AND asin IS NOT NULL
+                ORDER BY asin, COALESCE(marketplace_id, 'default'), data_date;
+            """, (start_date, end_date))
+            
+            columns = None
+            records = []
+            for row in cursor:
+                if columns is None:
+                    columns = [desc[0] for desc in cursor.description]
+                records.append(dict(zip(columns, row)))
+                if len(records) >= batch_size:
+                    # 只产出已完整读取的分组，最后一组可能尚未读完
+                    groups = [list(group) for _, group in groupby(records, key=lambda r: (r['asin'], r['marketplace_id']))]
+                    records = groups.pop()
+                    yield from groups
+            
+            for _, group in groupby(records, key=lambda r: (r['asin'], r['marketplace_id'])):
+                yield list(group)
+        finally:
+            cursor.close()
     
     def clear_existing_data(self, target_date: date) -> int:
         """清除指定日期的现有数据"""
@@ -225,6 +338,50 @@ class InventoryDealsGenerator:
         
         return deleted_count
     
+    def bulk_replace_inventory_deals(self, start_date: date, end_date: date, deals_data: List[Dict[str, Any]],
+                                     page_size: int = 2000) -> int:
+        """在同一事务内清除日期区间的现有快照并批量写入，返回写入条数"""
+        insert_sql = """
+            INSERT INTO inventory_deals (
+                snapshot_date, asin, product_name, sales_person, warehouse_location,
+                time_window, time_window_days, window_start_date, window_end_date,
+                fba_available, fba_in_transit, local_warehouse, total_inventory,
+                total_sales_amount, total_sales_quantity, avg_daily_sales, avg_daily_revenue,
+                total_ad_impressions, total_ad_clicks, total_ad_spend, total_ad_orders,
+                ad_ctr, ad_conversion_rate, acos, inventory_turnover_days, inventory_status,
+                source_records_count, calculation_method, data_completeness_score
+            ) VALUES %s;
+        """
+        template = """(
+                %(snapshot_date)s, %(asin)s, %(product_name)s, %(sales_person)s, %(warehouse_location)s,
+                %(time_window)s, %(time_window_days)s, %(window_start_date)s, %(window_end_date)s,
+                %(fba_available)s, %(fba_in_transit)s, %(local_warehouse)s, %(total_inventory)s,
+                %(total_sales_amount)s, %(total_sales_quantity)s, %(avg_daily_sales)s, %(avg_daily_revenue)s,
+                %(total_ad_impressions)s, %(total_ad_clicks)s, %(total_ad_spend)s, %(total_ad_orders)s,
+                %(ad_ctr)s, %(ad_conversion_rate)s, %(acos)s, %(inventory_turnover_days)s, %(inventory_status)s,
+                %(source_records_count)s, %(calculation_method)s, %(data_completeness_score)s
+            )"""
+        
+        try:
+            self.cursor.execute("""
+                DELETE FROM inventory_deals 
+                WHERE snapshot_date >= %s AND snapshot_date <= %s;
+            """, (start_date, end_date))
+            deleted_count = self.cursor.rowcount
+            
+            if deals_data:
+                psycopg2.extras.execute_values(self.cursor, insert_sql, deals_data,
+                                               template=template, page_size=page_size)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        
+        if deleted_count > 0:
+            print(f"🗑️  已清除 {deleted_count} 条现有数据")
+        
+        return len(deals_data)
+    
     def insert_inventory_deals(self, deals_data: List[Dict[str, Any]]) -> int:
         """批量插入库存点快照数据"""
         if not deals_data:
@@ -300,7 +457,7 @@ class InventoryDealsGenerator:
             all_deals_data = []
             processed_asins = 0
             
-            print(f"\n🔄 开始生成快照数据...")
+            print("\n🔄 开始生成快照数据...")
             for i, asin_info in enumerate(asins, 1):
                 asin = asin_info['asin']
                 marketplace_id = asin_info['marketplace_id']
@@ -357,30 +514,104 @@ class InventoryDealsGenerator:
         finally:
             self.close_db()
 
+    def generate_inventory_deals_range(self, start_date: date, end_date: date) -> bool:
+        """回填 start_date..end_date 每个快照日期的数据
+        
+        只扫描一次覆盖区间 (start_date-60)..end_date，在每个 ASIN×站点 上滑动时间窗口，
+        所有快照日期的记录在一个事务内批量写入。
+        """
+        try:
+            print('🚀 开始回填 inventory_deals 库存点快照表\n')
+            
+            if not self.connect_db():
+                return False
+            
+            snapshot_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+            print(f"📅 快照日期区间: {start_date.strftime('%Y-%m-%d')} 到 {end_date.strftime('%Y-%m-%d')} ({len(snapshot_dates)} 天)")
+            
+            if not self.check_table_exists('inventory_deals'):
+                print('❌ inventory_deals 表不存在，需要先创建表结构')
+                return False
+            
+            data_start_date = start_date - timedelta(days=LOOKBACK_DAYS)
+            print(f"📊 数据扫描范围: {data_start_date.strftime('%Y-%m-%d')} 到 {end_date.strftime('%Y-%m-%d')}")
+            
+            all_deals_data = []
+            asins_per_date = {target_date: 0 for target_date in snapshot_dates}
+            group_count = 0
+            
+            print("\n🔄 开始滑动窗口生成快照数据...")
+            for asin_data in self.iter_span_data(data_start_date, end_date):
+                group_count += 1
+                for target_date, deals in self.slide_time_windows(asin_data, snapshot_dates).items():
+                    all_deals_data.extend(deals)
+                    asins_per_date[target_date] += 1
+            
+            print(f"✅ 扫描 {group_count} 个 ASIN×站点，生成 {len(all_deals_data)} 条快照记录")
+            for target_date, count in asins_per_date.items():
+                print(f"   {target_date.strftime('%Y-%m-%d')}: {count} 个ASIN")
+            
+            if not all_deals_data:
+                print("❌ 没有生成任何快照数据")
+                return False
+            
+            print(f"\n💾 批量写入 {len(all_deals_data)} 条快照记录到数据库...")
+            inserted_count = self.bulk_replace_inventory_deals(start_date, end_date, all_deals_data)
+            print(f"✅ 成功插入 {inserted_count} 条记录")
+            return True
+                
+        except Exception as error:
+            print(f'❌ 回填过程中发生错误: {error}')
+            import traceback
+            print('错误详情:')
+            print(traceback.format_exc())
+            return False
+        finally:
+            self.close_db()
+
 def main():
     """主函数入口"""
+    end_date = date.today() - timedelta(days=1)
+    
+    parser = argparse.ArgumentParser(description='生成 inventory_deals 库存点快照')
+    parser.add_argument('--start', type=date.fromisoformat, default=end_date - timedelta(days=29),
+                        help='起始快照日期 YYYY-MM-DD')
+    parser.add_argument('--end', type=date.fromisoformat, default=end_date - timedelta(days=22),
+                        help='结束快照日期 YYYY-MM-DD')
+    parser.add_argument('--per-date', action='store_true',
+                        help='逐日生成（每个日期单独扫描和写入）')
+    args = parser.parse_args()
+    
+    if args.start > args.end:
+        parser.error('--start 不能晚于 --end')
+    
     print("=" * 70)
     print("Amazon Analyst - 库存点快照生成器 (生产版本)")
     print("=" * 70)
     
     # 创建生成器实例
     generator = InventoryDealsGenerator()
+    
+    if not args.per_date:
+        success = generator.generate_inventory_deals_range(args.start, args.end)
+        if not success:
+            print(f"❌ 回填 {args.start} 到 {args.end} 的库存点快照数据失败")
+            sys.exit(1)
+        print(f"✅ 回填 {args.start} 到 {args.end} 的库存点快照数据成功")
+        return
 
     error_list = []
     
-    # 生成快照数据
-    today = date.today()
-    end_date = today - timedelta(days=1)
-    for i in range(22, 30):  # 7-30
-        # INFO 7-29 有点问题
-        # 7-22 
-        target_date = end_date - timedelta(days=i)
+    # 逐日生成快照数据
+    target_date = args.start
+    while target_date <= args.end:
         success = generator.generate_inventory_deals(target_date)
         if not success:
             print(f"❌ 生成 {target_date.strftime('%Y-%m-%d')} 的库存点快照数据失败")
             error_list.append(target_date.strftime('%Y-%m-%d'))
         else:
             print(f"✅ 生成 {target_date.strftime('%Y-%m-%d')} 的库存点快照数据成功")
+        target_date += timedelta(days=1)
 
     print(f"❌ 生成失败日期: {error_list}")
 
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+模块导入耗时基准
+每次在全新的解释器中导入目标模块，统计导入耗时（取中位数）以及被连带加载的重量级依赖，
+用于确认命令行脚本启动时不再提前导入 SQLAlchemy / psycopg2 / APScheduler 等
+
+用法:
+    python benchmarks/bench_import_time.py --repeat 5
+    python benchmarks/bench_import_time.py src.scheduler.sync_jobs src.models
+"""
+
+import sys
+import os
+import argparse
+import json
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    'src',
+    'src.config',
+    'src.models',
+    'src.database',
+    'src.processors.product_analytics_processor',
+    'src.auth.saihu_api_client',
+    'src.scheduler.task_scheduler',
+    'src.scheduler.sync_jobs',
+]
+
+HEAVY_MODULES = ['sqlalchemy', 'psycopg2', 'apscheduler', 'yaml', 'pytz', 'requests', 'decouple']
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'ms': elapsed * 1000, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """在子进程中导入一次模块"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='模块导入耗时基准')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help='要测量的模块')
+    parser.add_argument('--repeat', type=int, default=5, help='每个模块的重复次数，取中位数')
+    args = parser.parse_args()
+
+    print(f"重复: {args.repeat}")
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.repeat)]
+        median_ms = statistics.median(run['ms'] for run in runs)
+        heavy = ', '.join(runs[-1]['heavy']) or '-'
+        print(f"{module:<45} {median_ms:8.1f}ms  重量级依赖: {heavy}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+ProductAnalytics 额外指标序列化基准
+对比“每次 set_metrics 立即 json.dumps / 每次 get_metrics 都 json.loads”与
+“脏位 + 入库时序列化一次”两种方式处理一整天批次的耗时
+
+用法:
+    python benchmarks/bench_metrics_json.py --rows 20000 --repeat 5
+"""
+
+import sys
+import os
+import argparse
+import json
+import time
+from datetime import date, datetime
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models import ProductAnalytics
+
+
+class EagerMetricsProductAnalytics(ProductAnalytics):
+    """旧实现：set_metrics 立即序列化，get_metrics 每次反序列化"""
+
+    metrics_json = None
+
+    def set_metrics(self, metrics):
+        self._additional_metrics.update(metrics)
+        self.metrics_json = json.dumps(self._additional_metrics, default=str, ensure_ascii=False)
+
+    def get_metrics(self):
+        if self.metrics_json:
+            try:
+                return json.loads(self.metrics_json)
+            except json.JSONDecodeError:
+                return {}
+        return self._additional_metrics or {}
+
+
+def build_api_rows(count: int):
+    """构造接近真实响应规模的额外指标"""
+    return [
+        {
+            'asinList': [f'B0BENCH{i:05d}'],
+            'productIdList': [str(i)],
+            'salePriceThis': '123.45',
+            'adClicksThis': i % 50,
+            'adImpressionsThis': 1000 + i,
+            **{f'extraMetric{k}': k * 1.5 for k in range(20)},
+        }
+        for i in range(count)
+    ]
+
+
+def run_batch(model_cls, api_rows, target_date) -> float:
+    """模拟一天批次：解码 → 衍生指标 → 聚合读取指标 → 入库序列化"""
+    started = time.perf_counter()
+
+    items = [model_cls.from_api_response(row, target_date) for row in api_rows]
+
+    for item in items:
+        # ProductAnalyticsProcessor._calculate_derived_metrics
+        metrics = item.get_metrics()
+        metrics.update({'ctr': 0.01, 'rpc': 1.2, 'processed_at': datetime.now().isoformat()})
+        item.set_metrics(metrics)
+
+    for item in items:
+        # ProductAnalyticsProcessor._merge_product_data 读取指标
+        item.get_metrics()
+
+    for item in items:
+        # 入库时读取一次 metrics_json
+        item.metrics_json
+
+    return time.perf_counter() - started
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='ProductAnalytics metrics_json 序列化基准')
+    parser.add_argument('--rows', type=int, default=20000, help='每批行数（约一天的数据量）')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最小值')
+    args = parser.parse_args()
+
+    api_rows = build_api_rows(args.rows)
+    target_date = date.today()
+
+    results = {}
+    for name, model_cls in (('eager', EagerMetricsProductAnalytics), ('lazy', ProductAnalytics)):
+        results[name] = min(run_batch(model_cls, api_rows, target_date) for _ in range(args.repeat))
+
+    print(f"行数: {args.rows}, 重复: {args.repeat}")
+    for name, seconds in results.items():
+        print(f"{name:>6}: {seconds:.3f}s 总计, {seconds / args.rows * 1e6:.1f}µs/行")
+    saved = results['eager'] - results['lazy']
+    print(f"节省: {saved:.3f}s ({saved / args.rows * 1e6:.1f}µs/行, {saved / results['eager']:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
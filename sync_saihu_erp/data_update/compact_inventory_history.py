@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+库存点历史表压缩脚本 - 一次性去除 inventory_point_history 重复快照并建立唯一索引
+"""
+
+import sys
+import os
+import argparse
+import json
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.history_compactor import InventoryHistoryCompactor
+from src.utils.logging_utils import setup_logging
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='压缩 inventory_point_history 重复快照')
+    parser.add_argument('--batch-size', type=int, default=5000, help='每批删除的最大行数')
+    parser.add_argument('--pause', type=float, default=0.1, help='批次之间的暂停秒数')
+    parser.add_argument('--dry-run', action='store_true', help='只统计重复数据，不删除')
+    parser.add_argument('--skip-index', action='store_true', help='压缩后不创建唯一索引')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    compactor = InventoryHistoryCompactor(batch_size=args.batch_size, pause_seconds=args.pause)
+    result = compactor.run(dry_run=args.dry_run, create_index=not args.skip_index)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,14 +6,16 @@
 import sys
 import os
 import time
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 import logging
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(__file__))
 
+from src.auth.saihu_api_client import saihu_api_client
 from src.services.data_sync_service import data_sync_service
 from src.scheduler.sync_jobs import SyncJobs
+from src.scheduler.sync_dag import SyncDag
 from src.database.connection import db_manager
 
 # 设置日志记录
@@ -52,92 +54,90 @@ class ContinuousSync:
         print(f"\n🔄 第 {self.sync_count} 次同步 - {sync_time.strftime('%H:%M:%S')}")
         print("-" * 60)
         
+        # 按依赖图并发执行：库存与产品分析互不依赖，API额度由全局限速器公平分配
+        dag = SyncDag('continuous_sync')
+        dag.add('fba_inventory', data_sync_service.sync_fba_inventory_today)
+        dag.add('warehouse_inventory', data_sync_service.sync_warehouse_inventory_today)
+        # 昨日产品分析（只入库，库存合并在所有产品分析写入后统一执行）
+        dag.add('product_analytics_yesterday', lambda: self.sync_jobs.sync_product_analytics_yesterday(merge=False),
+                is_success=lambda r: r.get('status') == 'success')
+        # 前7天更新覆盖昨日数据，需等待昨日同步结束
+        dag.add('product_analytics_7days', lambda: self.sync_jobs.sync_product_analytics_history(days=7, merge=False),
+                depends_on=('product_analytics_yesterday',),
+                is_success=lambda r: r.get('status') == 'completed')
+        analytics_deps = ('product_analytics_yesterday', 'product_analytics_7days')
+        refresh_days = 7
+        
+        # 每月1号执行30天历史回填（完整历史数据）
+        if date.today().day == 1:
+            dag.add('product_analytics_30days',
+                    lambda: self.sync_jobs.sync_product_analytics_history(days=30, merge=False),
+                    depends_on=('product_analytics_7days',),
+                    is_success=lambda r: r.get('status') == 'completed')
+            analytics_deps = analytics_deps + ('product_analytics_30days',)
+            refresh_days = 30
+        
+        # 库存点合并与 inventory_deals 快照读取已入库的产品分析数据，需在所有产品分析写入后执行
+        dag.add('inventory_merge', lambda: self.sync_jobs.merge_inventory_points(days=refresh_days),
+                depends_on=analytics_deps,
+                is_success=lambda r: r.get('status') == 'success')
+        dag.add('inventory_deals', lambda: self.sync_jobs.generate_inventory_deals(days=refresh_days),
+                depends_on=analytics_deps,
+                is_success=lambda r: r.get('status') == 'success')
+        
+        print("🚀 并发执行: FBA库存 | 库存明细 | 产品分析 -> 前7天更新 -> 库存合并 | 库存点快照")
+        report = dag.run()
+        outcomes = report.outcomes
+        
         results = {
-            'fba_inventory': False,
-            'warehouse_inventory': False,
-            'product_analytics_yesterday': False,
-            'product_analytics_7days': False,
-            'inventory_merge': False  # 添加库存合并结果跟踪
+            'fba_inventory': outcomes['fba_inventory'].succeeded,
+            'warehouse_inventory': outcomes['warehouse_inventory'].succeeded,
+            'product_analytics_yesterday': outcomes['product_analytics_yesterday'].succeeded,
+            'product_analytics_7days': outcomes['product_analytics_7days'].succeeded,
+            'inventory_merge': outcomes['inventory_merge'].succeeded,
+            'inventory_deals': outcomes['inventory_deals'].succeeded
         }
         
-        try:
-            # 1. 同步FBA库存数据（当天全量替换）
-            print("📦 同步FBA库存数据...")
-            fba_result = data_sync_service.sync_fba_inventory_today()
-            results['fba_inventory'] = fba_result
-            status = "✅ 成功" if fba_result else "❌ 失败"
-            print(f"   FBA库存同步: {status}")
-            
-            # 延迟1秒避免API频率限制
-            time.sleep(1)
-            
-            # 2. 同步库存明细数据（当天全量替换）
-            print("🏠 同步库存明细数据...")
-            warehouse_result = data_sync_service.sync_warehouse_inventory_today()
-            results['warehouse_inventory'] = warehouse_result
-            status = "✅ 成功" if warehouse_result else "❌ 失败"
-            print(f"   库存明细同步: {status}")
-            
-            # 延迟1秒避免API频率限制
-            time.sleep(1)
-            
-            # 3. 同步前一天产品分析数据（增量+库存合并）
-            print("📊 同步前一天产品分析数据（含库存合并）...")
-            yesterday_result = self.sync_jobs.sync_product_analytics_yesterday()
-            yesterday_success = yesterday_result.get('status') == 'success'
-            results['product_analytics_yesterday'] = yesterday_success
-            status = "✅ 成功" if yesterday_success else "❌ 失败"
-            print(f"   昨日产品分析: {status}")
-            if yesterday_success:
-                print(f"   📊 合并数据: {yesterday_result.get('merged_count', 0)} 条")
-                print(f"   📈 保存数据: {yesterday_result.get('saved_count', 0)} 条")
-            
-            # 延迟1秒避免API频率限制
-            time.sleep(1)
-            
-            # 4. 更新前7天产品分析数据（增量+库存合并）
-            print("📈 更新前7天产品分析数据（含库存合并）...")
-            seven_days_result = self.sync_jobs.sync_product_analytics_history(days=7)
-            seven_days_success = seven_days_result.get('status') == 'completed'
-            results['product_analytics_7days'] = seven_days_success
-            status = "✅ 成功" if seven_days_success else "❌ 失败"
-            print(f"   7天产品分析: {status}")
-            if seven_days_success:
-                print(f"   📊 成功天数: {seven_days_result.get('success_count', 0)}/7")
-                print(f"   📈 失败天数: {seven_days_result.get('failure_count', 0)}/7")
-            
-            # 5. 每月月初执行30天历史回填（完整历史数据）
-            today = date.today()
-            if today.day == 1:  # 每月1号执行30天完整回填
-                print("📊 执行30天历史产品分析数据完整回填...")
-                thirty_days_result = self.sync_jobs.sync_product_analytics_history(days=30)
-                thirty_days_success = thirty_days_result.get('status') == 'completed'
-                if thirty_days_success:
-                    print(f"✅ 30天完整回填成功: {thirty_days_result.get('success_count', 0)}/30 天")
-                else:
-                    print(f"❌ 30天完整回填失败: {thirty_days_result.get('error', '未知错误')}")
-            
-            # 延迟1秒避免API频率限制
-            time.sleep(1)
-            
-            # 5. 获取库存合并统计
-            print("🔄 生成库存合并统计...")
-            yesterday = (date.today() - timedelta(days=1)).strftime('%Y-%m-%d')
-            merge_status = self.sync_jobs.get_sync_status(yesterday)
-            merge_success = 'error' not in merge_status
-            results['inventory_merge'] = merge_success
-            status = "✅ 成功" if merge_success else "❌ 失败"
-            print(f"   库存合并统计: {status}")
-            if merge_success and 'merge_summary' in merge_status:
-                summary = merge_status['merge_summary']
-                if summary:
-                    print(f"   📊 合并总点数: {summary.get('total_points', 0)}")
-                    print(f"   📈 有效库存点: {summary.get('effective_points', 0)}")
-                    print(f"   💰 总库存价值: ${summary.get('total_inventory_value', 0):.2f}")
-            
-        except Exception as e:
-            logger.error(f"数据同步异常: {e}")
-            print(f"❌ 同步过程发生异常: {e}")
+        def status_text(success):
+            return "✅ 成功" if success else "❌ 失败"
+        
+        print(f"   FBA库存同步: {status_text(results['fba_inventory'])} ({outcomes['fba_inventory'].duration:.1f}s)")
+        print(f"   库存明细同步: {status_text(results['warehouse_inventory'])} ({outcomes['warehouse_inventory'].duration:.1f}s)")
+        
+        yesterday_outcome = outcomes['product_analytics_yesterday']
+        print(f"   昨日产品分析: {status_text(yesterday_outcome.succeeded)} ({yesterday_outcome.duration:.1f}s)")
+        if yesterday_outcome.succeeded:
+            print(f"   📊 抓取数据: {yesterday_outcome.result.get('raw_count', 0)} 条")
+            print(f"   📈 入库数据: {yesterday_outcome.result.get('processed_count', 0)} 条")
+        
+        seven_days_outcome = outcomes['product_analytics_7days']
+        print(f"   7天产品分析: {status_text(seven_days_outcome.succeeded)} ({seven_days_outcome.duration:.1f}s)")
+        if seven_days_outcome.succeeded:
+            print(f"   📊 成功天数: {seven_days_outcome.result.get('success_count', 0)}/7")
+            print(f"   📈 失败天数: {seven_days_outcome.result.get('failure_count', 0)}/7")
+        
+        if 'product_analytics_30days' in outcomes:
+            thirty_days_outcome = outcomes['product_analytics_30days']
+            if thirty_days_outcome.succeeded:
+                print(f"✅ 30天完整回填成功: {thirty_days_outcome.result.get('success_count', 0)}/30 天")
+            else:
+                error = thirty_days_outcome.error or (thirty_days_outcome.result or {}).get('error', '未知错误')
+                print(f"❌ 30天完整回填失败: {error}")
+        
+        merge_outcome = outcomes['inventory_merge']
+        print(f"   库存点合并: {status_text(merge_outcome.succeeded)} ({merge_outcome.duration:.1f}s)")
+        if merge_outcome.succeeded and 'merge_summary' in merge_outcome.result:
+            summary = merge_outcome.result['merge_summary']
+            if summary:
+                print(f"   📊 合并总点数: {summary.get('total_points', 0)}")
+                print(f"   📈 有效库存点: {summary.get('effective_points', 0)}")
+                print(f"   💰 总库存价值: ${summary.get('total_inventory_value', 0):.2f}")
+        
+        deals_outcome = outcomes['inventory_deals']
+        print(f"   库存点快照: {status_text(deals_outcome.succeeded)} ({deals_outcome.duration:.1f}s)")
+        
+        print(f"\n⏱️ 本轮耗时: {report.wall_seconds:.1f}s（串行需 {report.serial_seconds:.1f}s）")
+        print(f"   关键路径: {report.format_critical_path()}")
         
         # 打印同步总结
         success_count = sum(1 for result in results.values() if result)
@@ -245,6 +245,10 @@ class ContinuousSync:
             logger.error(f"连续同步服务异常: {e}")
             print(f"\n❌ 同步服务异常退出: {e}")
         finally:
+            # 关闭并行解码进程池和API客户端（含请求对冲线程池）
+            self.sync_jobs.close()
+            if saihu_api_client.is_resolved:
+                saihu_api_client.close()
             print("👋 感谢使用赛狐ERP数据同步服务")
 
 def main():
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+产品分析累计汇总表重建脚本 - 从 product_analytics 全量（或按ASIN）重建 product_analytics_cumulative
+"""
+
+import sys
+import os
+import argparse
+import json
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.services.analytics_rollup_service import AnalyticsRollupService
+from src.utils.logging_utils import setup_logging
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='重建 product_analytics_cumulative 累计汇总表')
+    parser.add_argument('--asin', action='append', dest='asins', help='只重建指定ASIN（可重复）')
+    args = parser.parse_args()
+
+    setup_logging()
+
+    service = AnalyticsRollupService(enabled=True)
+    rows = service.rebuild(args.asins)
+
+    print(json.dumps({'rebuilt_rows': rows, 'asins': args.asins or 'all'}, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
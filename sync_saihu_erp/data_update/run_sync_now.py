@@ -14,6 +14,7 @@ import time
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from src.auth.saihu_api_client import saihu_api_client
 from src.scheduler.sync_jobs import SyncJobs
 from src.config.settings import settings
 from src.utils.logging_utils import setup_logging
@@ -215,6 +216,11 @@ def main():
         
         print(f"\n📁 执行结果已保存到: sync_execution_result.json")
         print(f"⏱️  总执行时间: {final_duration}")
+
+        # 关闭并行解码进程池和API客户端（含请求对冲线程池）
+        sync_jobs.close()
+        if saihu_api_client.is_resolved:
+            saihu_api_client.close()
     
     print("\n🎉 数据同步执行完成!")
     return True
@@ -1,5 +1,12 @@
 # auth模块初始化
-from .oauth_client import OAuthClient
-from .api_signer import ApiSigner
+from ..utils.lazy import lazy_exports
 
-__all__ = ['OAuthClient', 'ApiSigner']
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'OAuthClient': '.oauth_client',
+    'ApiSigner': '.api_signer',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['OAuthClient', 'ApiSigner']
@@ -9,6 +9,7 @@ import random
 import logging
 from typing import Dict, Any, Optional
 from ..config.secure_config import config
+from ..utils.lazy import LazyObject
 
 logger = logging.getLogger(__name__)
 
@@ -135,5 +136,5 @@ class ApiSigner:
             logger.error(f"时间戳格式错误: {e}")
             return False
 
-# 全局签名生成器实例
-api_signer = ApiSigner()
\ No newline at end of file
+# 全局签名生成器实例（首次使用时构造）
+api_signer = LazyObject(ApiSigner)
\ No newline at end of file
@@ -9,6 +9,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from ..config.secure_config import config
+from ..utils.lazy import LazyObject
 
 logger = logging.getLogger(__name__)
 
@@ -243,5 +244,5 @@ class OAuthClient:
         logger.info("Token缓存已清除")
 
 
-# 全局OAuth客户端实例
-oauth_client = OAuthClient()
\ No newline at end of file
+# 全局OAuth客户端实例（首次使用时构造）
+oauth_client = LazyObject(OAuthClient)
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+分页接口页大小自适应
+按端点记录请求延迟（固定开销 + 每行耗时）、每行字节数和服务端页大小上限，选择延迟目标内允许的最大页大小，
+并持久化到状态文件。
+单次分页抓取（pull）开始时确定页大小、抓取过程中保持不变（pageNo 偏移依赖页大小）；只有抓取过程中的分页请求
+计入观测（变更探测、取总数等单独请求不计入），抓取结束时页大小最多放大一步，用于下一次抓取。
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, Optional
+
+from ..config.settings import settings
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+# 指数加权平均的新样本权重
+EWMA_ALPHA = 0.3
+
+# 行数方差低于该值时无法区分固定开销与每行耗时，全部按每行耗时估算（偏保守）
+MIN_ROWS_VARIANCE = 1.0
+
+
+@dataclass
+class PageSizeState:
+    """单个端点的页大小状态"""
+    page_size: int
+    server_limit: Optional[int] = None     # 服务端实际允许的最大页大小（截断或拒绝时得到）
+    largest_ok: int = 0                    # 成功返回过的最大页大小
+    seconds_per_row: Optional[float] = None
+    overhead_seconds: float = 0.0          # 与行数无关的单次请求固定开销（签名、网络往返、服务端查询）
+    bytes_per_row: Optional[float] = None
+    samples: int = 0
+    timeouts: int = 0
+    # 延迟 = 固定开销 + 每行耗时 × 行数 的加权回归统计量
+    mean_rows: Optional[float] = None
+    mean_seconds: Optional[float] = None
+    var_rows: float = 0.0
+    cov_rows_seconds: float = 0.0
+
+
+@dataclass
+class _PullScope:
+    """一次分页抓取的观测范围"""
+    endpoint: Optional[str]
+    observed: bool = False
+    backed_off: bool = False
+
+
+# 当前上下文所在的分页抓取（线程池/对冲请求通过 copy_context 继承）
+_current_pull: ContextVar[Optional[_PullScope]] = ContextVar('page_size_pull', default=None)
+
+
+class PageSizeTuner:
+    """分页接口页大小自适应调整器"""
+
+    def __init__(self, enabled: Optional[bool] = None, state_file: Optional[str] = None,
+                 target_seconds: Optional[float] = None, min_size: Optional[int] = None,
+                 max_size: Optional[int] = None, max_response_bytes: Optional[int] = None):
+        """
+        Args:
+            enabled: 是否自适应，默认 api.adaptive_page_size（关闭时始终使用调用方传入的页大小）
+            state_file: 状态持久化文件，默认 api.page_size_state_file（空字符串表示不持久化）
+            target_seconds: 单页延迟目标，默认 api.page_latency_target
+            max_response_bytes: 单页响应字节上限，默认 api.page_max_response_bytes
+        """
+        self.enabled = bool(settings.get('api.adaptive_page_size', False) if enabled is None else enabled)
+        self.state_file = state_file if state_file is not None else settings.get('api.page_size_state_file', '')
+        self.target_seconds = float(target_seconds or settings.get('api.page_latency_target', 10))
+        self.min_size = int(min_size or settings.get('api.page_size_min', 20))
+        self.max_size = int(max_size or settings.get('api.page_size_max', 500))
+        self.max_response_bytes = int(max_response_bytes or settings.get('api.page_max_response_bytes', 8 * 1024 * 1024))
+        self.states: Dict[str, PageSizeState] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def page_size_for(self, endpoint: str, default: int) -> int:
+        """本次分页抓取使用的页大小（未开启或尚无观测时为调用方默认值）"""
+        if not self.enabled:
+            return default
+        with self._lock:
+            state = self.states.get(endpoint)
+            return state.page_size if state is not None else default
+
+    @contextmanager
+    def pull(self, endpoint: Optional[str], default: int) -> Iterator[int]:
+        """一次分页抓取：返回本次使用的页大小
+
+        期间同一端点的分页请求计入观测；结束时按观测结果最多调整一步页大小并持久化。
+        """
+        scope = _PullScope(endpoint=endpoint)
+        token = _current_pull.set(scope)
+        try:
+            yield self.page_size_for(endpoint, default) if endpoint else default
+        finally:
+            _current_pull.reset(token)
+            self._finish_pull(scope)
+            self.save()
+
+    @contextmanager
+    def unobserved(self) -> Iterator[None]:
+        """抓取过程中的非分页请求（如只取1条读取 totalSize），不计入观测"""
+        token = _current_pull.set(None)
+        try:
+            yield
+        finally:
+            _current_pull.reset(token)
+
+    def observe(self, endpoint: str, page_size: int, seconds: float, size_bytes: int = 0,
+                rows: int = 0, has_more: bool = False, timed_out: bool = False,
+                rejected: bool = False) -> None:
+        """记录一次分页请求（不在该端点的分页抓取中的请求忽略）
+
+        Args:
+            rows: 本页返回的行数
+            has_more: 是否还有后续页（用于识别服务端截断页大小）
+            timed_out: 请求超时
+            rejected: 服务端因页大小拒绝请求
+        """
+        if not self.enabled or page_size <= 0:
+            return
+        scope = _current_pull.get()
+        if scope is None or scope.endpoint != endpoint:
+            return
+
+        with self._lock:
+            state = self.states.setdefault(endpoint, PageSizeState(page_size=page_size))
+            if timed_out or rejected:
+                if timed_out:
+                    state.timeouts += 1
+                # 以成功过的最大页大小为上限，没有成功记录时减半
+                limit = state.largest_ok if 0 < state.largest_ok < page_size else max(self.min_size, page_size // 2)
+                if rejected:
+                    state.server_limit = limit
+                state.page_size = min(state.page_size, limit)
+                scope.backed_off = True
+                self._dirty = True
+                logger.warning(
+                    f"分页接口 {endpoint} 页大小 {page_size} {'超时' if timed_out else '被拒绝'}，调整为 {state.page_size}"
+                )
+                return
+
+            if rows <= 0:
+                return
+            if has_more and rows < page_size:
+                # 服务端按自身上限截断了页大小
+                state.server_limit = rows
+            state.largest_ok = max(state.largest_ok, min(rows, page_size))
+            self._fit_latency(state, rows, seconds)
+            if size_bytes:
+                state.bytes_per_row = self._ewma(state.bytes_per_row, size_bytes / rows)
+            state.samples += 1
+            scope.observed = True
+            self._dirty = True
+
+    def _fit_latency(self, state: PageSizeState, rows: int, seconds: float) -> None:
+        """加权回归拟合 延迟 = 固定开销 + 每行耗时 × 行数"""
+        if state.mean_rows is None or state.mean_seconds is None:
+            state.mean_rows, state.mean_seconds = float(rows), seconds
+        else:
+            d_rows = rows - state.mean_rows
+            d_seconds = seconds - state.mean_seconds
+            state.mean_rows += EWMA_ALPHA * d_rows
+            state.mean_seconds += EWMA_ALPHA * d_seconds
+            state.var_rows = (1 - EWMA_ALPHA) * (state.var_rows + EWMA_ALPHA * d_rows * d_rows)
+            state.cov_rows_seconds = (1 - EWMA_ALPHA) * (state.cov_rows_seconds + EWMA_ALPHA * d_rows * d_seconds)
+
+        if state.var_rows >= MIN_ROWS_VARIANCE:
+            slope = state.cov_rows_seconds / state.var_rows
+            intercept = state.mean_seconds - slope * state.mean_rows
+            if slope > 0 and intercept >= 0:
+                state.seconds_per_row, state.overhead_seconds = slope, intercept
+                return
+        # 页大小单一或拟合结果不合理时，全部耗时按行分摊
+        state.seconds_per_row, state.overhead_seconds = state.mean_seconds / state.mean_rows, 0.0
+
+    def _finish_pull(self, scope: _PullScope) -> None:
+        """抓取结束：有成功观测且未退避时按观测结果调整一次页大小"""
+        if not scope.observed or scope.backed_off:
+            return
+        with self._lock:
+            state = self.states.get(scope.endpoint)
+            if state is not None:
+                state.page_size = self._choose(state)
+                self._dirty = True
+
+    def _choose(self, state: PageSizeState) -> int:
+        """延迟目标、响应大小、服务端上限内的最大页大小；每次抓取最多放大一倍，逐步试探"""
+        candidates = [self.max_size, state.page_size * 2]
+        if state.seconds_per_row:
+            candidates.append(int(max(self.target_seconds - state.overhead_seconds, 0) / state.seconds_per_row))
+        if state.bytes_per_row:
+            candidates.append(int(self.max_response_bytes / state.bytes_per_row))
+        if state.server_limit:
+            candidates.append(state.server_limit)
+        size = max(self.min_size, min(candidates))
+        return size - size % 10 if size > 10 else size
+
+    @staticmethod
+    def _ewma(previous: Optional[float], value: float) -> float:
+        return value if previous is None else previous + EWMA_ALPHA * (value - previous)
+
+    def _load(self) -> None:
+        """加载持久化的端点状态"""
+        if not self.enabled or not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self.states = {endpoint: PageSizeState(**data) for endpoint, data in saved.items()}
+        except Exception as e:
+            logger.warning(f"读取分页大小状态失败: {e}")
+
+    def save(self) -> None:
+        """原子写入端点状态（无变化时不写）"""
+        if not self.enabled or not self.state_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {endpoint: asdict(state) for endpoint, state in self.states.items()}
+            self._dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.state_file))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.state_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.warning(f"保存分页大小状态失败: {e}")
+
+
+# 全局页大小调整器（首次使用时读取配置和状态文件）
+page_size_tuner = LazyObject(PageSizeTuner)
@@ -0,0 +1,75 @@
+"""
+API调用速率限制
+进程内共享的令牌桶，多个同步分支并发抓取时按到达顺序公平分配调用额度
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from ..config.settings import settings
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """公平令牌桶
+
+    令牌按 rate 个/秒补充，最多累积 burst 个；等待者按先来先得排队，
+    避免某个分支连续抢占额度导致其他分支饥饿。rate <= 0 时不限速。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiters: deque = deque()
+
+    @property
+    def enabled(self) -> bool:
+        """是否限速"""
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        """按流逝时间补充令牌"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """获取一个令牌，超时返回False"""
+        if not self.enabled:
+            return True
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self._condition:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] is ticket and self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+
+                    wait = (1 - self._tokens) / self.rate if self._waiters[0] is ticket else None
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                self._condition.notify_all()
+
+
+# 全局API限速器（api.rate_limit_per_second <= 0 时不限速；首次使用时读取配置）
+api_rate_limiter = LazyObject(lambda: TokenBucket(
+    rate=settings.get('api.rate_limit_per_second', 0),
+    burst=settings.get('api.rate_limit_burst', 1)
+))
@@ -0,0 +1,208 @@
+"""
+API请求对冲
+只读端点的请求超过该端点已观测的 p95 延迟仍未返回时，在限速额度允许的情况下再发一次相同请求，
+先返回者胜出，避免个别慢页拖住整个顺序抓取。落后的请求无法取消，其结果直接丢弃。
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from .rate_limiter import api_rate_limiter
+from ..config.settings import settings
+from ..utils.instrumentation import LatencyHistogram, METRIC_PREFIX, metrics_registry
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 默认允许对冲的只读分页查询端点（重复请求无副作用）
+DEFAULT_HEDGE_ENDPOINTS = (
+    '/api/productAnalyze/new/pageList.json',
+    '/api/inventoryManage/fba/pageList.json',
+    '/api/warehouseManage/warehouseItemList.json',
+)
+
+
+class HedgeStats:
+    """单个端点的对冲统计"""
+
+    __slots__ = ('issued', 'won', 'skipped', 'saved_seconds')
+
+    def __init__(self):
+        self.issued = 0
+        self.won = 0
+        self.skipped = 0
+        self.saved_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'issued': self.issued,
+            'won': self.won,
+            'skipped': self.skipped,
+            'saved_seconds': round(self.saved_seconds, 4),
+        }
+
+
+class RequestHedger:
+    """按端点 p95 延迟对冲慢请求"""
+
+    def __init__(self, enabled: Optional[bool] = None, endpoints: Optional[Iterable[str]] = None,
+                 min_samples: Optional[int] = None, min_delay: Optional[float] = None,
+                 workers: Optional[int] = None, rate_limiter: Any = None):
+        """
+        Args:
+            enabled: 是否开启对冲，默认 api.hedge_requests
+            endpoints: 允许对冲的端点（必须是幂等的只读查询），默认 api.hedge_endpoints
+            min_samples: 端点至少观测到多少次成功请求后才开始对冲，默认 api.hedge_min_samples
+            min_delay: 对冲等待时间下限（秒），默认 api.hedge_min_delay
+            workers: 执行请求的线程数，默认 api.hedge_workers
+            rate_limiter: 限速器，默认进程内共享的 api_rate_limiter
+        """
+        self.enabled = bool(settings.get('api.hedge_requests', False) if enabled is None else enabled)
+        self.endpoints = frozenset(endpoints if endpoints is not None
+                                   else settings.get('api.hedge_endpoints', list(DEFAULT_HEDGE_ENDPOINTS)))
+        self.min_samples = int(min_samples if min_samples is not None else settings.get('api.hedge_min_samples', 20))
+        self.min_delay = float(min_delay if min_delay is not None else settings.get('api.hedge_min_delay', 1.0))
+        self.workers = int(workers or settings.get('api.hedge_workers', 8))
+        self.rate_limiter = rate_limiter if rate_limiter is not None else api_rate_limiter
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.stats: Dict[str, HedgeStats] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """对冲前的等待时间：端点 p95 延迟（不低于 min_delay）；样本不足时为 None"""
+        with self._lock:
+            histogram = self.latency.get(endpoint)
+            if histogram is None or histogram.count < self.min_samples:
+                return None
+            p95 = histogram.quantile(0.95)
+        if p95 == float('inf'):
+            return None
+        return max(self.min_delay, p95)
+
+    def call(self, endpoint: str, send: Callable[[], T]) -> T:
+        """执行请求，超过 p95 未返回时对冲
+
+        Args:
+            send: 发起一次完整请求（每次调用须重新签名），异常视为该次请求失败
+        """
+        if not self.enabled or endpoint not in self.endpoints:
+            return send()
+
+        delay = self.hedge_delay(endpoint)
+        if delay is None:
+            return self._timed(endpoint, send)[0]
+
+        primary = self._submit(endpoint, send)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()[0]
+
+        # 对冲请求不排队等待额度，额度已用完时继续等待原请求
+        if not self.rate_limiter.acquire(timeout=0):
+            with self._lock:
+                self._stats(endpoint).skipped += 1
+            return primary.result()[0]
+
+        with self._lock:
+            self._stats(endpoint).issued += 1
+        logger.info(f"请求 {endpoint} 超过 p95 延迟 {delay}s 未返回，发起对冲请求")
+        hedge = self._submit(endpoint, send)
+
+        pending = {primary, hedge}
+        first_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # 同时完成时优先原请求
+            for future in sorted(done, key=lambda f: f is hedge):
+                try:
+                    result, finished_at = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self._stats(endpoint).won += 1
+                    primary.add_done_callback(lambda _, at=finished_at: self._record_saved(endpoint, at))
+                return result
+        raise first_error
+
+    def _submit(self, endpoint: str, send: Callable[[], T]) -> 'Future[Tuple[T, float]]':
+        """在线程池中执行请求（沿用当前上下文，埋点仍计入当前任务）"""
+        context = contextvars.copy_context()
+        return self._get_executor().submit(context.run, self._timed, endpoint, send)
+
+    def _timed(self, endpoint: str, send: Callable[[], T]) -> Tuple[T, float]:
+        started = time.perf_counter()
+        result = send()
+        finished_at = time.perf_counter()
+        with self._lock:
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = LatencyHistogram()
+            histogram.observe(finished_at - started)
+        return result, finished_at
+
+    def _record_saved(self, endpoint: str, hedge_finished_at: float) -> None:
+        """原请求结束时，计入对冲节省的时间"""
+        saved = time.perf_counter() - hedge_finished_at
+        with self._lock:
+            self._stats(endpoint).saved_seconds += saved
+
+    def _stats(self, endpoint: str) -> HedgeStats:
+        stats = self.stats.get(endpoint)
+        if stats is None:
+            stats = self.stats[endpoint] = HedgeStats()
+        return stats
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='api-hedge')
+            return self._executor
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭请求线程池（之后再发起对冲会重新创建）
+
+        Args:
+            wait: 是否等待仍在执行的请求（含已落后的请求）结束
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        # 请求线程结束时需要获取 _lock，不能持锁等待
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """各端点的对冲统计"""
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in sorted(self.stats.items())}
+
+    def to_prometheus(self) -> List[str]:
+        """输出 Prometheus 文本行"""
+        p = METRIC_PREFIX
+        lines: List[str] = []
+        stats = self.to_dict()
+        for metric, key, help_text in (
+            ('api_hedges_total', 'issued', 'Hedged API requests issued.'),
+            ('api_hedge_wins_total', 'won', 'Hedged API requests that answered first.'),
+            ('api_hedges_skipped_total', 'skipped', 'Hedges skipped for lack of rate budget.'),
+            ('api_hedge_saved_seconds_total', 'saved_seconds', 'Latency saved by winning hedges.'),
+        ):
+            lines.append(f'# HELP {p}_{metric} {help_text}')
+            lines.append(f'# TYPE {p}_{metric} counter')
+            for endpoint, values in stats.items():
+                lines.append(f'{p}_{metric}{{endpoint="{endpoint}"}} {values[key]}')
+        return lines
+
+
+# 全局请求对冲器（首次使用时读取配置）
+request_hedger = LazyObject(RequestHedger)
+
+metrics_registry.register_collector(lambda: request_hedger.to_prometheus())
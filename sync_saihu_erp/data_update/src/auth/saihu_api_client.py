@@ -3,16 +3,37 @@
 处理需要签名的API请求
 """
 import json
+import time
 import requests
 import logging
 from typing import Dict, Any, Optional
 from datetime import datetime
 from .oauth_client import oauth_client
 from .api_signer import api_signer
+from .page_size_tuner import page_size_tuner
+from .rate_limiter import api_rate_limiter
+from .request_hedger import request_hedger
 from ..config.settings import settings
+from ..utils.instrumentation import record_api_latency
+from ..utils.lazy import LazyObject
 
 logger = logging.getLogger(__name__)
 
+PRODUCT_ANALYTICS_ENDPOINT = '/api/productAnalyze/new/pageList.json'
+FBA_INVENTORY_ENDPOINT = '/api/inventoryManage/fba/pageList.json'
+WAREHOUSE_INVENTORY_ENDPOINT = '/api/warehouseManage/warehouseItemList.json'
+
+# 分页抓取函数 -> 端点（按端点自适应页大小）
+PAGE_LIST_ENDPOINTS = {
+    'fetch_product_analytics': PRODUCT_ANALYTICS_ENDPOINT,
+    'fetch_fba_inventory': FBA_INVENTORY_ENDPOINT,
+    'fetch_warehouse_inventory': WAREHOUSE_INVENTORY_ENDPOINT,
+}
+
+# 频率限制错误码（与页大小无关）
+RATE_LIMIT_CODE = 40019
+
+
 class SaihuApiClient:
     """赛狐ERP API客户端"""
     
@@ -31,6 +52,13 @@ class SaihuApiClient:
         
         logger.info("赛狐ERP API客户端初始化完成")
     
+    def close(self) -> None:
+        """关闭HTTP会话和请求对冲线程池"""
+        self.session.close()
+        if request_hedger.is_resolved:
+            request_hedger.shutdown()
+        logger.info("赛狐ERP API客户端已关闭")
+    
     def make_signed_request(self,
                           endpoint: str,
                           method: str = 'POST',
@@ -58,29 +86,21 @@ class SaihuApiClient:
             # 打印获取到的token
             print(f"🔑 获取到的访问令牌: {access_token}")
             
-            # 生成签名参数（传入URL路径）
-            sign_params = self.api_signer.generate_sign_params(
-                access_token=access_token,
-                url=endpoint,
-                method='post'
-            )
-            
             # 构建完整URL
             url = f"{self.base_url}{endpoint}"
             
             logger.info(f"发起签名API请求: {method} {url}")
             print(f"🔗 请求URL: {url}")
-            print(f"📝 签名参数: {sign_params}")
             print(f"📦 请求体数据: {json.dumps(body_data, ensure_ascii=False, indent=2) if body_data else 'None'}")
-            logger.debug(f"签名参数: {sign_params}")
             logger.debug(f"请求体数据: {body_data}")
             
-            # 发起POST请求
-            response = self.session.post(
-                url=url,
-                params=sign_params,  # 签名参数作为查询参数
-                json=body_data,      # 请求体数据作为JSON
-                timeout=timeout
+            # 并发同步分支共享调用额度
+            api_rate_limiter.acquire()
+            
+            # 只读端点开启对冲时，超过 p95 未返回会在额度内重发（每次重新签名）
+            response = request_hedger.call(
+                endpoint,
+                lambda: self._post_signed(endpoint, url, access_token, body_data, timeout)
             )
             
             logger.debug(f"API响应: {response.status_code}")
@@ -107,6 +127,84 @@ class SaihuApiClient:
         except Exception as e:
             logger.error(f"签名API请求失败: {e}")
             return None
+
+    def _post_signed(self,
+                     endpoint: str,
+                     url: str,
+                     access_token: str,
+                     body_data: Optional[Dict[str, Any]],
+                     timeout: int) -> requests.Response:
+        """生成签名并发起POST请求（记录延迟直方图和响应字节数）"""
+        # 生成签名参数（传入URL路径）
+        sign_params = self.api_signer.generate_sign_params(
+            access_token=access_token,
+            url=endpoint,
+            method='post'
+        )
+        print(f"📝 签名参数: {sign_params}")
+        logger.debug(f"签名参数: {sign_params}")
+        
+        request_started = time.perf_counter()
+        try:
+            response = self.session.post(
+                url=url,
+                params=sign_params,  # 签名参数作为查询参数
+                json=body_data,      # 请求体数据作为JSON
+                timeout=timeout
+            )
+        except requests.exceptions.RequestException as e:
+            elapsed = time.perf_counter() - request_started
+            record_api_latency(endpoint, elapsed, ok=False)
+            if isinstance(e, requests.exceptions.Timeout):
+                self._observe_page(endpoint, body_data, elapsed, timed_out=True)
+            raise
+        elapsed = time.perf_counter() - request_started
+        record_api_latency(
+            endpoint,
+            elapsed,
+            ok=response.status_code == 200,
+            size=len(response.content or b'')
+        )
+        self._observe_page(endpoint, body_data, elapsed, response)
+        return response
+
+    def _observe_page(self,
+                      endpoint: str,
+                      body_data: Optional[Dict[str, Any]],
+                      seconds: float,
+                      response: Optional[requests.Response] = None,
+                      timed_out: bool = False) -> None:
+        """分页请求的延迟、响应字节数、返回行数计入页大小调整器（只有分页抓取过程中的请求会被采纳）"""
+        if not page_size_tuner.enabled or not body_data or 'pageSize' not in body_data:
+            return
+        try:
+            page_size = int(body_data['pageSize'])
+            if timed_out or response is None:
+                page_size_tuner.observe(endpoint, page_size, seconds, timed_out=True)
+                return
+
+            payload = response.json()
+            code = payload.get('code')
+            if code not in (0, RATE_LIMIT_CODE):
+                message = str(payload.get('msg') or '').lower()
+                rejected = 'pagesize' in message or '每页' in message or '分页' in message
+                if rejected:
+                    page_size_tuner.observe(endpoint, page_size, seconds, rejected=True)
+                return
+            if code != 0:
+                return
+
+            data = payload.get('data') or {}
+            page_size_tuner.observe(
+                endpoint,
+                page_size,
+                seconds,
+                size_bytes=len(response.content or b''),
+                rows=len(data.get('rows') or []),
+                has_more=int(body_data.get('pageNo', 1)) < int(data.get('totalPage') or 0)
+            )
+        except Exception as e:
+            logger.debug(f"记录分页观测失败: {e}")
     
     def fetch_product_analytics(self,
                               start_date: str,
@@ -165,7 +263,7 @@ class SaihuApiClient:
         
         try:
             response = self.make_signed_request(
-                endpoint='/api/productAnalyze/new/pageList.json',
+                endpoint=PRODUCT_ANALYTICS_ENDPOINT,
                 method='POST',
                 body_data=body_data
             )
@@ -248,7 +346,7 @@ class SaihuApiClient:
         
         try:
             response = self.make_signed_request(
-                endpoint='/api/inventoryManage/fba/pageList.json',
+                endpoint=FBA_INVENTORY_ENDPOINT,
                 method='POST',
                 body_data=body_data
             )
@@ -344,7 +442,7 @@ class SaihuApiClient:
         
         try:
             response = self.make_signed_request(
-                endpoint='/api/warehouseManage/warehouseItemList.json',
+                endpoint=WAREHOUSE_INVENTORY_ENDPOINT,
                 method='POST',
                 body_data=body_data
             )
@@ -372,6 +470,7 @@ class SaihuApiClient:
                        **kwargs) -> list:
         """
         获取所有分页数据 - 添加延迟避免API调用频率限制
+        开启 api.adaptive_page_size 时按端点使用调整后的页大小（整个抓取过程保持不变），结束后调整页大小并持久化
         
         Args:
             fetch_func: 数据获取函数
@@ -385,54 +484,59 @@ class SaihuApiClient:
         import time
         all_data = []
         page_no = 1
-        
-        while True:
-            try:
-                # 添加延迟避免API调用频率限制（除了第一页）
-                if page_no > 1:
-                    logger.info(f"等待 {delay_seconds} 秒后继续抓取...")
-                    time.sleep(delay_seconds)
+
+        endpoint = PAGE_LIST_ENDPOINTS.get(getattr(fetch_func, '__name__', ''))
+        with page_size_tuner.pull(endpoint, kwargs.get('page_size', 0)) as page_size:
+            if endpoint and 'page_size' in kwargs:
+                kwargs['page_size'] = page_size
+            
+            while True:
+                try:
+                    # 添加延迟避免API调用频率限制（除了第一页）
+                    if page_no > 1:
+                        logger.info(f"等待 {delay_seconds} 秒后继续抓取...")
+                        time.sleep(delay_seconds)
                 
-                # 获取当前页数据
-                result = fetch_func(page_no=page_no, **kwargs)
+                    # 获取当前页数据
+                    result = fetch_func(page_no=page_no, **kwargs)
                 
-                if not result:
-                    logger.warning(f"第 {page_no} 页数据获取失败")
-                    break
+                    if not result:
+                        logger.warning(f"第 {page_no} 页数据获取失败")
+                        break
                 
-                # 提取数据行
-                rows = result.get('rows', [])
-                if not rows:
-                    logger.info(f"第 {page_no} 页无数据，抓取完成")
-                    break
+                    # 提取数据行
+                    rows = result.get('rows', [])
+                    if not rows:
+                        logger.info(f"第 {page_no} 页无数据，抓取完成")
+                        break
                 
-                all_data.extend(rows)
+                    all_data.extend(rows)
                 
-                # 检查是否还有更多页
-                total_page = result.get('totalPage', 0)
-                if page_no >= total_page:
-                    logger.info(f"已抓取完所有 {total_page} 页数据")
-                    break
+                    # 检查是否还有更多页
+                    total_page = result.get('totalPage', 0)
+                    if page_no >= total_page:
+                        logger.info(f"已抓取完所有 {total_page} 页数据")
+                        break
                 
-                # 检查最大页数限制
-                if max_pages and page_no >= max_pages:
-                    logger.warning(f"已达到最大页数限制: {max_pages}")
-                    break
+                    # 检查最大页数限制
+                    if max_pages and page_no >= max_pages:
+                        logger.warning(f"已达到最大页数限制: {max_pages}")
+                        break
                 
-                page_no += 1
-                logger.info(f"已获取 {len(all_data)} 条数据，继续获取第 {page_no} 页")
+                    page_no += 1
+                    logger.info(f"已获取 {len(all_data)} 条数据，继续获取第 {page_no} 页")
                 
-            except Exception as e:
-                logger.error(f"获取第 {page_no} 页数据异常: {e}")
-                # 如果是频率限制错误，等待更长时间后重试
-                if "调用超过限制" in str(e) or "40019" in str(e):
-                    logger.warning(f"遇到API频率限制，等待10秒后重试...")
-                    time.sleep(10)
-                    continue
-                break
+                except Exception as e:
+                    logger.error(f"获取第 {page_no} 页数据异常: {e}")
+                    # 如果是频率限制错误，等待更长时间后重试
+                    if "调用超过限制" in str(e) or "40019" in str(e):
+                        logger.warning(f"遇到API频率限制，等待10秒后重试...")
+                        time.sleep(10)
+                        continue
+                    break
         
         logger.info(f"分页抓取完成，共获取 {len(all_data)} 条数据")
         return all_data
 
-# 全局API客户端实例
-saihu_api_client = SaihuApiClient()
\ No newline at end of file
+# 全局API客户端实例（首次使用时构造）
+saihu_api_client = LazyObject(SaihuApiClient)
\ No newline at end of file
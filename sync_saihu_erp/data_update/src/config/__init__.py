@@ -1,6 +1,13 @@
 # config模块初始化
-from .settings import Settings
-from .database import DatabaseConfig
-from .api import ApiConfig
+from ..utils.lazy import lazy_exports
 
-__all__ = ['Settings', 'DatabaseConfig', 'ApiConfig']
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'Settings': '.settings',
+    'DatabaseConfig': '.database',
+    'ApiConfig': '.api',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['Settings', 'DatabaseConfig', 'ApiConfig']
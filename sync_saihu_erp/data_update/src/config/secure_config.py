@@ -11,6 +11,7 @@ from dataclasses import dataclass
 
 from decouple import AutoConfig
 from .settings import settings
+from ..utils.lazy import LazyObject
 
 logger = logging.getLogger(__name__)
 
@@ -125,5 +126,5 @@ class SecureConfig:
             'debug_mode': sync_config.enable_debug
         }
 
-# 全局配置实例
-config = SecureConfig()
\ No newline at end of file
+# 全局配置实例（首次使用时构造）
+config = LazyObject(SecureConfig)
\ No newline at end of file
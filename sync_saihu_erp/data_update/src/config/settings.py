@@ -3,11 +3,11 @@
 处理系统配置的加载、验证和管理
 """
 import os
-import yaml
 import json
 from typing import Dict, Any, Optional
 from pathlib import Path
 import logging
+from ..utils.lazy import LazyObject
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +31,7 @@ class Settings:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     if self.config_file.endswith('.yml') or self.config_file.endswith('.yaml'):
+                        import yaml
                         self._config = yaml.safe_load(f) or {}
                     elif self.config_file.endswith('.json'):
                         self._config = json.load(f)
@@ -65,6 +66,21 @@ class Settings:
                 'timeout': 60,
                 'retry_count': 3,
                 'retry_delay': 1,
+                'adaptive_page_size': False,
+                'page_size_state_file': 'logs/page_size_state.json',
+                'page_latency_target': 10,
+                'page_size_min': 20,
+                'page_size_max': 500,
+                'page_max_response_bytes': 8388608,
+                'hedge_requests': False,
+                'hedge_endpoints': [
+                    '/api/productAnalyze/new/pageList.json',
+                    '/api/inventoryManage/fba/pageList.json',
+                    '/api/warehouseManage/warehouseItemList.json'
+                ],
+                'hedge_min_samples': 20,
+                'hedge_min_delay': 1.0,
+                'hedge_workers': 8,
                 'auth': {
                     'type': 'bearer',
                     'token': os.getenv('API_TOKEN', ''),
@@ -76,13 +92,27 @@ class Settings:
                 'batch_size': 500,
                 'max_history_days': 30,
                 'enable_validation': True,
-                'parallel_workers': 4
+                'parallel_workers': 4,
+                'parallel_decode': False,
+                'parallel_shard_size': 2000,
+                'parallel_min_rows': 10000,
+                'maintain_cumulative_rollup': False,
+                'incremental_merge': True,
+                'merge_engine': 'python',
+                'record_checksums': True,
+                'sharded_fetch': False,
+                'shard_fetch_workers': 4,
+                'shard_fetch_retries': 2,
+                'shard_cache_seconds': 21600,
+                'shard_lookback_days': 30,
+                'inventory_deals_script': ''
             },
             'scheduler': {
                 'timezone': 'Asia/Shanghai',
                 'max_instances': 1,
                 'coalesce': True,
-                'misfire_grace_time': 300
+                'misfire_grace_time': 300,
+                'job_store': 'postgresql'
             },
             'logging': {
                 'level': 'INFO',
@@ -124,6 +154,7 @@ class Settings:
         try:
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             
+            import yaml
             with open(file_path, 'w', encoding='utf-8') as f:
                 yaml.dump(self._config, f, default_flow_style=False, allow_unicode=True)
             
@@ -180,5 +211,5 @@ class Settings:
                 original[key] = value
 
 
-# 全局配置实例
-settings = Settings()
\ No newline at end of file
+# 全局配置实例（首次读取配置时才加载配置文件）
+settings = LazyObject(Settings)
\ No newline at end of file
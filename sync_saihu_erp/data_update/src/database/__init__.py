@@ -1,12 +1,19 @@
 # database模块初始化
-from .connection import DatabaseManager
+# 全局数据库管理器 db_manager 定义在 connection 模块中，首次使用时才构造
+from ..utils.lazy import lazy_exports
 
-# 创建全局数据库管理器实例
-db_manager = DatabaseManager()
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'DatabaseManager': '.connection',
+    'db_manager': '.connection',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
 
 # 创建get_db_session函数作为兼容性包装
 def get_db_session():
     """获取数据库会话的兼容性函数"""
+    from .connection import db_manager
     return db_manager.get_connection()
 
-__all__ = ['DatabaseManager', 'db_manager', 'get_db_session']
\ No newline at end of file
+__all__ = ['DatabaseManager', 'db_manager', 'get_db_session']
@@ -0,0 +1,96 @@
+"""
+ASIN 变更跟踪
+产品分析数据 UPSERT 时记录实际发生变化的 (asin, data_date)，
+库存合并据此只重算变化的 ASIN 并原地更新对应库存点
+"""
+import logging
+from typing import Any, Dict, Iterable, Optional
+from .connection import db_manager
+from .schema_registry import TableSchema, schema_registry
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+DIRTY_ASINS_TABLE = 'inventory_merge_dirty_asins'
+
+# 待重新合并的 (asin, data_date)；marked_at 为最近一次标记时间，用于避免清除合并期间新产生的标记
+DIRTY_ASINS_SCHEMA = schema_registry.register(TableSchema(
+    name=DIRTY_ASINS_TABLE,
+    columns={
+        'asin': 'VARCHAR(20) NOT NULL',
+        'data_date': 'DATE NOT NULL',
+        'marked_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+    },
+    constraints=['PRIMARY KEY (asin, data_date)']
+))
+
+# 追加在 UPSERT 语句之后：upserted CTE 返回的行即为新增或值发生变化的行
+MARK_DIRTY_SQL = f"""
+    INSERT INTO {DIRTY_ASINS_TABLE} (asin, data_date, marked_at)
+    SELECT DISTINCT asin, data_date, clock_timestamp() FROM upserted
+    WHERE asin IS NOT NULL AND data_date IS NOT NULL
+    ON CONFLICT (asin, data_date) DO UPDATE SET marked_at = EXCLUDED.marked_at
+    RETURNING asin, data_date
+"""
+
+
+class DirtyAsinTracker:
+    """待重新合并 ASIN 的跟踪器"""
+
+    def ensure_table(self) -> None:
+        """确保标记表就绪（进程内只校验一次）"""
+        schema_registry.ensure(DIRTY_ASINS_SCHEMA.name)
+
+    def mark(self, asins: Iterable[str], data_date: Any) -> int:
+        """手动标记 ASIN 需要重新合并，返回标记数"""
+        asins = sorted(set(asin for asin in asins if asin))
+        if not asins:
+            return 0
+
+        self.ensure_table()
+        return db_manager.execute_values(
+            f"""
+            INSERT INTO {DIRTY_ASINS_TABLE} (asin, data_date, marked_at) VALUES %s
+            ON CONFLICT (asin, data_date) DO UPDATE SET marked_at = EXCLUDED.marked_at
+            """,
+            [(asin, data_date) for asin in asins],
+            template="(%s, %s, clock_timestamp())"
+        )
+
+    def load(self, data_date: Any) -> Dict[str, Any]:
+        """读取指定日期的待合并 ASIN，返回 asin -> marked_at"""
+        self.ensure_table()
+        rows = db_manager.execute_query(
+            f"SELECT asin, marked_at FROM {DIRTY_ASINS_TABLE} WHERE data_date = %s",
+            (data_date,)
+        )
+        return {row['asin']: row['marked_at'] for row in rows}
+
+    def clear(self, data_date: Any, marks: Optional[Dict[str, Any]] = None) -> int:
+        """清除已合并的标记
+
+        Args:
+            marks: load() 的返回值；只清除标记时间未变化的行，合并期间重新标记的 ASIN 保留到下一次。
+                   为 None 时清除该日期的全部标记（全量重建后使用）
+        """
+        self.ensure_table()
+        if marks is None:
+            return db_manager.execute_update(
+                f"DELETE FROM {DIRTY_ASINS_TABLE} WHERE data_date = %s", (data_date,)
+            )
+        if not marks:
+            return 0
+
+        asins = list(marks.keys())
+        return db_manager.execute_update(
+            f"""
+            DELETE FROM {DIRTY_ASINS_TABLE} d
+            USING unnest(%s::text[], %s::timestamptz[]) AS m(asin, marked_at)
+            WHERE d.data_date = %s AND d.asin = m.asin AND d.marked_at = m.marked_at
+            """,
+            (asins, [marks[asin] for asin in asins], data_date)
+        )
+
+
+# 全局变更跟踪器
+dirty_asin_tracker = LazyObject(DirtyAsinTracker)
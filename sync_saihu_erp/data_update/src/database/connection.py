@@ -2,17 +2,33 @@
 数据库连接管理模块 - PostgreSQL版本
 提供PostgreSQL连接池管理和事务处理
 """
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.extensions import connection as PgConnection
 import logging
-from typing import Optional, Dict, Any, ContextManager, List, Tuple
+from typing import Optional, Dict, Any, ContextManager, List, Tuple, Set, Iterable, TYPE_CHECKING
 from contextlib import contextmanager
-from threading import Lock
+import time
+from threading import Condition, Lock
 from ..config import Settings
+from ..utils.instrumentation import record_db_round_trip
+from ..utils.lazy import LazyObject
+
+# psycopg2 在首次建立连接/执行查询时才导入，仅导入模块的脚本无需加载驱动
+if TYPE_CHECKING:
+    from psycopg2.extensions import connection as PgConnection
 
 logger = logging.getLogger(__name__)
 
+# product_analytics 冲突时更新的列（也用于判断数据是否真正变化）
+PRODUCT_ANALYTICS_UPDATE_COLUMNS = (
+    'sales_amount', 'sales_quantity', 'impressions', 'clicks', 'conversion_rate', 'acos',
+    'currency', 'shop_id', 'dev_id', 'operator_id',
+    'ad_cost', 'ad_sales', 'cpc', 'cpa', 'ad_orders', 'ad_conversion_rate',
+    'order_count', 'refund_count', 'refund_rate', 'return_count', 'return_rate',
+    'rating', 'rating_count', 'title', 'brand_name', 'category_name',
+    'profit_amount', 'profit_rate', 'avg_profit', 'available_days',
+    'fba_inventory', 'total_inventory', 'sessions', 'page_views', 'buy_box_price',
+    'spu_name', 'brand', 'product_id',
+)
+
 class DatabaseManager:
     """PostgreSQL数据库连接管理器"""
     
@@ -37,8 +53,17 @@ class DatabaseManager:
         self.connection_params = self._get_connection_params()
         self._connection_pool = []
         self._pool_lock = Lock()
-        self._max_connections = 10
+        # 连接归还时唤醒等待的线程（依赖图并发分支共享连接池，满时等待而不是直接失败）
+        self._pool_available = Condition(self._pool_lock)
+        db_config = self.settings.get('database', {})
+        # 空闲保留 pool_size 个连接，并发高峰时最多再临时创建 max_overflow 个
+        self._pool_size = int(db_config.get('pool_size', 10))
+        self._max_connections = self._pool_size + int(db_config.get('max_overflow', 0))
+        self._pool_timeout = float(db_config.get('pool_timeout', 30))
         self._current_connections = 0
+        # 表结构缓存：表名 -> 列集合（None 表示表不存在）
+        self._catalog_columns: Dict[str, Optional[Set[str]]] = {}
+        self._catalog_lock = Lock()
         
         logger.info("PostgreSQL数据库管理器初始化完成")
     
@@ -54,8 +79,9 @@ class DatabaseManager:
             'sslmode': db_config.get('sslmode', 'prefer')
         }
     
-    def _create_connection(self) -> psycopg2.extensions.connection:
+    def _create_connection(self) -> 'PgConnection':
         """创建新的PostgreSQL连接"""
+        import psycopg2
         try:
             connection = psycopg2.connect(**self.connection_params)
             connection.autocommit = False
@@ -72,44 +98,49 @@ class DatabaseManager:
             logger.error(f"创建PostgreSQL连接失败: {e}")
             raise
     
-    def get_connection(self) -> psycopg2.extensions.connection:
-        """获取PostgreSQL连接"""
-        with self._pool_lock:
-            # 尝试从连接池获取连接
-            if self._connection_pool:
-                connection = self._connection_pool.pop()
-                # 检查连接是否有效
-                try:
-                    connection.status  # 检查PostgreSQL连接状态
+    def get_connection(self) -> 'PgConnection':
+        """获取PostgreSQL连接（连接数已达上限时最多等待 database.pool_timeout 秒）"""
+        deadline = time.monotonic() + self._pool_timeout
+        with self._pool_available:
+            while True:
+                # 尝试从连接池获取连接
+                if self._connection_pool:
+                    connection = self._connection_pool.pop()
+                    # 检查连接是否有效
+                    try:
+                        connection.status  # 检查PostgreSQL连接状态
+                        return connection
+                    except:
+                        logger.warning("连接池中的连接已失效，创建新连接")
+                        if self._current_connections > 0:
+                            self._current_connections -= 1
+                
+                # 创建新连接
+                if self._current_connections < self._max_connections:
+                    connection = self._create_connection()
+                    self._current_connections += 1
                     return connection
-                except:
-                    logger.warning("连接池中的连接已失效，创建新连接")
-                    if self._current_connections > 0:
-                        self._current_connections -= 1
-            
-            # 创建新连接
-            if self._current_connections < self._max_connections:
-                connection = self._create_connection()
-                self._current_connections += 1
-                return connection
-            else:
-                raise Exception("连接池已满，无法创建新连接")
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(f"连接池已满，等待 {self._pool_timeout} 秒后仍无可用连接")
+                self._pool_available.wait(remaining)
     
-    def return_connection(self, connection: psycopg2.extensions.connection) -> None:
+    def return_connection(self, connection: 'PgConnection') -> None:
         """归还PostgreSQL连接到连接池"""
-        if connection and connection.closed == 0:  # 连接正常且未关闭
-            with self._pool_lock:
-                if len(self._connection_pool) < self._max_connections:
+        with self._pool_available:
+            if connection and connection.closed == 0:  # 连接正常且未关闭
+                if len(self._connection_pool) < self._pool_size:
                     self._connection_pool.append(connection)
                 else:
                     connection.close()
                     self._current_connections -= 1
-        else:
-            with self._pool_lock:
+            else:
                 self._current_connections -= 1
+            self._pool_available.notify()
     
     @contextmanager
-    def get_db_connection(self) -> ContextManager[psycopg2.extensions.connection]:
+    def get_db_connection(self) -> ContextManager['PgConnection']:
         """获取PostgreSQL连接的上下文管理器"""
         connection = None
         try:
@@ -128,7 +159,7 @@ class DatabaseManager:
                 self.return_connection(connection)
     
     @contextmanager
-    def get_db_transaction(self) -> ContextManager[psycopg2.extensions.connection]:
+    def get_db_transaction(self) -> ContextManager['PgConnection']:
         """获取PostgreSQL事务连接的上下文管理器"""
         connection = None
         try:
@@ -150,15 +181,19 @@ class DatabaseManager:
     
     def execute_query(self, sql: str, params: Optional[Tuple] = None) -> List[Dict[str, Any]]:
         """执行查询SQL并返回Dict格式结果"""
+        from psycopg2.extras import RealDictCursor
         with self.get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                record_db_round_trip()
                 cursor.execute(sql, params)
                 return cursor.fetchall()
     
     def execute_single(self, sql: str, params: Optional[Tuple] = None) -> Optional[Dict[str, Any]]:
         """执行查询单条记录"""
+        from psycopg2.extras import RealDictCursor
         with self.get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                record_db_round_trip()
                 cursor.execute(sql, params)
                 return cursor.fetchone()
     
@@ -166,6 +201,7 @@ class DatabaseManager:
         """执行更新SQL"""
         with self.get_db_connection() as conn:
             with conn.cursor() as cursor:
+                record_db_round_trip()
                 cursor.execute(sql, params)
                 conn.commit()
                 return cursor.rowcount
@@ -177,9 +213,28 @@ class DatabaseManager:
         
         with self.get_db_transaction() as conn:
             with conn.cursor() as cursor:
+                # executemany 逐行发送，每行一次往返
+                record_db_round_trip(len(params_list))
                 cursor.executemany(sql, params_list)
                 return cursor.rowcount
     
+    def execute_values(self, sql: str, params_list: List[Tuple],
+                       template: Optional[str] = None, page_size: int = 1000, fetch: bool = False):
+        """批量执行多行VALUES语句（单条INSERT携带多行，减少往返次数）
+        
+        fetch 为 True 时返回各分页 RETURNING 结果的合并列表，否则返回行数
+        """
+        if not params_list:
+            return [] if fetch else 0
+        
+        from psycopg2.extras import execute_values
+        with self.get_db_transaction() as conn:
+            with conn.cursor() as cursor:
+                record_db_round_trip((len(params_list) + page_size - 1) // page_size)
+                result = execute_values(cursor, sql, params_list, template=template,
+                                        page_size=page_size, fetch=fetch)
+                return result if fetch else len(params_list)
+    
     def execute_script(self, script: str) -> None:
         """执行PostgreSQL SQL脚本"""
         with self.get_db_transaction() as conn:
@@ -189,6 +244,7 @@ class DatabaseManager:
                 
                 for statement in statements:
                     if statement and not statement.upper().startswith('REM'):
+                        record_db_round_trip()
                         cursor.execute(statement)
     
     def test_connection(self) -> bool:
@@ -208,6 +264,7 @@ class DatabaseManager:
         with self._pool_lock:
             return {
                 'max_connections': self._max_connections,
+                'retained_pool_size': self._pool_size,
                 'current_connections': self._current_connections,
                 'pool_size': len(self._connection_pool),
                 'available_connections': len(self._connection_pool)
@@ -223,6 +280,7 @@ class DatabaseManager:
                 except:
                     pass
             self._current_connections = 0
+            self._pool_available.notify_all()
         
         logger.info("所有数据库连接已关闭")
     
@@ -331,61 +389,36 @@ class DatabaseManager:
         if not analytics_list:
             return 0
         
-        sql = """
-        INSERT INTO product_analytics 
-        (asin, sku, parent_asin, spu, msku, sales_amount, sales_quantity,
-         impressions, clicks, conversion_rate, acos, data_date, marketplace_id,
-         dev_name, operator_name, currency, shop_id, dev_id, operator_id,
-         ad_cost, ad_sales, cpc, cpa, ad_orders, ad_conversion_rate,
-         order_count, refund_count, refund_rate, return_count, return_rate,
-         rating, rating_count, title, brand_name, category_name,
-         profit_amount, profit_rate, avg_profit, available_days,
-         fba_inventory, total_inventory, sessions, page_views, buy_box_price,
-         spu_name, brand, product_id, created_at, updated_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        ON CONFLICT (asin, sku, data_date) DO UPDATE
-        SET sales_amount = EXCLUDED.sales_amount,
-            sales_quantity = EXCLUDED.sales_quantity,
-            impressions = EXCLUDED.impressions,
-            clicks = EXCLUDED.clicks,
-            conversion_rate = EXCLUDED.conversion_rate,
-            acos = EXCLUDED.acos,
-            currency = EXCLUDED.currency,
-            shop_id = EXCLUDED.shop_id,
-            dev_id = EXCLUDED.dev_id,
-            operator_id = EXCLUDED.operator_id,
-            ad_cost = EXCLUDED.ad_cost,
-            ad_sales = EXCLUDED.ad_sales,
-            cpc = EXCLUDED.cpc,
-            cpa = EXCLUDED.cpa,
-            ad_orders = EXCLUDED.ad_orders,
-            ad_conversion_rate = EXCLUDED.ad_conversion_rate,
-            order_count = EXCLUDED.order_count,
-            refund_count = EXCLUDED.refund_count,
-            refund_rate = EXCLUDED.refund_rate,
-            return_count = EXCLUDED.return_count,
-            return_rate = EXCLUDED.return_rate,
-            rating = EXCLUDED.rating,
-            rating_count = EXCLUDED.rating_count,
-            title = EXCLUDED.title,
-            brand_name = EXCLUDED.brand_name,
-            category_name = EXCLUDED.category_name,
-            profit_amount = EXCLUDED.profit_amount,
-            profit_rate = EXCLUDED.profit_rate,
-            avg_profit = EXCLUDED.avg_profit,
-            available_days = EXCLUDED.available_days,
-            fba_inventory = EXCLUDED.fba_inventory,
-            total_inventory = EXCLUDED.total_inventory,
-            sessions = EXCLUDED.sessions,
-            page_views = EXCLUDED.page_views,
-            buy_box_price = EXCLUDED.buy_box_price,
-            spu_name = EXCLUDED.spu_name,
-            brand = EXCLUDED.brand,
-            product_id = EXCLUDED.product_id,
-            updated_at = CURRENT_TIMESTAMP
+        from .change_tracker import MARK_DIRTY_SQL, dirty_asin_tracker
+        
+        # 冲突时只在值确实变化时更新；upserted 返回新增或变化的行，同一语句内写入变更标记
+        update_set = ',\n                '.join(
+            f"{column} = EXCLUDED.{column}" for column in PRODUCT_ANALYTICS_UPDATE_COLUMNS
+        )
+        current_values = ', '.join(f"product_analytics.{column}" for column in PRODUCT_ANALYTICS_UPDATE_COLUMNS)
+        new_values = ', '.join(f"EXCLUDED.{column}" for column in PRODUCT_ANALYTICS_UPDATE_COLUMNS)
+        sql = f"""
+        WITH upserted AS (
+            INSERT INTO product_analytics 
+            (asin, sku, parent_asin, spu, msku, sales_amount, sales_quantity,
+             impressions, clicks, conversion_rate, acos, data_date, marketplace_id,
+             dev_name, operator_name, currency, shop_id, dev_id, operator_id,
+             ad_cost, ad_sales, cpc, cpa, ad_orders, ad_conversion_rate,
+             order_count, refund_count, refund_rate, return_count, return_rate,
+             rating, rating_count, title, brand_name, category_name,
+             profit_amount, profit_rate, avg_profit, available_days,
+             fba_inventory, total_inventory, sessions, page_views, buy_box_price,
+             spu_name, brand, product_id, created_at, updated_at)
+            VALUES %s
+            ON CONFLICT (asin, sku, data_date) DO UPDATE
+            SET {update_set},
+                updated_at = CURRENT_TIMESTAMP
+            WHERE ({current_values}) IS DISTINCT FROM ({new_values})
+            RETURNING asin, data_date
+        )
+        {MARK_DIRTY_SQL}
         """
+        template = "(" + ", ".join(["%s"] * 47) + ", CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
         
         params_list = []
         for analytics in analytics_list:
@@ -449,56 +482,143 @@ class DatabaseManager:
             )
             params_list.append(params)
         
+        # 同一批次内 (asin, sku, data_date) 重复时保留最后一条（单条多行UPSERT不能重复更新同一行）
+        params_list = list({(params[0], params[1], params[11]): params for params in params_list}.values())
+        
         try:
-            affected_rows = self.execute_batch(sql, params_list)
-            logger.info(f"批量保存产品分析数据成功: {affected_rows} 条")
-            return affected_rows
+            dirty_asin_tracker.ensure_table()
+            changed = self.execute_values(sql, params_list, template=template, fetch=True)
+            affected_rows = len(params_list)
+            logger.info(f"批量保存产品分析数据成功: {affected_rows} 条，其中 {len(changed)} 个ASIN日期有变化")
         except Exception as e:
             logger.error(f"批量保存产品分析数据失败: {e}")
             return 0
+        
+        # 增量更新累计汇总表（sync.maintain_cumulative_rollup 开启时），只重述有变化的ASIN日期
+        from ..services.analytics_rollup_service import analytics_rollup_service
+        changed_keys = {(row[0], str(row[1])) for row in changed}
+        analytics_rollup_service.record_saved([
+            analytics for analytics in analytics_list
+            if (getattr(analytics, 'asin', None), str(getattr(analytics, 'data_date', None))) in changed_keys
+        ])
+        return affected_rows
     
     def upsert_product_analytics(self, analytics_list, target_date) -> int:
         """更新产品分析数据（插入或更新）"""
         return self.batch_save_product_analytics(analytics_list)
     
+    def delete_product_analytics_partitions(self, partitions, keep_keys=()) -> int:
+        """删除指定 (日期, 站点, 店铺) 分区中不在 keep_keys 内的产品分析数据，
+        并在同一语句中标记被删除的ASIN待重新合并
+        
+        Args:
+            partitions: (日期, 站点, 店铺) 列表
+            keep_keys: 需保留的 (日期, asin, sku)，即赛狐仍存在的记录；为空时删除分区内全部数据
+            
+        Returns:
+            受影响的 ASIN日期 数
+        """
+        partitions = [tuple(partition) for partition in partitions]
+        if not partitions:
+            return 0
+        
+        from .change_tracker import MARK_DIRTY_SQL, dirty_asin_tracker
+        
+        keep_keys = [tuple(key) for key in keep_keys]
+        # MARK_DIRTY_SQL 读取名为 upserted 的CTE，这里由 DELETE 返回被删除的行
+        sql = f"""
+        WITH upserted AS (
+            DELETE FROM product_analytics p
+            USING unnest(%s::date[], %s::text[], %s::text[]) AS b(data_date, marketplace_id, shop_id)
+            WHERE p.data_date = b.data_date
+              AND COALESCE(p.marketplace_id, '') = b.marketplace_id
+              AND COALESCE(p.shop_id::text, '') = b.shop_id
+              AND NOT EXISTS (
+                  SELECT 1 FROM unnest(%s::date[], %s::text[], %s::text[]) AS k(data_date, asin, sku)
+                  WHERE k.data_date = p.data_date AND k.asin = p.asin AND k.sku IS NOT DISTINCT FROM p.sku
+              )
+            RETURNING p.asin, p.data_date
+        )
+        {MARK_DIRTY_SQL}
+        """
+        params = tuple(list(column) for column in zip(*partitions)) + \
+            (tuple(list(column) for column in zip(*keep_keys)) if keep_keys else ([], [], []))
+        dirty_asin_tracker.ensure_table()
+        with self.get_db_transaction() as conn:
+            with conn.cursor() as cursor:
+                record_db_round_trip()
+                cursor.execute(sql, params)
+                marked = cursor.fetchall()
+        logger.info(f"清理产品分析数据分区 {len(partitions)} 个，删除涉及 {len(marked)} 个ASIN日期")
+        return len(marked)
+    
+    def load_schema_catalog(self, table_names: Iterable[str]) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
+        """一次目录查询加载多张表的列和索引信息
+
+        Returns:
+            (表名 -> 列名集合, 表名 -> 索引名集合)，不存在的表不出现在列字典中
+        """
+        names = list(table_names)
+        if not names:
+            return {}, {}
+        
+        sql = """
+            SELECT table_name AS table_name, column_name AS object_name, 'column' AS kind
+            FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = ANY(%s)
+            UNION ALL
+            SELECT tablename AS table_name, indexname AS object_name, 'index' AS kind
+            FROM pg_indexes
+            WHERE schemaname = 'public' AND tablename = ANY(%s)
+        """
+        rows = self.execute_query(sql, (names, names))
+        
+        columns: Dict[str, Set[str]] = {}
+        indexes: Dict[str, Set[str]] = {}
+        for row in rows:
+            target = columns if row['kind'] == 'column' else indexes
+            target.setdefault(row['table_name'], set()).add(row['object_name'])
+        
+        with self._catalog_lock:
+            for name in names:
+                self._catalog_columns[name] = columns.get(name)
+        
+        return columns, indexes
+    
+    def invalidate_schema_catalog(self) -> None:
+        """清空表结构缓存（执行DDL后调用）"""
+        with self._catalog_lock:
+            self._catalog_columns.clear()
+    
+    def _get_cached_columns(self, table_name: str) -> Tuple[bool, Optional[Set[str]]]:
+        """读取表结构缓存，返回 (是否命中, 列集合)"""
+        with self._catalog_lock:
+            if table_name in self._catalog_columns:
+                return True, self._catalog_columns[table_name]
+        return False, None
+    
     def table_exists(self, table_name: str) -> bool:
-        """检查PostgreSQL表是否存在"""
+        """检查PostgreSQL表是否存在（优先使用表结构缓存）"""
         try:
-            sql = """
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
-                    AND table_name = %s
-                )
-            """
-            result = self.execute_single(sql, (table_name,))
-            if not result:
-                return False
-            # RealDictCursor returns key 'exists'
-            return bool(result.get('exists'))
+            hit, columns = self._get_cached_columns(table_name)
+            if not hit:
+                columns = self.load_schema_catalog([table_name])[0].get(table_name)
+            return columns is not None
         except Exception as e:
             logger.error(f"检查PostgreSQL表存在性失败: {e}")
             return False
 
     def column_exists(self, table_name: str, column_name: str) -> bool:
-        """检查PostgreSQL表的列是否存在"""
+        """检查PostgreSQL表的列是否存在（优先使用表结构缓存）"""
         try:
-            sql = """
-                SELECT EXISTS (
-                    SELECT FROM information_schema.columns 
-                    WHERE table_schema = 'public' 
-                    AND table_name = %s
-                    AND column_name = %s
-                )
-            """
-            result = self.execute_single(sql, (table_name, column_name))
-            if not result:
-                return False
-            return bool(result.get('exists'))
+            hit, columns = self._get_cached_columns(table_name)
+            if not hit:
+                columns = self.load_schema_catalog([table_name])[0].get(table_name)
+            return bool(columns) and column_name in columns
         except Exception as e:
             logger.error(f"检查PostgreSQL列存在性失败: {e}")
             return False
 
 
-# 全局数据库管理器实例  
-db_manager = DatabaseManager()
\ No newline at end of file
+# 全局数据库管理器实例（首次使用时构造）
+db_manager = LazyObject(DatabaseManager)
\ No newline at end of file
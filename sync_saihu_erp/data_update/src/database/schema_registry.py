@@ -0,0 +1,134 @@
+"""
+数据库表结构注册中心
+进程内只校验/迁移一次表结构，并缓存结果，避免每次处理都执行DDL脚本
+"""
+import logging
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List, Optional, Set
+from .connection import DatabaseManager, db_manager
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TableSchema:
+    """表结构定义
+
+    columns 为有序的 列名 -> 列定义；缺表时据此生成 CREATE TABLE，
+    缺列时据此生成 ALTER TABLE ... ADD COLUMN。
+    indexes 为 索引名 -> 创建语句；optional_indexes 中的索引创建失败不视为错误
+    （例如旧表存在重复数据时无法建立的唯一索引）。
+    """
+    name: str
+    columns: Dict[str, str]
+    constraints: List[str] = field(default_factory=list)
+    indexes: Dict[str, str] = field(default_factory=dict)
+    optional_indexes: Dict[str, str] = field(default_factory=dict)
+
+    def create_table_sql(self) -> str:
+        """生成建表语句"""
+        definitions = [f"{column} {definition}" for column, definition in self.columns.items()]
+        definitions.extend(self.constraints)
+        body = ',\n    '.join(definitions)
+        return f"CREATE TABLE IF NOT EXISTS {self.name} (\n    {body}\n)"
+
+
+class SchemaRegistry:
+    """表结构注册中心（进程级缓存）"""
+
+    def __init__(self, db: DatabaseManager):
+        """初始化注册中心"""
+        self.db = db
+        self._schemas: Dict[str, TableSchema] = {}
+        self._ready: Set[str] = set()
+        self._indexes: Dict[str, Set[str]] = {}
+        self._lock = Lock()
+
+    def register(self, schema: TableSchema) -> TableSchema:
+        """注册表结构定义（重复注册以最后一次为准）"""
+        with self._lock:
+            self._schemas[schema.name] = schema
+            self._ready.discard(schema.name)
+        return schema
+
+    def ensure(self, *table_names: str) -> None:
+        """确保指定表结构就绪；同一进程内已校验过的表直接返回"""
+        pending = [name for name in table_names if name not in self._ready]
+        if not pending:
+            return
+
+        with self._lock:
+            pending = [name for name in pending if name not in self._ready]
+            if not pending:
+                return
+
+            unknown = [name for name in pending if name not in self._schemas]
+            if unknown:
+                raise KeyError(f"未注册的表结构: {', '.join(unknown)}")
+
+            columns, indexes = self.db.load_schema_catalog(pending)
+            for name in pending:
+                self._migrate_table(self._schemas[name], columns.get(name), indexes.get(name, set()))
+                self._ready.add(name)
+
+            self.db.invalidate_schema_catalog()
+
+    def ensure_all(self) -> None:
+        """校验所有已注册的表"""
+        self.ensure(*list(self._schemas.keys()))
+
+    def has_index(self, table_name: str, index_name: str) -> bool:
+        """表上是否已存在指定索引（需先 ensure）"""
+        return index_name in self._indexes.get(table_name, set())
+
+    def is_ready(self, table_name: str) -> bool:
+        """表结构是否已校验"""
+        return table_name in self._ready
+
+    def reset(self) -> None:
+        """清空缓存，下次 ensure 时重新校验"""
+        with self._lock:
+            self._ready.clear()
+            self._indexes.clear()
+        self.db.invalidate_schema_catalog()
+
+    def _migrate_table(self, schema: TableSchema, existing_columns: Optional[Set[str]],
+                       existing_indexes: Set[str]) -> None:
+        """按定义补齐缺失的表、列和索引"""
+        statements: List[str] = []
+
+        if existing_columns is None:
+            logger.info(f"创建数据表: {schema.name}")
+            statements.append(schema.create_table_sql())
+        else:
+            for column, definition in schema.columns.items():
+                if column not in existing_columns:
+                    logger.info(f"数据表 {schema.name} 缺少列 {column}，自动补齐")
+                    statements.append(
+                        f"ALTER TABLE {schema.name} ADD COLUMN IF NOT EXISTS {column} {definition}"
+                    )
+
+        statements.extend(
+            ddl for index_name, ddl in schema.indexes.items() if index_name not in existing_indexes
+        )
+
+        if statements:
+            self.db.execute_script(';\n'.join(statements))
+
+        created_indexes = set(existing_indexes) | set(schema.indexes.keys())
+
+        for index_name, ddl in schema.optional_indexes.items():
+            if index_name in existing_indexes:
+                continue
+            try:
+                self.db.execute_update(ddl)
+                created_indexes.add(index_name)
+            except Exception as e:
+                logger.warning(f"可选索引 {index_name} 创建失败: {e}")
+
+        self._indexes[schema.name] = created_indexes
+        logger.debug(f"表结构校验完成: {schema.name}")
+
+
+# 全局表结构注册中心
+schema_registry = SchemaRegistry(db_manager)
@@ -6,16 +6,26 @@
 - 非欧盟地区库存合并  
 - 广告数据合并
 - 库存分析和统计
+- SQL 下推合并引擎
 """
 
-from .merger import InventoryMerger
-from .eu_merger import EUMerger
-from .non_eu_merger import NonEUMerger
-from .ad_merger import AdMerger
+from ..utils.lazy import lazy_exports
+
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'InventoryMerger': '.merger',
+    'EUMerger': '.eu_merger',
+    'NonEUMerger': '.non_eu_merger',
+    'AdMerger': '.ad_merger',
+    'SqlInventoryMerger': '.sql_merger',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
 
 __all__ = [
     'InventoryMerger',
     'EUMerger', 
     'NonEUMerger',
-    'AdMerger'
-]
\ No newline at end of file
+    'AdMerger',
+    'SqlInventoryMerger'
+]
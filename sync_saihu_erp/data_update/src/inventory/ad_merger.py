@@ -9,6 +9,8 @@
 import logging
 from typing import Dict, Any
 
+from .enrichment import AD_METRIC_DEFAULTS, ad_metrics, daily_sales_amount, parse_price, safe_divide
+
 logger = logging.getLogger(__name__)
 
 
@@ -46,27 +48,19 @@ class AdMerger:
             ad_sales = inventory_point.get('ad_sales', 0) or 0
             
             # 计算广告指标
-            ad_metrics = self._calculate_ad_metrics(
+            metrics = self._calculate_ad_metrics(
                 ad_impressions, ad_clicks, ad_spend, ad_order_count, ad_sales, inventory_point
             )
             
             # 更新库存点数据
-            inventory_point.update(ad_metrics)
-            
-            self.logger.debug(f"广告数据合并完成: {inventory_point.get('asin', 'Unknown')}")
+            inventory_point.update(metrics)
             
             return inventory_point
             
         except Exception as e:
             self.logger.error(f"广告数据合并失败: {e}")
             # 出错时返回原始数据，添加默认的广告指标
-            inventory_point.update({
-                'ad_ctr': 0.0,
-                'ad_cvr': 0.0, 
-                'acoas': 0.0,
-                'ad_cpc': 0.0,
-                'ad_roas': 0.0
-            })
+            inventory_point.update(AD_METRIC_DEFAULTS)
             return inventory_point
     
     def _calculate_ad_metrics(self, ad_impressions: float, ad_clicks: float, ad_spend: float, 
@@ -85,34 +79,14 @@ class AdMerger:
         Returns:
             计算后的广告指标字典
         """
-        metrics = {}
-        
-        # 1. 广告点击率 (CTR) = 广告点击量 / 广告曝光量
-        metrics['ad_ctr'] = self._safe_divide(ad_clicks, ad_impressions, precision=4)
-        
-        # 2. 广告转化率 (CVR) = 广告订单量 / 广告点击量
-        metrics['ad_cvr'] = self._safe_divide(ad_order_count, ad_clicks, precision=4)
-        
-        # 3. 计算ACOAS = 广告花费 / (日均销售额 * 7)
-        daily_sales_amount = self._calculate_daily_sales_amount(inventory_point)
-        weekly_sales_amount = daily_sales_amount * 7
-        metrics['acoas'] = self._safe_divide(ad_spend, weekly_sales_amount, precision=4)
-        
-        # 4. 计算广告平均点击成本 (CPC) = 广告花费 / 广告点击量
-        metrics['ad_cpc'] = self._safe_divide(ad_spend, ad_clicks, precision=2)
-        
-        # 5. 计算广告投资回报率 (ROAS) = 广告销售额 / 广告花费
-        metrics['ad_roas'] = self._safe_divide(ad_sales, ad_spend, precision=2)
-        
-        # 6. 计算广告销售转化率 = 广告销售额 / 广告点击量
-        metrics['ad_sales_per_click'] = self._safe_divide(ad_sales, ad_clicks, precision=2)
-        
-        # 7. 广告成本占销售额比例 = 广告花费 / 广告销售额
-        metrics['ad_cost_ratio'] = self._safe_divide(ad_spend, ad_sales, precision=4)
-        
-        self.logger.debug(f"广告指标计算完成: CTR={metrics['ad_ctr']}, CVR={metrics['ad_cvr']}, ACOAS={metrics['acoas']}")
-        
-        return metrics
+        daily_amount = self._calculate_daily_sales_amount(inventory_point)
+        return ad_metrics({
+            'ad_impressions': ad_impressions,
+            'ad_clicks': ad_clicks,
+            'ad_spend': ad_spend,
+            'ad_order_count': ad_order_count,
+            'ad_sales': ad_sales,
+        }, daily_amount)
     
     def _calculate_daily_sales_amount(self, inventory_point: Dict[str, Any]) -> float:
         """
@@ -121,20 +95,7 @@ class AdMerger:
         根据设计文档的要求：日均销售额 = 平均销量 * 平均售价
         """
         try:
-            # 获取平均销量
-            average_sales = inventory_point.get('average_sales', 0) or 0
-            
-            # 获取平均售价，需要从字符串中提取数值
-            average_price_str = inventory_point.get('average_price', '') or ''
-            average_price = self._extract_price_from_string(average_price_str)
-            
-            # 计算日均销售额
-            daily_sales_amount = average_sales * average_price
-            
-            self.logger.debug(f"日均销售额计算: {average_sales} * {average_price} = {daily_sales_amount}")
-            
-            return daily_sales_amount
-            
+            return daily_sales_amount(inventory_point)
         except Exception as e:
             self.logger.warning(f"日均销售额计算失败: {e}")
             return 0.0
@@ -145,21 +106,7 @@ class AdMerger:
         
         例如: "US$25.99" -> 25.99
         """
-        if not price_str:
-            return 0.0
-        
-        try:
-            import re
-            # 使用正则表达式提取数字（包括小数点）
-            price_match = re.search(r'[\d.]+', str(price_str))
-            if price_match:
-                return float(price_match.group())
-            
-            return 0.0
-            
-        except Exception as e:
-            self.logger.warning(f"价格提取失败: {price_str}, 错误: {e}")
-            return 0.0
+        return parse_price(price_str)
     
     def _safe_divide(self, numerator: float, denominator: float, precision: int = 2) -> float:
         """
@@ -173,16 +120,7 @@ class AdMerger:
         Returns:
             计算结果，除零时返回0.0
         """
-        try:
-            if denominator == 0 or denominator is None:
-                return 0.0
-            
-            result = numerator / denominator
-            return round(result, precision)
-            
-        except Exception as e:
-            self.logger.warning(f"除法计算失败: {numerator}/{denominator}, 错误: {e}")
-            return 0.0
+        return safe_divide(numerator, denominator, precision)
     
     def get_ad_summary(self, inventory_points: list) -> Dict[str, Any]:
         """
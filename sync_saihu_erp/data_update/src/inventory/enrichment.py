@@ -0,0 +1,116 @@
+"""
+库存点指标计算
+
+合并完成后一次遍历计算全部派生指标，原地写入库存点字典：
+- 广告指标：点击率、转化率、ACOAS、CPC、ROAS 等
+- 库存分析：总库存、周转天数、日均销售额
+- 状态标识：周转超标、库存不足、断货、零销量、有效库存点
+"""
+
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_PRICE_PATTERN = re.compile(r'[\d.]+')
+
+# 有效库存点的日均销售额阈值
+EFFECTIVE_DAILY_SALES_AMOUNT = 16.7
+
+AD_METRIC_DEFAULTS = {
+    'ad_ctr': 0.0,
+    'ad_cvr': 0.0,
+    'acoas': 0.0,
+    'ad_cpc': 0.0,
+    'ad_roas': 0.0,
+}
+
+
+@lru_cache(maxsize=4096)
+def _parse_price_text(price_text: str) -> float:
+    match = _PRICE_PATTERN.search(price_text)
+    if not match:
+        return 0.0
+    try:
+        return float(match.group())
+    except ValueError:
+        return 0.0
+
+
+def parse_price(price: Any) -> float:
+    """从价格字符串中提取数值，例如 "US$25.99" -> 25.99（同一价格文本只解析一次）"""
+    if not price:
+        return 0.0
+    return _parse_price_text(str(price))
+
+
+def safe_divide(numerator: Any, denominator: Any, precision: int = 2) -> float:
+    """安全除法，分母为0或计算失败时返回0.0"""
+    try:
+        if denominator == 0 or denominator is None:
+            return 0.0
+        return round(numerator / denominator, precision)
+    except Exception as e:
+        logger.warning(f"除法计算失败: {numerator}/{denominator}, 错误: {e}")
+        return 0.0
+
+
+def daily_sales_amount(point: Dict[str, Any]) -> float:
+    """日均销售额 = 平均销量 * 平均售价（未取整）"""
+    return (point.get('average_sales', 0) or 0) * parse_price(point.get('average_price', ''))
+
+
+def ad_metrics(point: Dict[str, Any], daily_amount: float) -> Dict[str, float]:
+    """计算广告指标；daily_amount 为未取整的日均销售额（ACOAS 的分母为其7倍）"""
+    ad_clicks = point.get('ad_clicks', 0) or 0
+    ad_spend = point.get('ad_spend', 0) or 0
+    ad_sales = point.get('ad_sales', 0) or 0
+    return {
+        'ad_ctr': safe_divide(ad_clicks, point.get('ad_impressions', 0) or 0, precision=4),
+        'ad_cvr': safe_divide(point.get('ad_order_count', 0) or 0, ad_clicks, precision=4),
+        'acoas': safe_divide(ad_spend, daily_amount * 7, precision=4),
+        'ad_cpc': safe_divide(ad_spend, ad_clicks, precision=2),
+        'ad_roas': safe_divide(ad_sales, ad_spend, precision=2),
+        'ad_sales_per_click': safe_divide(ad_sales, ad_clicks, precision=2),
+        'ad_cost_ratio': safe_divide(ad_spend, ad_sales, precision=4),
+    }
+
+
+def enrich_points(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """一次遍历计算广告指标、库存分析指标和状态标识（原地更新，返回同一列表）"""
+    for point in points:
+        try:
+            daily_amount = daily_sales_amount(point)
+        except Exception as e:
+            logger.warning(f"日均销售额计算失败: {e}")
+            daily_amount = 0.0
+
+        try:
+            point.update(ad_metrics(point, daily_amount))
+        except Exception as e:
+            logger.error(f"广告数据合并失败: {e}")
+            point.update(AD_METRIC_DEFAULTS)
+
+        try:
+            fba_available = point.get('fba_available', 0) or 0
+            total_inventory = fba_available + (point.get('fba_inbound', 0) or 0) + (point.get('local_available', 0) or 0)
+            average_sales = point.get('average_sales', 0) or 0
+            if average_sales > 0:
+                turnover_days = round(total_inventory / average_sales, 1)
+            else:
+                turnover_days = 999 if total_inventory > 0 else 0
+
+            point['total_inventory'] = total_inventory
+            point['turnover_days'] = turnover_days
+            point['daily_sales_amount'] = round(daily_amount, 2)
+            point['is_turnover_exceeded'] = turnover_days > 100 or turnover_days == 999
+            point['is_low_inventory'] = 0 < turnover_days < 45
+            point['is_out_of_stock'] = fba_available <= 0
+            point['is_zero_sales'] = (point.get('sales_7days', 0) or 0) == 0
+            point['is_effective_point'] = daily_amount >= EFFECTIVE_DAILY_SALES_AMOUNT
+        except Exception as e:
+            logger.warning(f"数据丰富失败: {e}, 使用原始数据")
+
+    return points
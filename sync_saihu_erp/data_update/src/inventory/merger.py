@@ -8,6 +8,8 @@ import logging
 from typing import List, Dict, Any, Tuple, Optional
 from datetime import datetime
 
+from .enrichment import enrich_points
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,12 +40,16 @@ class InventoryMerger:
             self.non_eu_merger = NonEUMerger()
             self.ad_merger = AdMerger()
     
-    def merge_inventory_points(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def merge_inventory_points(self, products: List[Dict[str, Any]], copy_products: bool = True,
+                               enrich: bool = True) -> List[Dict[str, Any]]:
         """
         合并库存点数据
         
         Args:
             products: 原始产品数据列表
+            copy_products: 是否复制输入字典；调用方独占输入时可传 False 原地清洗，省去一次复制
+            enrich: 是否计算广告及库存分析指标（见 enrichment.enrich_points）；
+                    调用方单独计时指标计算阶段时可传 False 自行调用
             
         Returns:
             合并后的库存点数据列表
@@ -59,7 +65,7 @@ class InventoryMerger:
             self._initialize_sub_mergers()
             
             # 数据预处理和验证
-            valid_products = self._validate_and_clean_products(products)
+            valid_products = self._validate_and_clean_products(products, copy_products)
             logger.info(f"有效产品数量: {len(valid_products)}")
             
             # 按ASIN分组
@@ -92,13 +98,9 @@ class InventoryMerger:
                     logger.error(f"ASIN {asin} 合并失败: {e}")
                     continue
             
-            # 合并广告数据
-            for point in merged_points:
-                try:
-                    point = self.ad_merger.merge_ad_data(point)
-                except Exception as e:
-                    logger.error(f"广告数据合并失败: {e}")
-                    continue
+            # 一次遍历计算广告指标和库存分析指标
+            if enrich:
+                enrich_points(merged_points)
             
             logger.info(f"库存点合并完成，合并后数量: {len(merged_points)}")
             return merged_points
@@ -107,7 +109,8 @@ class InventoryMerger:
             logger.error(f"库存点合并过程异常: {e}")
             raise
     
-    def _validate_and_clean_products(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _validate_and_clean_products(self, products: List[Dict[str, Any]],
+                                     copy_products: bool = True) -> List[Dict[str, Any]]:
         """验证和清洗产品数据"""
         valid_products = []
         required_fields = ['asin', 'product_name', 'store', 'marketplace']
@@ -120,7 +123,7 @@ class InventoryMerger:
                     continue
                 
                 # 数据类型转换和清理
-                cleaned_product = self._clean_product_data(product)
+                cleaned_product = self._clean_product_data(product, copy_products)
                 valid_products.append(cleaned_product)
                 
             except Exception as e:
@@ -129,9 +132,9 @@ class InventoryMerger:
         
         return valid_products
     
-    def _clean_product_data(self, product: Dict[str, Any]) -> Dict[str, Any]:
+    def _clean_product_data(self, product: Dict[str, Any], copy_product: bool = True) -> Dict[str, Any]:
         """清理单个产品数据"""
-        cleaned = product.copy()
+        cleaned = product.copy() if copy_product else product
         
         # 数值字段标准化
         numeric_fields = [
@@ -0,0 +1,334 @@
+"""
+库存点合并 SQL 下推引擎
+
+以集合SQL表达与 InventoryMerger 相同的合并规则，在数据库内直接由 product_analytics 生成 inventory_points：
+1. 欧盟：每个店铺前缀选出 FBA可用+FBA在途 最大的记录作为代表，代表累加为一个欧盟库存点
+2. 非欧盟：同一国家下各店铺的库存和销量累加
+3. 广告指标和库存分析指标（周转天数、各状态标识）重新计算
+
+SQL 只使用 PostgreSQL 与 SQLite 共有的语法（窗口函数 ROW_NUMBER、RTRIM/LTRIM 字符集裁剪），
+差异部分（有序字符串聚合、价格解析、数值类型、占位符）由方言对象提供。
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .merger import InventoryMerger
+
+# 合并输入关系需提供的列（与 InventoryMerger 输入字典的键一致），src_order 为输入顺序
+TEXT_FIELDS = (
+    'asin', 'product_name', 'sku', 'category', 'sales_person', 'product_tag', 'dev_name',
+    'marketplace', 'store', 'average_price', 'sales_amount', 'net_sales', 'refund_rate',
+)
+INVENTORY_FIELDS = ('fba_available', 'fba_inbound', 'fba_sellable', 'fba_unsellable', 'inbound_shipped')
+SALES_FIELDS = ('sales_7days', 'total_sales', 'average_sales', 'order_count', 'promotional_orders')
+AD_FIELDS = ('ad_impressions', 'ad_clicks', 'ad_spend', 'ad_order_count', 'ad_sales')
+NUMERIC_FIELDS = INVENTORY_FIELDS + ('local_available',) + SALES_FIELDS + AD_FIELDS
+
+# 代表/首条记录沿用的基础信息字段
+BASE_FIELDS = (
+    'asin', 'product_name', 'sku', 'category', 'sales_person', 'product_tag', 'dev_name',
+    'average_price', 'average_price_value', 'sales_amount', 'net_sales', 'refund_rate',
+)
+
+# 写入 inventory_points 的列（顺序与 SELECT 输出一致）
+OUTPUT_COLUMNS = (
+    'asin', 'product_name', 'sku', 'category', 'sales_person', 'product_tag', 'dev_name',
+    'marketplace', 'store', 'inventory_point_name',
+    'fba_available', 'fba_inbound', 'fba_sellable', 'fba_unsellable',
+    'local_available', 'inbound_shipped', 'total_inventory',
+    'sales_7days', 'total_sales', 'average_sales', 'order_count', 'promotional_orders',
+    'average_price', 'sales_amount', 'net_sales', 'refund_rate',
+    'ad_impressions', 'ad_clicks', 'ad_spend', 'ad_order_count', 'ad_sales',
+    'ad_ctr', 'ad_cvr', 'acoas', 'ad_cpc', 'ad_roas',
+    'turnover_days', 'daily_sales_amount', 'is_turnover_exceeded',
+    'is_out_of_stock', 'is_zero_sales', 'is_low_inventory', 'is_effective_point',
+    'merge_type', 'merged_stores', 'store_count',
+)
+
+# product_analytics -> 合并输入 的列映射，与 ProductAnalyticsProcessor._to_merge_dict 产出的字典一致
+# （该字典中不存在的合并字段按 0 / 空串处理）
+MARKETPLACE_COUNTRIES = {
+    'A1F83G8C2ARO7P': 'UK',
+    'A1PA6795UKMFR9': 'DE',
+    'A13V1IB3VIYZZH': 'FR',
+    'APJ6JRA9NG5V4': 'IT',
+    'A1RKKUPIHCS9HS': 'ES',
+    'ATVPDKIKX0DER': 'US',
+    'A2EUQ1WTGCTBG2': 'CA',
+    'A39IBJ37TRP1C6': 'AU',
+    'A1VC38T7YXB528': 'JP',
+    'A21TJRUUN4KGV': 'IN',
+}
+
+_COUNTRY_SQL = "CASE TRIM(COALESCE(marketplace_id, '')) {whens} ELSE TRIM(COALESCE(marketplace_id, '')) END".format(
+    whens=' '.join(f"WHEN '{mid}' THEN '{code}'" for mid, code in MARKETPLACE_COUNTRIES.items())
+)
+
+PRODUCT_ANALYTICS_SOURCE = {
+    'src_order': 'id',
+    'asin': "COALESCE(asin, '')",
+    'product_name': "COALESCE(title, '')",
+    'sku': "COALESCE(sku, '')",
+    'dev_name': "COALESCE(dev_name, '')",
+    'marketplace': 'country',
+    'store': (
+        "CASE WHEN TRIM(COALESCE(CAST(shop_id AS TEXT), '')) <> '' AND country <> '' "
+        "THEN 'Shop' || TRIM(CAST(shop_id AS TEXT)) || '-' || country "
+        "ELSE COALESCE(NULLIF(country, ''), 'Unknown') END"
+    ),
+    'sales_amount': "CAST(COALESCE(sales_amount, 0) AS TEXT)",
+    'refund_rate': "CAST(COALESCE(refund_rate, 0) AS TEXT)",
+    'order_count': 'COALESCE(order_count, 0)',
+    'ad_sales': 'COALESCE(ad_sales, 0)',
+}
+
+
+class SqlDialect:
+    """SQL方言（PostgreSQL）"""
+
+    placeholder = '%s'
+
+    def decimal(self, expr: str) -> str:
+        """可安全 ROUND/除法的数值类型"""
+        return f"CAST({expr} AS NUMERIC)"
+
+    def date_param(self) -> str:
+        """SELECT 列表中的日期参数"""
+        return f"CAST({self.placeholder} AS DATE)"
+
+    def price_value(self, expr: str) -> str:
+        """从价格字符串中提取第一个数值（与 AdMerger._extract_price_from_string 一致）"""
+        # 形如 '1.2.3' 的片段在 Python 中 float() 失败按0处理，这里同样不做转换
+        matched = f"SUBSTRING(COALESCE({expr}, '') FROM '[0-9.]+')"
+        return (
+            f"CASE WHEN {matched} ~ '^([0-9]+[.]?[0-9]*|[.][0-9]+)$' "
+            f"THEN CAST({matched} AS NUMERIC) ELSE 0 END"
+        )
+
+    def ordered_concat(self, expr: str, relation: str, condition: str, order_by: str) -> str:
+        """按 order_by 顺序以 ', ' 连接的标量子查询"""
+        return f"(SELECT string_agg({expr}, ', ' ORDER BY {order_by}) FROM {relation} WHERE {condition})"
+
+    def prepare(self, connection: Any) -> None:
+        """执行前准备连接（注册函数等）"""
+
+
+class SqliteDialect(SqlDialect):
+    """SQL方言（SQLite，用于一致性测试）"""
+
+    placeholder = '?'
+
+    def decimal(self, expr: str) -> str:
+        return f"CAST({expr} AS REAL)"
+
+    def date_param(self) -> str:
+        return self.placeholder
+
+    def price_value(self, expr: str) -> str:
+        return f"price_value({expr})"
+
+    def ordered_concat(self, expr: str, relation: str, condition: str, order_by: str) -> str:
+        return (
+            f"(SELECT group_concat(v, ', ') FROM "
+            f"(SELECT {expr} AS v FROM {relation} WHERE {condition} ORDER BY {order_by}))"
+        )
+
+    def prepare(self, connection: Any) -> None:
+        connection.create_function('price_value', 1, _extract_price, deterministic=True)
+
+
+def _extract_price(price_str: Any) -> float:
+    """价格字符串 -> 数值（SQLite 自定义函数）"""
+    match = re.search(r'[\d.]+', str(price_str or ''))
+    try:
+        return float(match.group()) if match else 0.0
+    except ValueError:
+        return 0.0
+
+
+class SqlInventoryMerger:
+    """库存点合并 SQL 下推引擎"""
+
+    def __init__(self, dialect: Optional[SqlDialect] = None):
+        self.dialect = dialect or SqlDialect()
+
+    # ---- 输入关系 ----
+
+    def product_analytics_source(self, asin_count: int = 0) -> str:
+        """指定日期 product_analytics 的合并输入关系（参数：data_date[, asin...]）"""
+        p = self.dialect.placeholder
+        asin_filter = f" AND asin IN ({', '.join([p] * asin_count)})" if asin_count else ''
+        columns = []
+        for field in ('src_order',) + TEXT_FIELDS + NUMERIC_FIELDS:
+            default = "''" if field in TEXT_FIELDS else '0'
+            columns.append(f"{PRODUCT_ANALYTICS_SOURCE.get(field, default)} AS {field}")
+        return (
+            f"SELECT {', '.join(columns)} FROM ("
+            f"SELECT pa.*, {_COUNTRY_SQL} AS country FROM product_analytics pa "
+            f"WHERE data_date = {p}{asin_filter}) pa"
+        )
+
+    # ---- 合并查询 ----
+
+    def merge_sql(self, source_sql: str) -> str:
+        """生成合并查询：输入关系 -> inventory_points 各列（OUTPUT_COLUMNS 顺序）"""
+        d = self.dialect
+        eu_list = ', '.join(f"'{code}'" for code in sorted(InventoryMerger.EU_COUNTRIES))
+
+        # 与 InventoryMerger 的清洗/校验一致：字符串去空白，数值空值按0，缺必需字段或ASIN长度异常的记录丢弃
+        cleaned = ', '.join(
+            [f"TRIM(COALESCE(s.{f}, '')) AS {f}" for f in TEXT_FIELDS]
+            + [f"COALESCE(s.{f}, 0) AS {f}" for f in NUMERIC_FIELDS]
+            + ['s.src_order AS src_order', f"{d.price_value('s.average_price')} AS average_price_value"]
+        )
+        non_dash = "REPLACE(store, '-', '')"
+        country = (
+            f"CASE WHEN {non_dash} <> store "
+            f"THEN UPPER(TRIM(SUBSTR(store, LENGTH(RTRIM(store, {non_dash})) + 1))) ELSE '' END"
+        )
+        store_prefix = f"TRIM(SUBSTR(store, 1, LENGTH(store) - LENGTH(LTRIM(store, {non_dash}))))"
+
+        base_b = ', '.join(f'b.{f}' for f in BASE_FIELDS)
+        eu_sums = ', '.join(f'SUM({f}) AS {f}' for f in INVENTORY_FIELDS + SALES_FIELDS + AD_FIELDS)
+        non_eu_sums = ', '.join(f'SUM({f}) AS {f}' for f in NUMERIC_FIELDS)
+        agg_cols = ', '.join(f'a.{f}' for f in NUMERIC_FIELDS)
+
+        eu_stores = d.ordered_concat("'\"' || r.store_prefix || '\"'", 'eu_reps r', 'r.asin = b.asin', 'r.rep_order')
+        non_eu_stores = d.ordered_concat(
+            "'\"' || g.store || '\"'", 'non_eu_groups g', 'g.asin = b.asin AND g.country = b.country', 'g.member_order'
+        )
+
+        dec = d.decimal
+        total_inventory = 'fba_available + fba_inbound + local_available'
+        daily_sales = f"{dec('average_sales')} * {dec('average_price_value')}"
+
+        def ratio(numerator: str, denominator: str, precision: int) -> str:
+            return f"CASE WHEN {denominator} = 0 THEN 0 ELSE ROUND({dec(numerator)} / {dec(denominator)}, {precision}) END"
+
+        return f"""
+        WITH src AS (
+            SELECT c.*, {country} AS country, {store_prefix} AS store_prefix
+            FROM (SELECT {cleaned} FROM ({source_sql}) s) c
+            WHERE asin <> '' AND product_name <> '' AND store <> '' AND marketplace <> ''
+              AND LENGTH(asin) BETWEEN 8 AND 15
+        ),
+        eu_ranked AS (
+            SELECT src.*,
+                   ROW_NUMBER() OVER (PARTITION BY asin, store_prefix
+                                      ORDER BY fba_available + fba_inbound DESC, src_order) AS rep_rank,
+                   MIN(src_order) OVER (PARTITION BY asin, store_prefix) AS prefix_first_seen
+            FROM src
+            WHERE country IN ({eu_list}) AND store_prefix <> ''
+        ),
+        eu_reps AS (
+            SELECT eu_ranked.*,
+                   ROW_NUMBER() OVER (PARTITION BY asin ORDER BY prefix_first_seen) AS rep_order
+            FROM eu_ranked
+            WHERE rep_rank = 1 AND fba_available + fba_inbound > -1
+        ),
+        eu_agg AS (
+            SELECT asin, {eu_sums}, MAX(local_available) AS local_available
+            FROM eu_reps GROUP BY asin
+        ),
+        non_eu_groups AS (
+            SELECT src.*,
+                   ROW_NUMBER() OVER (PARTITION BY asin, country ORDER BY src_order) AS member_order
+            FROM src
+            WHERE country NOT IN ({eu_list}) AND country <> ''
+        ),
+        non_eu_agg AS (
+            SELECT asin, country, {non_eu_sums}, COUNT(*) AS member_count,
+                   COUNT(DISTINCT NULLIF(store_prefix, '')) AS prefix_count,
+                   MAX(NULLIF(store_prefix, '')) AS any_prefix
+            FROM non_eu_groups GROUP BY asin, country
+        ),
+        merged AS (
+            SELECT {base_b}, '欧盟' AS marketplace, '欧盟汇总' AS store, {agg_cols},
+                   'eu_merged' AS merge_type, '[' || {eu_stores} || ']' AS merged_stores, 1 AS store_count
+            FROM eu_reps b JOIN eu_agg a ON a.asin = b.asin
+            WHERE b.rep_order = 1
+            UNION ALL
+            SELECT {base_b}, a.country AS marketplace,
+                   CASE WHEN a.member_count = 1 THEN b.store
+                        WHEN a.prefix_count > 1 THEN a.country || '多店铺汇总'
+                        WHEN a.prefix_count = 1 THEN a.any_prefix || '-' || a.country
+                        ELSE a.country || '汇总' END AS store,
+                   {agg_cols},
+                   'non_eu_merged' AS merge_type, '[' || {non_eu_stores} || ']' AS merged_stores,
+                   a.member_count AS store_count
+            FROM non_eu_groups b JOIN non_eu_agg a ON a.asin = b.asin AND a.country = b.country
+            WHERE b.member_order = 1
+        ),
+        analysed AS (
+            SELECT merged.*,
+                   {total_inventory} AS total_inventory,
+                   CASE WHEN average_sales > 0 THEN ROUND({dec(total_inventory)} / {dec('average_sales')}, 1)
+                        WHEN {total_inventory} > 0 THEN 999 ELSE 0 END AS turnover_days,
+                   {daily_sales} AS daily_sales_raw
+            FROM merged
+        )
+        SELECT asin, product_name, sku, category, sales_person, product_tag, dev_name,
+               marketplace, store, asin || '-' || marketplace AS inventory_point_name,
+               fba_available, fba_inbound, fba_sellable, fba_unsellable,
+               local_available, inbound_shipped, total_inventory,
+               sales_7days, total_sales, average_sales, order_count, promotional_orders,
+               average_price, sales_amount, net_sales, refund_rate,
+               ad_impressions, ad_clicks, ad_spend, ad_order_count, ad_sales,
+               {ratio('ad_clicks', 'ad_impressions', 4)} AS ad_ctr,
+               {ratio('ad_order_count', 'ad_clicks', 4)} AS ad_cvr,
+               {ratio('ad_spend', 'daily_sales_raw * 7', 4)} AS acoas,
+               {ratio('ad_spend', 'ad_clicks', 2)} AS ad_cpc,
+               {ratio('ad_sales', 'ad_spend', 2)} AS ad_roas,
+               turnover_days, ROUND(daily_sales_raw, 2) AS daily_sales_amount,
+               turnover_days > 100 AS is_turnover_exceeded,
+               fba_available <= 0 AS is_out_of_stock,
+               sales_7days = 0 AS is_zero_sales,
+               turnover_days > 0 AND turnover_days < 45 AS is_low_inventory,
+               daily_sales_raw >= 16.7 AS is_effective_point,
+               merge_type, merged_stores, store_count
+        FROM analysed
+        """
+
+    # ---- 写入 ----
+
+    def merge_into(self, cursor: Any, data_date: Any, asins: Optional[Sequence[str]] = None,
+                   source_sql: Optional[str] = None, source_params: Optional[Sequence[Any]] = None,
+                   table: str = 'inventory_points') -> Tuple[int, int]:
+        """在数据库内重建指定日期（可限定ASIN）的库存点
+
+        Args:
+            cursor: DB-API 游标（调用方负责事务）
+            asins: 只重建这些ASIN；None 表示整天
+            source_sql/source_params: 自定义输入关系，默认读取 product_analytics 当天数据
+
+        Returns:
+            (删除行数, 写入行数)
+        """
+        p = self.dialect.placeholder
+        asins = list(asins) if asins is not None else None
+        asin_params: List[Any] = asins or []
+
+        if source_sql is None:
+            source_sql = self.product_analytics_source(len(asin_params))
+            source_params = [data_date] + asin_params
+        elif asins:
+            source_sql = f"SELECT * FROM ({source_sql}) scoped WHERE asin IN ({', '.join([p] * len(asins))})"
+            source_params = list(source_params or []) + asin_params
+
+        asin_filter = f" AND asin IN ({', '.join([p] * len(asin_params))})" if asin_params else ''
+        cursor.execute(f"DELETE FROM {table} WHERE data_date = {p}{asin_filter}", [data_date] + asin_params)
+        deleted = cursor.rowcount
+
+        columns = ', '.join(OUTPUT_COLUMNS)
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}, data_date, created_at, updated_at) "
+            f"SELECT {columns}, {self.dialect.date_param()}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM ({self.merge_sql(source_sql)}) merged",
+            [data_date] + list(source_params or [])
+        )
+        return deleted, cursor.rowcount
+
+    def select_points(self, cursor: Any, source_sql: str, source_params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """执行合并查询并以字典返回库存点（用于一致性校验和预览）"""
+        cursor.execute(self.merge_sql(source_sql), list(source_params))
+        return [dict(zip(OUTPUT_COLUMNS, row)) for row in cursor.fetchall()]
@@ -1,17 +1,19 @@
 # models模块初始化
-from .product_analytics import ProductAnalytics
-from .fba_inventory import FbaInventory
-from .inventory_details import InventoryDetails
-from .sync_task_log import SyncTaskLog, TaskType, TaskStatus
-from .inventory_point import InventoryPoint, InventoryPointHistory
+# InventoryPoint/InventoryPointHistory 为SQLAlchemy ORM模型，仅在使用时才导入SQLAlchemy
+from ..utils.lazy import lazy_exports
 
-__all__ = [
-    'ProductAnalytics',
-    'FbaInventory', 
-    'InventoryDetails',
-    'SyncTaskLog',
-    'TaskType',
-    'TaskStatus',
-    'InventoryPoint',
-    'InventoryPointHistory'
-]
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'ProductAnalytics': '.product_analytics',
+    'FbaInventory': '.fba_inventory',
+    'InventoryDetails': '.inventory_details',
+    'SyncTaskLog': '.sync_task_log',
+    'TaskType': '.sync_task_log',
+    'TaskStatus': '.sync_task_log',
+    'InventoryPoint': '.inventory_point',
+    'InventoryPointHistory': '.inventory_point',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['ProductAnalytics', 'FbaInventory', 'InventoryDetails', 'SyncTaskLog', 'TaskType', 'TaskStatus', 'InventoryPoint', 'InventoryPointHistory']
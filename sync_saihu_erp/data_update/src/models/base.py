@@ -4,10 +4,15 @@
 from datetime import datetime
 from typing import Dict, Any, Optional
 import json
-from sqlalchemy.ext.declarative import declarative_base
 
-# SQLAlchemy基础类
-Base = declarative_base()
+
+def __getattr__(name: str):
+    """SQLAlchemy基础类 Base 在首次被ORM模型引用时才创建，普通模型不导入SQLAlchemy"""
+    if name == 'Base':
+        from sqlalchemy.ext.declarative import declarative_base
+        base = globals()['Base'] = declarative_base()
+        return base
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class BaseModel:
     """基础数据模型类"""
@@ -282,20 +282,67 @@ class ProductAnalytics(BaseModel):
         # 额外的指标数据
         self._additional_metrics = kwargs
     
+    @property
+    def metrics_json(self) -> Optional[str]:
+        """额外指标的JSON串（指标变更后在首次读取时才序列化，通常即入库时）"""
+        if self._metrics_dirty:
+            self._metrics_json = json.dumps(self._additional_metrics, default=str, ensure_ascii=False)
+            self._metrics_dirty = False
+        return self._metrics_json
+    
+    @metrics_json.setter
+    def metrics_json(self, value: Optional[str]) -> None:
+        """直接设置JSON串（例如从数据库/字典还原），解析推迟到 get_metrics"""
+        self._metrics_json = value
+        self._metrics_dirty = False
+        self._metrics_owned = False
+        self._parsed_metrics = None
+    
     def set_metrics(self, metrics: Dict[str, Any]) -> None:
-        """设置额外的指标数据"""
+        """设置额外的指标数据（只标记脏位，不立即序列化）"""
         self._additional_metrics.update(metrics)
-        self.metrics_json = json.dumps(self._additional_metrics, default=str, ensure_ascii=False)
+        self._metrics_dirty = True
+        self._metrics_owned = True
+        self._parsed_metrics = None
     
     def get_metrics(self) -> Dict[str, Any]:
-        """获取额外的指标数据"""
-        if self.metrics_json:
-            try:
-                return json.loads(self.metrics_json)
-            except json.JSONDecodeError:
-                return {}
+        """获取额外的指标数据（返回副本，修改后需调用 set_metrics）"""
+        if self._metrics_owned:
+            return dict(self._additional_metrics)
+        if self._metrics_json:
+            if self._parsed_metrics is None:
+                try:
+                    self._parsed_metrics = json.loads(self._metrics_json)
+                except json.JSONDecodeError:
+                    self._parsed_metrics = {}
+            return dict(self._parsed_metrics)
         return self._additional_metrics or {}
     
+    def is_valid(self) -> bool:
+        """验证数据有效性"""
+        if not (self.product_id or self.asin) or not self.data_date:
+            return False
+        
+        # 检查数量是否为负数
+        counts = [self.sales_quantity, self.impressions, self.clicks, self.order_count]
+        for count in counts:
+            if count is not None and count < 0:
+                return False
+        
+        return True
+    
+    def calculate_ctr(self) -> Decimal:
+        """计算点击率（点击/曝光）"""
+        if not self.impressions:
+            return Decimal('0.0000')
+        return (Decimal(self.clicks or 0) / Decimal(self.impressions)).quantize(Decimal('0.0001'))
+    
+    def calculate_revenue_per_click(self) -> Decimal:
+        """计算每次点击收入（销售额/点击）"""
+        if not self.clicks:
+            return Decimal('0.00')
+        return (Decimal(self.sales_amount or 0) / Decimal(self.clicks)).quantize(Decimal('0.01'))
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
         data = {
@@ -1,5 +1,12 @@
 # parsers模块初始化
-from .md_parser import MarkdownApiParser
-from .api_template import ApiTemplate
+from ..utils.lazy import lazy_exports
 
-__all__ = ['MarkdownApiParser', 'ApiTemplate']
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'MarkdownApiParser': '.md_parser',
+    'ApiTemplate': '.api_template',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['MarkdownApiParser', 'ApiTemplate']
@@ -1,10 +1,13 @@
 # processors模块初始化
-from .base_processor import BaseProcessor
-from .product_analytics_processor import ProductAnalyticsProcessor
-from .inventory_merge_processor import InventoryMergeProcessor
+from ..utils.lazy import lazy_exports
 
-__all__ = [
-    'BaseProcessor',
-    'ProductAnalyticsProcessor',
-    'InventoryMergeProcessor'
-]
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'BaseProcessor': '.base_processor',
+    'ProductAnalyticsProcessor': '.product_analytics_processor',
+    'InventoryMergeProcessor': '.inventory_merge_processor',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['BaseProcessor', 'ProductAnalyticsProcessor', 'InventoryMergeProcessor']
@@ -2,19 +2,32 @@
 基础数据处理器
 提供数据清洗、转换、验证和持久化的通用功能
 """
+import inspect
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from datetime import date
 from ..database import db_manager
 from ..models import SyncTaskLog, TaskType
-from ..config.settings import Settings
-settings = Settings()
+from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 class BaseProcessor(ABC):
-    """基础数据处理器抽象类"""
+    """基础数据处理器抽象类
+
+    预处理为单次遍历的融合流水线，子类通过类属性声明：
+        preprocess_stages: 启用的逐条阶段，按 dedupe → validate → clean 顺序执行
+        sort_key: 排序键函数（可直接写函数或 lambda，不会被绑定为方法）；为 None 时不排序（默认）
+        time_stages: 为 True 时记录各阶段耗时到 last_stage_stats（用于基准测试）
+    """
+    
+    PREPROCESS_STAGE_ORDER = ('dedupe', 'validate', 'clean')
+    
+    preprocess_stages: Tuple[str, ...] = ('dedupe', 'validate', 'clean')
+    sort_key: Optional[Callable[[Any], Any]] = None
+    time_stages: bool = False
     
     def __init__(self, task_type: str):
         """初始化处理器"""
@@ -22,6 +35,7 @@ class BaseProcessor(ABC):
         self.batch_size = settings.get('sync.batch_size', 500)
         self.enable_validation = settings.get('sync.enable_validation', True)
         self.parallel_workers = settings.get('sync.parallel_workers', 1)
+        self.last_stage_stats: Dict[str, Dict[str, Any]] = {}
         
         logger.info(f"初始化数据处理器: {self.__class__.__name__}")
     
@@ -41,20 +55,10 @@ class BaseProcessor(ABC):
             
             logger.info(f"开始处理 {len(data_list)} 条数据")
             
-            # 数据预处理
-            processed_data = self._preprocess_data(data_list)
-            
-            # 数据验证
-            if self.enable_validation:
-                validated_data, validation_errors = self._validate_data(processed_data)
-                if validation_errors:
-                    logger.warning(f"数据验证发现 {len(validation_errors)} 个错误")
-            else:
-                validated_data = processed_data
-                validation_errors = []
-            
-            # 数据清洗
-            cleaned_data = self._clean_data(validated_data)
+            # 数据预处理（去重/验证/清洗单次遍历完成）
+            cleaned_data, validation_errors = self._run_preprocess(data_list)
+            if validation_errors:
+                logger.warning(f"数据验证发现 {len(validation_errors)} 个错误")
             
             # 数据转换
             transformed_data = self._transform_data(cleaned_data)
@@ -96,8 +100,102 @@ class BaseProcessor(ABC):
                 'task_log_id': task_log_id
             }
     
+    def _run_preprocess(self, data_list: List[Any]) -> Tuple[List[Any], List[str]]:
+        """融合预处理：单次遍历依次执行子类声明的阶段，必要时最后排序
+
+        Returns:
+            (通过全部阶段的数据, 验证错误列表)
+        """
+        errors: List[str] = []
+        pipeline = self._build_preprocess_pipeline(errors)
+        
+        output = []
+        for index, item in enumerate(data_list):
+            for _, stage_func in pipeline:
+                item = stage_func(item, index)
+                if item is None:
+                    break
+            else:
+                output.append(item)
+        
+        if self._sort_key() is not None:
+            output = self._sort_data(output)
+        
+        logger.info(
+            f"预处理完成: 原始 {len(data_list)} 条 -> 处理后 {len(output)} 条"
+            f" (阶段: {', '.join(name for name, _ in pipeline) or '无'})"
+        )
+        return output, errors
+    
+    def _active_preprocess_stages(self) -> List[str]:
+        """当前启用的预处理阶段（按固定顺序；关闭验证配置时跳过 validate）"""
+        declared = set(self.preprocess_stages)
+        return [
+            name for name in self.PREPROCESS_STAGE_ORDER
+            if name in declared and (name != 'validate' or self.enable_validation)
+        ]
+    
+    def _build_preprocess_pipeline(self, errors: List[str]) -> List[Tuple[str, Callable[[Any, int], Any]]]:
+        """构建逐条阶段函数列表；time_stages 开启时包装计时"""
+        seen_keys = set()
+        
+        def dedupe(item, index):
+            if not hasattr(item, 'get_unique_key'):
+                return item
+            key = item.get_unique_key()
+            if key in seen_keys:
+                return None
+            seen_keys.add(key)
+            return item
+        
+        def validate(item, index):
+            try:
+                if hasattr(item, 'is_valid') and item.is_valid():
+                    return item
+                errors.append(f"第 {index+1} 条数据验证失败")
+            except Exception as e:
+                errors.append(f"第 {index+1} 条数据验证异常: {e}")
+            return None
+        
+        def clean(item, index):
+            try:
+                return self._clean_item(item)
+            except Exception as e:
+                logger.error(f"清洗单条数据失败: {e}")
+                return None
+        
+        stage_funcs = {'dedupe': dedupe, 'validate': validate, 'clean': clean}
+        pipeline = [(name, stage_funcs[name]) for name in self._active_preprocess_stages()]
+        
+        if self.time_stages:
+            self.last_stage_stats = {}
+            pipeline = [(name, self._timed_stage(name, func)) for name, func in pipeline]
+        
+        return pipeline
+    
+    def _timed_stage(self, name: str, func: Callable[[Any, int], Any]) -> Callable[[Any, int], Any]:
+        """为阶段函数累计输入/输出条数和耗时"""
+        stats = self.last_stage_stats.setdefault(name, {'input': 0, 'output': 0, 'seconds': 0.0})
+        perf_counter = time.perf_counter
+        
+        def timed(item, index):
+            started = perf_counter()
+            result = func(item, index)
+            stats['seconds'] += perf_counter() - started
+            stats['input'] += 1
+            if result is not None:
+                stats['output'] += 1
+            return result
+        
+        return timed
+    
+    def _clean_item(self, item: Any) -> Any:
+        """清洗单条数据，返回None表示丢弃；默认复用子类的批量 _clean_data"""
+        cleaned = self._clean_data([item])
+        return cleaned[0] if cleaned else None
+    
     def _preprocess_data(self, data_list: List[Any]) -> List[Any]:
-        """数据预处理"""
+        """数据预处理（仅去重和按 sort_key 排序，兼容旧调用方）"""
         try:
             # 去重处理
             unique_data = self._remove_duplicates(data_list)
@@ -114,7 +212,7 @@ class BaseProcessor(ABC):
     
     def _remove_duplicates(self, data_list: List[Any]) -> List[Any]:
         """去除重复数据"""
-        if not hasattr(data_list[0], 'get_unique_key'):
+        if not data_list or not hasattr(data_list[0], 'get_unique_key'):
             return data_list
         
         seen_keys = set()
@@ -132,11 +230,20 @@ class BaseProcessor(ABC):
         
         return unique_data
     
+    def _sort_key(self) -> Optional[Callable[[Any], Any]]:
+        """按未绑定的原始值读取 sort_key（类属性声明的函数不会收到 self）"""
+        sort_key = inspect.getattr_static(self, 'sort_key', None)
+        if isinstance(sort_key, (staticmethod, classmethod)):
+            sort_key = sort_key.__get__(self, type(self))
+        return sort_key
+    
     def _sort_data(self, data_list: List[Any]) -> List[Any]:
-        """数据排序"""
+        """数据排序（仅当子类声明 sort_key 时排序）"""
+        sort_key = self._sort_key()
+        if sort_key is None:
+            return data_list
         try:
-            # 默认排序逻辑，子类可以重写
-            return sorted(data_list, key=lambda x: getattr(x, 'created_at', datetime.now()) or datetime.now())
+            return sorted(data_list, key=sort_key)
         except Exception as e:
             logger.warning(f"数据排序失败: {e}")
             return data_list
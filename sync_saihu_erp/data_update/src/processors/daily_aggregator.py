@@ -0,0 +1,150 @@
+"""
+产品分析每日聚合器
+单次遍历把数据折叠进 (data_date, product_id) 累加器，使用 Decimal 精确累加，
+输出时直接在每组首条记录上写回合并结果，不再重建对象
+"""
+import logging
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Set
+
+from ..models import ProductAnalytics
+
+logger = logging.getLogger(__name__)
+
+_RATE_QUANT = Decimal('0.0001')
+_ZERO_AMOUNT = Decimal('0.00')
+
+
+class _ProductAccumulator:
+    """同一天同一产品的累加器"""
+
+    __slots__ = (
+        'base', 'count', 'sales_amount', 'sales_quantity', 'impressions', 'clicks',
+        'acos_weighted', 'acos_weight', 'metrics', 'metric_is_sum'
+    )
+
+    def __init__(self, item: ProductAnalytics):
+        self.base = item
+        self.count = 0
+        self.sales_amount = 0
+        self.sales_quantity = 0
+        self.impressions = 0
+        self.clicks = 0
+        self.acos_weighted = 0
+        self.acos_weight = 0
+        self.metrics: Dict[str, Any] = {}
+        self.metric_is_sum: Dict[str, bool] = {}
+
+    def add(self, item: ProductAnalytics) -> None:
+        """折叠一条记录"""
+        self.count += 1
+
+        sales_amount = item.sales_amount or _ZERO_AMOUNT
+        self.sales_amount += sales_amount
+        self.sales_quantity += item.sales_quantity or 0
+        self.impressions += item.impressions or 0
+        self.clicks += item.clicks or 0
+
+        # 加权ACOS只统计有ACOS且销售额为正的记录
+        if item.acos is not None and item.sales_amount and item.sales_amount > 0:
+            self.acos_weighted += item.acos * item.sales_amount
+            self.acos_weight += item.sales_amount
+
+        # 额外指标：首个值为数值的键求和，否则取最后一个值
+        for key, value in item.get_metrics().items():
+            is_sum = self.metric_is_sum.get(key)
+            if is_sum is None:
+                self.metric_is_sum[key] = isinstance(value, (int, float))
+                self.metrics[key] = value
+            elif is_sum:
+                self.metrics[key] += value
+            else:
+                self.metrics[key] = value
+
+    def emit(self) -> ProductAnalytics:
+        """输出合并结果；单条记录原样返回"""
+        merged = self.base
+        if self.count == 1:
+            return merged
+
+        merged.sales_amount = self.sales_amount
+        merged.sales_quantity = self.sales_quantity
+        merged.impressions = self.impressions
+        merged.clicks = self.clicks
+
+        # 重新计算比例指标
+        if self.clicks > 0:
+            merged.conversion_rate = Decimal(str(self.sales_quantity / self.clicks)).quantize(_RATE_QUANT)
+
+        if self.acos_weight > 0:
+            merged.acos = (self.acos_weighted / self.acos_weight).quantize(_RATE_QUANT)
+
+        merged.set_metrics(self.metrics)
+
+        logger.info(f"合并产品 {merged.product_id} 的 {self.count} 条数据")
+        return merged
+
+
+class DailyAggregator:
+    """按 (data_date, product_id) 流式聚合产品分析数据
+
+    输出顺序与按日期分组、再按产品分组的旧实现一致：
+    日期按首次出现顺序，同一日期内产品按首次出现顺序。
+    每组首条记录会被原地改写为合并结果，调用方需独占输入对象。
+    """
+
+    def __init__(self):
+        self._groups: Dict[Any, Dict[Any, _ProductAccumulator]] = {}
+        self._failed_dates: Set[Any] = set()
+
+    def add(self, item: ProductAnalytics) -> None:
+        """折叠一条记录"""
+        data_date = item.data_date
+        if data_date in self._failed_dates:
+            return
+
+        products = self._groups.get(data_date)
+        if products is None:
+            products = self._groups[data_date] = {}
+
+        try:
+            accumulator = products.get(item.product_id)
+            if accumulator is None:
+                accumulator = products[item.product_id] = _ProductAccumulator(item)
+            accumulator.add(item)
+        except Exception as e:
+            logger.error(f"转换日期 {data_date} 的数据失败: {e}")
+            self._failed_dates.add(data_date)
+
+    def add_all(self, items: List[ProductAnalytics]) -> 'DailyAggregator':
+        """折叠一批记录"""
+        for item in items:
+            self.add(item)
+        return self
+
+    def results(self) -> List[ProductAnalytics]:
+        """输出所有聚合结果（聚合失败的日期整体跳过）"""
+        results: List[ProductAnalytics] = []
+        for data_date, products in self._groups.items():
+            if data_date in self._failed_dates:
+                continue
+            try:
+                results.extend([accumulator.emit() for accumulator in products.values()])
+            except Exception as e:
+                logger.error(f"转换日期 {data_date} 的数据失败: {e}")
+        return results
+
+
+def aggregate_daily(items: List[ProductAnalytics]) -> List[ProductAnalytics]:
+    """单次遍历聚合产品分析数据"""
+    return DailyAggregator().add_all(items).results()
+
+
+def merge_product_items(items: List[ProductAnalytics]) -> Optional[ProductAnalytics]:
+    """合并同一产品的多条数据"""
+    if not items:
+        return None
+    accumulator = _ProductAccumulator(items[0])
+    for item in items:
+        accumulator.add(item)
+    return accumulator.emit()
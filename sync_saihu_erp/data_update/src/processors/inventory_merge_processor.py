@@ -10,30 +10,154 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, date
 # SQLAlchemy已替换为纯SQL操作
 
+
 from .base_processor import BaseProcessor
+from ..config.settings import settings
 from ..inventory import InventoryMerger
+from ..inventory.enrichment import enrich_points, parse_price
+from ..inventory.sql_merger import SqlInventoryMerger
 # 使用纯SQL操作，不需要导入ORM模型
 from ..database import db_manager
+from ..database.change_tracker import dirty_asin_tracker
+from ..database.schema_registry import TableSchema, schema_registry
+from ..services.merge_summary_service import merge_summary_service
 from ..utils.logging_utils import get_logger
+from ..utils.instrumentation import stage, record_db_round_trip
 
 logger = get_logger(__name__)
 
+# 库存点表结构（进程内只校验一次，见 SchemaRegistry）
+INVENTORY_POINTS_SCHEMA = schema_registry.register(TableSchema(
+    name='inventory_points',
+    columns={
+        'id': 'SERIAL PRIMARY KEY',
+        'asin': 'VARCHAR(20) NOT NULL',
+        'product_name': 'VARCHAR(255) NOT NULL',
+        'sku': 'VARCHAR(100)',
+        'category': 'VARCHAR(100)',
+        'sales_person': 'VARCHAR(100)',
+        'product_tag': 'VARCHAR(100)',
+        'dev_name': 'VARCHAR(100)',
+        'marketplace': 'VARCHAR(50) NOT NULL',
+        'store': 'VARCHAR(255)',
+        'inventory_point_name': 'VARCHAR(255)',
+        
+        'fba_available': 'NUMERIC(10,2) DEFAULT 0',
+        'fba_inbound': 'NUMERIC(10,2) DEFAULT 0',
+        'fba_sellable': 'NUMERIC(10,2) DEFAULT 0',
+        'fba_unsellable': 'NUMERIC(10,2) DEFAULT 0',
+        'local_available': 'NUMERIC(10,2) DEFAULT 0',
+        'inbound_shipped': 'NUMERIC(10,2) DEFAULT 0',
+        'total_inventory': 'NUMERIC(10,2) DEFAULT 0',
+        
+        'sales_7days': 'NUMERIC(10,2) DEFAULT 0',
+        'total_sales': 'NUMERIC(10,2) DEFAULT 0',
+        'average_sales': 'NUMERIC(10,2) DEFAULT 0',
+        'order_count': 'INTEGER DEFAULT 0',
+        'promotional_orders': 'INTEGER DEFAULT 0',
+        
+        'average_price': 'VARCHAR(50)',
+        'sales_amount': 'VARCHAR(50)',
+        'net_sales': 'VARCHAR(50)',
+        'refund_rate': 'VARCHAR(50)',
+        
+        'ad_impressions': 'INTEGER DEFAULT 0',
+        'ad_clicks': 'INTEGER DEFAULT 0',
+        'ad_spend': 'NUMERIC(10,2) DEFAULT 0',
+        'ad_order_count': 'INTEGER DEFAULT 0',
+        'ad_sales': 'NUMERIC(10,2) DEFAULT 0',
+        'ad_ctr': 'NUMERIC(8,4) DEFAULT 0',
+        'ad_cvr': 'NUMERIC(8,4) DEFAULT 0',
+        'acoas': 'NUMERIC(8,4) DEFAULT 0',
+        'ad_cpc': 'NUMERIC(8,2) DEFAULT 0',
+        'ad_roas': 'NUMERIC(8,2) DEFAULT 0',
+        
+        'turnover_days': 'NUMERIC(8,1) DEFAULT 0',
+        'daily_sales_amount': 'NUMERIC(10,2) DEFAULT 0',
+        'is_turnover_exceeded': 'BOOLEAN DEFAULT FALSE',
+        'is_out_of_stock': 'BOOLEAN DEFAULT FALSE',
+        'is_zero_sales': 'BOOLEAN DEFAULT FALSE',
+        'is_low_inventory': 'BOOLEAN DEFAULT FALSE',
+        'is_effective_point': 'BOOLEAN DEFAULT FALSE',
+        
+        'merge_type': 'VARCHAR(50)',
+        'merged_stores': 'TEXT',
+        'store_count': 'INTEGER DEFAULT 1',
+        'data_date': 'DATE NOT NULL',
+        'created_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+        'updated_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+    },
+    constraints=['CONSTRAINT unique_point UNIQUE (asin, marketplace, data_date)'],
+    indexes={
+        'idx_inventory_points_date':
+            'CREATE INDEX IF NOT EXISTS idx_inventory_points_date ON inventory_points(data_date)',
+        'idx_inventory_points_marketplace':
+            'CREATE INDEX IF NOT EXISTS idx_inventory_points_marketplace ON inventory_points(marketplace)',
+        'idx_inventory_points_asin':
+            'CREATE INDEX IF NOT EXISTS idx_inventory_points_asin ON inventory_points(asin)',
+    }
+))
+
+# 库存点历史快照表结构；唯一索引为可选项：旧表存在重复数据时会创建失败，
+# 此时需先运行 compact_inventory_history.py，历史写入退化为先删后插
+INVENTORY_POINT_HISTORY_SCHEMA = schema_registry.register(TableSchema(
+    name='inventory_point_history',
+    columns={
+        'id': 'SERIAL PRIMARY KEY',
+        'asin': 'VARCHAR(20) NOT NULL',
+        'marketplace': 'VARCHAR(50) NOT NULL',
+        'data_date': 'DATE NOT NULL',
+        'total_inventory': 'NUMERIC(10,2) DEFAULT 0',
+        'average_sales': 'NUMERIC(10,2) DEFAULT 0',
+        'turnover_days': 'NUMERIC(8,1) DEFAULT 0',
+        'daily_sales_amount': 'NUMERIC(10,2) DEFAULT 0',
+        'ad_spend': 'NUMERIC(10,2) DEFAULT 0',
+        'ad_sales': 'NUMERIC(10,2) DEFAULT 0',
+        'acoas': 'NUMERIC(8,4) DEFAULT 0',
+        'created_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+    },
+    indexes={
+        'idx_inventory_point_hist_asin_date':
+            'CREATE INDEX IF NOT EXISTS idx_inventory_point_hist_asin_date '
+            'ON inventory_point_history(asin, data_date)',
+        'idx_inventory_point_hist_marketplace_date':
+            'CREATE INDEX IF NOT EXISTS idx_inventory_point_hist_marketplace_date '
+            'ON inventory_point_history(marketplace, data_date)',
+    },
+    optional_indexes={
+        'uq_inventory_point_hist_point':
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_inventory_point_hist_point '
+            'ON inventory_point_history(asin, marketplace, data_date)',
+    }
+))
+
 
 class InventoryMergeProcessor(BaseProcessor):
     """库存合并处理器"""
     
+    # 输入为字典，有效性由 _clean_item 中的字段校验负责
+    preprocess_stages = ('clean',)
+    
     def __init__(self):
         super().__init__('inventory_merge')
         self.merger = InventoryMerger()
         self.logger = logger
+        self._history_upsert_supported = False
+        # 增量合并：当天已有库存点时只重算产品分析数据有变化的ASIN（见 change_tracker）
+        self.incremental = bool(settings.get('sync.incremental_merge', True))
+        # 合并引擎：python（内存合并后批量写入）或 sql（合并规则下推到数据库，直接由 product_analytics 生成库存点）
+        self.engine = settings.get('sync.merge_engine', 'python')
+        self.sql_merger = SqlInventoryMerger()
     
-    def process(self, data_list: List[Dict[str, Any]], data_date: str = None) -> Dict[str, Any]:
+    def process(self, data_list: List[Dict[str, Any]], data_date: str = None,
+                copy_input: bool = True) -> Dict[str, Any]:
         """
         处理库存合并逻辑
         
         Args:
             data_list: 原始产品数据列表
             data_date: 数据日期，格式YYYY-MM-DD
+            copy_input: 是否复制输入字典；输入由调用方新建且不再复用时可传 False，原地标准化
             
         Returns:
             处理结果
@@ -45,8 +169,16 @@ class InventoryMergeProcessor(BaseProcessor):
             
             self.logger.info(f"开始处理库存合并，数据日期: {data_date}, 数据量: {len(data_list)}")
             
+            # 表结构进程内只校验一次，后续调用不再执行DDL
+            self._ensure_tables()
+            
+            if self.engine == 'sql':
+                return self._process_in_database(data_list, data_date)
+            
             # 第一步：数据预处理
-            cleaned_data = self._clean_data(data_list)
+            with stage('clean') as clean_stage:
+                cleaned_data = self._clean_data(data_list, copy_input)
+                clean_stage.rows = len(cleaned_data)
             self.logger.info(f"数据清洗完成，有效数据量: {len(cleaned_data)}")
             
             if not cleaned_data:
@@ -59,21 +191,48 @@ class InventoryMergeProcessor(BaseProcessor):
                     'saved_count': 0
                 }
             
+            # 增量模式下只重算有变化的ASIN（合并按ASIN分组，各ASIN的库存点互不影响）
+            dirty_marks = self._load_dirty_marks(data_date)
+            if dirty_marks is not None:
+                cleaned_data = [item for item in cleaned_data if item['asin'] in dirty_marks]
+                self.logger.info(f"增量合并: {len(dirty_marks)} 个ASIN有变化，重算产品数据 {len(cleaned_data)} 条")
+            
             # 第二步：执行库存点合并
-            merged_points = self.merger.merge_inventory_points(cleaned_data)
+            with stage('merge') as merge_stage:
+                # cleaned_data 已由本处理器独占，合并器无需再复制
+                merged_points = self.merger.merge_inventory_points(cleaned_data, copy_products=False, enrich=False) \
+                    if cleaned_data else []
+                merge_stage.rows = len(merged_points)
             self.logger.info(f"库存合并完成，合并后库存点数量: {len(merged_points)}")
             
-            # 第三步：计算分析指标
-            enriched_points = self._enrich_analysis_data(merged_points)
+            # 第三步：一次遍历计算广告指标和分析指标（原地更新库存点）
+            with stage('enrich') as enrich_stage:
+                enriched_points = self._enrich_analysis_data(merged_points)
+                enrich_stage.rows = len(enriched_points)
             
-            # 第四步：持久化合并结果
-            saved_count = self._persist_merged_data(enriched_points, data_date)
+            # 第四步：持久化合并结果（增量模式只替换变化ASIN的库存点）
+            with stage('persist') as persist_stage:
+                saved_count = self._persist_merged_data(
+                    enriched_points, data_date,
+                    asins=list(dirty_marks) if dirty_marks is not None else None
+                )
+                persist_stage.rows = saved_count
             
             # 第五步：保存历史快照
-            self._save_history_snapshots(enriched_points, data_date)
+            with stage('history') as history_stage:
+                self._save_history_snapshots(enriched_points, data_date)
+                history_stage.rows = len(enriched_points)
             
-            # 第六步：生成合并统计
+            # 合并结果已落库，清除本次处理的变更标记
+            self._clear_dirty_marks(data_date, dirty_marks)
+            
+            # 第六步：生成合并统计（全量合并时汇总直接由内存结果计算；增量合并只有部分库存点在内存中，回查数据库）
             merge_stats = self.merger.get_merge_statistics(len(data_list), merged_points)
+            if dirty_marks is None:
+                merge_summary = merge_summary_service.summarize_points(enriched_points, data_date)
+            else:
+                merge_summary = merge_summary_service.get_summary(data_date, use_materialized=False)
+            merge_summary_service.record(merge_summary)
             
             result = {
                 'status': 'success',
@@ -82,7 +241,11 @@ class InventoryMergeProcessor(BaseProcessor):
                 'cleaned_count': len(cleaned_data),
                 'merged_count': len(merged_points),
                 'saved_count': saved_count,
+                'merge_engine': 'python',
+                'merge_mode': 'full' if dirty_marks is None else 'incremental',
+                'dirty_asin_count': len(dirty_marks) if dirty_marks is not None else None,
                 'merge_statistics': merge_stats,
+                'merge_summary': merge_summary,
                 'processing_time': datetime.utcnow().isoformat()
             }
             
@@ -99,6 +262,86 @@ class InventoryMergeProcessor(BaseProcessor):
                 'processing_time': datetime.utcnow().isoformat()
             }
     
+    def _process_in_database(self, data_list: List[Dict[str, Any]], data_date: str) -> Dict[str, Any]:
+        """SQL 下推模式：在单个事务内由当天 product_analytics 重建库存点和历史快照
+        
+        合并输入取自已落库的产品分析数据（与 data_list 同源），data_list 仅用于统计。
+        """
+        dirty_marks = self._load_dirty_marks(data_date)
+        asins = sorted(dirty_marks) if dirty_marks is not None else None
+        
+        deleted_count = saved_count = 0
+        with stage('merge') as merge_stage:
+            if asins is None or asins:
+                with db_manager.get_db_transaction() as conn:
+                    with conn.cursor() as cursor:
+                        record_db_round_trip(2)
+                        deleted_count, saved_count = self.sql_merger.merge_into(cursor, data_date, asins)
+                        self._save_history_in_database(cursor, data_date, asins)
+            merge_stage.rows = saved_count
+        self.logger.info(f"SQL合并完成: 删除旧库存点 {deleted_count} 个，写入 {saved_count} 个")
+        
+        self._clear_dirty_marks(data_date, dirty_marks)
+        
+        merge_summary = merge_summary_service.get_summary(data_date, use_materialized=False)
+        merge_summary_service.record(merge_summary)
+        
+        result = {
+            'status': 'success',
+            'data_date': data_date,
+            'processed_count': len(data_list),
+            'merged_count': saved_count,
+            'saved_count': saved_count,
+            'merge_engine': 'sql',
+            'merge_mode': 'full' if dirty_marks is None else 'incremental',
+            'dirty_asin_count': len(dirty_marks) if dirty_marks is not None else None,
+            'merge_summary': merge_summary,
+            'processing_time': datetime.utcnow().isoformat()
+        }
+        self.logger.info(f"库存合并处理完成: {result}")
+        return result
+    
+    def _save_history_in_database(self, cursor, data_date: str, asins: Optional[List[str]] = None):
+        """由刚写入的库存点生成历史快照（INSERT ... SELECT，与库存点写入同一事务）"""
+        asin_filter = ' AND asin = ANY(%s)' if asins is not None else ''
+        params = (data_date, asins) if asins is not None else (data_date,)
+        columns = ('asin, marketplace, data_date, total_inventory, average_sales, '
+                   'turnover_days, daily_sales_amount, ad_spend, ad_sales, acoas')
+        select_sql = (
+            f"SELECT {columns}, NOW() FROM inventory_points WHERE data_date = %s{asin_filter}"
+        )
+        
+        if self._history_upsert_supported:
+            record_db_round_trip()
+            cursor.execute(
+                f"""
+                INSERT INTO inventory_point_history ({columns}, created_at)
+                {select_sql}
+                ON CONFLICT (asin, marketplace, data_date) DO UPDATE
+                SET total_inventory = EXCLUDED.total_inventory,
+                    average_sales = EXCLUDED.average_sales,
+                    turnover_days = EXCLUDED.turnover_days,
+                    daily_sales_amount = EXCLUDED.daily_sales_amount,
+                    ad_spend = EXCLUDED.ad_spend,
+                    ad_sales = EXCLUDED.ad_sales,
+                    acoas = EXCLUDED.acoas,
+                    created_at = EXCLUDED.created_at
+                """,
+                params
+            )
+        else:
+            record_db_round_trip(2)
+            cursor.execute(
+                f"""
+                DELETE FROM inventory_point_history
+                WHERE data_date = %s AND (asin, marketplace) IN (
+                    SELECT asin, marketplace FROM inventory_points WHERE data_date = %s{asin_filter}
+                )
+                """,
+                (data_date,) + params
+            )
+            cursor.execute(f"INSERT INTO inventory_point_history ({columns}, created_at) {select_sql}", params)
+    
     def _validate_product_data(self, data: Dict[str, Any]) -> bool:
         """验证产品数据完整性"""
         required_fields = ['asin', 'product_name', 'store', 'marketplace']
@@ -115,9 +358,9 @@ class InventoryMergeProcessor(BaseProcessor):
         
         return True
     
-    def _normalize_product_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def _normalize_product_data(self, data: Dict[str, Any], copy_data: bool = True) -> Dict[str, Any]:
         """标准化产品数据"""
-        normalized = data.copy()
+        normalized = data.copy() if copy_data else data
         
         # 数值字段标准化
         numeric_fields = [
@@ -149,74 +392,62 @@ class InventoryMergeProcessor(BaseProcessor):
         return normalized
     
     def _enrich_analysis_data(self, merged_points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """丰富分析数据，计算各种指标"""
-        enriched_points = []
-        
-        for point in merged_points:
-            try:
-                enriched_point = point.copy()
-                
-                # 计算总库存
-                total_inventory = (
-                    (point.get('fba_available', 0) or 0) + 
-                    (point.get('fba_inbound', 0) or 0) + 
-                    (point.get('local_available', 0) or 0)
-                )
-                enriched_point['total_inventory'] = total_inventory
-                
-                # 计算库存周转天数
-                average_sales = point.get('average_sales', 0) or 0
-                if average_sales > 0:
-                    turnover_days = round(total_inventory / average_sales, 1)
-                else:
-                    turnover_days = 999 if total_inventory > 0 else 0
-                enriched_point['turnover_days'] = turnover_days
-                
-                # 计算日均销售额
-                average_price = self._extract_price_from_string(point.get('average_price', ''))
-                daily_sales_amount = average_sales * average_price
-                enriched_point['daily_sales_amount'] = round(daily_sales_amount, 2)
-                
-                # 计算状态标识
-                enriched_point['is_turnover_exceeded'] = turnover_days > 100 or turnover_days == 999
-                enriched_point['is_low_inventory'] = 0 < turnover_days < 45
-                enriched_point['is_out_of_stock'] = (point.get('fba_available', 0) or 0) <= 0
-                enriched_point['is_zero_sales'] = (point.get('sales_7days', 0) or 0) == 0
-                enriched_point['is_effective_point'] = daily_sales_amount >= 16.7
-                
-                enriched_points.append(enriched_point)
-                
-            except Exception as e:
-                self.logger.warning(f"数据丰富失败: {e}, 使用原始数据")
-                enriched_points.append(point)
-        
-        return enriched_points
+        """丰富分析数据，计算广告指标、库存分析指标和状态标识（原地更新）"""
+        return enrich_points(merged_points)
     
     def _extract_price_from_string(self, price_str: str) -> float:
         """从价格字符串中提取数值"""
-        if not price_str:
-            return 0.0
+        return parse_price(price_str)
+    
+    def _load_dirty_marks(self, data_date: str) -> Optional[Dict[str, Any]]:
+        """读取当天待重新合并的ASIN标记；返回 None 表示需要全量合并
+        
+        未开启增量、当天尚无库存点（首次合并）或读取标记失败时全量合并。
+        """
+        if not self.incremental:
+            return None
         
         try:
-            import re
-            price_match = re.search(r'[\d.]+', str(price_str))
-            if price_match:
-                return float(price_match.group())
-            return 0.0
-        except:
-            return 0.0
+            existing = db_manager.execute_single(
+                "SELECT 1 AS found FROM inventory_points WHERE data_date = %s LIMIT 1", (data_date,)
+            )
+            if not existing:
+                return None
+            return dirty_asin_tracker.load(data_date)
+        except Exception as e:
+            self.logger.warning(f"读取ASIN变更标记失败，改为全量合并: {e}")
+            return None
     
-    def _persist_merged_data(self, merged_points: List[Dict[str, Any]], data_date: str) -> int:
-        """持久化合并后的数据"""
+    def _clear_dirty_marks(self, data_date: str, dirty_marks: Optional[Dict[str, Any]]):
+        """清除已合并的变更标记（全量合并清除当天全部标记）"""
+        if not self.incremental:
+            return
+        
+        try:
+            dirty_asin_tracker.clear(data_date, dirty_marks)
+        except Exception as e:
+            # 标记残留只会导致下次多重算这些ASIN
+            self.logger.warning(f"清除ASIN变更标记失败: {e}")
+    
+    def _persist_merged_data(self, merged_points: List[Dict[str, Any]], data_date: str,
+                             asins: Optional[List[str]] = None) -> int:
+        """持久化合并后的数据
+        
+        Args:
+            asins: 只替换这些ASIN的库存点（增量合并）；为 None 时替换当天全部库存点
+        """
         saved_count = 0
+        if asins is not None and not asins:
+            return saved_count
         
         try:
-            # 首先创建表如果不存在
-            self._ensure_inventory_points_table()
-            
             # 删除当天的旧数据
-            delete_sql = "DELETE FROM inventory_points WHERE data_date = %s"
-            db_manager.execute_update(delete_sql, (data_date,))
+            if asins is None:
+                db_manager.execute_update("DELETE FROM inventory_points WHERE data_date = %s", (data_date,))
+            else:
+                db_manager.execute_update(
+                    "DELETE FROM inventory_points WHERE data_date = %s AND asin = ANY(%s)", (data_date, asins)
+                )
             
             # 批量插入新数据
             if merged_points:
@@ -321,195 +552,132 @@ class InventoryMergeProcessor(BaseProcessor):
         
         return saved_count
     
+    def _ensure_tables(self):
+        """确保库存点表和历史表结构就绪（由 SchemaRegistry 缓存，进程内只执行一次）"""
+        self._ensure_inventory_points_table()
+        self._ensure_history_table()
+    
     def _ensure_inventory_points_table(self):
         """确保库存点表存在（PostgreSQL版）"""
         try:
-            create_table_sql = """
-            CREATE TABLE IF NOT EXISTS inventory_points (
-                id SERIAL PRIMARY KEY,
-                asin VARCHAR(20) NOT NULL,
-                product_name VARCHAR(255) NOT NULL,
-                sku VARCHAR(100),
-                category VARCHAR(100),
-                sales_person VARCHAR(100),
-                product_tag VARCHAR(100),
-                dev_name VARCHAR(100),
-                marketplace VARCHAR(50) NOT NULL,
-                store VARCHAR(255),
-                inventory_point_name VARCHAR(255),
-                
-                fba_available NUMERIC(10,2) DEFAULT 0,
-                fba_inbound NUMERIC(10,2) DEFAULT 0,
-                fba_sellable NUMERIC(10,2) DEFAULT 0,
-                fba_unsellable NUMERIC(10,2) DEFAULT 0,
-                local_available NUMERIC(10,2) DEFAULT 0,
-                inbound_shipped NUMERIC(10,2) DEFAULT 0,
-                total_inventory NUMERIC(10,2) DEFAULT 0,
-                
-                sales_7days NUMERIC(10,2) DEFAULT 0,
-                total_sales NUMERIC(10,2) DEFAULT 0,
-                average_sales NUMERIC(10,2) DEFAULT 0,
-                order_count INTEGER DEFAULT 0,
-                promotional_orders INTEGER DEFAULT 0,
-                
-                average_price VARCHAR(50),
-                sales_amount VARCHAR(50),
-                net_sales VARCHAR(50),
-                refund_rate VARCHAR(50),
-                
-                ad_impressions INTEGER DEFAULT 0,
-                ad_clicks INTEGER DEFAULT 0,
-                ad_spend NUMERIC(10,2) DEFAULT 0,
-                ad_order_count INTEGER DEFAULT 0,
-                ad_sales NUMERIC(10,2) DEFAULT 0,
-                ad_ctr NUMERIC(8,4) DEFAULT 0,
-                ad_cvr NUMERIC(8,4) DEFAULT 0,
-                acoas NUMERIC(8,4) DEFAULT 0,
-                ad_cpc NUMERIC(8,2) DEFAULT 0,
-                ad_roas NUMERIC(8,2) DEFAULT 0,
-                
-                turnover_days NUMERIC(8,1) DEFAULT 0,
-                daily_sales_amount NUMERIC(10,2) DEFAULT 0,
-                is_turnover_exceeded BOOLEAN DEFAULT FALSE,
-                is_out_of_stock BOOLEAN DEFAULT FALSE,
-                is_zero_sales BOOLEAN DEFAULT FALSE,
-                is_low_inventory BOOLEAN DEFAULT FALSE,
-                is_effective_point BOOLEAN DEFAULT FALSE,
-                
-                merge_type VARCHAR(50),
-                merged_stores TEXT,
-                store_count INTEGER DEFAULT 1,
-                data_date DATE NOT NULL,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                
-                CONSTRAINT unique_point UNIQUE (asin, marketplace, data_date)
-            );
-            CREATE INDEX IF NOT EXISTS idx_inventory_points_date ON inventory_points(data_date);
-            CREATE INDEX IF NOT EXISTS idx_inventory_points_marketplace ON inventory_points(marketplace);
-            CREATE INDEX IF NOT EXISTS idx_inventory_points_asin ON inventory_points(asin);
-            """
-            
-            db_manager.execute_script(create_table_sql)
-            self.logger.debug("库存点表创建或检查完成")
-            
+            schema_registry.ensure(INVENTORY_POINTS_SCHEMA.name)
         except Exception as e:
             self.logger.error(f"创建库存点表失败: {e}")
             raise
     
     def _save_history_snapshots(self, merged_points: List[Dict[str, Any]], data_date: str):
-        """保存历史快照数据"""
+        """保存历史快照数据（按 asin+marketplace+data_date 幂等UPSERT）"""
         try:
-            # 创建历史表如果不存在
-            self._ensure_history_table()
+            history_rows = self._build_history_rows(merged_points, data_date)
+            if not history_rows:
+                return
             
-            if merged_points:
-                history_sql = """
+            if self._history_upsert_supported:
+                # 单条多行INSERT ... ON CONFLICT，重复处理同一天只会覆盖不会新增
+                upsert_sql = """
                 INSERT INTO inventory_point_history 
                 (asin, marketplace, data_date, total_inventory, average_sales, 
                  turnover_days, daily_sales_amount, ad_spend, ad_sales, acoas, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                VALUES %s
+                ON CONFLICT (asin, marketplace, data_date) DO UPDATE
+                SET total_inventory = EXCLUDED.total_inventory,
+                    average_sales = EXCLUDED.average_sales,
+                    turnover_days = EXCLUDED.turnover_days,
+                    daily_sales_amount = EXCLUDED.daily_sales_amount,
+                    ad_spend = EXCLUDED.ad_spend,
+                    ad_sales = EXCLUDED.ad_sales,
+                    acoas = EXCLUDED.acoas,
+                    created_at = EXCLUDED.created_at
                 """
-                
-                params_list = []
-                for point_data in merged_points:
-                    params = (
-                        point_data.get('asin', ''),
-                        point_data.get('marketplace', ''),
-                        data_date,
-                        point_data.get('total_inventory', 0),
-                        point_data.get('average_sales', 0),
-                        point_data.get('turnover_days', 0),
-                        point_data.get('daily_sales_amount', 0),
-                        point_data.get('ad_spend', 0),
-                        point_data.get('ad_sales', 0),
-                        point_data.get('acoas', 0)
-                    )
-                    params_list.append(params)
-                
-                db_manager.execute_batch(history_sql, params_list)
-                self.logger.debug(f"历史快照保存完成，数据日期: {data_date}")
+                db_manager.execute_values(
+                    upsert_sql, history_rows,
+                    template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
+                )
+            else:
+                # 历史表尚未压缩去重（无唯一索引），退化为同一事务内先删后插
+                from psycopg2.extras import execute_values
+                with db_manager.get_db_transaction() as conn:
+                    with conn.cursor() as cursor:
+                        record_db_round_trip(2)
+                        cursor.execute(
+                            "DELETE FROM inventory_point_history WHERE data_date = %s AND (asin, marketplace) IN %s",
+                            (data_date, tuple((row[0], row[1]) for row in history_rows))
+                        )
+                        execute_values(
+                            cursor,
+                            """
+                            INSERT INTO inventory_point_history 
+                            (asin, marketplace, data_date, total_inventory, average_sales, 
+                             turnover_days, daily_sales_amount, ad_spend, ad_sales, acoas, created_at)
+                            VALUES %s
+                            """,
+                            history_rows,
+                            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())"
+                        )
+            
+            self.logger.debug(f"历史快照保存完成，数据日期: {data_date}, 数量: {len(history_rows)}")
                 
         except Exception as e:
             self.logger.error(f"历史快照保存异常: {e}")
     
+    def _build_history_rows(self, merged_points: List[Dict[str, Any]], data_date: str) -> List[tuple]:
+        """构建历史快照参数，同一批次内按 (asin, marketplace) 去重（保留最后一条）"""
+        rows_by_key = {}
+        for point_data in merged_points or []:
+            key = (point_data.get('asin', ''), point_data.get('marketplace', ''))
+            rows_by_key[key] = (
+                key[0],
+                key[1],
+                data_date,
+                point_data.get('total_inventory', 0),
+                point_data.get('average_sales', 0),
+                point_data.get('turnover_days', 0),
+                point_data.get('daily_sales_amount', 0),
+                point_data.get('ad_spend', 0),
+                point_data.get('ad_sales', 0),
+                point_data.get('acoas', 0)
+            )
+        return list(rows_by_key.values())
+    
     def _ensure_history_table(self):
-        """确保历史表存在（PostgreSQL版）"""
+        """确保历史表存在（PostgreSQL版），并根据唯一索引是否存在选择写入方式"""
         try:
-            create_history_sql = """
-            CREATE TABLE IF NOT EXISTS inventory_point_history (
-                id SERIAL PRIMARY KEY,
-                asin VARCHAR(20) NOT NULL,
-                marketplace VARCHAR(50) NOT NULL,
-                data_date DATE NOT NULL,
-                total_inventory NUMERIC(10,2) DEFAULT 0,
-                average_sales NUMERIC(10,2) DEFAULT 0,
-                turnover_days NUMERIC(8,1) DEFAULT 0,
-                daily_sales_amount NUMERIC(10,2) DEFAULT 0,
-                ad_spend NUMERIC(10,2) DEFAULT 0,
-                ad_sales NUMERIC(10,2) DEFAULT 0,
-                acoas NUMERIC(8,4) DEFAULT 0,
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-            );
-            CREATE INDEX IF NOT EXISTS idx_inventory_point_hist_asin_date ON inventory_point_history(asin, data_date);
-            CREATE INDEX IF NOT EXISTS idx_inventory_point_hist_marketplace_date ON inventory_point_history(marketplace, data_date);
-            """
-            db_manager.execute_script(create_history_sql)
+            schema_registry.ensure(INVENTORY_POINT_HISTORY_SCHEMA.name)
         except Exception as e:
             self.logger.error(f"创建历史表失败: {e}")
             raise
+        
+        self._history_upsert_supported = schema_registry.has_index(
+            INVENTORY_POINT_HISTORY_SCHEMA.name, 'uq_inventory_point_hist_point'
+        )
+        if not self._history_upsert_supported:
+            self.logger.warning(
+                "历史表缺少唯一索引（可能存在重复数据，请运行 compact_inventory_history.py），使用先删后插方式写入"
+            )
     
     def get_merge_summary(self, data_date: str = None) -> Dict[str, Any]:
-        """获取合并数据汇总"""
-        if not data_date:
-            data_date = date.today().strftime('%Y-%m-%d')
-        
+        """获取合并数据汇总（单条聚合查询，开启物化时优先读取汇总表）"""
         try:
-            # 基础统计
-            total_points_sql = "SELECT COUNT(*) as count FROM inventory_points WHERE data_date = %s"
-            total_result = db_manager.execute_single(total_points_sql, (data_date,))
-            total_points = total_result['count'] if total_result else 0
-            
-            eu_points_sql = "SELECT COUNT(*) as count FROM inventory_points WHERE data_date = %s AND marketplace = '欧盟'"
-            eu_result = db_manager.execute_single(eu_points_sql, (data_date,))
-            eu_points = eu_result['count'] if eu_result else 0
-            
-            turnover_sql = "SELECT COUNT(*) as count FROM inventory_points WHERE data_date = %s AND is_turnover_exceeded = TRUE"
-            turnover_result = db_manager.execute_single(turnover_sql, (data_date,))
-            turnover_exceeded = turnover_result['count'] if turnover_result else 0
-            
-            stock_sql = "SELECT COUNT(*) as count FROM inventory_points WHERE data_date = %s AND is_out_of_stock = TRUE"
-            stock_result = db_manager.execute_single(stock_sql, (data_date,))
-            out_of_stock = stock_result['count'] if stock_result else 0
-            
-            effective_sql = "SELECT COUNT(*) as count FROM inventory_points WHERE data_date = %s AND is_effective_point = TRUE"
-            effective_result = db_manager.execute_single(effective_sql, (data_date,))
-            effective_points = effective_result['count'] if effective_result else 0
-            
-            return {
-                'data_date': data_date,
-                'total_points': total_points,
-                'eu_points': eu_points,
-                'non_eu_points': total_points - eu_points,
-                'turnover_exceeded': turnover_exceeded,
-                'out_of_stock': out_of_stock,
-                'effective_points': effective_points,
-                'effectiveness_rate': round(effective_points / total_points if total_points > 0 else 0, 4)
-            }
-            
+            return merge_summary_service.get_summary(data_date)
         except Exception as e:
             self.logger.error(f"获取合并汇总失败: {e}")
             return {}
     
     # 实现基类的抽象方法  
-    def _clean_data(self, data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _clean_item(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """融合预处理中的逐条验证和标准化"""
+        if not self._validate_product_data(data):
+            return None
+        return self._normalize_product_data(data)
+    
+    def _clean_data(self, data_list: List[Dict[str, Any]], copy_input: bool = True) -> List[Dict[str, Any]]:
         """数据清洗和验证"""
         cleaned = []
         
         for i, data in enumerate(data_list):
             try:
                 if self._validate_product_data(data):
-                    normalized_data = self._normalize_product_data(data)
+                    normalized_data = self._normalize_product_data(data, copy_input)
                     cleaned.append(normalized_data)
                 else:
                     self.logger.debug(f"产品 #{i} 验证失败，跳过")
@@ -523,7 +691,7 @@ class InventoryMergeProcessor(BaseProcessor):
     def _transform_data(self, data_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """数据转换 - 执行库存合并"""
         try:
-            merged_points = self.merger.merge_inventory_points(data_list)
+            merged_points = self.merger.merge_inventory_points(data_list, enrich=False)
             enriched_points = self._enrich_analysis_data(merged_points)
             return enriched_points
         except Exception as e:
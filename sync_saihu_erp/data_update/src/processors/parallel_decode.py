@@ -0,0 +1,220 @@
+"""
+产品分析数据并行解码
+大数据量日期把原始分页数据切片后交给进程池，在子进程内完成 解码 → 验证 → 清洗，
+跨进程只传输紧凑序列化数据：输入为 JSON 字节，输出为 marshal 编码的定长字段元组，
+按切片顺序合并结果，保证与串行处理的输出顺序一致
+"""
+import json
+import logging
+import marshal
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.settings import settings
+from ..models import ProductAnalytics
+
+logger = logging.getLogger(__name__)
+
+# marshal 可直接编码的标量类型
+_PLAIN_TYPES = (type(None), bool, int, float, str)
+
+_KIND_PLAIN = 0
+_KIND_DECIMAL = 1
+_KIND_DATE = 2
+_KIND_DATETIME = 3
+
+
+def _field_kind(annotation: Any) -> int:
+    """根据构造参数注解判断字段编码方式"""
+    args = getattr(annotation, '__args__', None) or (annotation,)
+    if Decimal in args:
+        return _KIND_DECIMAL
+    if datetime in args:
+        return _KIND_DATETIME
+    if date in args:
+        return _KIND_DATE
+    return _KIND_PLAIN
+
+
+def _plain_value(value: Any) -> Any:
+    """把额外指标中的值转换为 marshal 可编码的形式（与 JSON default=str 语义一致）"""
+    if type(value) in _PLAIN_TYPES:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_plain_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _plain_value(v) for k, v in value.items()}
+    return str(value)
+
+
+class ProductAnalyticsCodec:
+    """ProductAnalytics 定长元组编解码器
+
+    字段顺序取自模型实例属性，编码方式取自构造参数注解：
+    Decimal 编码为字符串，日期/时间编码为 ISO 字符串，额外指标单独作为字典传输。
+    """
+
+    def __init__(self):
+        prototype = ProductAnalytics()
+        hints = typing.get_type_hints(ProductAnalytics.__init__)
+        self.fields: Tuple[str, ...] = tuple(name for name in vars(prototype) if not name.startswith('_'))
+        self.kinds: Tuple[int, ...] = tuple(_field_kind(hints.get(name)) for name in self.fields)
+
+    def encode(self, model: ProductAnalytics) -> Tuple[tuple, Dict[str, Any]]:
+        """编码单个模型为 (字段值元组, 额外指标)"""
+        attrs = vars(model)
+        values = []
+        append = values.append
+        for name, kind in zip(self.fields, self.kinds):
+            value = attrs.get(name)
+            if value is None or type(value) is str:
+                append(value)
+            elif kind == _KIND_DECIMAL:
+                append(str(value))
+            elif kind == _KIND_DATE or kind == _KIND_DATETIME:
+                append(value.isoformat())
+            else:
+                append(_plain_value(value))
+        metrics = model.get_metrics()
+        return tuple(values), {key: _plain_value(value) for key, value in metrics.items()}
+
+    def decode(self, record: Tuple[tuple, Dict[str, Any]]) -> ProductAnalytics:
+        """从 (字段值元组, 额外指标) 还原模型，不经过构造函数的默认值处理"""
+        values, metrics = record
+        model = ProductAnalytics.__new__(ProductAnalytics)
+        attrs = vars(model)
+        for name, kind, value in zip(self.fields, self.kinds, values):
+            if value is not None and kind != _KIND_PLAIN:
+                if kind == _KIND_DECIMAL:
+                    value = Decimal(value)
+                elif kind == _KIND_DATE:
+                    value = date.fromisoformat(value)
+                else:
+                    value = datetime.fromisoformat(value)
+            attrs[name] = value
+        model._additional_metrics = {}
+        model.metrics_json = None
+        if metrics:
+            model.set_metrics(metrics)
+        return model
+
+
+# 子进程内复用的编解码器和清洗用处理器
+_worker_codec: Optional[ProductAnalyticsCodec] = None
+_worker_processor = None
+
+
+def _get_worker_state():
+    """按进程懒加载编解码器和处理器（处理器只用于逐条清洗，不访问数据库）"""
+    global _worker_codec, _worker_processor
+    if _worker_codec is None:
+        from .product_analytics_processor import ProductAnalyticsProcessor
+        _worker_codec = ProductAnalyticsCodec()
+        _worker_processor = ProductAnalyticsProcessor()
+    return _worker_codec, _worker_processor
+
+
+def decode_shard(payload: bytes, target_date: str) -> bytes:
+    """子进程任务：解码并清洗一个切片，返回 marshal 编码的记录列表"""
+    codec, processor = _get_worker_state()
+    data_date = date.fromisoformat(target_date)
+    records = []
+
+    for item in json.loads(payload):
+        try:
+            analytics = ProductAnalytics.from_api_response(item, data_date)
+            if not analytics.is_valid():
+                continue
+        except Exception as ex:
+            logger.warning(f"转换产品分析数据失败: {ex}")
+            continue
+
+        try:
+            cleaned = processor._clean_item(analytics)
+        except Exception as e:
+            logger.error(f"清洗单条数据失败: {e}")
+            continue
+        if cleaned is not None:
+            records.append(codec.encode(cleaned))
+
+    return marshal.dumps(records)
+
+
+class ParallelDecoder:
+    """进程池并行解码器
+
+    配置项：
+        sync.parallel_decode     是否开启（默认关闭）
+        sync.parallel_workers    进程数
+        sync.parallel_shard_size 每个切片的原始记录数
+        sync.parallel_min_rows   低于该记录数时仍走串行（进程间传输不划算）
+    """
+
+    def __init__(self, workers: Optional[int] = None, shard_size: Optional[int] = None,
+                 min_rows: Optional[int] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = bool(settings.get('sync.parallel_decode', False))
+        self.enabled = enabled
+        self.workers = int(workers if workers is not None else settings.get('sync.parallel_workers', 1))
+        self.shard_size = max(1, int(shard_size if shard_size is not None
+                                     else settings.get('sync.parallel_shard_size', 2000)))
+        self.min_rows = int(min_rows if min_rows is not None else settings.get('sync.parallel_min_rows', 10000))
+        self._codec: Optional[ProductAnalyticsCodec] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def should_parallelize(self, row_count: int) -> bool:
+        """判断本批数据是否值得走进程池"""
+        return self.enabled and self.workers > 1 and row_count >= self.min_rows
+
+    def decode_and_clean(self, rows: List[Dict[str, Any]], target_date: date) -> Optional[Tuple[List[ProductAnalytics], int]]:
+        """并行解码并清洗原始记录
+
+        Returns:
+            (清洗后的模型列表, 传输字节数)；进程池不可用时返回None，由调用方退回串行
+        """
+        if self._codec is None:
+            self._codec = ProductAnalyticsCodec()
+
+        payloads = [
+            json.dumps(rows[start:start + self.shard_size], ensure_ascii=False,
+                       separators=(',', ':'), default=str).encode('utf-8')
+            for start in range(0, len(rows), self.shard_size)
+        ]
+        transferred = sum(len(payload) for payload in payloads)
+
+        try:
+            executor = self._get_executor()
+            # map 按提交顺序返回结果，合并后的顺序与串行处理一致
+            results = list(executor.map(decode_shard, payloads, repeat(target_date.isoformat())))
+        except Exception as e:
+            logger.warning(f"并行解码失败，退回串行处理: {e}")
+            self.shutdown()
+            return None
+
+        decode = self._codec.decode
+        models: List[ProductAnalytics] = []
+        for result in results:
+            transferred += len(result)
+            models.extend(decode(record) for record in marshal.loads(result))
+
+        logger.info(
+            f"并行解码完成: {len(rows)} 条原始数据, {len(payloads)} 个切片, "
+            f"{self.workers} 个进程 -> {len(models)} 条"
+        )
+        return models, transferred
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """懒创建进程池，多个日期之间复用"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
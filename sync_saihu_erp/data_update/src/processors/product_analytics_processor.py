@@ -3,60 +3,177 @@
 特别处理前七天数据的更新逻辑
 """
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from .base_processor import BaseProcessor
+from .daily_aggregator import aggregate_daily, merge_product_items
+from .parallel_decode import ParallelDecoder
 from ..models import ProductAnalytics
 from ..database import db_manager
+from ..services.checksum_service import checksum_service
+from ..utils.instrumentation import stage
 
 logger = logging.getLogger(__name__)
 
 class ProductAnalyticsProcessor(BaseProcessor):
     """产品分析数据处理器"""
     
+    # 模型在抓取/字典还原时已通过 is_valid 过滤，且同产品多条记录由聚合阶段合并，
+    # 预处理只需逐条清洗，无需排序
+    preprocess_stages = ('clean',)
+    
     def __init__(self):
         """初始化产品分析数据处理器"""
         super().__init__('product_analytics')
         self.table_name = 'product_analytics'
         self.update_history_days = 7  # 更新前7天的历史数据
+        self.parallel_decoder = ParallelDecoder(workers=self.parallel_workers)
         logger.info("产品分析数据处理器初始化完成")
     
     def process(self, raw_data: List[Dict[str, Any]], data_date: Optional[str] = None) -> Dict[str, Any]:
-        """处理抓取到的原始产品分析数据，并返回用于库存合并的标准结构
+        """处理抓取到的原始产品分析数据，并返回用于库存合并的标准结构（字典接口）
 
         Args:
-            raw_data: 抓取器返回的字典数据列表（由 ProductAnalytics.to_dict() 生成）
+            raw_data: 抓取器返回的字典数据列表（由 ProductAnalytics.to_dict() 生成），
+                      也可直接包含 ProductAnalytics 对象
             data_date: 可选的数据日期（YYYY-MM-DD），用于记录
 
         Returns:
             { status, processed_count, processed_data, errors }
         """
+        model_list: List[ProductAnalytics] = []
+        for item in raw_data or []:
+            try:
+                model = item if isinstance(item, ProductAnalytics) else self._dict_to_model(item)
+                if model is not None and model.is_valid():
+                    model_list.append(model)
+            except Exception as ex:
+                logger.warning(f"字典转换模型失败: {ex}")
+                continue
+
+        return self.process_models(model_list, data_date)
+
+    def shutdown(self) -> None:
+        """关闭并行解码进程池（常驻服务和脚本退出时调用；之后再并行解码会重新创建）"""
+        self.parallel_decoder.shutdown()
+
+    def process_raw(self, rows: List[Dict[str, Any]], data_date: str) -> Dict[str, Any]:
+        """处理API原始记录：解码 → 清洗 → 转换 → 入库
+
+        数据量达到 sync.parallel_min_rows 且开启 sync.parallel_decode 时，
+        解码和清洗在进程池中按切片并行执行（decode 阶段包含清洗耗时），否则串行处理。
+
+        Args:
+            rows: 抓取器返回的原始API记录
+            data_date: 数据日期（YYYY-MM-DD）
+
+        Returns:
+            与 process_models 相同的结构
+        """
+        models, precleaned = self._decode_raw(rows, data_date)
+        return self.process_models(models, data_date, precleaned=precleaned)
+
+    def prepare_raw(self, rows: List[Dict[str, Any]], data_date: str) -> List[ProductAnalytics]:
+        """解码 → 清洗 → 聚合API原始记录，不入库（对账时使用，结果与同步入库的数据一致）"""
+        models, precleaned = self._decode_raw(rows, data_date)
+        cleaned = models if precleaned else self._run_preprocess(models)[0]
+        return self._transform_data(cleaned)
+
+    def load_merge_data(self, data_date: str) -> List[Dict[str, Any]]:
+        """读取已入库的当天产品分析数据，转换为库存合并需要的字典结构"""
+        rows = db_manager.execute_query(
+            f"SELECT * FROM {self.table_name} WHERE data_date = %s", (data_date,)
+        ) or []
+        models = [self._dict_to_model(row) for row in rows]
+        return self.to_merge_data([m for m in models if m is not None and m.is_valid()])
+
+    def resync(self, models: List[ProductAnalytics], partitions=()) -> Dict[str, Any]:
+        """对账后重新同步不一致的 (日期, 站点, 店铺) 分区：写入赛狐的最新记录，再删除分区内赛狐已不存在的记录
+
+        models 为这些分区在赛狐的全部记录；分区在赛狐已不存在时该分区的本地数据全部删除。
+        写入和删除都会标记受影响的ASIN，随后的增量合并只重算这些ASIN。
+
+        Raises:
+            Exception: 写入或删除失败（调用方不得保存这些分区的校验和）
+        """
+        persist_result = self._persist_data(models)
+        if persist_result['errors']:
+            raise Exception(f"重新同步失败: {persist_result['errors']}")
+        keep_keys = [(m.data_date, m.asin, m.sku) for m in models]
+        return {
+            'saved_count': persist_result['success'],
+            'deleted_asin_count': db_manager.delete_product_analytics_partitions(partitions, keep_keys),
+        }
+
+    def to_merge_data(self, models: List[ProductAnalytics]) -> List[Dict[str, Any]]:
+        """将模型列表转换为库存合并需要的字典结构（每条均为新建字典）"""
+        return [self._to_merge_dict(m) for m in models]
+
+    def _decode_raw(self, rows: List[Dict[str, Any]], data_date: str) -> Tuple[List[ProductAnalytics], bool]:
+        """解码原始记录（达到阈值时在进程池中并行解码并清洗，失败回退串行）
+
+        Returns:
+            (模型列表, 是否已完成清洗)
+        """
+        target_date = datetime.strptime(data_date, '%Y-%m-%d').date()
+        rows = rows or []
+
+        with stage('decode') as decode_stage:
+            decoded = None
+            if self.parallel_decoder.should_parallelize(len(rows)):
+                decoded = self.parallel_decoder.decode_and_clean(rows, target_date)
+            if decoded is not None:
+                models, decode_stage.bytes = decoded
+            else:
+                models = []
+                for item in rows:
+                    try:
+                        analytics = ProductAnalytics.from_api_response(item, target_date)
+                        if analytics.is_valid():
+                            models.append(analytics)
+                    except Exception as ex:
+                        logger.warning(f"转换产品分析数据失败: {ex}")
+            decode_stage.rows = len(models)
+
+        return models, decoded is not None
+
+    def process_models(self, models: List[ProductAnalytics], data_date: Optional[str] = None,
+                       precleaned: bool = False) -> Dict[str, Any]:
+        """直接处理抓取器产出的模型对象，省去 字典 -> 模型 的重复解析
+
+        Args:
+            models: ProductAnalytics 列表（由调用方独占，处理过程中可能被原地清洗）
+            data_date: 可选的数据日期（YYYY-MM-DD），用于记录
+            precleaned: 模型是否已完成清洗（并行解码路径），为True时跳过预处理
+
+        Returns:
+            { status, processed_count, processed_data, errors }，processed_data 为合并用字典，
+            每条字典均为新建对象，下游可直接原地修改
+        """
         try:
-            # 1) 字典 -> 模型对象
-            model_list: List[ProductAnalytics] = []
-            for item in raw_data or []:
-                try:
-                    model = self._dict_to_model(item)
-                    if model is not None and model.is_valid():
-                        model_list.append(model)
-                except Exception as ex:
-                    logger.warning(f"字典转换模型失败: {ex}")
-                    continue
-
-            # 2) 走标准处理流水线（预处理/验证/清洗/转换/入库）
-            processed = self._preprocess_data(model_list)
-            if self.enable_validation:
-                validated, validation_errors = self._validate_data(processed)
+            if precleaned:
+                cleaned, validation_errors = models or [], []
             else:
-                validated, validation_errors = processed, []
-            cleaned = self._clean_data(validated)
-            transformed = self._transform_data(cleaned)
+                with stage('clean') as clean_stage:
+                    # 走标准处理流水线（单次遍历预处理/清洗 → 转换 → 入库）
+                    cleaned, validation_errors = self._run_preprocess(models or [])
+                    clean_stage.rows = len(cleaned)
+
+            with stage('aggregate') as aggregate_stage:
+                transformed = self._transform_data(cleaned)
+                aggregate_stage.rows = len(transformed)
 
-            persist_result = self._persist_data(transformed)
+            with stage('persist') as persist_stage:
+                persist_result = self._persist_data(transformed)
+                persist_stage.rows = len(transformed)
 
-            # 3) 构造用于库存合并的字典数据
-            merge_ready: List[Dict[str, Any]] = [self._to_merge_dict(m) for m in transformed]
+            # 入库成功后记录分区校验和，供与赛狐对账时定位不一致的店铺
+            if transformed and not persist_result.get('errors'):
+                checksum_service.record(transformed)
+
+            # 构造用于库存合并的字典数据（每行只序列化这一次）
+            merge_ready: List[Dict[str, Any]] = self.to_merge_data(transformed)
 
             errors = validation_errors + persist_result.get('errors', [])
             return {
@@ -211,6 +328,10 @@ class ProductAnalyticsProcessor(BaseProcessor):
         logger.info(f"数据清洗完成: {len(cleaned_data)}/{len(data_list)} 条数据通过清洗")
         return cleaned_data
     
+    def _clean_item(self, item: ProductAnalytics) -> Optional[ProductAnalytics]:
+        """融合预处理中的逐条清洗"""
+        return self._clean_single_item(item)
+    
     def _clean_single_item(self, item: ProductAnalytics) -> ProductAnalytics:
         """清洗单条产品分析数据"""
         # 确保必要字段不为空
@@ -264,105 +385,15 @@ class ProductAnalyticsProcessor(BaseProcessor):
             logger.warning(f"计算衍生指标失败: {e}")
     
     def _transform_data(self, data_list: List[ProductAnalytics]) -> List[ProductAnalytics]:
-        """转换产品分析数据"""
-        # 按日期分组处理
-        daily_data = {}
-        for item in data_list:
-            date_key = item.data_date
-            if date_key not in daily_data:
-                daily_data[date_key] = []
-            daily_data[date_key].append(item)
-        
-        transformed_data = []
-        
-        for data_date, items in daily_data.items():
-            try:
-                # 对同一天的数据进行聚合处理
-                aggregated_items = self._aggregate_daily_data(items, data_date)
-                transformed_data.extend(aggregated_items)
-            except Exception as e:
-                logger.error(f"转换日期 {data_date} 的数据失败: {e}")
-                continue
+        """转换产品分析数据（按 日期+产品 单次遍历聚合）"""
+        transformed_data = aggregate_daily(data_list)
         
         logger.info(f"数据转换完成: {len(transformed_data)} 条数据")
         return transformed_data
     
-    def _aggregate_daily_data(self, items: List[ProductAnalytics], data_date: date) -> List[ProductAnalytics]:
-        """聚合同一天的数据"""
-        # 按产品ID分组
-        product_data = {}
-        
-        for item in items:
-            product_id = item.product_id
-            if product_id not in product_data:
-                product_data[product_id] = []
-            product_data[product_id].append(item)
-        
-        aggregated_items = []
-        
-        for product_id, product_items in product_data.items():
-            if len(product_items) == 1:
-                # 单条数据直接使用
-                aggregated_items.append(product_items[0])
-            else:
-                # 多条数据需要聚合
-                aggregated_item = self._merge_product_data(product_items)
-                aggregated_items.append(aggregated_item)
-        
-        return aggregated_items
-    
     def _merge_product_data(self, items: List[ProductAnalytics]) -> ProductAnalytics:
         """合并同一产品的多条数据"""
-        if len(items) == 1:
-            return items[0]
-        
-        # 使用第一条数据作为基础
-        merged_item = ProductAnalytics.from_dict(items[0].to_dict())
-        
-        # 累加数值字段
-        total_sales_amount = sum(item.sales_amount or Decimal('0.00') for item in items)
-        total_sales_quantity = sum(item.sales_quantity or 0 for item in items)
-        total_impressions = sum(item.impressions or 0 for item in items)
-        total_clicks = sum(item.clicks or 0 for item in items)
-        
-        merged_item.sales_amount = total_sales_amount
-        merged_item.sales_quantity = total_sales_quantity
-        merged_item.impressions = total_impressions
-        merged_item.clicks = total_clicks
-        
-        # 重新计算比例指标
-        if total_clicks > 0:
-            merged_item.conversion_rate = Decimal(str(total_sales_quantity / total_clicks)).quantize(Decimal('0.0001'))
-        
-        # 计算加权平均ACOS
-        valid_acos_items = [item for item in items if item.acos is not None and item.sales_amount and item.sales_amount > 0]
-        if valid_acos_items:
-            total_weighted_acos = sum(item.acos * item.sales_amount for item in valid_acos_items)
-            total_weight = sum(item.sales_amount for item in valid_acos_items)
-            if total_weight > 0:
-                merged_item.acos = (total_weighted_acos / total_weight).quantize(Decimal('0.0001'))
-        
-        # 合并额外指标
-        all_metrics = {}
-        for item in items:
-            item_metrics = item.get_metrics()
-            for key, value in item_metrics.items():
-                if key not in all_metrics:
-                    all_metrics[key] = []
-                all_metrics[key].append(value)
-        
-        # 处理合并后的指标
-        merged_metrics = {}
-        for key, values in all_metrics.items():
-            if isinstance(values[0], (int, float)):
-                merged_metrics[key] = sum(values)
-            else:
-                merged_metrics[key] = values[-1]  # 使用最后一个值
-        
-        merged_item.set_metrics(merged_metrics)
-        
-        logger.info(f"合并产品 {merged_item.product_id} 的 {len(items)} 条数据")
-        return merged_item
+        return merge_product_items(items)
     
     def _persist_data(self, data_list: List[ProductAnalytics]) -> Dict[str, Any]:
         """持久化产品分析数据（使用专用的批量UPSERT函数，避免自定义字段不匹配）"""
@@ -371,9 +402,12 @@ class ProductAnalyticsProcessor(BaseProcessor):
 
         try:
             saved_count = db_manager.upsert_product_analytics(data_list, None)
-            failed = max(len(data_list) - (saved_count or 0), 0)
+            if not saved_count:
+                # 批量UPSERT在数据库层捕获异常并返回0，非空批次未写入任何记录即为失败
+                raise Exception(f"批量UPSERT未写入任何记录（共 {len(data_list)} 条）")
+            failed = max(len(data_list) - saved_count, 0)
             return {
-                'success': saved_count or 0,
+                'success': saved_count,
                 'failed': failed,
                 'errors': []
             }
@@ -1,5 +1,12 @@
 # scheduler模块初始化
-from .task_scheduler import TaskScheduler
-from .sync_jobs import SyncJobs
+from ..utils.lazy import lazy_exports
 
-__all__ = ['TaskScheduler', 'SyncJobs']
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'TaskScheduler': '.task_scheduler',
+    'SyncJobs': '.sync_jobs',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['TaskScheduler', 'SyncJobs']
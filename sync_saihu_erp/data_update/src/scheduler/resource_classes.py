@@ -0,0 +1,212 @@
+"""
+调度任务资源类别
+按资源类型（API密集、数据库密集、CPU密集）划分独立执行器和并发上限，
+类别内按优先级放行等待中的任务，并为高优先级任务预留槽位，
+避免长时间回填占满执行器导致每日同步饥饿；同时统计各类别的排队深度和等待延迟
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from ..config.settings import settings
+from ..utils.instrumentation import LatencyHistogram, LATENCY_BUCKETS, METRIC_PREFIX, metrics_registry
+from ..utils.profiling import job_profiler
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_API = 'api'
+RESOURCE_DB = 'db'
+RESOURCE_CPU = 'cpu'
+
+# 数值越小优先级越高
+PRIORITY_CRITICAL = 0
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 50
+PRIORITY_LOW = 100
+
+# 各类别默认配置：并发上限、为高优先级任务预留的槽位、执行器线程数（含排队中的任务）
+DEFAULT_RESOURCE_CLASSES: Dict[str, Dict[str, int]] = {
+    RESOURCE_API: {'max_concurrency': 2, 'reserved_slots': 1, 'executor_threads': 6},
+    RESOURCE_DB: {'max_concurrency': 2, 'reserved_slots': 1, 'executor_threads': 6},
+    RESOURCE_CPU: {'max_concurrency': 1, 'reserved_slots': 0, 'executor_threads': 4},
+}
+
+
+class PriorityGate:
+    """带优先级和预留槽位的并发闸门
+
+    等待者按 (优先级, 到达顺序) 放行；普通任务最多占用 max_concurrency - reserved_slots 个槽位，
+    剩余槽位只留给 priority <= PRIORITY_HIGH 的任务。
+    """
+
+    def __init__(self, name: str, max_concurrency: int, reserved_slots: int = 0):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.reserved_slots = min(max(0, int(reserved_slots)), self.max_concurrency - 1)
+        self._condition = threading.Condition()
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self.running = 0
+        # 统计
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_latency = LatencyHistogram()
+        self.run_latency = LatencyHistogram()
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队任务数"""
+        return len(self._waiting)
+
+    def _limit_for(self, priority: int) -> int:
+        """该优先级可占用的槽位数"""
+        if priority <= PRIORITY_HIGH:
+            return self.max_concurrency
+        return self.max_concurrency - self.reserved_slots
+
+    def _can_enter(self, entry: tuple) -> bool:
+        """队首且有可用槽位时放行；队首被预留槽位阻塞时，允许后面的高优先级任务先行"""
+        priority = entry[0]
+        if self.running >= self._limit_for(priority):
+            return False
+        if self._waiting[0] is entry:
+            return True
+        head_priority = self._waiting[0][0]
+        return self.running >= self._limit_for(head_priority) and priority <= PRIORITY_HIGH
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL) -> Iterator[float]:
+        """占用一个槽位，产出排队等待秒数"""
+        entry = (priority, next(self._sequence))
+        queued_at = time.perf_counter()
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+            while not self._can_enter(entry):
+                self._condition.wait()
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+            self.running += 1
+            waited = time.perf_counter() - queued_at
+            self.wait_latency.observe(waited)
+            # 可能还有空闲槽位，唤醒后续等待者
+            self._condition.notify_all()
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield waited
+            ok = True
+        finally:
+            with self._condition:
+                self.running -= 1
+                self.run_latency.observe(time.perf_counter() - started, ok)
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                self._condition.notify_all()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        with self._condition:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'reserved_slots': self.reserved_slots,
+                'running': self.running,
+                'queue_depth': len(self._waiting),
+                'max_queue_depth': self.max_queue_depth,
+                'completed': self.completed,
+                'failed': self.failed,
+                'wait_latency': self.wait_latency.to_dict(),
+                'run_latency': self.run_latency.to_dict()
+            }
+
+
+class ResourceClassRegistry:
+    """资源类别注册表（配置取自 scheduler.resource_classes）"""
+
+    def __init__(self, config: Optional[Dict[str, Dict[str, int]]] = None):
+        if config is None:
+            config = settings.get('scheduler.resource_classes', None) or {}
+        self.config: Dict[str, Dict[str, int]] = {}
+        for name, defaults in DEFAULT_RESOURCE_CLASSES.items():
+            self.config[name] = {**defaults, **(config.get(name) or {})}
+        for name, overrides in config.items():
+            if name not in self.config:
+                self.config[name] = {**DEFAULT_RESOURCE_CLASSES[RESOURCE_API], **(overrides or {})}
+        self.gates: Dict[str, PriorityGate] = {
+            name: PriorityGate(name, cfg['max_concurrency'], cfg['reserved_slots'])
+            for name, cfg in self.config.items()
+        }
+
+    def gate(self, resource_class: str) -> PriorityGate:
+        """获取资源类别闸门"""
+        try:
+            return self.gates[resource_class]
+        except KeyError:
+            raise ValueError(f"未知的资源类别: {resource_class}")
+
+    def executor_threads(self, resource_class: str) -> int:
+        """执行器线程数（至少为并发上限，多出的线程用于在闸门前按优先级排队）"""
+        cfg = self.config[resource_class]
+        return max(cfg['executor_threads'], cfg['max_concurrency'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """各类别运行统计"""
+        return {name: gate.to_dict() for name, gate in self.gates.items()}
+
+    def to_prometheus(self) -> List[str]:
+        """Prometheus 文本行"""
+        p = METRIC_PREFIX
+        lines: List[str] = []
+        gauges = (
+            ('resource_running', 'running', 'Jobs running per resource class.'),
+            ('resource_queue_depth', 'queue_depth', 'Jobs waiting per resource class.'),
+            ('resource_max_queue_depth', 'max_queue_depth', 'Peak queue depth per resource class.'),
+        )
+        for metric, attr, help_text in gauges:
+            lines.append(f'# HELP {p}_{metric} {help_text}')
+            lines.append(f'# TYPE {p}_{metric} gauge')
+            for name, gate in sorted(self.gates.items()):
+                lines.append(f'{p}_{metric}{{resource_class="{name}"}} {getattr(gate, attr)}')
+
+        lines.append(f'# HELP {p}_resource_wait_seconds Queue wait before a job starts.')
+        lines.append(f'# TYPE {p}_resource_wait_seconds histogram')
+        for name, gate in sorted(self.gates.items()):
+            histogram = gate.wait_latency
+            cumulative = 0
+            for bound, value in zip(list(LATENCY_BUCKETS) + ['+Inf'], histogram.bucket_counts):
+                cumulative += value
+                lines.append(f'{p}_resource_wait_seconds_bucket{{resource_class="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_resource_wait_seconds_sum{{resource_class="{name}"}} {round(histogram.total, 6)}')
+            lines.append(f'{p}_resource_wait_seconds_count{{resource_class="{name}"}} {histogram.count}')
+        return lines
+
+
+# 全局资源类别注册表（首次使用时读取配置），并入 Prometheus 导出
+resource_classes = LazyObject(ResourceClassRegistry)
+metrics_registry.register_collector(lambda: resource_classes.to_prometheus())
+
+
+def run_in_resource_class(target: Any, resource_class: str, priority: int, job_name: str, *args, **kwargs) -> Any:
+    """调度器任务入口：在资源类别闸门内执行 target（'module:function' 文本引用或可调用对象）"""
+    if isinstance(target, str):
+        from apscheduler.util import ref_to_obj
+        target = ref_to_obj(target)
+
+    gate = resource_classes.gate(resource_class)
+    with gate.slot(priority) as waited:
+        if waited >= 1:
+            logger.info(f"任务 {job_name} 在资源类别 {resource_class} 排队 {waited:.1f}s 后开始执行")
+
+        if job_profiler.enabled:
+            with job_profiler.profile(job_name):
+                return target(*args, **kwargs)
+        return target(*args, **kwargs)
@@ -0,0 +1,402 @@
+"""
+事件驱动的常驻同步服务
+每个数据集按各自的节奏调度；先用首页指纹和分页总数做低成本变更探测，
+只有数据发生变化（或超过最长陈旧时间）时才全量拉取，并提供本地健康检查/状态接口
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config.settings import settings
+from .resource_classes import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, RESOURCE_API
+
+logger = logging.getLogger(__name__)
+
+# 调度器作业以文本引用指向该入口，持久化作业存储也可序列化
+DATASET_JOB_REF = 'src.scheduler.sync_daemon:run_daemon_dataset'
+
+
+def page_fingerprint(result: Optional[Dict[str, Any]], params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """计算分页接口首页的指纹（请求参数 + 总页数/总条数 + 首页数据），接口失败返回None"""
+    if not result:
+        return None
+    payload = {
+        'params': params or {},
+        'totalPage': result.get('totalPage'),
+        'totalSize': result.get('totalSize'),
+        'rows': result.get('rows', [])
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+@dataclass
+class DatasetSpec:
+    """数据集调度配置
+
+    probe 返回当前指纹（None 表示探测失败，按有变化处理）；probe 为空时每次都全量拉取。
+    同一 exclusive_group 的数据集写入相同的表，串行执行。
+    """
+    name: str
+    sync: Callable[[], Any]
+    probe: Optional[Callable[[], Optional[str]]] = None
+    interval_minutes: int = 30
+    max_staleness_minutes: int = 240
+    exclusive_group: Optional[str] = None
+    is_success: Callable[[Any], bool] = bool
+    resource_class: Optional[str] = RESOURCE_API
+    priority: int = PRIORITY_NORMAL
+
+
+@dataclass
+class DatasetState:
+    """数据集运行状态"""
+    name: str
+    fingerprint: Optional[str] = None
+    last_probe_at: Optional[str] = None
+    last_sync_at: Optional[str] = None
+    last_sync_ok: Optional[bool] = None
+    last_error: Optional[str] = None
+    probes: int = 0
+    syncs: int = 0
+    skipped: int = 0
+    running: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'name': self.name,
+            'fingerprint': self.fingerprint,
+            'last_probe_at': self.last_probe_at,
+            'last_sync_at': self.last_sync_at,
+            'last_sync_ok': self.last_sync_ok,
+            'last_error': self.last_error,
+            'probes': self.probes,
+            'syncs': self.syncs,
+            'skipped': self.skipped,
+            'running': self.running
+        }
+
+
+class SyncDaemon:
+    """常驻同步服务"""
+
+    def __init__(self, datasets: List[DatasetSpec], scheduler=None, state_file: Optional[str] = None):
+        """初始化常驻同步服务
+
+        Args:
+            datasets: 数据集配置
+            scheduler: TaskScheduler 实例（为空时在 start 时创建后台调度器）
+            state_file: 指纹/状态持久化文件（默认读取 daemon.state_file，空字符串表示不持久化）
+        """
+        self.datasets: Dict[str, DatasetSpec] = {spec.name: spec for spec in datasets}
+        self.scheduler = scheduler
+        self.state_file = state_file if state_file is not None else settings.get('daemon.state_file', '')
+        self.states: Dict[str, DatasetState] = {name: DatasetState(name) for name in self.datasets}
+        self.started_at: Optional[datetime] = None
+        self._state_lock = threading.Lock()
+        self._group_locks: Dict[str, threading.Lock] = {}
+        self._health_server: Optional[ThreadingHTTPServer] = None
+        self._load_state()
+
+    # ---- 调度 ----
+
+    def start(self, run_immediately: bool = True) -> None:
+        """注册所有数据集作业并启动调度器"""
+        global _active_daemon
+        _active_daemon = self
+
+        if self.scheduler is None:
+            from .task_scheduler import TaskScheduler
+            # 作业在每次启动时重新注册，默认使用进程内作业存储
+            self.scheduler = TaskScheduler(background_mode=True,
+                                           job_store=settings.get('daemon.job_store', 'memory'))
+
+        for spec in self.datasets.values():
+            kwargs = {'args': [spec.name], 'name': f"daemon:{spec.name}"}
+            if run_immediately:
+                kwargs['next_run_time'] = datetime.now(self.scheduler.timezone)
+            self.scheduler.add_interval_job(
+                DATASET_JOB_REF,
+                minutes=spec.interval_minutes,
+                job_id=f"daemon_{spec.name}",
+                resource_class=spec.resource_class,
+                priority=spec.priority,
+                **kwargs
+            )
+
+        self.started_at = datetime.now()
+        self.scheduler.start()
+        logger.info(f"常驻同步服务已启动: {', '.join(self.datasets)}")
+
+    def stop(self) -> None:
+        """停止调度器和健康检查接口"""
+        if self._health_server is not None:
+            self._health_server.shutdown()
+            self._health_server.server_close()
+            self._health_server = None
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=True)
+        # 作业已全部结束，回收请求对冲线程
+        from ..auth.request_hedger import request_hedger
+        if request_hedger.is_resolved:
+            request_hedger.shutdown()
+        self._save_state()
+        logger.info("常驻同步服务已停止")
+
+    def run_dataset(self, name: str, force: bool = False) -> Dict[str, Any]:
+        """执行一次数据集调度：探测变更，必要时全量拉取"""
+        spec = self.datasets[name]
+        state = self.states[name]
+
+        lock = self._group_lock(spec.exclusive_group or spec.name)
+        with lock:
+            fingerprint = None
+            if spec.probe is not None and not force:
+                fingerprint = self._probe(spec, state)
+                if fingerprint is not None and fingerprint == state.fingerprint and not self._is_stale(spec, state):
+                    with self._state_lock:
+                        state.skipped += 1
+                    logger.info(f"数据集 {name} 无变化，跳过全量拉取")
+                    return {'dataset': name, 'action': 'skipped'}
+
+            return self._sync(spec, state, fingerprint)
+
+    def _probe(self, spec: DatasetSpec, state: DatasetState) -> Optional[str]:
+        """执行变更探测，失败时返回None"""
+        try:
+            fingerprint = spec.probe()
+        except Exception as e:
+            logger.warning(f"数据集 {spec.name} 变更探测失败: {e}")
+            fingerprint = None
+        with self._state_lock:
+            state.probes += 1
+            state.last_probe_at = datetime.now().isoformat()
+        return fingerprint
+
+    def _sync(self, spec: DatasetSpec, state: DatasetState, fingerprint: Optional[str]) -> Dict[str, Any]:
+        """全量拉取数据集，成功后才更新指纹"""
+        with self._state_lock:
+            state.running = True
+        logger.info(f"数据集 {spec.name} 开始全量拉取")
+
+        ok, error = False, None
+        try:
+            ok = bool(spec.is_success(spec.sync()))
+        except Exception as e:
+            error = str(e)
+            logger.error(f"数据集 {spec.name} 同步异常: {e}")
+
+        with self._state_lock:
+            state.running = False
+            state.syncs += 1
+            state.last_sync_ok = ok
+            state.last_error = error
+            if ok:
+                state.last_sync_at = datetime.now().isoformat()
+                # 探测失败或未配置探测时清空指纹，下次必然重新比较
+                state.fingerprint = fingerprint
+        self._save_state()
+
+        return {'dataset': spec.name, 'action': 'synced', 'success': ok, 'error': error}
+
+    def _is_stale(self, spec: DatasetSpec, state: DatasetState) -> bool:
+        """是否超过最长陈旧时间（从未成功同步也视为陈旧）"""
+        if not state.last_sync_at:
+            return True
+        last_sync = datetime.fromisoformat(state.last_sync_at)
+        return datetime.now() - last_sync >= timedelta(minutes=spec.max_staleness_minutes)
+
+    def _group_lock(self, group: str) -> threading.Lock:
+        """获取互斥组锁"""
+        with self._state_lock:
+            lock = self._group_locks.get(group)
+            if lock is None:
+                lock = self._group_locks[group] = threading.Lock()
+            return lock
+
+    # ---- 状态 ----
+
+    def status(self) -> Dict[str, Any]:
+        """整体运行状态"""
+        running = bool(self.scheduler is not None and self.scheduler.is_running)
+        with self._state_lock:
+            datasets = {name: state.to_dict() for name, state in self.states.items()}
+        stale = [name for name, spec in self.datasets.items() if self._is_unhealthy(spec, self.states[name])]
+        return {
+            'healthy': running and not stale,
+            'scheduler_running': running,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'stale_datasets': stale,
+            'datasets': datasets
+        }
+
+    def _is_unhealthy(self, spec: DatasetSpec, state: DatasetState) -> bool:
+        """超过两倍最长陈旧时间仍未成功同步视为不健康（启动后的首个周期除外）"""
+        if state.running:
+            return False
+        reference = state.last_sync_at or (self.started_at.isoformat() if self.started_at else None)
+        if reference is None:
+            return False
+        return datetime.now() - datetime.fromisoformat(reference) >= timedelta(minutes=spec.max_staleness_minutes * 2)
+
+    def _load_state(self) -> None:
+        """加载持久化的指纹和同步时间"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取常驻同步状态失败: {e}")
+            return
+        for name, data in saved.items():
+            state = self.states.get(name)
+            if state is not None:
+                state.fingerprint = data.get('fingerprint')
+                state.last_sync_at = data.get('last_sync_at')
+
+    def _save_state(self) -> None:
+        """原子写入指纹和同步时间"""
+        if not self.state_file:
+            return
+        with self._state_lock:
+            data = {
+                name: {'fingerprint': state.fingerprint, 'last_sync_at': state.last_sync_at}
+                for name, state in self.states.items()
+            }
+        try:
+            directory = os.path.dirname(os.path.abspath(self.state_file))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.warning(f"保存常驻同步状态失败: {e}")
+
+    # ---- 健康检查接口 ----
+
+    def serve_health(self, host: Optional[str] = None, port: Optional[int] = None) -> ThreadingHTTPServer:
+        """在后台线程启动健康检查接口：GET /health 返回健康状态，GET /status 返回详细状态"""
+        host = host or settings.get('daemon.health_host', '127.0.0.1')
+        port = int(port if port is not None else settings.get('daemon.health_port', 8765))
+        daemon = self
+
+        class HealthHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = daemon.status()
+                if self.path.rstrip('/') == '/health':
+                    body = {'status': 'ok' if status['healthy'] else 'degraded',
+                            'stale_datasets': status['stale_datasets']}
+                    code = 200 if status['healthy'] else 503
+                elif self.path.rstrip('/') == '/status':
+                    body, code = status, 200
+                else:
+                    body, code = {'error': 'not found'}, 404
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(f"健康检查请求: {format % args}")
+
+        self._health_server = ThreadingHTTPServer((host, port), HealthHandler)
+        thread = threading.Thread(target=self._health_server.serve_forever, name='sync-daemon-health', daemon=True)
+        thread.start()
+        logger.info(f"健康检查接口已启动: http://{host}:{self._health_server.server_port}/health")
+        return self._health_server
+
+
+_active_daemon: Optional[SyncDaemon] = None
+
+
+def run_daemon_dataset(name: str) -> Dict[str, Any]:
+    """调度器作业入口"""
+    if _active_daemon is None:
+        raise RuntimeError("常驻同步服务未启动")
+    return _active_daemon.run_dataset(name)
+
+
+def build_default_datasets(sync_jobs=None) -> List[DatasetSpec]:
+    """默认数据集：FBA库存、库存明细、昨日产品分析、前7天产品分析
+
+    Args:
+        sync_jobs: 产品分析数据集使用的 SyncJobs（由调用方在退出时 close），为空时新建
+    """
+    from ..auth.saihu_api_client import saihu_api_client as client
+    from ..services.data_sync_service import data_sync_service
+    from .sync_jobs import SyncJobs
+
+    sync_jobs = sync_jobs or SyncJobs()
+    probe_size = int(settings.get('daemon.probe_page_size', 20))
+    cadence = settings.get('daemon.datasets', {}) or {}
+
+    def minutes(name: str, key: str, default: int) -> int:
+        return int((cadence.get(name) or {}).get(key, default))
+
+    def probe_fba() -> Optional[str]:
+        params = {'hide_zero': True}
+        return page_fingerprint(client.fetch_fba_inventory(page_no=1, page_size=probe_size, **params), params)
+
+    def probe_warehouse() -> Optional[str]:
+        params = {'is_hidden': True}
+        return page_fingerprint(client.fetch_warehouse_inventory(page_no=1, page_size=probe_size, **params), params)
+
+    def probe_analytics(days: int) -> Callable[[], Optional[str]]:
+        def probe() -> Optional[str]:
+            end_date = date.today() - timedelta(days=1)
+            params = {
+                'start_date': (end_date - timedelta(days=days - 1)).strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d')
+            }
+            return page_fingerprint(client.fetch_product_analytics(page_no=1, page_size=probe_size, **params), params)
+        return probe
+
+    return [
+        DatasetSpec(
+            name='fba_inventory',
+            sync=data_sync_service.sync_fba_inventory_today,
+            probe=probe_fba,
+            interval_minutes=minutes('fba_inventory', 'interval_minutes', 30),
+            max_staleness_minutes=minutes('fba_inventory', 'max_staleness_minutes', 240),
+            priority=PRIORITY_HIGH
+        ),
+        DatasetSpec(
+            name='warehouse_inventory',
+            sync=data_sync_service.sync_warehouse_inventory_today,
+            probe=probe_warehouse,
+            interval_minutes=minutes('warehouse_inventory', 'interval_minutes', 30),
+            max_staleness_minutes=minutes('warehouse_inventory', 'max_staleness_minutes', 240),
+            priority=PRIORITY_HIGH
+        ),
+        DatasetSpec(
+            name='product_analytics_yesterday',
+            sync=sync_jobs.sync_product_analytics_yesterday,
+            probe=probe_analytics(1),
+            interval_minutes=minutes('product_analytics_yesterday', 'interval_minutes', 60),
+            max_staleness_minutes=minutes('product_analytics_yesterday', 'max_staleness_minutes', 240),
+            exclusive_group='product_analytics',
+            is_success=lambda r: r.get('status') == 'success',
+            priority=PRIORITY_HIGH
+        ),
+        DatasetSpec(
+            name='product_analytics_7days',
+            sync=lambda: sync_jobs.sync_product_analytics_history(days=7),
+            probe=probe_analytics(7),
+            interval_minutes=minutes('product_analytics_7days', 'interval_minutes', 240),
+            max_staleness_minutes=minutes('product_analytics_7days', 'max_staleness_minutes', 1440),
+            exclusive_group='product_analytics',
+            is_success=lambda r: r.get('status') == 'completed',
+            priority=PRIORITY_LOW
+        ),
+    ]
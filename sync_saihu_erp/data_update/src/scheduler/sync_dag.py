@@ -0,0 +1,198 @@
+"""
+同步任务依赖图编排
+互不依赖的同步任务并发执行，只在真实依赖处等待；
+结束后输出每个任务的起止时间和关键路径，一轮同步的耗时约等于最长分支
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+STATUS_ERROR = 'error'
+STATUS_SKIPPED = 'skipped'
+
+
+@dataclass
+class DagTask:
+    """依赖图中的一个同步任务"""
+    name: str
+    func: Callable[[], Any]
+    depends_on: Tuple[str, ...] = ()
+    requires_success: bool = False
+    is_success: Callable[[Any], bool] = bool
+
+
+@dataclass
+class TaskOutcome:
+    """任务执行结果（时间为相对本轮开始的秒数）"""
+    name: str
+    status: str = STATUS_SKIPPED
+    result: Any = None
+    error: Optional[str] = None
+    started: float = 0.0
+    finished: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        """任务耗时"""
+        return self.finished - self.started
+
+    @property
+    def succeeded(self) -> bool:
+        """是否成功"""
+        return self.status == STATUS_SUCCESS
+
+
+@dataclass
+class DagRunReport:
+    """一轮编排的执行报告"""
+    name: str
+    outcomes: Dict[str, TaskOutcome] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+    critical_path: List[str] = field(default_factory=list)
+
+    @property
+    def serial_seconds(self) -> float:
+        """各任务耗时之和（即串行执行所需时间）"""
+        return sum(outcome.duration for outcome in self.outcomes.values())
+
+    def results(self) -> Dict[str, bool]:
+        """各任务是否成功"""
+        return {name: outcome.succeeded for name, outcome in self.outcomes.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'name': self.name,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'serial_seconds': round(self.serial_seconds, 3),
+            'critical_path': self.critical_path,
+            'tasks': {
+                name: {
+                    'status': outcome.status,
+                    'started': round(outcome.started, 3),
+                    'finished': round(outcome.finished, 3),
+                    'duration': round(outcome.duration, 3),
+                    'error': outcome.error
+                }
+                for name, outcome in self.outcomes.items()
+            }
+        }
+
+    def format_critical_path(self) -> str:
+        """关键路径的可读文本"""
+        return ' -> '.join(
+            f"{name}({self.outcomes[name].duration:.1f}s)" for name in self.critical_path
+        ) or '无'
+
+
+class SyncDag:
+    """同步任务依赖图
+
+    依赖必须先于任务添加，因此图天然无环。依赖默认只约束执行顺序；
+    requires_success=True 的任务在任一依赖未成功时跳过（并向下游传递）。
+    """
+
+    def __init__(self, name: str = 'sync', max_workers: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self._tasks: Dict[str, DagTask] = {}
+
+    def add(self, name: str, func: Callable[[], Any], depends_on: Tuple[str, ...] = (),
+            requires_success: bool = False, is_success: Optional[Callable[[Any], bool]] = None) -> 'SyncDag':
+        """添加任务"""
+        if name in self._tasks:
+            raise ValueError(f"重复的同步任务: {name}")
+        missing = [dep for dep in depends_on if dep not in self._tasks]
+        if missing:
+            raise ValueError(f"同步任务 {name} 的依赖尚未添加: {missing}")
+
+        self._tasks[name] = DagTask(
+            name=name,
+            func=func,
+            depends_on=tuple(depends_on),
+            requires_success=requires_success,
+            is_success=is_success or bool
+        )
+        return self
+
+    def run(self) -> DagRunReport:
+        """执行所有任务，返回执行报告"""
+        report = DagRunReport(self.name)
+        report.outcomes = {name: TaskOutcome(name) for name in self._tasks}
+        if not self._tasks:
+            return report
+
+        started = time.perf_counter()
+        pending = dict(self._tasks)
+        done: set = set()
+        running = {}
+
+        logger.info(f"开始依赖图同步 {self.name}: {len(pending)} 个任务")
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(pending),
+                                thread_name_prefix=f"dag-{self.name}") as executor:
+            while pending or running:
+                for name, task in list(pending.items()):
+                    if not all(dep in done for dep in task.depends_on):
+                        continue
+                    del pending[name]
+                    outcome = report.outcomes[name]
+                    if task.requires_success and not all(report.outcomes[dep].succeeded for dep in task.depends_on):
+                        outcome.started = outcome.finished = time.perf_counter() - started
+                        logger.warning(f"依赖未成功，跳过同步任务: {name}")
+                        done.add(name)
+                        continue
+                    outcome.started = time.perf_counter() - started
+                    running[executor.submit(task.func)] = name
+
+                if not running:
+                    # 本轮只有被跳过的任务，继续检查其下游
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    self._record(report.outcomes[name], self._tasks[name], future, time.perf_counter() - started)
+                    done.add(name)
+
+        report.wall_seconds = time.perf_counter() - started
+        report.critical_path = self._critical_path(report)
+        logger.info(
+            f"依赖图同步 {self.name} 完成: 耗时 {report.wall_seconds:.1f}s"
+            f"（串行需 {report.serial_seconds:.1f}s），关键路径: {report.format_critical_path()}"
+        )
+        return report
+
+    @staticmethod
+    def _record(outcome: TaskOutcome, task: DagTask, future, finished_at: float) -> None:
+        """记录任务结果"""
+        outcome.finished = finished_at
+        try:
+            outcome.result = future.result()
+            outcome.status = STATUS_SUCCESS if task.is_success(outcome.result) else STATUS_FAILED
+        except Exception as e:
+            logger.error(f"同步任务 {task.name} 异常: {e}")
+            outcome.status = STATUS_ERROR
+            outcome.error = str(e)
+        logger.info(f"同步任务 {task.name} 结束: {outcome.status}, 耗时 {outcome.duration:.1f}s")
+
+    def _critical_path(self, report: DagRunReport) -> List[str]:
+        """从最晚结束的任务沿最晚结束的依赖回溯出关键路径"""
+        executed = [o for o in report.outcomes.values() if o.status != STATUS_SKIPPED]
+        if not executed:
+            return []
+
+        path = []
+        current = max(executed, key=lambda o: o.finished).name
+        while current is not None:
+            path.append(current)
+            deps = [report.outcomes[dep] for dep in self._tasks[current].depends_on]
+            deps = [o for o in deps if o.status != STATUS_SKIPPED]
+            current = max(deps, key=lambda o: o.finished).name if deps else None
+        path.reverse()
+        return path
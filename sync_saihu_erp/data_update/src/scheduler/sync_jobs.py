@@ -4,18 +4,69 @@
 包含所有定时任务的具体实现，集成库存点合并逻辑
 """
 
+import importlib.util
+import json
 import logging
+import os
 from datetime import datetime, date, timedelta
+from functools import lru_cache
+from pathlib import Path
 from typing import Dict, Any, List
 
 from ..scrapers import ProductAnalyticsScraper, FbaInventoryScraper, InventoryDetailsScraper
 from ..processors import ProductAnalyticsProcessor, InventoryMergeProcessor
 from ..models import SyncTaskLog
 from ..database import db_manager
+from ..database.schema_registry import TableSchema, schema_registry
+from ..config.settings import settings
+from ..services.checksum_service import checksum_service
 from ..utils.logging_utils import get_logger
+from ..utils.instrumentation import track_run, current_run, metrics_registry
+from ..utils.profiling import profiled
 
 logger = get_logger(__name__)
 
+# 项目根目录（data_update）；库存点快照生成脚本默认位于其上两级的仓库根目录
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_INVENTORY_DEALS_SCRIPT = PROJECT_ROOT.parents[1] / 'generate_inventory_deals_full.py'
+
+# 同步任务日志表结构（stage_metrics 保存每个阶段的耗时/行数/字节数及API延迟直方图）
+SYNC_TASK_LOG_SCHEMA = schema_registry.register(TableSchema(
+    name='sync_task_log',
+    columns={
+        'id': 'SERIAL PRIMARY KEY',
+        'task_name': 'VARCHAR(100) NOT NULL',
+        'task_type': 'VARCHAR(50) NOT NULL',
+        'status': "VARCHAR(20) DEFAULT 'pending'",
+        'start_time': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+        'end_time': 'TIMESTAMP WITH TIME ZONE',
+        'duration_seconds': 'INTEGER',
+        'records_processed': 'INTEGER DEFAULT 0',
+        'error_message': 'TEXT',
+        'api_calls_count': 'INTEGER DEFAULT 0',
+        'db_round_trips': 'INTEGER DEFAULT 0',
+        'stage_metrics': 'JSONB',
+        'created_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+    },
+    indexes={
+        'idx_sync_log_task': 'CREATE INDEX IF NOT EXISTS idx_sync_log_task ON sync_task_log(task_name)',
+        'idx_sync_log_type': 'CREATE INDEX IF NOT EXISTS idx_sync_log_type ON sync_task_log(task_type)',
+        'idx_sync_log_status': 'CREATE INDEX IF NOT EXISTS idx_sync_log_status ON sync_task_log(status)',
+        'idx_sync_log_time': 'CREATE INDEX IF NOT EXISTS idx_sync_log_time ON sync_task_log(start_time, end_time)',
+    }
+))
+
+
+@lru_cache(maxsize=None)
+def _load_script_module(path: str):
+    """按路径加载脚本模块，同一路径只执行一次"""
+    spec = importlib.util.spec_from_file_location('generate_inventory_deals_full', path)
+    if spec is None or spec.loader is None:
+        raise Exception(f"无法加载库存点快照生成脚本: {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
 
 class SyncJobs:
     """同步任务作业类"""
@@ -35,28 +86,43 @@ class SyncJobs:
         self.fba_inventory_scraper = FbaInventoryScraper(saihu_api_client)
         self.inventory_details_scraper = InventoryDetailsScraper(saihu_api_client)
     
+    def close(self) -> None:
+        """释放同步作业持有的资源（并行解码进程池）"""
+        self.product_analytics_processor.shutdown()
+    
     def update_api_templates(self, api_templates: Dict[str, Any]):
         """更新API模板配置"""
         self.api_templates = api_templates
         self.logger.info(f"更新API模板配置，数量: {len(api_templates)}")
     
-    def sync_product_analytics_yesterday(self) -> Dict[str, Any]:
+    def sync_product_analytics_yesterday(self, merge: bool = True) -> Dict[str, Any]:
         """同步昨天的产品分析数据"""
         yesterday = (date.today() - timedelta(days=1)).strftime('%Y-%m-%d')
-        return self.sync_product_analytics_by_date(yesterday)
+        return self.sync_product_analytics_by_date(yesterday, merge=merge)
     
-    def sync_product_analytics_by_date(self, data_date: str) -> Dict[str, Any]:
+    @profiled('product_analytics')
+    def sync_product_analytics_by_date(self, data_date: str, merge: bool = True) -> Dict[str, Any]:
         """
         同步指定日期的产品分析数据并执行库存点合并
         
         Args:
             data_date: 数据日期，格式YYYY-MM-DD
+            merge: 是否立即执行库存点合并（由依赖图统一合并时传 False）
             
         Returns:
             同步结果
         """
         task_id = f"product_analytics_{data_date}_{int(datetime.now().timestamp())}"
         
+        with track_run(task_id, 'product_analytics') as run:
+            result = self._sync_product_analytics(task_id, data_date, merge)
+        
+        result['stage_metrics'] = run.to_dict()
+        self._export_metrics()
+        return result
+    
+    def _sync_product_analytics(self, task_id: str, data_date: str, merge: bool = True) -> Dict[str, Any]:
+        """执行单日产品分析同步（抓取 → 处理 → 合并 → 持久化），各阶段由埋点计时"""
         try:
             self.logger.info(f"开始同步产品分析数据: {data_date}")
             
@@ -64,16 +130,17 @@ class SyncJobs:
             self._log_task_start(task_id, 'product_analytics', data_date)
             
             # 第一步：抓取产品分析数据
-            scrape_result = self.product_analytics_scraper.scrape_by_date(data_date)
+            # 原始记录直接交给处理器解码（大数据量时可在进程池中并行解码/清洗）
+            scrape_result = self.product_analytics_scraper.scrape_raw_by_date(data_date)
             
             if scrape_result.get('status') != 'success':
                 raise Exception(f"数据抓取失败: {scrape_result.get('error', 'Unknown error')}")
             
-            raw_data = scrape_result.get('data', [])
-            self.logger.info(f"抓取到原始数据: {len(raw_data)} 条")
+            raw_rows = scrape_result.get('rows', [])
+            self.logger.info(f"抓取到原始数据: {len(raw_rows)} 条")
             
             # 第二步：基础数据处理
-            process_result = self.product_analytics_processor.process(raw_data)
+            process_result = self.product_analytics_processor.process_raw(raw_rows, data_date)
             
             if process_result.get('status') != 'success':
                 raise Exception(f"数据处理失败: {process_result.get('error', 'Unknown error')}")
@@ -81,20 +148,36 @@ class SyncJobs:
             processed_data = process_result.get('processed_data', [])
             self.logger.info(f"处理后数据: {len(processed_data)} 条")
             
+            if not merge:
+                result = {
+                    'status': 'success',
+                    'task_id': task_id,
+                    'data_date': data_date,
+                    'raw_count': len(raw_rows),
+                    'processed_count': len(processed_data),
+                    'merge_deferred': True,
+                    'execution_time': datetime.utcnow().isoformat()
+                }
+                self._log_task_success(task_id, result)
+                self.logger.info(f"产品分析数据同步完成（库存点合并延后执行）: {result}")
+                return result
+            
             # 第三步：执行库存点合并
-            merge_result = self.inventory_merge_processor.process(processed_data, data_date)
+            # processed_data 为处理器新建的字典，合并时可原地标准化
+            merge_result = self.inventory_merge_processor.process(processed_data, data_date, copy_input=False)
             
             if merge_result.get('status') != 'success':
                 raise Exception(f"库存合并失败: {merge_result.get('error', 'Unknown error')}")
             
-            # 第四步：生成合并统计
-            merge_summary = self.inventory_merge_processor.get_merge_summary(data_date)
+            # 第四步：生成合并统计（合并结果已携带汇总时不再查询数据库）
+            merge_summary = merge_result.get('merge_summary') or \
+                self.inventory_merge_processor.get_merge_summary(data_date)
             
             result = {
                 'status': 'success',
                 'task_id': task_id,
                 'data_date': data_date,
-                'raw_count': len(raw_data),
+                'raw_count': len(raw_rows),
                 'processed_count': len(processed_data),
                 'merged_count': merge_result.get('merged_count', 0),
                 'saved_count': merge_result.get('saved_count', 0),
@@ -124,12 +207,14 @@ class SyncJobs:
             self._log_task_failure(task_id, error_result)
             return error_result
     
-    def sync_product_analytics_history(self, days: int = 30) -> Dict[str, Any]:
+    @profiled('product_analytics_history')
+    def sync_product_analytics_history(self, days: int = 30, merge: bool = True) -> Dict[str, Any]:
         """
         同步历史产品分析数据（前N天），默认30天
         
         Args:
             days: 历史天数，默认30天覆盖完整历史周期
+            merge: 是否逐日执行库存点合并（由依赖图统一合并时传 False）
             
         Returns:
             同步结果汇总
@@ -147,7 +232,7 @@ class SyncJobs:
                 sync_date = (date.today() - timedelta(days=i)).strftime('%Y-%m-%d')
                 
                 try:
-                    result = self.sync_product_analytics_by_date(sync_date)
+                    result = self.sync_product_analytics_by_date(sync_date, merge=merge)
                     results.append(result)
                     
                     if result.get('status') == 'success':
@@ -185,6 +270,91 @@ class SyncJobs:
                 'execution_time': datetime.utcnow().isoformat()
             }
     
+    @profiled('reconcile_product_analytics')
+    def reconcile_product_analytics(self, data_date: str) -> Dict[str, Any]:
+        """
+        与赛狐对账指定日期的产品分析数据：重新抓取后按 日期/站点/店铺 比较校验和，
+        只重新写入校验和不一致的店铺数据，并增量重算受影响的库存点
+        
+        Args:
+            data_date: 数据日期，格式YYYY-MM-DD
+            
+        Returns:
+            对账结果
+        """
+        task_id = f"reconcile_product_analytics_{data_date}_{int(datetime.now().timestamp())}"
+        
+        try:
+            self.logger.info(f"开始对账产品分析数据: {data_date}")
+            
+            scrape_result = self.product_analytics_scraper.scrape_raw_by_date(data_date)
+            if scrape_result.get('status') != 'success':
+                raise Exception(f"数据抓取失败: {scrape_result.get('error', 'Unknown error')}")
+            
+            processor = self.product_analytics_processor
+            fresh_models = processor.prepare_raw(scrape_result.get('rows', []), data_date)
+            reconcile_result = checksum_service.reconcile(data_date, fresh_models)
+            divergent = reconcile_result['divergent_buckets']
+            fresh_tree = reconcile_result['fresh_tree']
+            
+            resynced_count = 0
+            removed = []
+            if divergent:
+                records = list(reconcile_result['records'])
+                
+                # 只存在于已保存校验和中的店铺：整天抓取没有返回，按店铺单独重新抓取确认
+                stored_only = [bucket for bucket in divergent if bucket not in fresh_tree.leaves]
+                if stored_only:
+                    refetched_rows = self.product_analytics_scraper.fetch_raw_by_shards(
+                        data_date, [(shop_id, marketplace_id) for _, marketplace_id, shop_id in stored_only]
+                    )
+                    refetched = processor.prepare_raw(refetched_rows, data_date)
+                    for model in refetched:
+                        fresh_tree.add(model)
+                    records.extend(refetched)
+                    fresh_models = fresh_models + refetched
+                    # 单独抓取仍无数据的店铺已在赛狐删除，本地数据随之删除
+                    removed = [bucket for bucket in stored_only if bucket not in fresh_tree.leaves]
+                
+                # 不一致的分区整体替换为赛狐的记录（写入后删除赛狐已不存在的行），提交后才保存校验和；
+                # 失败时抛出异常，校验和保持不变，下次对账仍会发现这些店铺
+                resync_result = processor.resync(records, divergent)
+                resynced_count = resync_result['saved_count']
+                checksum_service.save(fresh_tree, divergent)
+                
+                # 变化和删除的ASIN已标记，增量合并只重算这些ASIN
+                merge_input = processor.to_merge_data(fresh_models)
+                merge_result = self.inventory_merge_processor.process(merge_input, data_date, copy_input=False)
+                if merge_result.get('status') != 'success':
+                    raise Exception(f"库存合并失败: {merge_result.get('error', 'Unknown error')}")
+            
+            result = {
+                'status': 'success',
+                'task_id': task_id,
+                'data_date': data_date,
+                'fresh_count': len(fresh_models),
+                'compared_nodes': reconcile_result['compared_nodes'],
+                'divergent_buckets': [list(bucket) for bucket in divergent],
+                'resynced_count': resynced_count,
+                'removed_buckets': [list(bucket) for bucket in removed],
+                'execution_time': datetime.utcnow().isoformat()
+            }
+            self.logger.info(f"产品分析对账完成: {result}")
+            return result
+            
+        except Exception as e:
+            error_msg = f"产品分析对账失败: {e}"
+            self.logger.error(error_msg)
+            
+            return {
+                'status': 'error',
+                'task_id': task_id,
+                'data_date': data_date,
+                'error': str(e),
+                'execution_time': datetime.utcnow().isoformat()
+            }
+    
+    @profiled('fba_inventory')
     def sync_fba_inventory(self) -> Dict[str, Any]:
         """同步FBA库存数据"""
         task_id = f"fba_inventory_{int(datetime.now().timestamp())}"
@@ -228,6 +398,7 @@ class SyncJobs:
             self._log_task_failure(task_id, error_result)
             return error_result
     
+    @profiled('inventory_details')
     def sync_inventory_details(self) -> Dict[str, Any]:
         """同步库存明细数据"""
         task_id = f"inventory_details_{int(datetime.now().timestamp())}"
@@ -271,6 +442,105 @@ class SyncJobs:
             self._log_task_failure(task_id, error_result)
             return error_result
     
+    @profiled('inventory_merge')
+    def merge_inventory_points(self, days: int = 1) -> Dict[str, Any]:
+        """
+        按已入库的产品分析数据重算前N天的库存点（依赖图中在产品分析同步完成后执行）
+        
+        Args:
+            days: 重算天数，从昨天往前数
+            
+        Returns:
+            合并结果汇总，merge_summary 为昨天的库存点统计
+        """
+        task_id = f"inventory_merge_{days}days_{int(datetime.now().timestamp())}"
+        results = []
+        success_count = 0
+        
+        with track_run(task_id, 'inventory_merge') as run:
+            for i in range(1, days + 1):
+                merge_date = (date.today() - timedelta(days=i)).strftime('%Y-%m-%d')
+                try:
+                    # sql 引擎直接读取 product_analytics，python 引擎先载入当天数据
+                    merge_input = [] if self.inventory_merge_processor.engine == 'sql' else \
+                        self.product_analytics_processor.load_merge_data(merge_date)
+                    result = self.inventory_merge_processor.process(merge_input, merge_date, copy_input=False)
+                except Exception as e:
+                    self.logger.warning(f"库存点合并失败，日期: {merge_date}, 错误: {e}")
+                    result = {'status': 'error', 'error': str(e)}
+                result['data_date'] = merge_date
+                results.append(result)
+                if result.get('status') != 'error':
+                    success_count += 1
+        
+        # 汇总取昨天的库存点统计（合并结果已携带汇总时不再查询数据库）
+        merge_summary = {}
+        if results and results[0].get('status') != 'error':
+            merge_summary = results[0].get('merge_summary') or \
+                self.inventory_merge_processor.get_merge_summary(results[0]['data_date'])
+        
+        summary = {
+            'status': 'success' if success_count == days else 'error',
+            'task_id': task_id,
+            'merge_days': days,
+            'success_count': success_count,
+            'failure_count': days - success_count,
+            'merge_summary': merge_summary,
+            'results': results,
+            'stage_metrics': run.to_dict(),
+            'execution_time': datetime.utcnow().isoformat()
+        }
+        self._export_metrics()
+        self.logger.info(f"库存点合并完成: 成功 {success_count}/{days}")
+        return summary
+    
+    @profiled('inventory_deals')
+    def generate_inventory_deals(self, days: int = 1) -> Dict[str, Any]:
+        """
+        生成前N天的 inventory_deals 库存点快照（依赖图中在产品分析同步完成后执行）
+        
+        快照生成器为仓库根目录的 generate_inventory_deals_full.py（路径见 sync.inventory_deals_script），
+        按区间一次扫描、滑动时间窗口生成。
+        
+        Args:
+            days: 快照天数，从昨天往前数
+            
+        Returns:
+            生成结果
+        """
+        task_id = f"inventory_deals_{days}days_{int(datetime.now().timestamp())}"
+        end_date = date.today() - timedelta(days=1)
+        start_date = end_date - timedelta(days=days - 1)
+        
+        try:
+            self.logger.info(f"开始生成库存点快照: {start_date} 到 {end_date}")
+            generator = self._load_inventory_deals_module().InventoryDealsGenerator()
+            if not generator.generate_inventory_deals_range(start_date, end_date):
+                raise Exception("库存点快照生成失败")
+            
+            return {
+                'status': 'success',
+                'task_id': task_id,
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+                'execution_time': datetime.utcnow().isoformat()
+            }
+            
+        except Exception as e:
+            self.logger.error(f"库存点快照生成失败: {e}")
+            return {
+                'status': 'error',
+                'task_id': task_id,
+                'error': str(e),
+                'execution_time': datetime.utcnow().isoformat()
+            }
+    
+    @staticmethod
+    def _load_inventory_deals_module():
+        """加载库存点快照生成脚本（sync.inventory_deals_script，默认仓库根目录下的脚本）"""
+        script = settings.get('sync.inventory_deals_script') or DEFAULT_INVENTORY_DEALS_SCRIPT
+        return _load_script_module(os.path.abspath(script))
+    
     def cleanup_old_data(self, keep_days: int = 30) -> Dict[str, Any]:
         """
         清理旧数据
@@ -384,6 +654,8 @@ class SyncJobs:
     def _log_task_start(self, task_id: str, task_type: str, data_date: str = None):
         """记录任务开始"""
         try:
+            schema_registry.ensure(SYNC_TASK_LOG_SCHEMA.name)
+            
             # 将日志写入PostgreSQL表 sync_task_log
             insert_sql = (
                 "INSERT INTO sync_task_log (task_name, task_type, status, start_time, records_processed) "
@@ -406,10 +678,10 @@ class SyncJobs:
             update_sql = (
                 "UPDATE sync_task_log "
                 "SET status = 'success', end_time = NOW(), duration_seconds = EXTRACT(EPOCH FROM (NOW() - start_time))::INT, "
-                "records_processed = %s "
+                "records_processed = %s, api_calls_count = %s, db_round_trips = %s, stage_metrics = %s "
                 "WHERE task_name = %s"
             )
-            db_manager.execute_update(update_sql, (processed, task_id))
+            db_manager.execute_update(update_sql, (processed, *self._run_metrics_params(), task_id))
         except Exception as e:
             self.logger.warning(f"任务成功日志记录失败: {e}")
     
@@ -419,9 +691,30 @@ class SyncJobs:
             update_sql = (
                 "UPDATE sync_task_log "
                 "SET status = 'failed', end_time = NOW(), duration_seconds = EXTRACT(EPOCH FROM (NOW() - start_time))::INT, "
-                "error_message = %s "
+                "error_message = %s, api_calls_count = %s, db_round_trips = %s, stage_metrics = %s "
                 "WHERE task_name = %s"
             )
-            db_manager.execute_update(update_sql, (error_result.get('error', ''), task_id))
+            db_manager.execute_update(
+                update_sql, (error_result.get('error', ''), *self._run_metrics_params(), task_id)
+            )
+        except Exception as e:
+            self.logger.warning(f"任务失败日志记录失败: {e}")
+    
+    def _run_metrics_params(self) -> tuple:
+        """当前任务的埋点数据（api_calls_count, db_round_trips, stage_metrics），未开启埋点时为空值"""
+        run = current_run()
+        if run is None:
+            return 0, 0, None
+        run.finish()
+        metrics = run.to_dict()
+        return metrics['api_calls'], metrics['db_round_trips'], json.dumps(metrics, ensure_ascii=False)
+    
+    def _export_metrics(self):
+        """按配置导出 Prometheus 文本格式指标（monitoring.prometheus_textfile）"""
+        path = settings.get('monitoring.prometheus_textfile')
+        if not path:
+            return
+        try:
+            metrics_registry.write_textfile(path)
         except Exception as e:
-            self.logger.warning(f"任务失败日志记录失败: {e}")
\ No newline at end of file
+            self.logger.warning(f"导出Prometheus指标失败: {e}")
\ No newline at end of file
@@ -3,40 +3,84 @@
 使用APScheduler管理定时同步任务
 """
 import logging
+import os
 from datetime import datetime
 from typing import Dict, Any, Optional
-from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from apscheduler.executors.pool import ThreadPoolExecutor
-from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 import pytz
-from ..config import settings, DatabaseConfig
+from ..config import DatabaseConfig
+from ..config.settings import settings
+from ..utils.profiling import job_profiler, run_profiled_job
+from .resource_classes import PRIORITY_NORMAL, resource_classes, run_in_resource_class
 
 logger = logging.getLogger(__name__)
 
+JOB_STORE_MEMORY = 'memory'
+JOB_STORE_SQLITE = 'sqlite'
+JOB_STORE_POSTGRESQL = 'postgresql'
+
 class TaskScheduler:
-    """任务调度器类"""
+    """任务调度器类
+    
+    APScheduler 实例在首次添加任务/启动时才创建；作业存储由 scheduler.job_store 选择：
+    memory（进程内，不依赖SQLAlchemy和数据库）、sqlite（本地文件）、postgresql（默认，与业务库共用）。
+    """
     
-    def __init__(self, background_mode: bool = True):
-        """初始化调度器"""
+    def __init__(self, background_mode: bool = True, job_store: Optional[str] = None):
+        """初始化调度器
+        
+        Args:
+            background_mode: 是否以后台线程运行
+            job_store: 作业存储类型，默认读取 scheduler.job_store
+        """
         self.background_mode = background_mode
-        self.scheduler = None
+        self.job_store = (job_store or settings.get('scheduler.job_store', JOB_STORE_POSTGRESQL)).lower()
+        self._scheduler = None
         self.timezone = pytz.timezone(settings.get('scheduler.timezone', 'Asia/Shanghai'))
-        self._setup_scheduler()
-        logger.info(f"任务调度器初始化完成 (模式: {'后台' if background_mode else '阻塞'})")
+        logger.info(f"任务调度器初始化完成 (模式: {'后台' if background_mode else '阻塞'}, 作业存储: {self.job_store})")
+    
+    @property
+    def scheduler(self):
+        """APScheduler 实例（懒创建）"""
+        if self._scheduler is None:
+            self._setup_scheduler()
+        return self._scheduler
+    
+    @property
+    def is_running(self) -> bool:
+        """调度器是否已启动（不会触发创建）"""
+        return self._scheduler is not None and self._scheduler.running
+    
+    def _build_jobstore(self):
+        """按配置创建作业存储，SQLAlchemy 仅在需要时导入"""
+        if self.job_store == JOB_STORE_MEMORY:
+            from apscheduler.jobstores.memory import MemoryJobStore
+            return MemoryJobStore()
+        
+        from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+        if self.job_store == JOB_STORE_SQLITE:
+            path = os.path.abspath(settings.get('scheduler.job_store_path', 'data/scheduler_jobs.sqlite'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return SQLAlchemyJobStore(url=f"sqlite:///{path}")
+        if self.job_store == JOB_STORE_POSTGRESQL:
+            return SQLAlchemyJobStore(url=DatabaseConfig.get_connection_url())
+        
+        raise ValueError(f"不支持的作业存储类型: {self.job_store}")
     
     def _setup_scheduler(self):
         """设置调度器配置"""
+        from apscheduler.executors.pool import ThreadPoolExecutor
+        
         # 配置作业存储
         jobstores = {
-            'default': SQLAlchemyJobStore(url=DatabaseConfig.get_connection_url())
+            'default': self._build_jobstore()
         }
         
-        # 配置执行器
+        # 配置执行器：默认执行器 + 每个资源类别一个独立执行器
         executors = {
             'default': ThreadPoolExecutor(max_workers=settings.get('sync.parallel_workers', 4))
         }
+        for name in resource_classes.gates:
+            executors[name] = ThreadPoolExecutor(max_workers=resource_classes.executor_threads(name))
         
         # 调度器配置
         job_defaults = {
@@ -47,14 +91,16 @@ class TaskScheduler:
         
         # 创建调度器
         if self.background_mode:
-            self.scheduler = BackgroundScheduler(
+            from apscheduler.schedulers.background import BackgroundScheduler
+            self._scheduler = BackgroundScheduler(
                 jobstores=jobstores,
                 executors=executors,
                 job_defaults=job_defaults,
                 timezone=self.timezone
             )
         else:
-            self.scheduler = BlockingScheduler(
+            from apscheduler.schedulers.blocking import BlockingScheduler
+            self._scheduler = BlockingScheduler(
                 jobstores=jobstores,
                 executors=executors,
                 job_defaults=job_defaults,
@@ -62,16 +108,30 @@ class TaskScheduler:
             )
         
         # 添加事件监听器
-        self.scheduler.add_listener(self._job_executed, EVENT_JOB_EXECUTED)
-        self.scheduler.add_listener(self._job_error, EVENT_JOB_ERROR)
+        from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
+        self._scheduler.add_listener(self._job_executed, EVENT_JOB_EXECUTED)
+        self._scheduler.add_listener(self._job_error, EVENT_JOB_ERROR)
     
     def add_job(self, 
                 func,
                 trigger_type: str = 'cron',
                 job_id: str = None,
+                resource_class: Optional[str] = None,
+                priority: int = PRIORITY_NORMAL,
                 **trigger_args) -> str:
-        """添加定时任务"""
+        """添加定时任务
+        
+        Args:
+            resource_class: 资源类别（api/db/cpu），指定后在该类别的独立执行器中按优先级排队执行
+            priority: 类别内优先级，数值越小越先执行（见 resource_classes.PRIORITY_*）
+        """
         try:
+            if resource_class:
+                resource_classes.gate(resource_class)
+                func, trigger_args = self._wrap_resource_class(func, job_id, resource_class, priority, trigger_args)
+            elif job_profiler.enabled:
+                func, trigger_args = self._wrap_profiled(func, job_id, trigger_args)
+            
             job = self.scheduler.add_job(
                 func=func,
                 trigger=trigger_type,
@@ -87,6 +147,39 @@ class TaskScheduler:
             logger.error(f"添加定时任务失败: {e}")
             raise
     
+    @staticmethod
+    def _job_target(func, job_id: Optional[str]):
+        """可解析为文本引用的函数以 'module:function' 形式传入，保证持久化作业存储仍可序列化"""
+        from apscheduler.util import obj_to_ref
+        target = func
+        if not isinstance(func, str):
+            try:
+                target = obj_to_ref(func)
+            except ValueError:
+                target = func
+        job_name = job_id or getattr(func, '__name__', str(func))
+        return target, job_name
+    
+    def _wrap_profiled(self, func, job_id: Optional[str], trigger_args: Dict[str, Any]):
+        """开启剖析时，通过 run_profiled_job 包装任务入口"""
+        target, job_name = self._job_target(func, job_id)
+        
+        trigger_args = dict(trigger_args)
+        trigger_args['args'] = [target, job_name, *(trigger_args.get('args') or ())]
+        trigger_args.setdefault('name', job_name)
+        return run_profiled_job, trigger_args
+    
+    def _wrap_resource_class(self, func, job_id: Optional[str], resource_class: str,
+                             priority: int, trigger_args: Dict[str, Any]):
+        """通过 run_in_resource_class 包装任务入口，并路由到该类别的执行器（剖析在入口内处理）"""
+        target, job_name = self._job_target(func, job_id)
+        
+        trigger_args = dict(trigger_args)
+        trigger_args['args'] = [target, resource_class, priority, job_name, *(trigger_args.get('args') or ())]
+        trigger_args.setdefault('name', job_name)
+        trigger_args['executor'] = resource_class
+        return run_in_resource_class, trigger_args
+    
     def add_cron_job(self,
                     func,
                     hour: int,
@@ -113,13 +206,14 @@ class TaskScheduler:
                         job_id: str = None,
                         **kwargs) -> str:
         """添加间隔定时任务"""
+        # IntervalTrigger 不接受 None，只传入指定的间隔分量
+        intervals = {name: value for name, value in
+                     (('minutes', minutes), ('hours', hours), ('seconds', seconds)) if value is not None}
         return self.add_job(
             func=func,
             trigger_type='interval',
             job_id=job_id,
-            minutes=minutes,
-            hours=hours,
-            seconds=seconds,
+            **intervals,
             **kwargs
         )
     
@@ -204,7 +298,7 @@ class TaskScheduler:
     def shutdown(self, wait: bool = True) -> None:
         """关闭调度器"""
         try:
-            if self.scheduler.running:
+            if self.is_running:
                 self.scheduler.shutdown(wait=wait)
                 logger.info("任务调度器已关闭")
             else:
@@ -238,11 +332,21 @@ class TaskScheduler:
     def get_scheduler_status(self) -> Dict[str, Any]:
         """获取调度器状态"""
         try:
+            if self._scheduler is None:
+                return {
+                    'running': False,
+                    'timezone': str(self.timezone),
+                    'job_store': self.job_store,
+                    'job_count': 0,
+                    'state': 'not_created'
+                }
             return {
-                'running': self.scheduler.running,
+                'running': self._scheduler.running,
                 'timezone': str(self.timezone),
-                'job_count': len(self.scheduler.get_jobs()),
-                'state': str(self.scheduler.state)
+                'job_store': self.job_store,
+                'job_count': len(self._scheduler.get_jobs()),
+                'state': str(self._scheduler.state),
+                'resource_classes': resource_classes.to_dict()
             }
         except Exception as e:
             logger.error(f"获取调度器状态失败: {e}")
@@ -1,12 +1,16 @@
 # scrapers模块初始化
-from .base_scraper import BaseScraper
-from .product_analytics_scraper import ProductAnalyticsScraper
-from .fba_inventory_scraper import FbaInventoryScraper
-from .inventory_details_scraper import InventoryDetailsScraper
+from ..utils.lazy import lazy_exports
 
-__all__ = [
-    'BaseScraper',
-    'ProductAnalyticsScraper',
-    'FbaInventoryScraper', 
-    'InventoryDetailsScraper'
-]
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'BaseScraper': '.base_scraper',
+    'ProductAnalyticsScraper': '.product_analytics_scraper',
+    'FbaInventoryScraper': '.fba_inventory_scraper',
+    'InventoryDetailsScraper': '.inventory_details_scraper',
+    'ShardedProductAnalyticsFetcher': '.sharded_fetcher',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['BaseScraper', 'ProductAnalyticsScraper', 'FbaInventoryScraper', 'InventoryDetailsScraper',
+           'ShardedProductAnalyticsFetcher']
@@ -68,14 +68,18 @@ class FbaInventoryScraper(BaseScraper):
                                hide_deleted_prd: bool = True,
                                need_merge_share: bool = False,
                                page_no: int = 1,
-                               page_size: int = 100,
+                               page_size: Optional[int] = None,
                                currency: str = "USD") -> List[FbaInventory]:
-        """抓取当前FBA库存数据 - 使用签名认证的API客户端"""
+        """抓取当前FBA库存数据 - 使用签名认证的API客户端（未指定页大小时按端点自适应，默认100）"""
         try:
             # 导入签名API客户端
-            from ..auth.saihu_api_client import saihu_api_client
+            from ..auth.saihu_api_client import saihu_api_client, FBA_INVENTORY_ENDPOINT
+            from ..auth.page_size_tuner import page_size_tuner
             from datetime import datetime
             
+            if page_size is None:
+                page_size = page_size_tuner.page_size_for(FBA_INVENTORY_ENDPOINT, 100)
+            
             # 构建API参数（符合官方文档）
             api_params = {
                 "page_no": page_no,
@@ -102,8 +106,9 @@ class FbaInventoryScraper(BaseScraper):
             
             logger.info(f"开始抓取FBA库存数据，页码: {page_no}, 页大小: {page_size}")
             
-            # 使用签名API客户端
-            result = saihu_api_client.fetch_fba_inventory(**api_params)
+            # 使用签名API客户端（单页抓取即一次完整抓取，结束时按观测结果调整页大小）
+            with page_size_tuner.pull(FBA_INVENTORY_ENDPOINT, page_size):
+                result = saihu_api_client.fetch_fba_inventory(**api_params)
             
             if not result:
                 logger.warning("FBA库存API返回空结果")
@@ -2,11 +2,14 @@
 产品分析数据抓取器
 """
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, date, timedelta
 from .base_scraper import BaseScraper
 from ..models import ProductAnalytics
 from ..auth.saihu_api_client import saihu_api_client
+from ..config.settings import settings
+from ..utils.instrumentation import stage
+from .sharded_fetcher import ShardedProductAnalyticsFetcher
 
 logger = logging.getLogger(__name__)
 
@@ -206,40 +209,89 @@ class ProductAnalyticsScraper(BaseScraper):
         
         return True
     
-    def scrape_by_date(self, data_date: str, **kwargs) -> Dict[str, Any]:
+    def fetch_raw_by_date(self, data_date: str) -> List[Dict[str, Any]]:
+        """抓取指定日期的原始API记录（不解码，供处理器串行或并行解码）
+
+        开启 sync.sharded_fetch 时按 店铺×站点 分片并行抓取，任一分片重试后仍失败则抛出异常而不是返回不完整数据
         """
-        按日期抓取产品分析数据的统一方法
+        with stage('fetch') as fetch_stage:
+            if settings.get('sync.sharded_fetch', False):
+                rows = ShardedProductAnalyticsFetcher(saihu_api_client).fetch_by_date(data_date)
+            else:
+                rows = saihu_api_client.fetch_all_pages(
+                    fetch_func=saihu_api_client.fetch_product_analytics,
+                    start_date=data_date,
+                    end_date=data_date,
+                    page_size=100
+                )
+            fetch_stage.rows = len(rows)
+        return rows
+
+    def fetch_raw_by_shards(self, data_date: str, shards: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """只抓取指定 (店铺, 站点) 分片的原始API记录（对账时重新同步单个店铺），失败时抛出异常"""
+        with stage('fetch') as fetch_stage:
+            rows = ShardedProductAnalyticsFetcher(saihu_api_client).fetch_shards(data_date, shards)
+            fetch_stage.rows = len(rows)
+        return rows
+
+    def scrape_raw_by_date(self, data_date: str, **kwargs) -> Dict[str, Any]:
+        """
+        按日期抓取产品分析原始记录
         
         Args:
             data_date: 数据日期，格式YYYY-MM-DD
             **kwargs: 其他参数，如product_ids等
             
         Returns:
-            包含抓取结果的字典
+            包含抓取结果的字典，rows 为原始API记录列表
+        """
+        try:
+            rows = self.fetch_raw_by_date(data_date)
+            return {
+                'status': 'success',
+                'rows': rows,
+                'data_count': len(rows),
+                'data_date': data_date
+            }
+        except Exception as e:
+            logger.error(f"按日期抓取产品分析数据失败: {e}")
+            return {
+                'status': 'error',
+                'error': str(e),
+                'data_date': data_date
+            }
+
+    def scrape_models_by_date(self, data_date: str, **kwargs) -> Dict[str, Any]:
+        """
+        按日期抓取产品分析数据，直接返回模型对象（不做字典序列化）
+        
+        Args:
+            data_date: 数据日期，格式YYYY-MM-DD
+            **kwargs: 其他参数，如product_ids等
+            
+        Returns:
+            包含抓取结果的字典，models 为 ProductAnalytics 列表
         """
         try:
             target_date = datetime.strptime(data_date, '%Y-%m-%d').date()
 
             # 使用签名API客户端抓取指定日期的数据（自动处理分页）
-            rows = saihu_api_client.fetch_all_pages(
-                fetch_func=saihu_api_client.fetch_product_analytics,
-                start_date=data_date,
-                end_date=data_date,
-                page_size=100
-            )
+            rows = self.fetch_raw_by_date(data_date)
 
-            analytics_list: List[ProductAnalytics] = []
-            for item in rows:
-                try:
-                    analytics = ProductAnalytics.from_api_response(item, target_date)
-                    if analytics.is_valid():
-                        analytics_list.append(analytics)
-                except Exception as ex:
-                    logger.warning(f"转换产品分析数据失败: {ex}")
+            with stage('decode') as decode_stage:
+                analytics_list: List[ProductAnalytics] = []
+                for item in rows:
+                    try:
+                        analytics = ProductAnalytics.from_api_response(item, target_date)
+                        if analytics.is_valid():
+                            analytics_list.append(analytics)
+                    except Exception as ex:
+                        logger.warning(f"转换产品分析数据失败: {ex}")
+                decode_stage.rows = len(analytics_list)
 
             return {
                 'status': 'success',
-                'data': [item.to_dict() for item in analytics_list],
+                'models': analytics_list,
                 'data_count': len(analytics_list),
                 'data_date': data_date
             }
@@ -252,6 +304,25 @@ class ProductAnalyticsScraper(BaseScraper):
                 'data_date': data_date
             }
 
+    def scrape_by_date(self, data_date: str, **kwargs) -> Dict[str, Any]:
+        """
+        按日期抓取产品分析数据的统一方法（字典接口，兼容旧调用方）
+        
+        Args:
+            data_date: 数据日期，格式YYYY-MM-DD
+            **kwargs: 其他参数，如product_ids等
+            
+        Returns:
+            包含抓取结果的字典
+        """
+        result = self.scrape_models_by_date(data_date, **kwargs)
+        if result.get('status') != 'success':
+            return result
+
+        models = result.pop('models')
+        result['data'] = [item.to_dict() for item in models]
+        return result
+
     def scrape(self, **kwargs) -> Dict[str, Any]:
         """
         抓取产品分析数据的统一方法
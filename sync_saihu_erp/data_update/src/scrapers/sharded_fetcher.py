@@ -0,0 +1,220 @@
+"""
+产品分析数据分片并行抓取
+按 店铺×站点 将一天的数据拆成相互独立的分片查询，分片在线程池中并行抓取（共享进程内API限速额度），
+每个分片独立重试；合并结果按分片键排序，保证输出确定。
+分片列表取自近期已入库的产品分析数据和不分片抓取时API返回的 店铺×站点，在进程内缓存；分片合计条数与
+不带过滤的 totalSize 不一致（例如出现新店铺）时回退为整天不分片抓取，并从返回的数据中学习新分片。
+分片线程沿用调用方上下文，API延迟和数据库往返计入当前同步任务的埋点。
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..auth.page_size_tuner import page_size_tuner
+from ..auth.saihu_api_client import PRODUCT_ANALYTICS_ENDPOINT
+from ..config.settings import settings
+from ..database import db_manager
+
+logger = logging.getLogger(__name__)
+
+Shard = Tuple[str, str]  # (shop_id, marketplace_id)
+
+
+class IncompleteFetchError(Exception):
+    """分页抓取失败或条数与 totalSize 不一致"""
+
+
+def _first(values: Any) -> str:
+    """API 列表字段取第一个值（与 ProductAnalytics.from_api_response 一致）"""
+    if isinstance(values, list):
+        return str(values[0]) if values else ''
+    return '' if values is None else str(values)
+
+
+def fetch_page(fetch_func: Callable[..., Optional[Dict[str, Any]]], page_no: int, retries: int = 3,
+               retry_delay: float = 1.0, **kwargs) -> Dict[str, Any]:
+    """抓取单页，失败（返回 None）时指数退避重试，重试耗尽抛出 IncompleteFetchError"""
+    for attempt in range(retries + 1):
+        result = fetch_func(page_no=page_no, **kwargs)
+        if result is not None:
+            return result
+        if attempt < retries:
+            time.sleep(retry_delay * (2 ** attempt))
+    raise IncompleteFetchError(f"第 {page_no} 页重试 {retries} 次后仍失败")
+
+
+def fetch_pages(fetch_func: Callable[..., Optional[Dict[str, Any]]], retries: int = 3,
+                retry_delay: float = 1.0, **kwargs) -> Tuple[List[Dict[str, Any]], int]:
+    """抓取全部分页，单页失败时重试，重试耗尽抛出 IncompleteFetchError（不会静默截断）
+
+    Returns:
+        (全部记录, 接口返回的 totalSize)
+    """
+    rows: List[Dict[str, Any]] = []
+    total_size = 0
+    page_no = 1
+    while True:
+        result = fetch_page(fetch_func, page_no, retries, retry_delay, **kwargs)
+        page_rows = result.get('rows') or []
+        total_size = int(result.get('totalSize') or 0)
+        rows.extend(page_rows)
+        if not page_rows or page_no >= int(result.get('totalPage') or 0):
+            break
+        page_no += 1
+
+    if total_size and len(rows) < total_size:
+        raise IncompleteFetchError(f"抓取 {len(rows)} 条，少于 totalSize {total_size}")
+    return rows, total_size
+
+
+class ShardedProductAnalyticsFetcher:
+    """产品分析数据分片并行抓取器"""
+
+    # 分片列表缓存（进程内共享）
+    _shards_cache: Optional[List[Shard]] = None
+    _shards_loaded_at = 0.0
+    # 从API返回数据中发现的分片（尚未入库的新店铺/站点），刷新缓存时保留
+    _discovered_shards: Set[Shard] = set()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, api_client: Any, workers: Optional[int] = None, page_size: int = 100,
+                 shard_retries: Optional[int] = None):
+        """
+        Args:
+            api_client: 赛狐API客户端（提供 fetch_product_analytics）
+            workers: 并行分片数，默认 sync.shard_fetch_workers
+            page_size: 默认页大小（开启 api.adaptive_page_size 时使用调整后的页大小）
+            shard_retries: 分片整体重试次数，默认 sync.shard_fetch_retries
+        """
+        self.api_client = api_client
+        self.workers = max(1, int(workers or settings.get('sync.shard_fetch_workers', 4)))
+        self.page_size = page_size
+        self.shard_retries = int(shard_retries if shard_retries is not None
+                                 else settings.get('sync.shard_fetch_retries', 2))
+        self.page_retries = int(settings.get('api.retry_count', 3))
+        self.retry_delay = float(settings.get('api.retry_delay', 1))
+        self.cache_ttl = float(settings.get('sync.shard_cache_seconds', 21600))
+        self.lookback_days = int(settings.get('sync.shard_lookback_days', 30))
+
+    def list_shards(self, refresh: bool = False) -> List[Shard]:
+        """近期入库或API返回过的 店铺×站点 组合（缓存 sync.shard_cache_seconds 秒）"""
+        cls = type(self)
+        with cls._cache_lock:
+            expired = time.monotonic() - cls._shards_loaded_at > self.cache_ttl
+            if refresh or cls._shards_cache is None or expired:
+                rows = db_manager.execute_query(
+                    """
+                    SELECT DISTINCT shop_id, marketplace_id FROM product_analytics
+                    WHERE data_date >= CURRENT_DATE - %s
+                      AND COALESCE(shop_id, '') <> '' AND COALESCE(marketplace_id, '') <> ''
+                    """,
+                    (self.lookback_days,)
+                )
+                stored = {(str(row['shop_id']), str(row['marketplace_id'])) for row in rows}
+                cls._shards_cache = sorted(stored | cls._discovered_shards)
+                cls._shards_loaded_at = time.monotonic()
+                logger.info(f"产品分析抓取分片: {len(cls._shards_cache)} 个 店铺×站点")
+            return list(cls._shards_cache)
+
+    def fetch_by_date(self, data_date: str) -> List[Dict[str, Any]]:
+        """分片并行抓取指定日期的原始记录；分片不完整时回退为不分片抓取"""
+        with page_size_tuner.pull(PRODUCT_ANALYTICS_ENDPOINT, self.page_size) as page_size:
+            return self._fetch_by_date(data_date, page_size)
+
+    def _fetch_by_date(self, data_date: str, page_size: int) -> List[Dict[str, Any]]:
+        shards = self.list_shards()
+        if not shards:
+            return self._learn_shards(self._fetch_unsharded(data_date, page_size))
+
+        expected = self._total_size(data_date)
+        rows = self._fetch_shards(data_date, shards, page_size)
+        if len(rows) != expected:
+            logger.warning(
+                f"分片抓取 {len(rows)} 条与整体 totalSize {expected} 不一致（可能有新店铺），回退为不分片抓取"
+            )
+            self.list_shards(refresh=True)
+            return self._learn_shards(self._fetch_unsharded(data_date, page_size))
+
+        logger.info(f"分片抓取完成: {data_date} 共 {len(shards)} 个分片 {len(rows)} 条")
+        return rows
+
+    def fetch_shards(self, data_date: str, shards: List[Shard]) -> List[Dict[str, Any]]:
+        """只抓取指定分片（对账时重新同步单个店铺×站点），任一分片失败抛出 IncompleteFetchError"""
+        if not shards:
+            return []
+        with page_size_tuner.pull(PRODUCT_ANALYTICS_ENDPOINT, self.page_size) as page_size:
+            return self._fetch_shards(data_date, sorted(shards), page_size)
+
+    def _fetch_shards(self, data_date: str, shards: List[Shard], page_size: int) -> List[Dict[str, Any]]:
+        """在线程池中并行抓取分片，按分片顺序拼接结果（每个分片在调用方上下文的副本中运行）"""
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(shards)),
+                                thread_name_prefix='pa-shard') as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._fetch_shard, data_date, shard, page_size)
+                for shard in shards
+            ]
+            results = [future.result() for future in futures]
+        return [row for shard_rows in results for row in shard_rows]
+
+    def _fetch_shard(self, data_date: str, shard: Shard, page_size: int) -> List[Dict[str, Any]]:
+        """抓取单个分片，失败时整体重试；只保留首个店铺/站点属于该分片的记录，避免跨分片重复"""
+        shop_id, marketplace_id = shard
+        for attempt in range(self.shard_retries + 1):
+            try:
+                rows, _ = fetch_pages(
+                    self.api_client.fetch_product_analytics,
+                    retries=self.page_retries, retry_delay=self.retry_delay,
+                    start_date=data_date, end_date=data_date, page_size=page_size,
+                    shopIdList=[shop_id], marketplaceIdList=[marketplace_id]
+                )
+                return [row for row in rows
+                        if (_first(row.get('shopIdList')), _first(row.get('marketplaceIdList'))) == shard]
+            except IncompleteFetchError as e:
+                if attempt >= self.shard_retries:
+                    raise IncompleteFetchError(f"分片 {shop_id}/{marketplace_id} 抓取失败: {e}") from e
+                logger.warning(f"分片 {shop_id}/{marketplace_id} 第 {attempt + 1} 次抓取失败，重试: {e}")
+        return []
+
+    def _total_size(self, data_date: str) -> int:
+        """不带过滤条件的当天记录总数（只取1条，不计入页大小观测）"""
+        with page_size_tuner.unobserved():
+            result = fetch_page(
+                self.api_client.fetch_product_analytics, 1,
+                retries=self.page_retries, retry_delay=self.retry_delay,
+                start_date=data_date, end_date=data_date, page_size=1
+            )
+        return int(result.get('totalSize') or 0)
+
+    def _fetch_unsharded(self, data_date: str, page_size: int) -> List[Dict[str, Any]]:
+        rows, _ = fetch_pages(
+            self.api_client.fetch_product_analytics,
+            retries=self.page_retries, retry_delay=self.retry_delay,
+            start_date=data_date, end_date=data_date, page_size=page_size
+        )
+        return rows
+
+    def _learn_shards(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """记录不分片抓取返回的 店铺×站点，新店铺下一次即可分片抓取（无需等待入库）"""
+        rows = list(rows)
+        seen = {(_first(row.get('shopIdList')), _first(row.get('marketplaceIdList'))) for row in rows}
+        seen = {shard for shard in seen if shard[0] and shard[1]}
+        cls = type(self)
+        with cls._cache_lock:
+            known = set(cls._shards_cache or ())
+            new_shards = seen - known
+            if new_shards:
+                cls._discovered_shards = cls._discovered_shards | new_shards
+                cls._shards_cache = sorted(known | new_shards)
+                logger.info(f"从API数据发现 {len(new_shards)} 个新分片，共 {len(cls._shards_cache)} 个 店铺×站点")
+        return rows
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        with cls._cache_lock:
+            cls._shards_cache = None
+            cls._shards_loaded_at = 0.0
+            cls._discovered_shards = set()
+
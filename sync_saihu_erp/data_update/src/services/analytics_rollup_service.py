@@ -0,0 +1,238 @@
+"""
+产品分析累计汇总服务
+按 (asin, marketplace_id, data_date) 维护销售/广告指标的累计值，
+任意时间窗口（T1/T3/T7/T30/T14/T60...）的汇总等于窗口两端累计值之差，只需两次索引查找
+"""
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+from ..config.settings import settings
+from ..database import db_manager
+from ..database.schema_registry import TableSchema, schema_registry
+from ..utils.instrumentation import record_db_round_trip
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = 'product_analytics_cumulative'
+
+# 累计的指标（product_analytics 列名）；record_count 为当天源记录数
+ROLLUP_METRICS = ('sales_amount', 'sales_quantity', 'impressions', 'clicks', 'ad_cost', 'ad_orders', 'record_count')
+
+_METRIC_TYPES = {
+    'sales_amount': 'NUMERIC(14,2)',
+    'sales_quantity': 'BIGINT',
+    'impressions': 'BIGINT',
+    'clicks': 'BIGINT',
+    'ad_cost': 'NUMERIC(14,2)',
+    'ad_orders': 'BIGINT',
+    'record_count': 'BIGINT',
+}
+
+# 累计汇总表：daily_* 为当天值，cum_* 为截至当天（含）的累计值
+CUMULATIVE_SCHEMA = schema_registry.register(TableSchema(
+    name=ROLLUP_TABLE,
+    columns={
+        'asin': 'VARCHAR(20) NOT NULL',
+        'marketplace_id': 'VARCHAR(50) NOT NULL',
+        'data_date': 'DATE NOT NULL',
+        **{f'daily_{metric}': f'{_METRIC_TYPES[metric]} DEFAULT 0' for metric in ROLLUP_METRICS},
+        **{f'cum_{metric}': f'{_METRIC_TYPES[metric]} DEFAULT 0' for metric in ROLLUP_METRICS},
+        'updated_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+    },
+    constraints=['PRIMARY KEY (asin, marketplace_id, data_date)']
+))
+
+# 同一天源数据按 ASIN×站点 聚合
+_DAILY_SELECT = ',\n                       '.join(
+    [f'SUM(COALESCE({metric}, 0)) AS {metric}' for metric in ROLLUP_METRICS if metric != 'record_count']
+    + ['COUNT(*) AS record_count']
+)
+
+_DAILY_COLUMNS = ', '.join(f'daily_{metric}' for metric in ROLLUP_METRICS)
+_CUM_COLUMNS = ', '.join(f'cum_{metric}' for metric in ROLLUP_METRICS)
+
+# 重述某一天：当天行改为新值，之后日期的累计值整体平移差值；
+# 数据修改CTE共享同一快照，前一日累计值读取的是平移前的数据（平移只影响更晚的日期）
+REFRESH_DAY_SQL = f"""
+    WITH fresh AS (
+        SELECT asin, COALESCE(marketplace_id, 'default') AS marketplace_id, data_date,
+               {_DAILY_SELECT}
+        FROM product_analytics
+        WHERE data_date = %(data_date)s AND asin = ANY(%(asins)s)
+        GROUP BY asin, COALESCE(marketplace_id, 'default'), data_date
+    ),
+    delta AS (
+        SELECT f.*,
+               {', '.join(f'f.{m} - COALESCE(o.daily_{m}, 0) AS delta_{m}' for m in ROLLUP_METRICS)}
+        FROM fresh f
+        LEFT JOIN {ROLLUP_TABLE} o
+          ON o.asin = f.asin AND o.marketplace_id = f.marketplace_id AND o.data_date = f.data_date
+    ),
+    shifted AS (
+        UPDATE {ROLLUP_TABLE} r
+        SET {', '.join(f'cum_{m} = r.cum_{m} + d.delta_{m}' for m in ROLLUP_METRICS)},
+            updated_at = CURRENT_TIMESTAMP
+        FROM delta d
+        WHERE r.asin = d.asin AND r.marketplace_id = d.marketplace_id AND r.data_date > d.data_date
+          AND ({' OR '.join(f'd.delta_{m} <> 0' for m in ROLLUP_METRICS)})
+        RETURNING 1
+    )
+    INSERT INTO {ROLLUP_TABLE} (asin, marketplace_id, data_date, {_DAILY_COLUMNS}, {_CUM_COLUMNS}, updated_at)
+    SELECT d.asin, d.marketplace_id, d.data_date,
+           {', '.join(f'd.{m}' for m in ROLLUP_METRICS)},
+           {', '.join(f'COALESCE(p.cum_{m}, 0) + d.{m}' for m in ROLLUP_METRICS)},
+           CURRENT_TIMESTAMP
+    FROM delta d
+    LEFT JOIN LATERAL (
+        SELECT {_CUM_COLUMNS}
+        FROM {ROLLUP_TABLE} prev
+        WHERE prev.asin = d.asin AND prev.marketplace_id = d.marketplace_id AND prev.data_date < d.data_date
+        ORDER BY prev.data_date DESC
+        LIMIT 1
+    ) p ON TRUE
+    ON CONFLICT (asin, marketplace_id, data_date) DO UPDATE
+    SET {', '.join(f'daily_{m} = EXCLUDED.daily_{m}' for m in ROLLUP_METRICS)},
+        {', '.join(f'cum_{m} = EXCLUDED.cum_{m}' for m in ROLLUP_METRICS)},
+        updated_at = EXCLUDED.updated_at
+"""
+
+# 窗口汇总：截至 end_date 的累计值减去截至 end_date - days 的累计值
+WINDOW_TOTALS_SQL = f"""
+    SELECT e.asin, e.marketplace_id, e.data_date AS latest_date,
+           {', '.join(f'e.cum_{m} - COALESCE(s.cum_{m}, 0) AS {m}' for m in ROLLUP_METRICS)}
+    FROM (
+        SELECT DISTINCT ON (asin, marketplace_id) asin, marketplace_id, data_date, {_CUM_COLUMNS}
+        FROM {ROLLUP_TABLE}
+        WHERE data_date <= %(end_date)s AND (%(asins)s::text[] IS NULL OR asin = ANY(%(asins)s))
+        ORDER BY asin, marketplace_id, data_date DESC
+    ) e
+    LEFT JOIN LATERAL (
+        SELECT {_CUM_COLUMNS}
+        FROM {ROLLUP_TABLE} s
+        WHERE s.asin = e.asin AND s.marketplace_id = e.marketplace_id AND s.data_date <= %(before_date)s
+        ORDER BY s.data_date DESC
+        LIMIT 1
+    ) s ON TRUE
+    WHERE e.cum_record_count - COALESCE(s.cum_record_count, 0) > 0
+"""
+
+
+class AnalyticsRollupService:
+    """产品分析累计汇总服务"""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        """初始化累计汇总服务
+
+        Args:
+            enabled: 是否在保存产品分析数据时维护累计表，默认读取配置 sync.maintain_cumulative_rollup
+        """
+        if enabled is None:
+            enabled = bool(settings.get('sync.maintain_cumulative_rollup', False))
+        self.enabled = enabled
+
+    def record_saved(self, analytics_list: Iterable[Any]) -> int:
+        """batch_save_product_analytics 写入后增量更新累计表（未开启时不做任何操作）
+
+        Returns:
+            重述的日期数
+        """
+        if not self.enabled:
+            return 0
+
+        asins_by_date: Dict[Any, set] = defaultdict(set)
+        for analytics in analytics_list:
+            asin = getattr(analytics, 'asin', None)
+            data_date = getattr(analytics, 'data_date', None)
+            if asin and data_date:
+                asins_by_date[data_date].add(asin)
+
+        if not asins_by_date:
+            return 0
+
+        try:
+            return self.refresh(asins_by_date)
+        except Exception as e:
+            logger.error(f"更新产品分析累计汇总表失败（可运行 rebuild_analytics_rollup.py 重建）: {e}")
+            return 0
+
+    def refresh(self, asins_by_date: Dict[Any, Iterable[str]]) -> int:
+        """按日期升序重述指定 ASIN 的当天汇总，并平移之后日期的累计值（单事务）"""
+        schema_registry.ensure(CUMULATIVE_SCHEMA.name)
+
+        with db_manager.get_db_transaction() as conn:
+            with conn.cursor() as cursor:
+                # 串行化并发的重述，保证累计值平移不会交错
+                record_db_round_trip()
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (ROLLUP_TABLE,))
+                for data_date in sorted(asins_by_date, key=str):
+                    record_db_round_trip()
+                    cursor.execute(REFRESH_DAY_SQL, {
+                        'data_date': data_date,
+                        'asins': sorted(asins_by_date[data_date])
+                    })
+
+        logger.debug(f"产品分析累计汇总已更新: {len(asins_by_date)} 个日期")
+        return len(asins_by_date)
+
+    def rebuild(self, asins: Optional[Sequence[str]] = None) -> int:
+        """从 product_analytics 全量重建累计表（首次启用或修复漂移时使用），返回写入行数"""
+        schema_registry.ensure(CUMULATIVE_SCHEMA.name)
+
+        asin_filter = 'WHERE asin = ANY(%(asins)s)' if asins else ''
+        rebuild_sql = f"""
+            INSERT INTO {ROLLUP_TABLE} (asin, marketplace_id, data_date, {_DAILY_COLUMNS}, {_CUM_COLUMNS}, updated_at)
+            SELECT asin, marketplace_id, data_date,
+                   {', '.join(ROLLUP_METRICS)},
+                   {', '.join(f'SUM({m}) OVER w' for m in ROLLUP_METRICS)},
+                   CURRENT_TIMESTAMP
+            FROM (
+                SELECT asin, COALESCE(marketplace_id, 'default') AS marketplace_id, data_date,
+                       {_DAILY_SELECT}
+                FROM product_analytics
+                WHERE asin IS NOT NULL AND data_date IS NOT NULL
+                {'AND asin = ANY(%(asins)s)' if asins else ''}
+                GROUP BY asin, COALESCE(marketplace_id, 'default'), data_date
+            ) daily
+            WINDOW w AS (PARTITION BY asin, marketplace_id ORDER BY data_date ROWS UNBOUNDED PRECEDING)
+        """
+        params = {'asins': list(asins)} if asins else None
+
+        with db_manager.get_db_transaction() as conn:
+            with conn.cursor() as cursor:
+                record_db_round_trip(3)
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (ROLLUP_TABLE,))
+                cursor.execute(f"DELETE FROM {ROLLUP_TABLE} {asin_filter}", params)
+                cursor.execute(rebuild_sql, params)
+                inserted = cursor.rowcount
+
+        logger.info(f"产品分析累计汇总表重建完成: {inserted} 行")
+        return inserted
+
+    def window_totals(self, end_date: Union[str, date], days: int,
+                      asins: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """查询 (end_date - days, end_date] 窗口内每个 ASIN×站点 的指标合计
+
+        窗口内无源记录的 ASIN×站点 不返回；latest_date 为窗口内最新的数据日期。
+        asins 为 None 时返回全部 ASIN，为空列表时返回空结果。
+        """
+        if days <= 0:
+            raise ValueError("窗口天数必须为正整数")
+        if asins is not None:
+            asins = list(asins)
+            if not asins:
+                return []
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+
+        schema_registry.ensure(CUMULATIVE_SCHEMA.name)
+        return db_manager.execute_query(WINDOW_TOTALS_SQL, {
+            'end_date': end_date,
+            'before_date': end_date - timedelta(days=days),
+            'asins': asins
+        })
+
+
+# 全局累计汇总服务实例（首次使用时读取配置）
+analytics_rollup_service = LazyObject(AnalyticsRollupService)
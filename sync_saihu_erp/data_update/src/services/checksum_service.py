@@ -0,0 +1,171 @@
+"""
+产品分析数据分区校验和服务
+同步入库时按 日期/站点/店铺 记录每个叶子桶的校验和，对账时与赛狐重新抓取的数据比较，
+只返回摘要不一致的桶及其记录用于重新同步
+"""
+import logging
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+from ..config.settings import settings
+from ..database import db_manager
+from ..database.schema_registry import TableSchema, schema_registry
+from ..utils.checksum_tree import BucketKey, ChecksumTree, DIGEST_MODULUS
+from ..utils.instrumentation import record_db_round_trip
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+CHECKSUM_TABLE = 'product_analytics_checksums'
+
+# 参与摘要的业务字段（同步写入 product_analytics 的核心指标）
+CHECKSUM_FIELDS = (
+    'asin', 'sku', 'parent_asin', 'marketplace_id', 'shop_id', 'data_date', 'title',
+    'sales_amount', 'sales_quantity', 'impressions', 'clicks', 'ad_cost', 'ad_sales', 'ad_orders',
+    'order_count', 'refund_count', 'sessions', 'page_views', 'fba_inventory', 'total_inventory',
+)
+
+# 分区：日期 -> 站点 -> 店铺（叶子桶）
+CHECKSUM_PARTITION = ('data_date', 'marketplace_id', 'shop_id')
+
+# 只存储叶子桶，上层节点加载后在内存中累加得到
+CHECKSUM_SCHEMA = schema_registry.register(TableSchema(
+    name=CHECKSUM_TABLE,
+    columns={
+        'data_date': 'DATE NOT NULL',
+        'marketplace_id': 'VARCHAR(50) NOT NULL',
+        'shop_id': 'VARCHAR(50) NOT NULL',
+        'digest': 'BIGINT NOT NULL',
+        'record_count': 'INTEGER NOT NULL',
+        'updated_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+    },
+    constraints=['PRIMARY KEY (data_date, marketplace_id, shop_id)']
+))
+
+
+def _to_signed(digest: int) -> int:
+    """无符号64位摘要 -> BIGINT"""
+    return digest - DIGEST_MODULUS if digest >= DIGEST_MODULUS // 2 else digest
+
+
+class ChecksumService:
+    """产品分析数据分区校验和服务"""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        """初始化校验和服务
+
+        Args:
+            enabled: 是否在同步入库后记录校验和，默认读取配置 sync.record_checksums
+        """
+        if enabled is None:
+            enabled = bool(settings.get('sync.record_checksums', True))
+        self.enabled = enabled
+
+    def build_tree(self, records: Iterable[Any]) -> ChecksumTree:
+        """由产品分析记录（模型或字典）构建校验和树"""
+        return ChecksumTree.from_records(records, CHECKSUM_FIELDS, CHECKSUM_PARTITION)
+
+    def record(self, records: Iterable[Any]) -> int:
+        """同步入库后记录校验和：整体替换记录所涉及日期的叶子桶（未开启时不做任何操作）
+
+        Returns:
+            写入的叶子桶数
+        """
+        if not self.enabled:
+            return 0
+
+        try:
+            return self.save(self.build_tree(records))
+        except Exception as e:
+            logger.error(f"记录产品分析校验和失败: {e}")
+            return 0
+
+    def save(self, tree: ChecksumTree, buckets: Optional[Sequence[BucketKey]] = None) -> int:
+        """保存叶子桶
+
+        Args:
+            buckets: 只替换这些叶子桶（对账后重新同步的桶）；为 None 时替换树中各日期的全部叶子桶
+        """
+        schema_registry.ensure(CHECKSUM_SCHEMA.name)
+
+        if buckets is None:
+            dates = sorted({bucket[0] for bucket in tree.leaves})
+            delete_sql = f"DELETE FROM {CHECKSUM_TABLE} WHERE data_date = ANY(%s::date[])"
+            delete_params = (dates,)
+            rows = [(*bucket, _to_signed(digest), count) for bucket, (digest, count) in tree.leaves.items()]
+        else:
+            buckets = [tuple(bucket) for bucket in buckets]
+            delete_sql = f"""
+                DELETE FROM {CHECKSUM_TABLE} c
+                USING unnest(%s::date[], %s::text[], %s::text[]) AS b(data_date, marketplace_id, shop_id)
+                WHERE c.data_date = b.data_date AND c.marketplace_id = b.marketplace_id AND c.shop_id = b.shop_id
+            """
+            delete_params = tuple(list(column) for column in zip(*buckets)) if buckets else ([], [], [])
+            rows = [(*bucket, _to_signed(tree.leaves[bucket][0]), tree.leaves[bucket][1])
+                    for bucket in buckets if bucket in tree.leaves]
+
+        from psycopg2.extras import execute_values
+        with db_manager.get_db_transaction() as conn:
+            with conn.cursor() as cursor:
+                record_db_round_trip(2)
+                cursor.execute(delete_sql, delete_params)
+                if rows:
+                    execute_values(
+                        cursor,
+                        f"""
+                        INSERT INTO {CHECKSUM_TABLE} (data_date, marketplace_id, shop_id, digest, record_count)
+                        VALUES %s
+                        """,
+                        rows
+                    )
+
+        logger.debug(f"产品分析校验和已保存: {len(rows)} 个叶子桶")
+        return len(rows)
+
+    def load_tree(self, data_date: Union[str, date]) -> ChecksumTree:
+        """加载指定日期已保存的校验和树"""
+        schema_registry.ensure(CHECKSUM_SCHEMA.name)
+        tree = ChecksumTree(CHECKSUM_FIELDS, CHECKSUM_PARTITION)
+        rows = db_manager.execute_query(
+            f"SELECT data_date, marketplace_id, shop_id, digest, record_count "
+            f"FROM {CHECKSUM_TABLE} WHERE data_date = %s",
+            (data_date,)
+        )
+        for row in rows:
+            bucket = tree.bucket_of(row)
+            tree.set_leaf(bucket, row['digest'], row['record_count'])
+        return tree
+
+    def reconcile(self, data_date: Union[str, date], fresh_records: Sequence[Any]) -> Dict[str, Any]:
+        """将重新抓取的数据与已保存的校验和比较
+
+        Returns:
+            divergent_buckets: 不一致的叶子桶 (日期, 站点, 店铺)
+            records: 需要重新同步的记录（属于不一致的桶）
+            fresh_tree: 重新抓取数据的校验和树（重新同步后用于保存）
+        """
+        fresh_tree = self.build_tree(fresh_records)
+        stored_tree = self.load_tree(data_date)
+        divergent, compared = fresh_tree.diff(stored_tree)
+
+        divergent_set = set(divergent)
+        by_bucket: Dict[BucketKey, List[Any]] = defaultdict(list)
+        for record in fresh_records:
+            bucket = fresh_tree.bucket_of(record)
+            if bucket in divergent_set:
+                by_bucket[bucket].append(record)
+
+        logger.info(
+            f"产品分析对账 {data_date}: 比较节点 {compared} 个，不一致叶子桶 {len(divergent)}/"
+            f"{len(fresh_tree.leaves)} 个，需重新同步 {sum(len(v) for v in by_bucket.values())} 条"
+        )
+        return {
+            'divergent_buckets': divergent,
+            'records': [record for bucket in divergent for record in by_bucket.get(bucket, [])],
+            'compared_nodes': compared,
+            'fresh_tree': fresh_tree,
+        }
+
+
+# 全局校验和服务实例（首次使用时读取配置）
+checksum_service = LazyObject(ChecksumService)
@@ -8,6 +8,7 @@ from typing import List, Dict, Any, Optional
 from ..auth.saihu_api_client import saihu_api_client
 from ..models import ProductAnalytics, FbaInventory, InventoryDetails
 from ..database import db_manager
+from ..scheduler.sync_dag import SyncDag
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +19,18 @@ class DataSyncService:
         """初始化数据同步服务"""
         self.api_client = saihu_api_client
         self.db_manager = db_manager
+        self.last_run_report = None
+        self._sync_jobs = None
         logger.info("数据同步服务初始化完成")
     
+    @property
+    def sync_jobs(self):
+        """库存点合并和快照生成使用的同步作业（首次使用时创建）"""
+        if self._sync_jobs is None:
+            from ..scheduler.sync_jobs import SyncJobs
+            self._sync_jobs = SyncJobs()
+        return self._sync_jobs
+    
     def sync_fba_inventory_today(self) -> bool:
         """
         同步当天的FBA库存数据
@@ -281,40 +292,31 @@ class DataSyncService:
         """
         执行完整的数据同步
         
+        FBA库存、库存明细、产品分析分别访问独立的接口和表，按依赖图并发执行；
+        前七天更新覆盖昨天的数据，需在昨日同步结束后执行。库存点合并和 inventory_deals 快照
+        读取已入库的产品分析数据，在两项产品分析同步结束后执行。API调用额度由全局限速器公平分配，
+        数据库连接数达到上限时并发分支排队等待。
+        
         Returns:
             各项同步任务的结果
         """
         logger.info("开始执行完整数据同步")
         
-        results = {}
+        dag = SyncDag('sync_all_data')
+        dag.add('fba_inventory', self.sync_fba_inventory_today)
+        dag.add('warehouse_inventory', self.sync_warehouse_inventory_today)
+        dag.add('product_analytics_yesterday', self.sync_product_analytics_yesterday)
+        dag.add('product_analytics_last_7_days', self.sync_product_analytics_last_seven_days,
+                depends_on=('product_analytics_yesterday',))
+        analytics_nodes = ('product_analytics_yesterday', 'product_analytics_last_7_days')
+        dag.add('inventory_merge', lambda: self.sync_jobs.merge_inventory_points(days=7),
+                depends_on=analytics_nodes, is_success=lambda r: r.get('status') == 'success')
+        dag.add('inventory_deals', lambda: self.sync_jobs.generate_inventory_deals(days=7),
+                depends_on=analytics_nodes, is_success=lambda r: r.get('status') == 'success')
         
-        # 1. 同步当天FBA库存数据
-        try:
-            results['fba_inventory'] = self.sync_fba_inventory_today()
-        except Exception as e:
-            logger.error(f"同步FBA库存数据异常: {e}")
-            results['fba_inventory'] = False
-        
-        # 2. 同步当天库存明细数据
-        try:
-            results['warehouse_inventory'] = self.sync_warehouse_inventory_today()
-        except Exception as e:
-            logger.error(f"同步库存明细数据异常: {e}")
-            results['warehouse_inventory'] = False
-        
-        # 3. 同步前一天产品分析数据
-        try:
-            results['product_analytics_yesterday'] = self.sync_product_analytics_yesterday()
-        except Exception as e:
-            logger.error(f"同步前一天产品分析数据异常: {e}")
-            results['product_analytics_yesterday'] = False
-        
-        # 4. 更新前七天产品分析数据
-        try:
-            results['product_analytics_last_7_days'] = self.sync_product_analytics_last_seven_days()
-        except Exception as e:
-            logger.error(f"更新前七天产品分析数据异常: {e}")
-            results['product_analytics_last_7_days'] = False
+        report = dag.run()
+        self.last_run_report = report
+        results = report.results()
         
         # 统计结果
         success_count = sum(1 for success in results.values() if success)
@@ -322,6 +324,7 @@ class DataSyncService:
         
         logger.info(f"完整数据同步结果: {success_count}/{total_count} 项成功")
         logger.info(f"详细结果: {results}")
+        logger.info(f"关键路径: {report.format_critical_path()}")
         
         return results
     
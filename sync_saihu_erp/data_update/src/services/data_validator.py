@@ -5,9 +5,11 @@
 import hashlib
 import json
 import logging
-from typing import Dict, List, Any, Optional
+from collections import Counter
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass
+from ..utils.checksum_tree import ChecksumTree
 
 @dataclass
 class ValidationResult:
@@ -15,131 +17,186 @@ class ValidationResult:
     errors: List[str]
     warnings: List[str]
     stats: Dict[str, Any]
+    aborted: bool = False
+
+
+# 字段规则：(字段, 期望类型, 是否必需)，模块加载时构建一次
+NUMBER_TYPES = (int, float)
+FIELD_RULES: Tuple[Tuple[str, Any, bool], ...] = (
+    ('asin', str, True),
+    ('productName', str, True),
+    ('totalInventory', NUMBER_TYPES, True),
+    ('fbaAvailable', NUMBER_TYPES, True),
+    ('salesPerson', str, True),
+    ('fbaInTransit', NUMBER_TYPES, False),
+    ('localAvailable', NUMBER_TYPES, False),
+    ('averageSales', NUMBER_TYPES, False),
+    ('dailySalesAmount', NUMBER_TYPES, False),
+    ('adSpend', NUMBER_TYPES, False),
+    ('adImpressions', NUMBER_TYPES, False),
+    ('adOrderCount', NUMBER_TYPES, False),
+)
+REQUIRED_FIELD_RULES = tuple((field, types) for field, types, required in FIELD_RULES if required)
+
+MAX_INVENTORY = 1000000
+
+# 校验和使用的关键字段（排除可能变化的时间戳）
+CHECKSUM_KEY_FIELDS = (
+    'asin', 'productName', 'salesPerson', 'marketplace', 'totalInventory', 'fbaAvailable', 'averageSales'
+)
+
+
+class ViolationReport:
+    """校验问题汇总：按规则和字段计数，只保留有限条示例信息"""
+    
+    def __init__(self, max_samples: int):
+        self.max_samples = max_samples
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.error_count = 0
+        self.warning_count = 0
+        self.rule_counts: Counter = Counter()
+        self.missing_fields: Counter = Counter()
+        self.type_issues: Counter = Counter()
+    
+    def error(self, rule: str, message: str, *args: Any) -> None:
+        """记录错误；示例已满时不再格式化信息"""
+        self.error_count += 1
+        self.rule_counts[rule] += 1
+        if len(self.errors) < self.max_samples:
+            self.errors.append(message.format(*args))
+    
+    def warning(self, rule: str, message: str, *args: Any) -> None:
+        """记录警告；示例已满时不再格式化信息"""
+        self.warning_count += 1
+        self.rule_counts[rule] += 1
+        if len(self.warnings) < self.max_samples:
+            self.warnings.append(message.format(*args))
+
 
 class DataIntegrityValidator:
     """数据完整性验证器"""
     
-    def __init__(self):
+    def __init__(self, max_samples: int = 50, abort_error_rate: Optional[float] = None,
+                 abort_min_records: int = 1000):
+        """
+        Args:
+            max_samples: 错误、警告各保留的示例条数
+            abort_error_rate: 无效记录占比超过该值时提前停止校验（None 表示不提前停止）
+            abort_min_records: 至少校验多少条记录后才判断是否提前停止
+        """
         self.logger = logging.getLogger(__name__)
+        self.max_samples = max_samples
+        self.abort_error_rate = abort_error_rate
+        self.abort_min_records = abort_min_records
     
-    def validate_inventory_data(self, records: List[Dict[str, Any]]) -> ValidationResult:
-        """验证库存数据完整性"""
-        errors = []
-        warnings = []
+    def validate_inventory_data(self, records: Iterable[Dict[str, Any]]) -> ValidationResult:
+        """验证库存数据完整性（单次流式遍历，records 可为任意可迭代对象）"""
+        report = ViolationReport(self.max_samples)
+        total = valid = 0
+        aborted = False
+        
+        for i, record in enumerate(records):
+            total += 1
+            errors_before = report.error_count
+            self._validate_record(i, record, report)
+            if report.error_count == errors_before:
+                valid += 1
+            
+            invalid = total - valid
+            if (self.abort_error_rate is not None and total >= self.abort_min_records
+                    and invalid > total * self.abort_error_rate):
+                aborted = True
+                self.logger.warning(
+                    f"无效记录占比 {invalid / total:.1%} 超过阈值 {self.abort_error_rate:.1%}，"
+                    f"已校验 {total} 条后停止"
+                )
+                break
+        
         stats = {
-            'total_records': len(records),
-            'valid_records': 0,
-            'invalid_records': 0,
-            'missing_fields': {},
-            'data_type_issues': []
+            'total_records': total,
+            'valid_records': valid,
+            'invalid_records': total - valid,
+            'missing_fields': dict(report.missing_fields),
+            'data_type_issues': dict(report.type_issues),
+            'rule_violations': dict(report.rule_counts),
+            'error_count': report.error_count,
+            'warning_count': report.warning_count,
+            'aborted': aborted,
         }
         
-        if not records:
+        if not total:
             return ValidationResult(False, ["无数据需要验证"], [], stats)
         
-        # 必需的字段
-        required_fields = {
-            'asin': str,
-            'productName': str,
-            'totalInventory': (int, float),
-            'fbaAvailable': (int, float),
-            'salesPerson': str
-        }
+        return ValidationResult(
+            is_valid=report.error_count == 0 and not aborted,
+            errors=report.errors,
+            warnings=report.warnings,
+            stats=stats,
+            aborted=aborted
+        )
+    
+    def _validate_record(self, i: int, record: Dict[str, Any], report: ViolationReport) -> None:
+        """校验单条记录"""
+        # 检查必需字段
+        for field, field_type in REQUIRED_FIELD_RULES:
+            value = record.get(field)
+            if value is None:
+                report.missing_fields[field] += 1
+                report.error('missing_field', "记录{}: 缺失必需字段 '{}'", i, field)
+            elif not isinstance(value, field_type):
+                report.type_issues[field] += 1
+                report.warning('type_mismatch', "记录{}: 字段'{}'类型错误，期望{}，得到{}",
+                               i, field, field_type, type(value))
         
-        # 可选字段及其类型
-        optional_fields = {
-            'fbaInTransit': (int, float),
-            'localAvailable': (int, float),
-            'averageSales': (int, float),
-            'dailySalesAmount': (int, float),
-            'adSpend': (int, float),
-            'adImpressions': (int, float),
-            'adOrderCount': (int, float)
-        }
+        # 检查数值字段的合理性
+        inventory = record.get('totalInventory')
+        if inventory is not None:
+            try:
+                inventory = float(inventory)
+                if inventory < 0:
+                    report.error('negative_inventory', "记录{}: 库存数量({})不能为负数", i, inventory)
+                elif inventory > MAX_INVENTORY:  # 合理范围检查
+                    report.warning('inventory_too_high', "记录{}: 库存数量({})异常高，请检查", i, inventory)
+            except (ValueError, TypeError):
+                report.error('invalid_inventory', "记录{}: 库存数量格式无效", i)
         
-        for i, record in enumerate(records):
-            record_errors = []
-            record_warnings = []
-            
-            # 检查必需字段
-            for field, field_type in required_fields.items():
-                if field not in record or record[field] is None:
-                    error = f"记录{i}: 缺失必需字段 '{field}'"
-                    record_errors.append(error)
-                    stats['missing_fields'][field] = stats['missing_fields'].get(field, 0) + 1
-                elif not isinstance(record[field], field_type):
-                    error = f"记录{i}: 字段'{field}'类型错误，期望{field_type}，得到{type(record[field])}"
-                    record_warnings.append(error)
-                    stats['data_type_issues'].append(error)
-            
-            # 检查数值字段的合理性
-            if 'totalInventory' in record and record['totalInventory'] is not None:
-                try:
-                    inventory = float(record['totalInventory'])
-                    if inventory < 0:
-                        error = f"记录{i}: 库存数量({inventory})不能为负数"
-                        record_errors.append(error)
-                    elif inventory > 1000000:  # 合理范围检查
-                        warning = f"记录{i}: 库存数量({inventory})异常高，请检查"
-                        record_warnings.append(warning)
-                except (ValueError, TypeError):
-                    error = f"记录{i}: 库存数量格式无效"
-                    record_errors.append(error)
-            
-            # 检查ASIN格式
-            if 'asin' in record and record['asin']:
-                asin = str(record['asin']).strip()
-                if not asin or len(asin) != 10 or not asin.isalnum():
-                    warning = f"记录{i}: ASIN格式可疑: '{asin}'"
-                    record_warnings.append(warning)
-            
-            # 检查业务逻辑
-            self._validate_business_logic(record, record_errors, record_warnings)
-            
-            if not record_errors:
-                stats['valid_records'] += 1
-            else:
-                stats['invalid_records'] += 1
-                errors.extend(record_errors)
-            
-            warnings.extend(record_warnings)
+        # 检查ASIN格式
+        asin = record.get('asin')
+        if asin:
+            asin = str(asin).strip()
+            if len(asin) != 10 or not asin.isalnum():
+                report.warning('suspicious_asin', "记录{}: ASIN格式可疑: '{}'", i, asin)
         
-        return ValidationResult(
-            is_valid=len(errors) == 0,
-            errors=errors,
-            warnings=warnings,
-            stats=stats
-        )
+        # 检查业务逻辑
+        self._validate_business_logic(i, record, report)
     
-    def _validate_business_logic(self, record: Dict[str, Any], 
-                               errors: List[str], warnings: List[str]) -> None:
+    def _validate_business_logic(self, i: int, record: Dict[str, Any], report: ViolationReport) -> None:
         """验证业务逻辑一致性"""
         
         # FBA检查
-        if all(field in record and record[field] is not None 
-               for field in ['totalInventory', 'fbaAvailable', 'fbaInTransit']):
+        total, fba_avail, fba_transit = (
+            record.get('totalInventory'), record.get('fbaAvailable'), record.get('fbaInTransit')
+        )
+        if total is not None and fba_avail is not None and fba_transit is not None:
             try:
-                total = float(record['totalInventory'])
-                fba_avail = float(record['fbaAvailable'])
-                fba_transit = float(record['fbaInTransit'])
-                
-                calculated_total = fba_avail + fba_transit
+                total = float(total)
+                calculated_total = float(fba_avail) + float(fba_transit)
                 if abs(total - calculated_total) > 1:  # 允许1个单位误差
-                    error = f"库存计算不一致: {total} != {calculated_total}"
-                    warnings.append(error)
+                    report.warning('inventory_mismatch', "记录{}: 库存计算不一致: {} != {}",
+                                   i, total, calculated_total)
             except (ValueError, TypeError):
                 pass
         
         # 销量验证
-        if 'averageSales' in record and record['averageSales'] is not None:
+        avg_sales = record.get('averageSales')
+        if avg_sales is not None:
             try:
-                avg_sales = float(record['averageSales'])
+                avg_sales = float(avg_sales)
                 if avg_sales < 0:
-                    error = f"日均销量({avg_sales})不能为负"
-                    errors.append(error)
+                    report.error('negative_sales', "记录{}: 日均销量({})不能为负", i, avg_sales)
             except (ValueError, TypeError):
-                error = f"日均销量数据无效"
-                errors.append(error)
+                report.error('invalid_sales', "记录{}: 日均销量数据无效", i)
     
     def calculate_data_checksum(self, records: List[Dict[str, Any]]) -> str:
         """计算数据的完整性校验和"""
@@ -170,6 +227,10 @@ class DataIntegrityValidator:
         
         return checksum
     
+    def calculate_partitioned_checksums(self, records: Iterable[Dict[str, Any]]) -> ChecksumTree:
+        """按站点分区计算与顺序无关的校验和树，比较两棵树可定位不一致的站点"""
+        return ChecksumTree.from_records(records, CHECKSUM_KEY_FIELDS, ('marketplace',))
+    
     def detect_duplicates(self, records: List[Dict[str, Any]]) -> Dict[str, List[int]]:
         """检测重复记录"""
         seen = {}
@@ -219,12 +280,15 @@ class DataIntegrityValidator:
             warning = f"新增产品: {len(extra_asins)}个 ({','.join(list(extra_asins)[:5])}...)"
             warnings.append(warning)
         
-        # 计算校验和对比
-        original_checksum = self.calculate_data_checksum(original)
-        processed_checksum = self.calculate_data_checksum(processed)
+        # 计算校验和对比（按站点分区，不一致时给出具体站点）
+        original_tree = self.calculate_partitioned_checksums(original)
+        processed_tree = self.calculate_partitioned_checksums(processed)
+        divergent, _ = original_tree.diff(processed_tree)
+        original_checksum = f"{original_tree.node()[0]:016x}"
+        processed_checksum = f"{processed_tree.node()[0]:016x}"
         
         # 注意：这里使用关键字段比较，不是完整数据
-        different_checksum = original_checksum != processed_checksum
+        different_checksum = bool(divergent)
         
         stats = {
             'original_count': original_count,
@@ -233,7 +297,8 @@ class DataIntegrityValidator:
             'extra_count': len(extra_asins),
             'original_checksum': original_checksum[:8] + "...",
             'processed_checksum': processed_checksum[:8] + "...",
-            'is_checksum_different': different_checksum
+            'is_checksum_different': different_checksum,
+            'divergent_marketplaces': [bucket[0] for bucket in divergent]
         }
         
         return ValidationResult(
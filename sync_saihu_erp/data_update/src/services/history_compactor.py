@@ -0,0 +1,108 @@
+"""
+库存点历史表压缩服务
+一次性清理 inventory_point_history 中的重复快照，并补建唯一索引
+"""
+import logging
+import time
+from typing import Dict, Any, List
+from ..database import db_manager
+
+logger = logging.getLogger(__name__)
+
+class InventoryHistoryCompactor:
+    """库存点历史去重压缩器
+
+    按 data_date 逐日处理，每批只删除有限数量的重复行并立即提交，
+    避免长事务和长时间持有行锁；同一 (asin, marketplace, data_date)
+    保留最新写入的一条。
+    """
+
+    UNIQUE_INDEX_NAME = 'uq_inventory_point_hist_point'
+
+    def __init__(self, batch_size: int = 5000, pause_seconds: float = 0.1):
+        """初始化压缩器"""
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+
+    def find_duplicate_dates(self) -> List[Dict[str, Any]]:
+        """查找存在重复快照的日期及重复行数"""
+        sql = """
+            SELECT data_date, COUNT(*) - COUNT(DISTINCT (asin, marketplace)) AS duplicate_count
+            FROM inventory_point_history
+            GROUP BY data_date
+            HAVING COUNT(*) > COUNT(DISTINCT (asin, marketplace))
+            ORDER BY data_date
+        """
+        return db_manager.execute_query(sql)
+
+    def compact_date(self, data_date) -> int:
+        """分批删除指定日期的重复快照，返回删除行数"""
+        delete_sql = """
+            DELETE FROM inventory_point_history
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY asin, marketplace
+                        ORDER BY created_at DESC, id DESC
+                    ) AS rn
+                    FROM inventory_point_history
+                    WHERE data_date = %s
+                ) ranked
+                WHERE rn > 1
+                LIMIT %s
+            )
+        """
+        deleted_total = 0
+        while True:
+            deleted = db_manager.execute_update(delete_sql, (data_date, self.batch_size))
+            deleted_total += deleted
+            if deleted < self.batch_size:
+                break
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+        return deleted_total
+
+    def create_unique_index(self) -> bool:
+        """并发创建唯一索引（不阻塞写入），完成后同步可走UPSERT路径"""
+        with db_manager.get_db_connection() as conn:
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {self.UNIQUE_INDEX_NAME} "
+                        "ON inventory_point_history(asin, marketplace, data_date)"
+                    )
+                return True
+            except Exception as e:
+                logger.error(f"创建历史表唯一索引失败: {e}")
+                return False
+            finally:
+                conn.autocommit = False
+
+    def run(self, dry_run: bool = False, create_index: bool = True) -> Dict[str, Any]:
+        """执行压缩任务"""
+        duplicate_dates = self.find_duplicate_dates()
+        expected = sum(int(row['duplicate_count'] or 0) for row in duplicate_dates)
+        logger.info(f"发现 {len(duplicate_dates)} 个日期存在重复快照，共 {expected} 条重复")
+
+        result = {
+            'duplicate_dates': len(duplicate_dates),
+            'duplicate_rows': expected,
+            'deleted_rows': 0,
+            'index_created': False,
+            'dry_run': dry_run
+        }
+
+        if dry_run:
+            return result
+
+        for row in duplicate_dates:
+            deleted = self.compact_date(row['data_date'])
+            result['deleted_rows'] += deleted
+            logger.info(f"{row['data_date']} 压缩完成: 删除 {deleted} 条重复快照")
+
+        if create_index:
+            result['index_created'] = self.create_unique_index()
+
+        logger.info(f"历史表压缩完成: {result}")
+        return result
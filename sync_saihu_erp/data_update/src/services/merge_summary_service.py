@@ -0,0 +1,168 @@
+"""
+库存点合并汇总服务
+单次遍历计算每日合并汇总：优先使用内存中的合并结果，其次读取物化汇总表，最后单条SQL聚合
+"""
+import logging
+from datetime import date
+from typing import Dict, Any, List, Optional
+from ..config.settings import settings
+from ..database import db_manager
+from ..database.schema_registry import TableSchema, schema_registry
+from ..utils.lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+EU_MARKETPLACE = '欧盟'
+
+# 每日合并汇总物化表（sync.materialize_merge_summary 开启时写入）
+DAILY_SUMMARY_SCHEMA = schema_registry.register(TableSchema(
+    name='inventory_point_daily_summary',
+    columns={
+        'data_date': 'DATE PRIMARY KEY',
+        'total_points': 'INTEGER DEFAULT 0',
+        'eu_points': 'INTEGER DEFAULT 0',
+        'turnover_exceeded': 'INTEGER DEFAULT 0',
+        'out_of_stock': 'INTEGER DEFAULT 0',
+        'effective_points': 'INTEGER DEFAULT 0',
+        'updated_at': 'TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP',
+    }
+))
+
+
+class MergeSummaryService:
+    """库存点合并汇总服务"""
+
+    def __init__(self, materialize: Optional[bool] = None):
+        """初始化汇总服务
+
+        Args:
+            materialize: 是否维护物化汇总表，默认读取配置 sync.materialize_merge_summary
+        """
+        if materialize is None:
+            materialize = bool(settings.get('sync.materialize_merge_summary', False))
+        self.materialize = materialize
+
+    def summarize_points(self, points: List[Dict[str, Any]], data_date: str) -> Dict[str, Any]:
+        """单次遍历内存中的库存点计算汇总"""
+        total_points = eu_points = turnover_exceeded = out_of_stock = effective_points = 0
+
+        for point in points or []:
+            total_points += 1
+            if point.get('marketplace') == EU_MARKETPLACE:
+                eu_points += 1
+            if point.get('is_turnover_exceeded'):
+                turnover_exceeded += 1
+            if point.get('is_out_of_stock'):
+                out_of_stock += 1
+            if point.get('is_effective_point'):
+                effective_points += 1
+
+        return self._build_summary(data_date, total_points, eu_points,
+                                   turnover_exceeded, out_of_stock, effective_points)
+
+    def record(self, summary: Dict[str, Any]) -> None:
+        """写入时同步更新物化汇总表（未开启物化时不做任何操作）"""
+        if not self.materialize or not summary:
+            return
+
+        try:
+            schema_registry.ensure(DAILY_SUMMARY_SCHEMA.name)
+            upsert_sql = """
+                INSERT INTO inventory_point_daily_summary
+                (data_date, total_points, eu_points, turnover_exceeded, out_of_stock, effective_points, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, NOW())
+                ON CONFLICT (data_date) DO UPDATE
+                SET total_points = EXCLUDED.total_points,
+                    eu_points = EXCLUDED.eu_points,
+                    turnover_exceeded = EXCLUDED.turnover_exceeded,
+                    out_of_stock = EXCLUDED.out_of_stock,
+                    effective_points = EXCLUDED.effective_points,
+                    updated_at = EXCLUDED.updated_at
+            """
+            db_manager.execute_update(upsert_sql, (
+                summary['data_date'],
+                summary['total_points'],
+                summary['eu_points'],
+                summary['turnover_exceeded'],
+                summary['out_of_stock'],
+                summary['effective_points']
+            ))
+        except Exception as e:
+            logger.warning(f"更新每日合并汇总表失败: {e}")
+
+    def get_summary(self, data_date: str = None, use_materialized: bool = True) -> Dict[str, Any]:
+        """查询指定日期的合并汇总（物化表命中时不扫描 inventory_points）
+
+        Args:
+            use_materialized: 是否优先读取物化表；库存点刚被部分更新、需要重新计算汇总时传 False
+        """
+        if not data_date:
+            data_date = date.today().strftime('%Y-%m-%d')
+
+        if self.materialize and use_materialized:
+            summary = self._load_materialized(data_date)
+            if summary is not None:
+                return summary
+
+        sql = """
+            SELECT COUNT(*) AS total_points,
+                   COUNT(*) FILTER (WHERE marketplace = %s) AS eu_points,
+                   COUNT(*) FILTER (WHERE is_turnover_exceeded = TRUE) AS turnover_exceeded,
+                   COUNT(*) FILTER (WHERE is_out_of_stock = TRUE) AS out_of_stock,
+                   COUNT(*) FILTER (WHERE is_effective_point = TRUE) AS effective_points
+            FROM inventory_points
+            WHERE data_date = %s
+        """
+        row = db_manager.execute_single(sql, (EU_MARKETPLACE, data_date)) or {}
+        return self._build_summary(
+            data_date,
+            row.get('total_points') or 0,
+            row.get('eu_points') or 0,
+            row.get('turnover_exceeded') or 0,
+            row.get('out_of_stock') or 0,
+            row.get('effective_points') or 0
+        )
+
+    def _load_materialized(self, data_date: str) -> Optional[Dict[str, Any]]:
+        """读取物化汇总表，未命中返回None"""
+        try:
+            schema_registry.ensure(DAILY_SUMMARY_SCHEMA.name)
+            row = db_manager.execute_single(
+                "SELECT total_points, eu_points, turnover_exceeded, out_of_stock, effective_points "
+                "FROM inventory_point_daily_summary WHERE data_date = %s",
+                (data_date,)
+            )
+        except Exception as e:
+            logger.warning(f"读取每日合并汇总表失败: {e}")
+            return None
+
+        if not row:
+            return None
+
+        return self._build_summary(
+            data_date,
+            row['total_points'],
+            row['eu_points'],
+            row['turnover_exceeded'],
+            row['out_of_stock'],
+            row['effective_points']
+        )
+
+    @staticmethod
+    def _build_summary(data_date, total_points: int, eu_points: int, turnover_exceeded: int,
+                       out_of_stock: int, effective_points: int) -> Dict[str, Any]:
+        """组装汇总结果（字段与原 get_merge_summary 保持一致）"""
+        return {
+            'data_date': str(data_date),
+            'total_points': total_points,
+            'eu_points': eu_points,
+            'non_eu_points': total_points - eu_points,
+            'turnover_exceeded': turnover_exceeded,
+            'out_of_stock': out_of_stock,
+            'effective_points': effective_points,
+            'effectiveness_rate': round(effective_points / total_points if total_points > 0 else 0, 4)
+        }
+
+
+# 全局汇总服务实例（首次使用时读取配置）
+merge_summary_service = LazyObject(MergeSummaryService)
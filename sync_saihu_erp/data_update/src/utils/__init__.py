@@ -1,4 +1,12 @@
 # utils模块初始化
-from .logging_utils import setup_logging, get_logger
+from .lazy import lazy_exports
 
-__all__ = ['setup_logging', 'get_logger']
\ No newline at end of file
+# 导出名 -> 所在子模块，首次访问时才导入（PEP 562）
+_EXPORTS = {
+    'setup_logging': '.logging_utils',
+    'get_logger': '.logging_utils',
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS, globals())
+
+__all__ = ['setup_logging', 'get_logger']
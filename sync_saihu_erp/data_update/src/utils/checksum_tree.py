@@ -0,0 +1,126 @@
+"""
+分区校验和树
+每条记录的摘要按分区键（例如 日期/站点/店铺）累加到叶子桶，上层节点为子节点之和。
+累加取模 2^64 与记录顺序无关，并且可以逐条增删记录而无需重新计算整棵树；
+两棵树比较时只需沿着摘要不同的节点向下，即可定位到不一致的叶子桶。
+"""
+import hashlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DIGEST_MODULUS = 1 << 64
+FIELD_SEPARATOR = '\x1f'
+
+BucketKey = Tuple[str, ...]
+
+
+def canonical_value(value: Any) -> str:
+    """字段值的规范文本：数值统一保留4位小数，日期为ISO格式，空值为空串"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (Decimal, float)):
+        return format(value, '.4f')
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def field_value(record: Any, field: str) -> Any:
+    """读取字典键或对象属性"""
+    if isinstance(record, dict):
+        return record.get(field)
+    return getattr(record, field, None)
+
+
+class ChecksumTree:
+    """与顺序无关、可增量更新的分区校验和树"""
+
+    def __init__(self, fields: Sequence[str], partition: Sequence[str]):
+        """
+        Args:
+            fields: 参与摘要的字段
+            partition: 分区字段，由粗到细，最后一级为叶子桶
+        """
+        self.fields = tuple(fields)
+        self.partition = tuple(partition)
+        self.leaves: Dict[BucketKey, List[int]] = {}
+        self._nodes: Optional[Dict[BucketKey, Tuple[int, int]]] = None
+        self._children: Dict[BucketKey, List[BucketKey]] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any], fields: Sequence[str],
+                     partition: Sequence[str]) -> 'ChecksumTree':
+        tree = cls(fields, partition)
+        for record in records:
+            tree.add(record)
+        return tree
+
+    def bucket_of(self, record: Any) -> BucketKey:
+        return tuple(canonical_value(field_value(record, field)) for field in self.partition)
+
+    def digest(self, record: Any) -> int:
+        """单条记录的64位摘要"""
+        payload = FIELD_SEPARATOR.join(canonical_value(field_value(record, field)) for field in self.fields)
+        return int.from_bytes(hashlib.md5(payload.encode('utf-8')).digest()[:8], 'big')
+
+    def add(self, record: Any) -> None:
+        self._apply(self.bucket_of(record), self.digest(record), 1)
+
+    def remove(self, record: Any) -> None:
+        self._apply(self.bucket_of(record), -self.digest(record), -1)
+
+    def set_leaf(self, bucket: BucketKey, digest: int, count: int) -> None:
+        """直接设置叶子桶（从存储加载）"""
+        self.leaves[tuple(bucket)] = [digest % DIGEST_MODULUS, count]
+        self._nodes = None
+
+    def _apply(self, bucket: BucketKey, digest: int, count: int) -> None:
+        leaf = self.leaves.setdefault(bucket, [0, 0])
+        leaf[0] = (leaf[0] + digest) % DIGEST_MODULUS
+        leaf[1] += count
+        if not leaf[1]:
+            del self.leaves[bucket]
+        self._nodes = None
+
+    def nodes(self) -> Dict[BucketKey, Tuple[int, int]]:
+        """各层节点的 (摘要, 记录数)：键为分区键前缀，() 为根节点"""
+        if self._nodes is None:
+            nodes: Dict[BucketKey, List[int]] = {}
+            for bucket, (digest, count) in self.leaves.items():
+                for depth in range(len(bucket) + 1):
+                    node = nodes.setdefault(bucket[:depth], [0, 0])
+                    node[0] = (node[0] + digest) % DIGEST_MODULUS
+                    node[1] += count
+            self._nodes = {key: (value[0], value[1]) for key, value in nodes.items()}
+            self._children = {}
+            for key in self._nodes:
+                if key:
+                    self._children.setdefault(key[:-1], []).append(key)
+        return self._nodes
+
+    def node(self, prefix: BucketKey = ()) -> Tuple[int, int]:
+        return self.nodes().get(tuple(prefix), (0, 0))
+
+    def children(self, prefix: BucketKey) -> List[BucketKey]:
+        self.nodes()
+        return self._children.get(tuple(prefix), [])
+
+    def diff(self, other: 'ChecksumTree') -> Tuple[List[BucketKey], int]:
+        """自顶向下比较两棵树，返回 (摘要不一致的叶子桶, 比较的节点数)"""
+        leaf_depth = len(self.partition)
+        divergent: List[BucketKey] = []
+        compared = 0
+        pending: List[BucketKey] = [()]
+        while pending:
+            prefix = pending.pop()
+            compared += 1
+            if self.node(prefix) == other.node(prefix):
+                continue
+            if len(prefix) == leaf_depth:
+                divergent.append(prefix)
+                continue
+            pending.extend(set(self.children(prefix)) | set(other.children(prefix)))
+        return sorted(divergent), compared
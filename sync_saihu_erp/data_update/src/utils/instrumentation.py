@@ -0,0 +1,325 @@
+"""
+同步链路埋点工具
+记录每个阶段的耗时/行数/字节数、API延迟直方图和数据库往返次数，
+支持输出为字典（写入 sync_task_log）和 Prometheus 文本格式
+"""
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Any, List, Optional, Iterator, Tuple
+
+# API延迟直方图桶上界（秒）
+LATENCY_BUCKETS: Tuple[float, ...] = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = 'saihu_sync'
+
+
+class StageStats:
+    """单个阶段的累计统计"""
+
+    __slots__ = ('wall_seconds', 'rows', 'bytes', 'calls')
+
+    def __init__(self):
+        self.wall_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.calls = 0
+
+    def merge(self, other: 'StageStats') -> None:
+        """合并另一份统计"""
+        self.wall_seconds += other.wall_seconds
+        self.rows += other.rows
+        self.bytes += other.bytes
+        self.calls += other.calls
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'wall_seconds': round(self.wall_seconds, 4),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'calls': self.calls,
+            'rows_per_second': round(self.rows / self.wall_seconds, 2) if self.wall_seconds > 0 else 0.0
+        }
+
+
+class LatencyHistogram:
+    """固定桶延迟直方图（Prometheus 累积桶语义在导出时计算）"""
+
+    __slots__ = ('bucket_counts', 'count', 'total', 'errors')
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+    def observe(self, seconds: float, ok: bool = True) -> None:
+        """记录一次观测值"""
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if not ok:
+            self.errors += 1
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        """合并另一份直方图"""
+        for i, value in enumerate(other.bucket_counts):
+            self.bucket_counts[i] += value
+        self.count += other.count
+        self.total += other.total
+        self.errors += other.errors
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数"""
+        if self.count == 0:
+            return 0.0
+        threshold = q * self.count
+        cumulative = 0
+        for i, value in enumerate(self.bucket_counts):
+            cumulative += value
+            if cumulative >= threshold:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float('inf')
+        return float('inf')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_seconds': round(self.total, 4),
+            'avg_seconds': round(self.total / self.count, 4) if self.count else 0.0,
+            'p50_le': self.quantile(0.5),
+            'p95_le': self.quantile(0.95),
+            'buckets': dict(zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], self.bucket_counts))
+        }
+
+
+class SyncRunMetrics:
+    """单次同步任务的埋点数据"""
+
+    def __init__(self, task_id: str, task_type: str = ''):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.started = time.perf_counter()
+        self.wall_seconds = 0.0
+        self.stages: Dict[str, StageStats] = {}
+        self.api_latency: Dict[str, LatencyHistogram] = {}
+        self.db_round_trips = 0
+        self._stage_stack: List[StageStats] = []
+        self._lock = threading.Lock()
+
+    def stage_stats(self, name: str) -> StageStats:
+        """获取（必要时创建）阶段统计"""
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return stats
+
+    def add_bytes(self, size: int) -> None:
+        """把字节数计入当前最内层阶段"""
+        if self._stage_stack:
+            self._stage_stack[-1].bytes += size
+
+    def observe_api(self, endpoint: str, seconds: float, ok: bool) -> None:
+        """记录一次API调用延迟"""
+        with self._lock:
+            histogram = self.api_latency.get(endpoint)
+            if histogram is None:
+                histogram = self.api_latency[endpoint] = LatencyHistogram()
+            histogram.observe(seconds, ok)
+
+    def add_db_round_trips(self, count: int) -> None:
+        """累计数据库往返次数"""
+        with self._lock:
+            self.db_round_trips += count
+
+    def finish(self) -> None:
+        """结束计时"""
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的字典"""
+        return {
+            'task_id': self.task_id,
+            'task_type': self.task_type,
+            'wall_seconds': round(self.wall_seconds, 4),
+            'db_round_trips': self.db_round_trips,
+            'api_calls': sum(h.count for h in self.api_latency.values()),
+            'stages': {name: stats.to_dict() for name, stats in self.stages.items()},
+            'api_latency': {endpoint: h.to_dict() for endpoint, h in self.api_latency.items()}
+        }
+
+
+class MetricsRegistry:
+    """进程级累计指标（用于 Prometheus 文本导出）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs: Dict[str, int] = {}
+        self.stages: Dict[Tuple[str, str], StageStats] = {}
+        self.api_latency: Dict[str, LatencyHistogram] = {}
+        self.db_round_trips: Dict[str, int] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        """注册额外的 Prometheus 文本行生成函数（如调度器资源类别指标）"""
+        self._collectors.append(collector)
+
+    def merge_run(self, run: SyncRunMetrics) -> None:
+        """合并一次任务的埋点数据"""
+        with self._lock:
+            self.runs[run.task_type] = self.runs.get(run.task_type, 0) + 1
+            self.db_round_trips[run.task_type] = self.db_round_trips.get(run.task_type, 0) + run.db_round_trips
+            for name, stats in run.stages.items():
+                key = (run.task_type, name)
+                if key not in self.stages:
+                    self.stages[key] = StageStats()
+                self.stages[key].merge(stats)
+            for endpoint, histogram in run.api_latency.items():
+                if endpoint not in self.api_latency:
+                    self.api_latency[endpoint] = LatencyHistogram()
+                self.api_latency[endpoint].merge(histogram)
+
+    def to_prometheus(self) -> str:
+        """输出 Prometheus 文本格式"""
+        p = METRIC_PREFIX
+        lines: List[str] = []
+
+        with self._lock:
+            lines.append(f'# HELP {p}_runs_total Completed sync runs.')
+            lines.append(f'# TYPE {p}_runs_total counter')
+            for task_type, value in sorted(self.runs.items()):
+                lines.append(f'{p}_runs_total{{task_type="{task_type}"}} {value}')
+
+            lines.append(f'# HELP {p}_db_round_trips_total Database round trips.')
+            lines.append(f'# TYPE {p}_db_round_trips_total counter')
+            for task_type, value in sorted(self.db_round_trips.items()):
+                lines.append(f'{p}_db_round_trips_total{{task_type="{task_type}"}} {value}')
+
+            for metric, attr, help_text in (
+                ('stage_seconds_total', 'wall_seconds', 'Wall time spent per stage.'),
+                ('stage_rows_total', 'rows', 'Rows handled per stage.'),
+                ('stage_bytes_total', 'bytes', 'Bytes handled per stage.'),
+                ('stage_calls_total', 'calls', 'Stage invocations.'),
+            ):
+                lines.append(f'# HELP {p}_{metric} {help_text}')
+                lines.append(f'# TYPE {p}_{metric} counter')
+                for (task_type, stage), stats in sorted(self.stages.items()):
+                    value = getattr(stats, attr)
+                    value = round(value, 6) if isinstance(value, float) else value
+                    lines.append(f'{p}_{metric}{{task_type="{task_type}",stage="{stage}"}} {value}')
+
+            lines.append(f'# HELP {p}_api_latency_seconds API request latency.')
+            lines.append(f'# TYPE {p}_api_latency_seconds histogram')
+            for endpoint, histogram in sorted(self.api_latency.items()):
+                cumulative = 0
+                for bound, value in zip(list(LATENCY_BUCKETS) + ['+Inf'], histogram.bucket_counts):
+                    cumulative += value
+                    lines.append(f'{p}_api_latency_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_api_latency_seconds_sum{{endpoint="{endpoint}"}} {round(histogram.total, 6)}')
+                lines.append(f'{p}_api_latency_seconds_count{{endpoint="{endpoint}"}} {histogram.count}')
+
+            lines.append(f'# HELP {p}_api_errors_total Failed API requests.')
+            lines.append(f'# TYPE {p}_api_errors_total counter')
+            for endpoint, histogram in sorted(self.api_latency.items()):
+                lines.append(f'{p}_api_errors_total{{endpoint="{endpoint}"}} {histogram.errors}')
+
+        for collector in self._collectors:
+            lines.extend(collector())
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str) -> None:
+        """原子写入 Prometheus textfile（供 node_exporter textfile collector 读取）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+_current_run: ContextVar[Optional[SyncRunMetrics]] = ContextVar('sync_run_metrics', default=None)
+
+# 全局累计指标
+metrics_registry = MetricsRegistry()
+
+
+def current_run() -> Optional[SyncRunMetrics]:
+    """获取当前上下文中的任务埋点（未开启时为None）"""
+    return _current_run.get()
+
+
+@contextmanager
+def track_run(task_id: str, task_type: str = '') -> Iterator[SyncRunMetrics]:
+    """在当前上下文中开启一次任务埋点，结束后并入全局累计指标"""
+    run = SyncRunMetrics(task_id, task_type)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        run.finish()
+        _current_run.reset(token)
+        metrics_registry.merge_run(run)
+
+
+class _StageHandle:
+    """阶段句柄，可在阶段内补充行数/字节数"""
+
+    __slots__ = ('stats', 'rows', 'bytes')
+
+    def __init__(self, stats: Optional[StageStats]):
+        self.stats = stats
+        self.rows = 0
+        self.bytes = 0
+
+
+@contextmanager
+def stage(name: str) -> Iterator[_StageHandle]:
+    """记录一个阶段的耗时、行数和字节数；无当前任务时只产生极小开销
+
+    用法::
+
+        with stage('clean') as s:
+            cleaned = clean(rows)
+            s.rows = len(cleaned)
+    """
+    run = _current_run.get()
+    if run is None:
+        yield _StageHandle(None)
+        return
+
+    stats = StageStats()
+    handle = _StageHandle(stats)
+    run._stage_stack.append(stats)
+    started = time.perf_counter()
+    try:
+        yield handle
+    finally:
+        stats.wall_seconds = time.perf_counter() - started
+        run._stage_stack.pop()
+        stats.rows = handle.rows
+        stats.bytes += handle.bytes
+        stats.calls = 1
+        run.stage_stats(name).merge(stats)
+
+
+def record_api_latency(endpoint: str, seconds: float, ok: bool = True, size: int = 0) -> None:
+    """记录API延迟，响应字节数计入当前阶段"""
+    run = _current_run.get()
+    if run is None:
+        return
+    run.observe_api(endpoint, seconds, ok)
+    if size:
+        run.add_bytes(size)
+
+
+def record_db_round_trip(count: int = 1) -> None:
+    """记录数据库往返次数"""
+    run = _current_run.get()
+    if run is not None:
+        run.add_db_round_trips(count)
@@ -0,0 +1,73 @@
+"""
+延迟加载工具
+全局单例和包级导出在首次使用时才构造/导入，缩短命令行脚本的启动时间
+"""
+import importlib
+import threading
+from typing import Any, Callable, Dict, List
+
+
+class LazyObject:
+    """延迟构造的全局单例代理
+
+    模块导入时只保存工厂函数，首次访问属性时才构造实例，之后所有属性读写都转发给该实例。
+    """
+
+    __slots__ = ('_lazy_factory', '_lazy_instance', '_lazy_lock')
+
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, '_lazy_factory', factory)
+        object.__setattr__(self, '_lazy_instance', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def _resolve(self) -> Any:
+        """获取（必要时构造）被代理的实例"""
+        instance = object.__getattribute__(self, '_lazy_instance')
+        if instance is None:
+            with object.__getattribute__(self, '_lazy_lock'):
+                instance = object.__getattribute__(self, '_lazy_instance')
+                if instance is None:
+                    instance = object.__getattribute__(self, '_lazy_factory')()
+                    object.__setattr__(self, '_lazy_instance', instance)
+        return instance
+
+    @property
+    def is_resolved(self) -> bool:
+        """实例是否已构造"""
+        return object.__getattribute__(self, '_lazy_instance') is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._resolve(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self._resolve(), name)
+
+    def __repr__(self) -> str:
+        if not self.is_resolved:
+            return f"<LazyObject {getattr(object.__getattribute__(self, '_lazy_factory'), '__name__', '?')} (未构造)>"
+        return repr(self._resolve())
+
+
+def lazy_exports(package: str, exports: Dict[str, str], namespace: Dict[str, Any]):
+    """生成包级 PEP 562 __getattr__/__dir__：按名称导入子模块属性并缓存到包命名空间
+
+    Args:
+        package: 包名（__name__）
+        exports: 导出名 -> 相对模块名（如 '.oauth_client'）
+        namespace: 包的 globals()
+    """
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name, package), name)
+        namespace[name] = value
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
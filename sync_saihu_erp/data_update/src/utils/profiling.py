@@ -0,0 +1,184 @@
+"""
+同步任务性能剖析工具
+按需为任务运行开启 cProfile CPU 剖析和 tracemalloc 内存分配追踪，
+结果输出到带时间戳的目录；支持每 N 次运行采样一次，便于在生产环境常开
+"""
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from ..config.settings import settings
+from .lazy import LazyObject
+
+logger = logging.getLogger(__name__)
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'on'}
+
+
+class ProfilingConfig:
+    """剖析配置（环境变量优先于 config.yml 的 profiling 段）
+
+    环境变量：
+        SYNC_PROFILE              开启剖析（1/true/yes/on）
+        SYNC_PROFILE_SAMPLE_EVERY 每 N 次运行剖析一次，默认 1
+        SYNC_PROFILE_DIR          输出目录，默认 logs/profiles
+    """
+
+    def __init__(self):
+        env_enabled = os.getenv('SYNC_PROFILE')
+        if env_enabled is not None:
+            self.enabled = env_enabled.strip().lower() in _TRUE_VALUES
+        else:
+            self.enabled = bool(settings.get('profiling.enabled', False))
+
+        self.sample_every = max(1, int(
+            os.getenv('SYNC_PROFILE_SAMPLE_EVERY') or settings.get('profiling.sample_every', 1)
+        ))
+        self.output_dir = os.getenv('SYNC_PROFILE_DIR') or settings.get('profiling.output_dir', 'logs/profiles')
+        self.track_allocations = bool(settings.get('profiling.track_allocations', True))
+        self.top_allocations = int(settings.get('profiling.top_allocations', 25))
+        self.top_functions = int(settings.get('profiling.top_functions', 50))
+        self.traceback_frames = int(settings.get('profiling.traceback_frames', 5))
+
+
+class JobProfiler:
+    """任务剖析器
+
+    同一时刻只剖析一个任务（cProfile/tracemalloc 均为进程级资源），
+    其他并发运行或嵌套调用直接跳过，不阻塞业务。
+    """
+
+    def __init__(self, config: Optional[ProfilingConfig] = None):
+        self.config = config or ProfilingConfig()
+        self._counters: Dict[str, int] = {}
+        self._counter_lock = threading.Lock()
+        self._active_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """是否开启剖析"""
+        return self.config.enabled
+
+    def should_profile(self, job_name: str) -> bool:
+        """按 1/N 采样判断本次运行是否剖析（每个任务的第 1、N+1、2N+1... 次）"""
+        if not self.config.enabled:
+            return False
+        with self._counter_lock:
+            count = self._counters.get(job_name, 0)
+            self._counters[job_name] = count + 1
+        return count % self.config.sample_every == 0
+
+    @contextmanager
+    def profile(self, job_name: str) -> Iterator[Optional[str]]:
+        """剖析一次任务运行，产出结果目录（未采样时为None）"""
+        if not self.should_profile(job_name):
+            yield None
+            return
+
+        if not self._active_lock.acquire(blocking=False):
+            logger.debug(f"已有任务在剖析中，跳过: {job_name}")
+            yield None
+            return
+
+        output_dir = self._make_output_dir(job_name)
+        profiler = cProfile.Profile()
+        started_tracing = False
+        if self.config.track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(self.config.traceback_frames)
+            started_tracing = True
+
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield output_dir
+        finally:
+            profiler.disable()
+            wall_seconds = time.perf_counter() - started
+            try:
+                self._dump(job_name, output_dir, profiler, wall_seconds)
+            except Exception as e:
+                logger.warning(f"剖析结果写入失败: {e}")
+            finally:
+                if started_tracing:
+                    tracemalloc.stop()
+                self._active_lock.release()
+
+    def _make_output_dir(self, job_name: str) -> str:
+        """创建带时间戳的输出目录"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in job_name)
+        path = os.path.join(self.config.output_dir, f"{safe_name}_{timestamp}_{os.getpid()}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _dump(self, job_name: str, output_dir: str, profiler: cProfile.Profile, wall_seconds: float) -> None:
+        """写出 CPU 剖析和内存分配统计"""
+        profiler.dump_stats(os.path.join(output_dir, 'cpu.prof'))
+
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(self.config.top_functions)
+        with open(os.path.join(output_dir, 'cpu_top.txt'), 'w', encoding='utf-8') as f:
+            f.write(stream.getvalue())
+
+        summary: Dict[str, Any] = {
+            'job_name': job_name,
+            'wall_seconds': round(wall_seconds, 4),
+            'sample_every': self.config.sample_every,
+            'profiled_at': datetime.now().isoformat()
+        }
+
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            summary['traced_memory_current'] = current
+            summary['traced_memory_peak'] = peak
+
+            top_stats = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            )).statistics('lineno')[:self.config.top_allocations]
+            with open(os.path.join(output_dir, 'allocations_top.txt'), 'w', encoding='utf-8') as f:
+                for index, stat in enumerate(top_stats, 1):
+                    f.write(f"#{index}: {stat}\n")
+
+        with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        logger.info(f"任务剖析完成: {job_name}, 耗时 {wall_seconds:.2f}s, 输出目录: {output_dir}")
+
+
+# 全局剖析器（首次使用时读取配置）
+job_profiler = LazyObject(JobProfiler)
+
+
+def profiled(job_name: Optional[str] = None) -> Callable:
+    """任务剖析装饰器；未开启剖析时仅多一次计数判断"""
+    def decorator(func: Callable) -> Callable:
+        name = job_name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not job_profiler.enabled:
+                return func(*args, **kwargs)
+            with job_profiler.profile(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def run_profiled_job(target: Any, job_name: str, *args, **kwargs) -> Any:
+    """调度器任务入口：target 可为 'module:function' 文本引用（可被持久化作业存储序列化）"""
+    if isinstance(target, str):
+        from apscheduler.util import ref_to_obj
+        target = ref_to_obj(target)
+    with job_profiler.profile(job_name):
+        return target(*args, **kwargs)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+常驻同步服务 - 替代 continuous_sync_4hours.py 的 4 小时轮询
+各数据集按自身节奏探测变更，仅在数据变化时全量拉取，并提供本地健康检查接口
+"""
+import sys
+import os
+import argparse
+import signal
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.scheduler.sync_daemon import SyncDaemon, build_default_datasets
+from src.scheduler.sync_jobs import SyncJobs
+from src.utils.logging_utils import setup_logging
+
+
+def main():
+    """主函数：启动常驻同步服务，直到收到 SIGINT/SIGTERM"""
+    parser = argparse.ArgumentParser(description='赛狐ERP常驻同步服务')
+    parser.add_argument('--health-port', type=int, default=None,
+                        help="健康检查接口端口，默认读取 daemon.health_port")
+    parser.add_argument('--no-health', action='store_true', help="不启动健康检查接口")
+    parser.add_argument('--no-initial-run', action='store_true', help="启动时不立即执行一轮探测")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    sync_jobs = SyncJobs()
+    daemon = SyncDaemon(build_default_datasets(sync_jobs))
+    if not args.no_health:
+        daemon.serve_health(port=args.health_port)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    daemon.start(run_immediately=not args.no_initial_run)
+    print("🔄 常驻同步服务已启动，按 Ctrl+C 停止")
+
+    try:
+        while not stop_event.wait(1):
+            pass
+    finally:
+        print("\n🛑 正在停止常驻同步服务...")
+        daemon.stop()
+        sync_jobs.close()
+        print("✅ 常驻同步服务已安全退出")
+
+
+if __name__ == "__main__":
+    main()
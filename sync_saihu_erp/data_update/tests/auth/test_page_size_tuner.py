@@ -0,0 +1,141 @@
+"""
+分页页大小自适应测试
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.auth.page_size_tuner import PageSizeTuner
+
+ENDPOINT = '/api/productAnalyze/new/pageList.json'
+
+
+class TestPageSizeTuner(unittest.TestCase):
+    """页大小调整器测试"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.tmpdir.name, 'page_size_state.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def tuner(self, **kwargs):
+        options = dict(enabled=True, state_file=self.state_file, target_seconds=10,
+                       min_size=20, max_size=1000, max_response_bytes=10 ** 7)
+        options.update(kwargs)
+        return PageSizeTuner(**options)
+
+    def pull(self, tuner, pages, default=100):
+        """模拟一次分页抓取：pages 为 (行数, 耗时, 其他参数) 列表，返回本次使用的页大小"""
+        with tuner.pull(ENDPOINT, default) as page_size:
+            for rows, seconds, *extra in pages:
+                tuner.observe(ENDPOINT, page_size, seconds, rows=rows, **(extra[0] if extra else {}))
+        return page_size
+
+    def test_disabled_uses_default(self):
+        tuner = self.tuner(enabled=False)
+        self.pull(tuner, [(100, 0.1)])
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 100), 100)
+
+    def test_grows_at_most_double_per_pull(self):
+        """快速响应时每次抓取最多放大一倍，直到上限"""
+        tuner = self.tuner()
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 100), 100)
+        self.pull(tuner, [(100, 0.5, {'has_more': True})] * 5 + [(40, 0.2)])
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 100), 200)
+        for _ in range(5):
+            size = tuner.page_size_for(ENDPOINT, 100)
+            self.pull(tuner, [(size, 0.5 * size / 100, {'has_more': True})] * 3)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 100), 1000)
+
+    def test_latency_target(self):
+        """每行0.05秒、延迟目标10秒 -> 200行"""
+        tuner = self.tuner()
+        self.pull(tuner, [(150, 7.5, {'has_more': True})], default=150)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 150), 200)
+
+    def test_fixed_overhead_modelled_separately(self):
+        """固定开销2秒 + 每行0.02秒：延迟目标10秒 -> 400行（全部按行分摊会得到更小的页）"""
+        tuner = self.tuner(max_size=2000)
+        self.pull(tuner, [(200, 6.0, {'has_more': True}), (200, 6.0, {'has_more': True}), (50, 3.0)], default=200)
+        state = tuner.states[ENDPOINT]
+        self.assertAlmostEqual(state.overhead_seconds, 2.0, places=6)
+        self.assertAlmostEqual(state.seconds_per_row, 0.02, places=6)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 200), 400)
+
+    def test_small_page_does_not_collapse_learned_size(self):
+        """已学到500行后，抓取中出现只有1行的页不会把页大小压到下限"""
+        tuner = self.tuner(max_size=500)
+        for _ in range(3):
+            size = tuner.page_size_for(ENDPOINT, 500)
+            self.pull(tuner, [(size, 0.5 + 0.01 * size, {'has_more': True})] * 3 + [(100, 1.5)], default=500)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 500), 500)
+
+        self.pull(tuner, [(1, 0.51)], default=500)
+        self.pull(tuner, [(1, 0.51)], default=500)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 500), 500)
+
+    def test_requests_outside_pull_ignored(self):
+        """变更探测等不在分页抓取中的请求不计入观测"""
+        tuner = self.tuner()
+        tuner.observe(ENDPOINT, 20, 0.5, rows=20, has_more=True)
+        self.assertNotIn(ENDPOINT, tuner.states)
+
+    def test_unobserved_requests_ignored(self):
+        """抓取过程中只取1条的总数请求不计入观测"""
+        tuner = self.tuner()
+        with tuner.pull(ENDPOINT, 100):
+            with tuner.unobserved():
+                tuner.observe(ENDPOINT, 1, 0.5, rows=1, has_more=True)
+        self.assertNotIn(ENDPOINT, tuner.states)
+
+    def test_response_bytes_limit(self):
+        tuner = self.tuner(max_response_bytes=50000)
+        with tuner.pull(ENDPOINT, 100) as size:
+            tuner.observe(ENDPOINT, size, 0.1, size_bytes=100000, rows=100, has_more=True)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 100), 50)
+
+    def test_server_truncation_sets_limit(self):
+        """还有后续页但返回行数少于请求页大小：服务端上限"""
+        tuner = self.tuner()
+        self.pull(tuner, [(200, 0.5, {'has_more': True})], default=500)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 500), 200)
+        self.pull(tuner, [(200, 0.2, {'has_more': True})], default=500)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 500), 200)
+
+    def test_last_page_is_not_truncation(self):
+        tuner = self.tuner()
+        self.pull(tuner, [(30, 0.1)])
+        self.assertIsNone(tuner.states[ENDPOINT].server_limit)
+
+    def test_timeout_and_rejection_back_off(self):
+        tuner = self.tuner()
+        self.pull(tuner, [(100, 1, {'has_more': True})])
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 100), 200)
+        self.pull(tuner, [(200, 2, {'has_more': True}), (0, 60, {'timed_out': True})])
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 100), 100)
+
+        tuner = self.tuner(state_file='')
+        with tuner.pull(ENDPOINT, 400):
+            tuner.observe(ENDPOINT, 400, 1, rejected=True)
+        self.assertEqual(tuner.page_size_for(ENDPOINT, 400), 200)
+        self.assertEqual(tuner.states[ENDPOINT].server_limit, 200)
+
+    def test_state_persisted(self):
+        """抓取结束时保存状态，重新加载沿用"""
+        tuner = self.tuner()
+        self.pull(tuner, [(100, 0.5, {'has_more': True})])
+        with open(self.state_file, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)[ENDPOINT]['page_size'], 200)
+        self.assertEqual(self.tuner().page_size_for(ENDPOINT, 100), 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+API请求对冲测试
+"""
+
+import threading
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.auth.request_hedger import RequestHedger
+from src.utils.instrumentation import track_run
+
+ENDPOINT = '/api/productAnalyze/new/pageList.json'
+
+
+class FakeLimiter:
+    """可控的限速器"""
+
+    def __init__(self, available=True):
+        self.available = available
+        self.calls = 0
+        self.acquired = threading.Event()
+
+    def acquire(self, timeout=None):
+        self.calls += 1
+        self.acquired.set()
+        return self.available
+
+
+class TestRequestHedger(unittest.TestCase):
+    """请求对冲测试"""
+
+    def hedger(self, limiter=None, **kwargs):
+        options = dict(enabled=True, endpoints=[ENDPOINT], min_samples=3, min_delay=0.1, workers=4,
+                       rate_limiter=limiter or FakeLimiter())
+        options.update(kwargs)
+        hedger = RequestHedger(**options)
+        # 预热：积累快速请求的延迟样本（p95 落在 0.1 秒桶）
+        for _ in range(3):
+            hedger.call(ENDPOINT, lambda: 'warm')
+        return hedger
+
+    def hedge_with(self, hedger, hedge):
+        """按提交顺序区分请求：第一次提交执行调用方的 send（原请求），之后的对冲请求执行 hedge"""
+        submit = hedger._submit
+        submitted = []
+
+        def labelled(endpoint, send):
+            submitted.append(endpoint)
+            return submit(endpoint, send if len(submitted) == 1 else hedge)
+
+        hedger._submit = labelled
+        return submitted
+
+    def blocked_until(self, event, result='primary'):
+        """在 event 触发前不返回的请求（超时只为避免测试失败时线程悬挂）"""
+        def send():
+            event.wait(5)
+            return result
+        return send
+
+    def test_disabled_or_not_allowlisted_calls_directly(self):
+        hedger = RequestHedger(enabled=False, endpoints=[ENDPOINT], rate_limiter=FakeLimiter())
+        self.assertEqual(hedger.call(ENDPOINT, lambda: 'ok'), 'ok')
+        self.assertEqual(hedger.latency, {})
+
+        hedger = self.hedger()
+        submitted = self.hedge_with(hedger, lambda: 'hedge')
+        self.assertEqual(hedger.call('/api/write.json', lambda: 'primary'), 'primary')
+        self.assertEqual(submitted, [])
+
+    def test_no_hedge_before_enough_samples(self):
+        hedger = self.hedger(min_samples=10)
+        self.assertIsNone(hedger.hedge_delay(ENDPOINT))
+        submitted = self.hedge_with(hedger, lambda: 'hedge')
+        self.assertEqual(hedger.call(ENDPOINT, lambda: 'primary'), 'primary')
+        self.assertEqual(submitted, [])
+
+    def test_slow_request_is_hedged(self):
+        """超过 p95 未返回时对冲，对冲先返回则胜出"""
+        limiter = FakeLimiter()
+        hedger = self.hedger(limiter)
+        self.assertEqual(hedger.hedge_delay(ENDPOINT), 0.1)
+        release = threading.Event()
+        submitted = self.hedge_with(hedger, lambda: 'hedge')
+
+        # 原请求在对冲胜出、调用返回之后才结束
+        self.assertEqual(hedger.call(ENDPOINT, self.blocked_until(release)), 'hedge')
+        self.assertEqual(len(submitted), 2)
+        self.assertEqual(limiter.calls, 1)
+
+        # 原请求结束后计入节省时间；shutdown 等待线程池中的请求（及其回调）完成
+        release.set()
+        hedger.shutdown()
+        stats = hedger.to_dict()[ENDPOINT]
+        self.assertEqual((stats['issued'], stats['won']), (1, 1))
+        self.assertGreater(stats['saved_seconds'], 0)
+
+    def test_skip_hedge_without_rate_budget(self):
+        limiter = FakeLimiter(available=False)
+        hedger = self.hedger(limiter)
+        submitted = self.hedge_with(hedger, lambda: 'hedge')
+        # 原请求在对冲申请额度之后才返回
+        self.assertEqual(hedger.call(ENDPOINT, self.blocked_until(limiter.acquired)), 'primary')
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual(hedger.to_dict()[ENDPOINT]['skipped'], 1)
+
+    def test_failed_attempt_falls_back_to_other(self):
+        """对冲请求失败时使用原请求的结果"""
+        hedger = self.hedger()
+        hedge_failed = threading.Event()
+
+        def hedge():
+            hedge_failed.set()
+            raise ConnectionError('reset')
+
+        self.hedge_with(hedger, hedge)
+        self.assertEqual(hedger.call(ENDPOINT, self.blocked_until(hedge_failed)), 'primary')
+        self.assertEqual(hedger.to_dict()[ENDPOINT]['won'], 0)
+
+    def test_shutdown_releases_threads(self):
+        """shutdown 关闭线程池，之后的对冲请求重新创建线程池"""
+        hedger = self.hedger()
+        self.assertEqual(hedger.call(ENDPOINT, lambda: 'ok'), 'ok')
+        executor = hedger._executor
+        hedger.shutdown()
+        self.assertIsNone(hedger._executor)
+        self.assertTrue(executor._shutdown)
+        self.assertEqual(hedger.call(ENDPOINT, lambda: 'ok'), 'ok')
+        hedger.shutdown()
+
+    def test_context_propagated_to_worker_threads(self):
+        """线程池中的请求仍计入当前任务埋点"""
+        from src.utils.instrumentation import current_run
+        hedger = self.hedger()
+        with track_run('t1', 'test') as run:
+            self.assertIs(hedger.call(ENDPOINT, current_run), run)
+
+    def test_prometheus_lines(self):
+        hedger = self.hedger()
+        release = threading.Event()
+        self.hedge_with(hedger, lambda: 'hedge')
+        hedger.call(ENDPOINT, self.blocked_until(release))
+        release.set()
+        hedger.shutdown()
+        text = '\n'.join(hedger.to_prometheus())
+        self.assertIn(f'saihu_sync_api_hedges_total{{endpoint="{ENDPOINT}"}} 1', text)
+
+if __name__ == '__main__':
+    unittest.main()
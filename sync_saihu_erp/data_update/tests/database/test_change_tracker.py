@@ -0,0 +1,69 @@
+"""
+ASIN 变更跟踪测试
+"""
+
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.database.change_tracker import DirtyAsinTracker
+from src.database.connection import DatabaseManager
+
+
+@patch('src.database.change_tracker.schema_registry')
+@patch('src.database.change_tracker.db_manager')
+class TestDirtyAsinTracker(unittest.TestCase):
+    """变更标记读写测试"""
+
+    def test_clear_only_removes_loaded_marks(self, mock_db, mock_registry):
+        """只清除读取时的标记版本，合并期间重新标记的ASIN保留"""
+        tracker = DirtyAsinTracker()
+
+        tracker.clear('2025-08-01', {'B01': 't1', 'B02': 't2'})
+
+        sql, params = mock_db.execute_update.call_args[0]
+        self.assertIn('d.marked_at = m.marked_at', sql)
+        self.assertEqual(params, (['B01', 'B02'], ['t1', 't2'], '2025-08-01'))
+
+    def test_clear_without_marks_clears_date(self, mock_db, mock_registry):
+        """全量合并后清除当天全部标记"""
+        DirtyAsinTracker().clear('2025-08-01')
+
+        self.assertEqual(mock_db.execute_update.call_args[0][1], ('2025-08-01',))
+
+
+class TestProductAnalyticsUpsertTracking(unittest.TestCase):
+    """产品分析UPSERT记录变化的ASIN"""
+
+    @patch('src.services.analytics_rollup_service.analytics_rollup_service')
+    @patch('src.database.change_tracker.dirty_asin_tracker')
+    def test_upsert_marks_changed_rows_in_same_statement(self, mock_tracker, mock_rollup):
+        """只在值变化时更新，并在同一语句中写入变更标记"""
+        manager = DatabaseManager.__new__(DatabaseManager)
+        saved = [
+            SimpleNamespace(asin='B01', sku='S1', data_date='2025-08-01', sales_amount=1),
+            SimpleNamespace(asin='B01', sku='S1', data_date='2025-08-01', sales_amount=2),
+            SimpleNamespace(asin='B02', sku='S2', data_date='2025-08-01', sales_amount=3),
+        ]
+
+        with patch.object(DatabaseManager, 'execute_values', return_value=[('B02', date(2025, 8, 1))]) as mock_values:
+            saved_count = manager.batch_save_product_analytics(saved)
+
+        sql, rows = mock_values.call_args[0]
+        self.assertIn('IS DISTINCT FROM', sql)
+        self.assertIn('inventory_merge_dirty_asins', sql)
+        self.assertTrue(mock_values.call_args[1]['fetch'])
+        self.assertEqual(saved_count, 2)
+        self.assertEqual([row[5] for row in rows], [2, 3])
+        self.assertEqual([item.asin for item in mock_rollup.record_saved.call_args[0][0]], ['B02'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+数据库连接池测试
+"""
+
+import threading
+import time
+import unittest
+from threading import Condition, Lock
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.database.connection import DatabaseManager
+
+
+def make_manager(pool_size=1, max_overflow=0, pool_timeout=1.0):
+    """构造独立的连接管理器（不连接数据库）"""
+    manager = object.__new__(DatabaseManager)
+    manager._connection_pool = []
+    manager._pool_lock = Lock()
+    manager._pool_available = Condition(manager._pool_lock)
+    manager._pool_size = pool_size
+    manager._max_connections = pool_size + max_overflow
+    manager._pool_timeout = pool_timeout
+    manager._current_connections = 0
+    return manager
+
+
+def fake_connection():
+    return SimpleNamespace(status=1, closed=0, close=lambda: None)
+
+
+@patch.object(DatabaseManager, '_create_connection', side_effect=lambda: fake_connection())
+class TestConnectionPool(unittest.TestCase):
+    """连接池上限与等待"""
+
+    def test_waits_for_returned_connection(self, mock_create):
+        """连接数已达上限时等待其他线程归还，而不是直接失败"""
+        manager = make_manager(pool_size=1, pool_timeout=2.0)
+        held = manager.get_connection()
+
+        timer = threading.Timer(0.1, manager.return_connection, args=(held,))
+        timer.start()
+        started = time.perf_counter()
+        connection = manager.get_connection()
+        timer.join()
+
+        self.assertIs(connection, held)
+        self.assertGreaterEqual(time.perf_counter() - started, 0.05)
+        self.assertEqual(mock_create.call_count, 1)
+
+    def test_raises_after_pool_timeout(self, mock_create):
+        """等待超过 pool_timeout 仍无可用连接时报错"""
+        manager = make_manager(pool_size=1, pool_timeout=0.1)
+        manager.get_connection()
+
+        with self.assertRaises(Exception):
+            manager.get_connection()
+
+    def test_overflow_connections_closed_on_return(self, mock_create):
+        """高峰期临时创建的连接归还时关闭，只保留 pool_size 个空闲连接"""
+        manager = make_manager(pool_size=1, max_overflow=1)
+        first, second = manager.get_connection(), manager.get_connection()
+
+        manager.return_connection(first)
+        manager.return_connection(second)
+
+        self.assertEqual(manager._connection_pool, [first])
+        self.assertEqual(manager._current_connections, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
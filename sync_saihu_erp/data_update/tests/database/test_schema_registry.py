@@ -0,0 +1,79 @@
+"""
+表结构注册中心测试
+"""
+
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.database.schema_registry import SchemaRegistry, TableSchema
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    """表结构注册中心测试"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.db = MagicMock()
+        self.registry = SchemaRegistry(self.db)
+        self.registry.register(TableSchema(
+            name='demo',
+            columns={'id': 'SERIAL PRIMARY KEY', 'asin': 'VARCHAR(20)', 'qty': 'INTEGER DEFAULT 0'},
+            indexes={'idx_demo_asin': 'CREATE INDEX IF NOT EXISTS idx_demo_asin ON demo(asin)'},
+            optional_indexes={'uq_demo': 'CREATE UNIQUE INDEX IF NOT EXISTS uq_demo ON demo(asin)'}
+        ))
+
+    def test_missing_table_created_once(self):
+        """缺表时创建，之后的调用不再访问数据库"""
+        self.db.load_schema_catalog.return_value = ({}, {})
+
+        self.registry.ensure('demo')
+        self.registry.ensure('demo')
+
+        self.db.load_schema_catalog.assert_called_once_with(['demo'])
+        script = self.db.execute_script.call_args[0][0]
+        self.assertIn('CREATE TABLE IF NOT EXISTS demo', script)
+        self.assertIn('idx_demo_asin', script)
+        self.assertTrue(self.registry.has_index('demo', 'uq_demo'))
+
+    def test_existing_table_only_adds_missing_columns(self):
+        """表已存在时只补齐缺失的列"""
+        self.db.load_schema_catalog.return_value = (
+            {'demo': {'id', 'asin'}},
+            {'demo': {'idx_demo_asin', 'uq_demo'}}
+        )
+
+        self.registry.ensure('demo')
+
+        script = self.db.execute_script.call_args[0][0]
+        self.assertNotIn('CREATE TABLE', script)
+        self.assertIn('ADD COLUMN IF NOT EXISTS qty INTEGER DEFAULT 0', script)
+        self.db.execute_update.assert_not_called()
+
+    def test_optional_index_failure_is_tolerated(self):
+        """可选索引创建失败不影响表结构就绪"""
+        self.db.load_schema_catalog.return_value = (
+            {'demo': {'id', 'asin', 'qty'}},
+            {'demo': {'idx_demo_asin'}}
+        )
+        self.db.execute_update.side_effect = Exception('duplicate key')
+
+        self.registry.ensure('demo')
+
+        self.db.execute_script.assert_not_called()
+        self.assertTrue(self.registry.is_ready('demo'))
+        self.assertFalse(self.registry.has_index('demo', 'uq_demo'))
+
+    def test_unregistered_table_raises(self):
+        """未注册的表抛出异常"""
+        with self.assertRaises(KeyError):
+            self.registry.ensure('unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+库存点指标计算测试
+"""
+
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.inventory.enrichment import enrich_points, parse_price, _parse_price_text
+
+
+class TestEnrichPoints(unittest.TestCase):
+    """单次遍历指标计算测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.point = {
+            'asin': 'B01TEST001',
+            'fba_available': 100,
+            'fba_inbound': 50,
+            'local_available': 30,
+            'average_sales': 4,
+            'sales_7days': 28,
+            'average_price': 'US$25.00',
+            'ad_impressions': 10000,
+            'ad_clicks': 300,
+            'ad_spend': 105.0,
+            'ad_order_count': 12,
+            'ad_sales': 420.0
+        }
+    
+    def test_computes_ad_and_analysis_metrics_in_place(self):
+        """广告指标、库存分析指标和状态标识写回原字典"""
+        points = [self.point]
+        result = enrich_points(points)
+        
+        self.assertIs(result, points)
+        self.assertIs(result[0], self.point)
+        self.assertEqual(self.point['ad_ctr'], 0.03)
+        self.assertEqual(self.point['ad_cvr'], 0.04)
+        self.assertEqual(self.point['acoas'], 0.15)
+        self.assertEqual(self.point['ad_cpc'], 0.35)
+        self.assertEqual(self.point['ad_roas'], 4.0)
+        self.assertEqual(self.point['total_inventory'], 180)
+        self.assertEqual(self.point['turnover_days'], 45.0)
+        self.assertEqual(self.point['daily_sales_amount'], 100.0)
+        self.assertFalse(self.point['is_turnover_exceeded'])
+        self.assertFalse(self.point['is_low_inventory'])
+        self.assertFalse(self.point['is_out_of_stock'])
+        self.assertFalse(self.point['is_zero_sales'])
+        self.assertTrue(self.point['is_effective_point'])
+    
+    def test_no_sales_and_invalid_values(self):
+        """无销量时周转天数为999；字段类型异常时保留原数据且不中断批次"""
+        no_sales = {'fba_available': 0, 'fba_inbound': 5, 'average_sales': 0}
+        invalid = {'fba_available': 'abc', 'average_sales': 1}
+        
+        enrich_points([invalid, no_sales])
+        
+        self.assertEqual(no_sales['turnover_days'], 999)
+        self.assertTrue(no_sales['is_turnover_exceeded'])
+        self.assertTrue(no_sales['is_out_of_stock'])
+        self.assertEqual(no_sales['acoas'], 0.0)
+        self.assertNotIn('turnover_days', invalid)
+        self.assertEqual(invalid['ad_ctr'], 0.0)
+    
+    def test_parse_price_is_memoised(self):
+        """相同价格文本只解析一次"""
+        _parse_price_text.cache_clear()
+        for _ in range(3):
+            self.assertEqual(parse_price('€15.50'), 15.5)
+        self.assertEqual(_parse_price_text.cache_info().hits, 2)
+        self.assertEqual(parse_price(None), 0.0)
+        self.assertEqual(parse_price('1.2.3'), 0.0)
+        self.assertEqual(parse_price(19.9), 19.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+inventory_deals 滑动窗口回填测试
+"""
+
+import importlib.util
+import random
+import unittest
+from datetime import date, timedelta
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+# 快照生成脚本位于仓库根目录
+SCRIPT_PATH = os.path.join(project_root, '..', '..', 'generate_inventory_deals_full.py')
+spec = importlib.util.spec_from_file_location('generate_inventory_deals_full', SCRIPT_PATH)
+deals_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(deals_module)
+
+
+def make_records(asin, marketplace_id, start, days, seed):
+    """构造一个 ASIN×站点 的按日期升序数据：随机缺失日期，部分日期有多条记录（不同SKU）"""
+    rng = random.Random(seed)
+    records = []
+    for offset in range(days):
+        if rng.random() < 0.3:
+            continue
+        for sku_index in range(2 if rng.random() < 0.2 else 1):
+            records.append({
+                'asin': asin,
+                'data_date': start + timedelta(days=offset),
+                'marketplace_id': marketplace_id,
+                'dev_name': f'dev-{sku_index}',
+                'spu_name': f'spu-{offset}-{sku_index}',
+                'fba_inventory': rng.randint(0, 50),
+                'total_inventory': rng.randint(0, 500),
+                # 金额取0.25的整数倍
+                'sales_amount': rng.randint(0, 400) * 0.25,
+                'sales_quantity': rng.randint(0, 10),
+                'impressions': rng.randint(0, 1000),
+                'clicks': rng.randint(0, 50),
+                'ad_cost': rng.randint(0, 80) * 0.25,
+                'ad_orders': rng.randint(0, 5),
+                'ad_conversion_rate': 0,
+                'acos': 0,
+            })
+    return records
+
+
+def per_date_deals(generator, asin_data, target_date):
+    """逐日生成路径：T-60..T 内至少5条记录，且四个时间窗口都有数据"""
+    data_start_date = target_date - timedelta(days=deals_module.LOOKBACK_DAYS)
+    in_range = [r for r in asin_data if data_start_date <= r['data_date'] <= target_date]
+    if len(in_range) < deals_module.MIN_RECORD_COUNT:
+        return []
+    deals = [generator.aggregate_time_window(in_range, window, target_date) for window in deals_module.TIME_WINDOWS]
+    return deals if all(deals) else []
+
+
+class TestSlidingWindowBackfill(unittest.TestCase):
+    """滑动窗口回填与逐日生成结果一致"""
+
+    def test_matches_per_date_path(self):
+        """每个快照日期的记录（含窗口累加值、最新记录字段、记录数）与逐日生成完全相同"""
+        generator = deals_module.InventoryDealsGenerator()
+        start_date, end_date = date(2025, 7, 1), date(2025, 7, 30)
+        snapshot_dates = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        data_start = start_date - timedelta(days=deals_module.LOOKBACK_DAYS)
+        span_days = (end_date - data_start).days + 1
+
+        groups = [
+            make_records('B01', 'ATVPDKIKX0DER', data_start, span_days, seed=1),
+            make_records('B02', 'A1PA6795UKMFR9', data_start, span_days, seed=2),
+            # 数据稀疏：部分快照日期不满足入选条件
+            make_records('B03', 'ATVPDKIKX0DER', end_date - timedelta(days=12), 13, seed=3),
+        ]
+
+        compared = 0
+        for asin_data in groups:
+            sliding = generator.slide_time_windows(asin_data, snapshot_dates)
+            for target_date in snapshot_dates:
+                expected = per_date_deals(generator, asin_data, target_date)
+                self.assertEqual(sliding.get(target_date, []), expected, f"{asin_data[0]['asin']} @ {target_date}")
+                compared += len(expected)
+
+        self.assertGreater(compared, 0)
+
+    def test_decimal_amounts_sum_exactly(self):
+        """金额不是二进制可精确表示的小数时，窗口累加值与逐条累加一致，无金额的窗口恰好为0"""
+        generator = deals_module.InventoryDealsGenerator()
+        target_date = date(2025, 7, 30)
+        data_start = target_date - timedelta(days=deals_module.LOOKBACK_DAYS)
+        asin_data = make_records('B01', 'ATVPDKIKX0DER', data_start, deals_module.LOOKBACK_DAYS + 1, seed=4)
+        for record in asin_data:
+            # 前期有金额、最近7天金额为0
+            recent = record['data_date'] > target_date - timedelta(days=7)
+            record['sales_amount'] = 0.0 if recent else 0.1 * (record['data_date'].day % 7 + 1)
+            record['ad_cost'] = 0.0 if recent else 0.07 * (record['data_date'].day % 5 + 1)
+
+        sliding = generator.slide_time_windows(asin_data, [target_date])[target_date]
+
+        self.assertEqual(sliding, per_date_deals(generator, asin_data, target_date))
+        t7 = next(deal for deal in sliding if deal['time_window'] == 'T7')
+        self.assertEqual((t7['total_sales_amount'], t7['total_ad_spend']), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+"""
+库存点合并 SQL 下推引擎测试
+在 SQLite 中执行合并查询，与 Python 合并引擎（InventoryMerger + 分析指标计算）的结果逐字段比对
+"""
+
+import json
+import sqlite3
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.inventory.merger import InventoryMerger
+from src.inventory.sql_merger import (
+    SqlInventoryMerger, SqliteDialect, OUTPUT_COLUMNS, TEXT_FIELDS, NUMERIC_FIELDS
+)
+from src.processors.inventory_merge_processor import InventoryMergeProcessor
+
+TEXT_COLUMNS = {'asin', 'product_name', 'sku', 'category', 'sales_person', 'product_tag', 'dev_name',
+                'marketplace', 'store', 'inventory_point_name', 'average_price', 'sales_amount',
+                'net_sales', 'refund_rate', 'merge_type', 'merged_stores'}
+FLAG_COLUMNS = {'is_turnover_exceeded', 'is_out_of_stock', 'is_zero_sales', 'is_low_inventory',
+                'is_effective_point'}
+
+
+def product(asin, store, marketplace, **values):
+    """构造一条合并输入记录"""
+    row = {
+        'asin': asin, 'product_name': f'Product {asin}', 'sku': f'SKU-{asin}-{store}',
+        'category': 'Home', 'sales_person': 'Alice', 'product_tag': '', 'dev_name': 'Bob',
+        'marketplace': marketplace, 'store': store, 'average_price': '$19.99',
+        'sales_amount': '1200.5', 'net_sales': '1100', 'refund_rate': '0.02',
+    }
+    row.update({field: 0 for field in NUMERIC_FIELDS})
+    row.update(values)
+    return row
+
+
+# 覆盖：欧盟多前缀/同前缀取最大值/并列取先出现者、英国视为非欧盟、
+# 非欧盟单店/单前缀多站点/多前缀/无前缀、无效记录
+FIXTURE = [
+    product('B0EU000001', '01 Alpha-DE', 'DE', fba_available=100, fba_inbound=20, local_available=5,
+            sales_7days=70, average_sales=10, ad_impressions=1000, ad_clicks=40, ad_spend=25.5,
+            ad_order_count=4, ad_sales=80),
+    product('B0EU000001', '01 Alpha-FR', 'FR', fba_available=150, fba_inbound=0, local_available=9,
+            sales_7days=35, average_sales=5, ad_impressions=500, ad_clicks=20, ad_spend=10,
+            ad_order_count=2, ad_sales=40),
+    product('B0EU000001', '02 Beta-IT', 'IT', fba_available=30, fba_inbound=30, local_available=12,
+            average_sales=3, average_price='EUR 12.50', ad_impressions=10, ad_clicks=0),
+    product('B0EU000001', '02 Beta-ES', 'ES', fba_available=60, fba_inbound=0, local_available=1,
+            average_sales=4),
+    product('B0EU000001', '01 Alpha-UK', 'UK', fba_available=40, fba_inbound=10, average_sales=2,
+            ad_impressions=100, ad_clicks=10, ad_spend=5, ad_order_count=1, ad_sales=30),
+    product('B0EU000002', 'Gamma-DE', 'DE', fba_available=0, fba_inbound=0, average_price=''),
+    product('B0US000001', 'Shop7-US', 'US', fba_available=500, fba_inbound=50, local_available=30,
+            sales_7days=140, average_sales=20, order_count=130, ad_impressions=3000, ad_clicks=150,
+            ad_spend=60, ad_order_count=15, ad_sales=450),
+    product('B0US000002', 'Shop7-US', 'US', fba_available=10, average_sales=0.5, average_price='9'),
+    product('B0US000002', 'Shop7 -us', 'US', fba_available=20, fba_inbound=5, average_sales=0.25),
+    product('B0US000003', 'Shop7-US', 'US', fba_available=1, average_sales=0),
+    product('B0US000003', 'Shop8-US', 'US', fba_inbound=3, sales_7days=1),
+    product('B0US000004', '-US', 'US', fba_available=5),
+    product('B0US000004', '-US', 'US', fba_available=7, average_sales=1),
+    product('B0CA000001', 'NoDashStore', 'CA', fba_available=9),
+    product('B0JP000001', 'Shop1-JP', 'JP', fba_available=0, fba_inbound=0, average_sales=0),
+    product('SHORT', 'Shop1-US', 'US', fba_available=3),
+    product('B0XX000001', '', 'US', fba_available=3),
+    product('B0XX000002', 'Shop1-US', '', fba_available=3),
+]
+
+
+class TestSqlInventoryMerger(unittest.TestCase):
+    """SQL 合并引擎与 Python 合并引擎的一致性测试"""
+
+    def setUp(self):
+        self.engine = SqlInventoryMerger(SqliteDialect())
+        self.conn = sqlite3.connect(':memory:')
+        self.engine.dialect.prepare(self.conn)
+
+        columns = ', '.join(['src_order INTEGER'] + [f'{f} TEXT' for f in TEXT_FIELDS]
+                            + [f'{f} REAL' for f in NUMERIC_FIELDS])
+        self.conn.execute(f"CREATE TABLE merge_source ({columns})")
+        self.load_source(FIXTURE)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def load_source(self, rows):
+        """写入合并输入表，src_order 为记录顺序"""
+        fields = TEXT_FIELDS + NUMERIC_FIELDS
+        self.conn.executemany(
+            f"INSERT INTO merge_source (src_order, {', '.join(fields)}) VALUES ({', '.join('?' * (len(fields) + 1))})",
+            [(i,) + tuple(row[f] for f in fields) for i, row in enumerate(rows)]
+        )
+
+    def python_points(self, rows):
+        """Python 引擎：清洗 -> 合并及指标计算，转换为 inventory_points 列"""
+        processor = InventoryMergeProcessor()
+        cleaned = processor._clean_data([dict(row) for row in rows])
+        points = {}
+        for point in InventoryMerger().merge_inventory_points(cleaned):
+            row = {column: point.get(column, '' if column in TEXT_COLUMNS else 0) for column in OUTPUT_COLUMNS}
+            row['merge_type'] = point.get('_merge_type', '')
+            row['merged_stores'] = json.dumps(point.get('_merged_stores', []), ensure_ascii=False)
+            row['store_count'] = point.get('_store_count', 1)
+            points[(row['asin'], row['marketplace'])] = row
+        return points
+
+    def sql_points(self):
+        cursor = self.conn.cursor()
+        rows = self.engine.select_points(cursor, 'SELECT * FROM merge_source')
+        return {(row['asin'], row['marketplace']): row for row in rows}
+
+    def assert_points_equal(self, expected, actual):
+        self.assertEqual(sorted(expected), sorted(actual))
+        for key, expected_row in expected.items():
+            for column in OUTPUT_COLUMNS:
+                want, got = expected_row[column], actual[key][column]
+                message = f"{key} {column}"
+                if column in FLAG_COLUMNS:
+                    self.assertEqual(bool(want), bool(got), message)
+                elif column in TEXT_COLUMNS:
+                    self.assertEqual(str(want), str(got), message)
+                else:
+                    self.assertAlmostEqual(float(want), float(got), places=6, msg=message)
+
+    def test_matches_python_engine(self):
+        """固定样例上两种引擎输出完全一致"""
+        expected = self.python_points(FIXTURE)
+        self.assertIn(('B0EU000001', '欧盟'), expected)
+        self.assertIn(('B0US000003', 'US'), expected)
+        self.assert_points_equal(expected, self.sql_points())
+
+    def test_eu_representative_and_stores(self):
+        """欧盟每个前缀取 FBA可用+在途 最大的站点，合并店铺按前缀首次出现顺序"""
+        point = self.sql_points()[('B0EU000001', '欧盟')]
+        self.assertEqual(point['fba_available'], 150 + 30)
+        self.assertEqual(point['local_available'], 12)
+        self.assertEqual(point['sku'], 'SKU-B0EU000001-01 Alpha-FR')
+        self.assertEqual(json.loads(point['merged_stores']), ['01 Alpha', '02 Beta'])
+
+    def test_non_eu_store_naming(self):
+        """非欧盟合并店铺名：单前缀 / 多前缀 / 无前缀"""
+        points = self.sql_points()
+        self.assertEqual(points[('B0US000002', 'US')]['store'], 'Shop7-US')
+        self.assertEqual(points[('B0US000003', 'US')]['store'], 'US多店铺汇总')
+        self.assertEqual(points[('B0US000004', 'US')]['store'], 'US汇总')
+        self.assertEqual(points[('B0US000003', 'US')]['store_count'], 2)
+        self.assertNotIn(('B0CA000001', 'CA'), points)
+
+    def test_merge_into_product_analytics(self):
+        """merge_into 由 product_analytics 直接写入 inventory_points，可只替换指定ASIN"""
+        self.conn.execute(
+            "CREATE TABLE product_analytics (id INTEGER PRIMARY KEY, asin TEXT, title TEXT, sku TEXT, "
+            "dev_name TEXT, marketplace_id TEXT, shop_id TEXT, sales_amount REAL, refund_rate REAL, "
+            "order_count INTEGER, ad_sales REAL, data_date TEXT)"
+        )
+        self.conn.executemany(
+            "INSERT INTO product_analytics (asin, title, sku, dev_name, marketplace_id, shop_id, sales_amount, "
+            "refund_rate, order_count, ad_sales, data_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                ('B0PA000001', 'Lamp', 'L-1', 'Bob', 'A1PA6795UKMFR9', '11', 10, 0, 2, 5, '2025-07-01'),
+                ('B0PA000001', 'Lamp', 'L-2', 'Bob', 'A13V1IB3VIYZZH', '12', 20, 0, 3, 6, '2025-07-01'),
+                ('B0PA000001', 'Lamp', 'L-3', 'Bob', 'ATVPDKIKX0DER', '', 30, 0, 4, 7, '2025-07-01'),
+                ('B0PA000002', 'Desk', 'D-1', 'Eve', 'A1VC38T7YXB528', '13', 40, 0, 5, 8, '2025-07-01'),
+                ('B0PA000002', 'Desk', 'D-1', 'Eve', 'A1VC38T7YXB528', '13', 50, 0, 6, 9, '2025-06-30'),
+            ]
+        )
+        self.conn.execute(
+            f"CREATE TABLE inventory_points ({', '.join(OUTPUT_COLUMNS)}, data_date, created_at, updated_at)"
+        )
+
+        cursor = self.conn.cursor()
+        # 无店铺ID的记录店铺名为国家代码，解析不出国家，与 Python 引擎一样被跳过
+        self.assertEqual(self.engine.merge_into(cursor, '2025-07-01'), (0, 2))
+        rows = cursor.execute(
+            "SELECT asin, marketplace, store, order_count, ad_sales, merge_type FROM inventory_points "
+            "ORDER BY asin, marketplace"
+        ).fetchall()
+        self.assertEqual(rows, [
+            ('B0PA000001', '欧盟', '欧盟汇总', 5, 11, 'eu_merged'),
+            ('B0PA000002', 'JP', 'Shop13-JP', 5, 8, 'non_eu_merged'),
+        ])
+
+        # 只重算 B0PA000002：其余ASIN的库存点保持不变
+        self.conn.execute("UPDATE product_analytics SET order_count = 60 WHERE asin = 'B0PA000002'")
+        self.assertEqual(self.engine.merge_into(cursor, '2025-07-01', asins=['B0PA000002']), (1, 1))
+        counts = dict(cursor.execute("SELECT asin, SUM(order_count) FROM inventory_points GROUP BY asin"))
+        self.assertEqual(counts, {'B0PA000001': 5, 'B0PA000002': 60})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+产品分析模型测试
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.models import ProductAnalytics
+
+
+class TestLazyMetricsJson(unittest.TestCase):
+    """额外指标延迟序列化测试"""
+    
+    def test_set_metrics_serialises_once_on_read(self):
+        """多次 set_metrics 只在读取 metrics_json 时序列化一次"""
+        item = ProductAnalytics(product_id='p1', asin='B01TEST001')
+        
+        with patch('src.models.product_analytics.json.dumps', wraps=json.dumps) as dumps:
+            item.set_metrics({'ctr': 0.1})
+            item.set_metrics({'rpc': 2.5})
+            self.assertEqual(item.get_metrics(), {'ctr': 0.1, 'rpc': 2.5})
+            self.assertEqual(dumps.call_count, 0)
+            
+            self.assertEqual(json.loads(item.metrics_json), {'ctr': 0.1, 'rpc': 2.5})
+            item.metrics_json
+            self.assertEqual(dumps.call_count, 1)
+    
+    def test_get_metrics_returns_copy(self):
+        """get_metrics 返回副本，未调用 set_metrics 的修改不生效"""
+        item = ProductAnalytics(product_id='p1', asin='B01TEST001')
+        item.set_metrics({'ctr': 0.1})
+        
+        item.get_metrics()['ctr'] = 0.9
+        
+        self.assertEqual(item.get_metrics()['ctr'], 0.1)
+    
+    def test_external_json_parsed_lazily(self):
+        """外部传入的 metrics_json 在首次 get_metrics 时解析"""
+        item = ProductAnalytics(product_id='p1', asin='B01TEST001', metrics_json='{"ctr": 0.3}')
+        
+        self.assertEqual(item.metrics_json, '{"ctr": 0.3}')
+        self.assertEqual(item.get_metrics(), {'ctr': 0.3})
+        
+        item.metrics_json = 'not json'
+        self.assertEqual(item.get_metrics(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+基础处理器融合预处理测试
+"""
+
+import unittest
+from operator import attrgetter
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.processors.base_processor import BaseProcessor
+
+
+class Row:
+    """测试数据"""
+    
+    def __init__(self, key, value, valid=True):
+        self.key = key
+        self.value = value
+        self.valid = valid
+        self.cleaned = 0
+    
+    def get_unique_key(self):
+        return (self.key,)
+    
+    def is_valid(self):
+        return self.valid
+
+
+class DemoProcessor(BaseProcessor):
+    """测试处理器"""
+    
+    def _clean_item(self, item):
+        item.cleaned += 1
+        return item if item.value >= 0 else None
+    
+    def _clean_data(self, data_list):
+        return [item for item in map(self._clean_item, data_list) if item is not None]
+    
+    def _transform_data(self, data_list):
+        return data_list
+    
+    def _persist_data(self, data_list):
+        return {'success': len(data_list), 'failed': 0, 'errors': []}
+
+
+class TestFusedPreprocess(unittest.TestCase):
+    """融合预处理测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.rows = [Row('b', 2), Row('a', 1), Row('b', 9), Row('c', 3, valid=False), Row('d', -1)]
+    
+    def test_single_pass_keeps_input_order(self):
+        """去重/验证/清洗单次遍历完成，默认不排序"""
+        processor = DemoProcessor('demo')
+        processor.enable_validation = True
+        
+        output, errors = processor._run_preprocess(self.rows)
+        
+        self.assertEqual([row.key for row in output], ['b', 'a'])
+        self.assertEqual(errors, ['第 4 条数据验证失败'])
+        # 重复和验证失败的数据不会进入清洗
+        self.assertEqual([row.cleaned for row in self.rows], [1, 1, 0, 0, 1])
+    
+    def test_declared_stages_and_sort_key(self):
+        """子类声明阶段与排序键"""
+        processor = DemoProcessor('demo')
+        processor.preprocess_stages = ('clean',)
+        processor.sort_key = attrgetter('value')
+        processor.time_stages = True
+        
+        output, errors = processor._run_preprocess(self.rows)
+        
+        self.assertEqual([row.value for row in output], [1, 2, 3, 9])
+        self.assertEqual(errors, [])
+        self.assertEqual(list(processor.last_stage_stats), ['clean'])
+        self.assertEqual(processor.last_stage_stats['clean']['input'], 5)
+        self.assertEqual(processor.last_stage_stats['clean']['output'], 4)
+    
+    def test_sort_key_declared_on_subclass(self):
+        """子类以函数/lambda 声明的 sort_key 不会被绑定为方法"""
+        def by_value(row):
+            return row.value
+        
+        class LambdaProcessor(DemoProcessor):
+            preprocess_stages = ('clean',)
+            sort_key = lambda row: -row.value  # noqa: E731
+        
+        class FunctionProcessor(DemoProcessor):
+            preprocess_stages = ('clean',)
+            sort_key = by_value
+        
+        output, _ = LambdaProcessor('demo')._run_preprocess(self.rows)
+        self.assertEqual([row.value for row in output], [9, 3, 2, 1])
+        output, _ = FunctionProcessor('demo')._run_preprocess(self.rows)
+        self.assertEqual([row.value for row in output], [1, 2, 3, 9])
+        self.assertEqual([row.value for row in FunctionProcessor('demo')._preprocess_data(self.rows)],
+                         [-1, 1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+产品分析每日聚合器测试
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.models import ProductAnalytics
+from src.processors.daily_aggregator import aggregate_daily
+
+
+def make_item(product_id, day, sales_amount, quantity, clicks, acos=None, metrics=None):
+    """构造测试数据"""
+    item = ProductAnalytics(
+        product_id=product_id, asin=f'B0{product_id}', data_date=date(2025, 8, day),
+        sales_amount=Decimal(sales_amount) if sales_amount is not None else None,
+        sales_quantity=quantity, impressions=clicks * 10, clicks=clicks,
+        acos=Decimal(acos) if acos is not None else None
+    )
+    if metrics:
+        item.set_metrics(metrics)
+    return item
+
+
+class TestDailyAggregator(unittest.TestCase):
+    """每日聚合测试"""
+    
+    def test_merges_same_product_same_day(self):
+        """同日同产品的记录精确累加并重算比例指标"""
+        items = [
+            make_item('P1', 1, '10.10', 1, 4, '0.2000', {'ctr': 0.5, 'source': 'a'}),
+            make_item('P1', 1, '20.20', 2, 8, '0.5000', {'ctr': 0.25, 'source': 'b'}),
+            make_item('P1', 1, None, 1, 0, '0.9000'),
+        ]
+        
+        result = aggregate_daily(items)
+        
+        self.assertEqual(len(result), 1)
+        merged = result[0]
+        self.assertEqual(merged.sales_amount, Decimal('30.30'))
+        self.assertEqual(merged.sales_quantity, 4)
+        self.assertEqual(merged.clicks, 12)
+        self.assertEqual(merged.impressions, 120)
+        self.assertEqual(merged.conversion_rate, Decimal('0.3333'))
+        # (0.2*10.10 + 0.5*20.20) / 30.30，无销售额的记录不参与加权
+        self.assertEqual(merged.acos, Decimal('0.4000'))
+        self.assertEqual(merged.get_metrics(), {'ctr': 0.75, 'source': 'b'})
+        self.assertIs(merged, items[0])
+    
+    def test_output_order_and_single_rows(self):
+        """按日期首次出现、再按产品首次出现的顺序输出；单条记录原样返回"""
+        items = [
+            make_item('P1', 1, '1', 1, 1),
+            make_item('P1', 2, '2', 1, 1),
+            make_item('P2', 1, '3', 1, 1),
+            make_item('P1', 1, '4', 1, 1),
+        ]
+        
+        result = aggregate_daily(items)
+        
+        self.assertEqual(
+            [(item.data_date.day, item.product_id, item.sales_amount) for item in result],
+            [(1, 'P1', Decimal('5')), (1, 'P2', Decimal('3')), (2, 'P1', Decimal('2'))]
+        )
+        self.assertIs(result[1], items[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
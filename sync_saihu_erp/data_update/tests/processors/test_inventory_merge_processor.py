@@ -0,0 +1,176 @@
+"""
+库存合并处理器测试
+"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.processors.inventory_merge_processor import InventoryMergeProcessor
+
+
+class TestHistorySnapshots(unittest.TestCase):
+    """历史快照写入测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.processor = InventoryMergeProcessor()
+        self.points = [
+            {'asin': 'B01TEST001', 'marketplace': 'US', 'total_inventory': 10, 'turnover_days': 5},
+            {'asin': 'B01TEST001', 'marketplace': '欧盟', 'total_inventory': 20, 'turnover_days': 6},
+            {'asin': 'B01TEST001', 'marketplace': 'US', 'total_inventory': 30, 'turnover_days': 7},
+        ]
+    
+    def test_build_history_rows_dedupes_by_point_key(self):
+        """同一批次内相同 asin+marketplace 只保留最后一条"""
+        rows = self.processor._build_history_rows(self.points, '2025-08-01')
+        
+        self.assertEqual(len(rows), 2)
+        us_row = next(row for row in rows if row[1] == 'US')
+        self.assertEqual(us_row[2], '2025-08-01')
+        self.assertEqual(us_row[3], 30)
+        self.assertEqual(us_row[5], 7)
+    
+    @patch('src.processors.inventory_merge_processor.db_manager')
+    def test_save_history_uses_single_bulk_upsert(self, mock_db):
+        """历史快照使用一次批量UPSERT写入"""
+        self.processor._ensure_history_table = lambda: None
+        self.processor._history_upsert_supported = True
+        
+        self.processor._save_history_snapshots(self.points, '2025-08-01')
+        
+        mock_db.execute_values.assert_called_once()
+        sql, rows = mock_db.execute_values.call_args[0][:2]
+        self.assertIn('ON CONFLICT (asin, marketplace, data_date) DO UPDATE', sql)
+        self.assertEqual(len(rows), 2)
+        mock_db.execute_batch.assert_not_called()
+
+
+def product(asin, store, marketplace='US'):
+    """构造合并输入的产品数据"""
+    return {
+        'asin': asin, 'product_name': f'{asin} product', 'store': store, 'marketplace': marketplace,
+        'fba_available': 5, 'average_sales': 1, 'sales_7days': 7
+    }
+
+
+@patch('src.processors.inventory_merge_processor.merge_summary_service')
+@patch('src.processors.inventory_merge_processor.dirty_asin_tracker')
+@patch('src.processors.inventory_merge_processor.db_manager')
+class TestIncrementalMerge(unittest.TestCase):
+    """增量合并测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.processor = InventoryMergeProcessor()
+        self.processor.incremental = True
+        self.processor._ensure_tables = lambda: None
+        self.processor._save_history_snapshots = MagicMock()
+        self.products = [
+            product('B01TEST001', 'ShopA-US'),
+            product('B01TEST002', 'ShopA-US'),
+            product('B01TEST003', 'ShopA-US'),
+        ]
+    
+    def test_only_dirty_asins_are_remerged(self, mock_db, mock_tracker, mock_summary):
+        """当天已有库存点时只重算并替换有变化的ASIN"""
+        marks = {'B01TEST002': 't1', 'B01TEST009': 't2'}
+        mock_db.execute_single.return_value = {'found': 1}
+        mock_db.execute_batch.side_effect = lambda sql, rows: len(rows)
+        mock_tracker.load.return_value = marks
+        mock_summary.get_summary.return_value = {'total_points': 3}
+        
+        result = self.processor.process(self.products, '2025-08-01')
+        
+        self.assertEqual(result['merge_mode'], 'incremental')
+        self.assertEqual(result['saved_count'], 1)
+        delete_sql, delete_params = mock_db.execute_update.call_args[0]
+        self.assertIn('asin = ANY(%s)', delete_sql)
+        self.assertEqual(sorted(delete_params[1]), ['B01TEST002', 'B01TEST009'])
+        inserted = mock_db.execute_batch.call_args[0][1]
+        self.assertEqual([row[0] for row in inserted], ['B01TEST002'])
+        mock_tracker.clear.assert_called_once_with('2025-08-01', marks)
+        mock_summary.get_summary.assert_called_once_with('2025-08-01', use_materialized=False)
+    
+    def test_no_changes_skips_merge_and_persist(self, mock_db, mock_tracker, mock_summary):
+        """没有变化的ASIN时不重写库存点"""
+        mock_db.execute_single.return_value = {'found': 1}
+        mock_tracker.load.return_value = {}
+        
+        result = self.processor.process(self.products, '2025-08-01')
+        
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['saved_count'], 0)
+        mock_db.execute_update.assert_not_called()
+        mock_db.execute_batch.assert_not_called()
+    
+    def test_first_merge_of_day_is_full(self, mock_db, mock_tracker, mock_summary):
+        """当天尚无库存点时全量合并，并清除当天全部标记"""
+        mock_db.execute_single.return_value = None
+        mock_db.execute_batch.side_effect = lambda sql, rows: len(rows)
+        
+        result = self.processor.process(self.products, '2025-08-01')
+        
+        self.assertEqual(result['merge_mode'], 'full')
+        self.assertEqual(result['saved_count'], 3)
+        mock_tracker.load.assert_not_called()
+        mock_tracker.clear.assert_called_once_with('2025-08-01', None)
+        mock_summary.summarize_points.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+@patch('src.processors.inventory_merge_processor.merge_summary_service')
+@patch('src.processors.inventory_merge_processor.dirty_asin_tracker')
+@patch('src.processors.inventory_merge_processor.db_manager')
+class TestSqlEngine(unittest.TestCase):
+    """SQL 下推合并引擎接入测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.processor = InventoryMergeProcessor()
+        self.processor.engine = 'sql'
+        self.processor.incremental = True
+        self.processor._history_upsert_supported = True
+        self.processor._ensure_tables = lambda: None
+        self.processor.sql_merger = MagicMock()
+        self.processor.sql_merger.merge_into.return_value = (2, 3)
+    
+    def test_merge_and_history_run_in_one_transaction(self, mock_db, mock_tracker, mock_summary):
+        """合并与历史快照在同一事务内由数据库完成，不在内存中合并"""
+        cursor = mock_db.get_db_transaction.return_value.__enter__.return_value \
+            .cursor.return_value.__enter__.return_value
+        mock_db.execute_single.return_value = None
+        self.processor.merger = MagicMock()
+        
+        result = self.processor.process([product('B01TEST001', 'ShopA-US')], '2025-08-01')
+        
+        self.assertEqual(result['merge_engine'], 'sql')
+        self.assertEqual(result['saved_count'], 3)
+        self.processor.sql_merger.merge_into.assert_called_once_with(cursor, '2025-08-01', None)
+        history_sql = cursor.execute.call_args[0][0]
+        self.assertIn('INSERT INTO inventory_point_history', history_sql)
+        self.assertIn('FROM inventory_points', history_sql)
+        self.processor.merger.merge_inventory_points.assert_not_called()
+        mock_tracker.clear.assert_called_once_with('2025-08-01', None)
+        mock_summary.get_summary.assert_called_once_with('2025-08-01', use_materialized=False)
+    
+    def test_incremental_limits_to_dirty_asins(self, mock_db, mock_tracker, mock_summary):
+        """增量模式只重建有变化的ASIN；无变化时不开启事务"""
+        mock_db.execute_single.return_value = {'found': 1}
+        mock_tracker.load.return_value = {'B01TEST002': 't1', 'B01TEST001': 't2'}
+        
+        self.processor.process([product('B01TEST001', 'ShopA-US')], '2025-08-01')
+        self.assertEqual(self.processor.sql_merger.merge_into.call_args[0][2], ['B01TEST001', 'B01TEST002'])
+        
+        mock_db.get_db_transaction.reset_mock()
+        mock_tracker.load.return_value = {}
+        result = self.processor.process([product('B01TEST001', 'ShopA-US')], '2025-08-01')
+        self.assertEqual(result['saved_count'], 0)
+        mock_db.get_db_transaction.assert_not_called()
@@ -0,0 +1,125 @@
+"""
+产品分析并行解码测试
+"""
+
+import unittest
+from datetime import date
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.models import ProductAnalytics
+from src.processors.parallel_decode import ParallelDecoder, ProductAnalyticsCodec
+from src.processors.product_analytics_processor import ProductAnalyticsProcessor
+from src.utils.instrumentation import track_run
+
+TARGET_DATE = date(2025, 8, 1)
+
+
+def make_rows(count):
+    """构造测试用原始API记录（含无效记录）"""
+    rows = []
+    for i in range(count):
+        rows.append({
+            'asinList': [f'B0TEST{i:04d}'], 'productIdList': [f' p{i} '], 'marketplaceIdList': ['ATVPDKIKX0DER'],
+            'shopIdList': [str(i % 3)], 'title': f'Test {i}', 'salePriceThis': f'{i}.25',
+            'adClicksThis': i % 7, 'adImpressionsThis': i * 10, 'productTotalNumThis': i % 5,
+            'customField': {'rank': i}
+        })
+    rows.append({'title': 'missing asin'})
+    return rows
+
+
+def serial_decode(rows):
+    """串行解码并清洗，作为对照结果"""
+    processor = ProductAnalyticsProcessor()
+    models = []
+    for row in rows:
+        model = ProductAnalytics.from_api_response(row, TARGET_DATE)
+        if model.is_valid():
+            cleaned = processor._clean_item(model)
+            if cleaned is not None:
+                models.append(cleaned)
+    return models
+
+
+def comparable(model):
+    """去掉创建/处理时间戳后的可比较字典"""
+    data = model.to_dict()
+    for key in ('created_at', 'updated_at', 'processed_at', 'metrics_json'):
+        data.pop(key, None)
+    metrics = model.get_metrics()
+    metrics.pop('processed_at', None)
+    return data, metrics
+
+
+class TestProductAnalyticsCodec(unittest.TestCase):
+    """定长元组编解码测试"""
+
+    def test_round_trip_preserves_fields_and_metrics(self):
+        """编码再解码后字段和额外指标保持不变"""
+        codec = ProductAnalyticsCodec()
+        model = serial_decode(make_rows(3))[1]
+
+        restored = codec.decode(codec.encode(model))
+
+        self.assertEqual(comparable(restored), comparable(model))
+        self.assertEqual(restored.data_date, TARGET_DATE)
+        self.assertEqual(restored.sales_amount, model.sales_amount)
+
+
+class TestParallelDecoder(unittest.TestCase):
+    """进程池并行解码测试"""
+
+    def test_threshold_keeps_small_batches_serial(self):
+        """未开启或数据量不足时不走进程池"""
+        self.assertFalse(ParallelDecoder(workers=4, min_rows=100, enabled=False).should_parallelize(1000))
+        self.assertFalse(ParallelDecoder(workers=4, min_rows=100, enabled=True).should_parallelize(99))
+        self.assertFalse(ParallelDecoder(workers=1, min_rows=0, enabled=True).should_parallelize(1000))
+        self.assertTrue(ParallelDecoder(workers=2, min_rows=100, enabled=True).should_parallelize(100))
+
+    def test_parallel_matches_serial_order(self):
+        """并行结果与串行结果逐条一致且顺序相同"""
+        rows = make_rows(25)
+        decoder = ParallelDecoder(workers=2, shard_size=4, min_rows=0, enabled=True)
+        try:
+            models, transferred = decoder.decode_and_clean(rows, TARGET_DATE)
+        finally:
+            decoder.shutdown()
+
+        expected = serial_decode(rows)
+        self.assertEqual(len(models), 25)
+        self.assertGreater(transferred, 0)
+        self.assertEqual([comparable(m) for m in models], [comparable(m) for m in expected])
+
+    def test_processor_shutdown_releases_pool(self):
+        """处理器关闭时回收进程池，之后再并行解码会重新创建"""
+        processor = ProductAnalyticsProcessor()
+        processor.parallel_decoder = ParallelDecoder(workers=2, shard_size=4, min_rows=0, enabled=True)
+        processor._decode_raw(make_rows(5), TARGET_DATE.isoformat())
+        self.assertIsNotNone(processor.parallel_decoder._executor)
+
+        processor.shutdown()
+        self.assertIsNone(processor.parallel_decoder._executor)
+        processor.shutdown()
+
+    def test_fallback_records_single_decode_stage(self):
+        """进程池不可用回退串行时，decode 阶段只记录一次"""
+        processor = ProductAnalyticsProcessor()
+        processor.parallel_decoder = ParallelDecoder(workers=2, shard_size=4, min_rows=0, enabled=True)
+        rows = make_rows(5)
+        with patch.object(processor.parallel_decoder, 'decode_and_clean', return_value=None), \
+                track_run('t1', 'test') as run:
+            models, precleaned = processor._decode_raw(rows, TARGET_DATE.isoformat())
+        self.assertFalse(precleaned)
+        self.assertEqual(len(models), 5)
+        self.assertEqual(run.stages['decode'].calls, 1)
+        self.assertEqual(run.stages['decode'].rows, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+产品分析处理器测试
+"""
+
+import unittest
+from datetime import date
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.models import ProductAnalytics
+from src.processors.product_analytics_processor import ProductAnalyticsProcessor
+
+
+def make_models():
+    """构造测试用模型"""
+    rows = [
+        {'asinList': ['B01TEST001'], 'productIdList': ['p1'], 'marketplaceIdList': ['ATVPDKIKX0DER'],
+         'shopIdList': ['11'], 'title': 'Test A', 'salePriceThis': '120.50', 'adClicksThis': 4,
+         'adImpressionsThis': 100, 'productTotalNumThis': 3},
+        {'asinList': ['B01TEST002'], 'productIdList': ['p2'], 'marketplaceIdList': ['A1PA6795UKMFR9'],
+         'shopIdList': ['12'], 'title': 'Test B', 'salePriceThis': '80', 'adClicksThis': 0,
+         'adImpressionsThis': 0, 'productTotalNumThis': 1},
+    ]
+    return [ProductAnalytics.from_api_response(row, date(2025, 8, 1)) for row in rows]
+
+
+@patch('src.processors.product_analytics_processor.db_manager')
+class TestModelHandoff(unittest.TestCase):
+    """模型直传测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.processor = ProductAnalyticsProcessor()
+    
+    def test_process_models_skips_dict_round_trip(self, mock_db):
+        """模型直接进入处理流水线，不经过 _dict_to_model"""
+        mock_db.upsert_product_analytics.side_effect = lambda items, _: len(items)
+        
+        with patch.object(self.processor, '_dict_to_model') as dict_to_model:
+            result = self.processor.process_models(make_models(), '2025-08-01')
+        
+        dict_to_model.assert_not_called()
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['processed_count'], 2)
+        markets = {item['asin']: item['marketplace'] for item in result['processed_data']}
+        self.assertEqual(markets, {'B01TEST001': 'US', 'B01TEST002': 'DE'})
+    
+    def test_dict_adapter_matches_model_path(self, mock_db):
+        """字典接口仍可用，且与模型路径产出相同的合并数据"""
+        mock_db.upsert_product_analytics.side_effect = lambda items, _: len(items)
+        
+        dict_result = self.processor.process([m.to_dict() for m in make_models()], '2025-08-01')
+        model_result = self.processor.process_models(make_models(), '2025-08-01')
+        
+        keys = ('asin', 'marketplace', 'store', 'product_name', 'sales_amount', 'clicks')
+        project = lambda rows: sorted(tuple(row[k] for k in keys) for row in rows)
+        self.assertEqual(project(dict_result['processed_data']), project(model_result['processed_data']))
+
+    @patch('src.processors.product_analytics_processor.checksum_service')
+    def test_failed_upsert_skips_checksums(self, mock_checksums, mock_db):
+        """批量UPSERT未写入任何记录时报告错误，不记录校验和"""
+        mock_db.upsert_product_analytics.return_value = 0
+        
+        result = self.processor.process_models(make_models(), '2025-08-01')
+        
+        self.assertTrue(result['errors'])
+        mock_checksums.record.assert_not_called()
+    
+    def test_resync_raises_when_nothing_saved(self, mock_db):
+        """重新同步写入失败时抛出异常，不删除分区"""
+        mock_db.upsert_product_analytics.return_value = 0
+        
+        with self.assertRaises(Exception):
+            self.processor.resync(make_models(), [('2025-08-01', 'ATVPDKIKX0DER', '13')])
+        
+        mock_db.delete_product_analytics_partitions.assert_not_called()
+    
+    def test_resync_deletes_rows_missing_upstream(self, mock_db):
+        """重新同步写入后删除分区内不在赛狐记录中的行"""
+        mock_db.upsert_product_analytics.side_effect = lambda items, _: len(items)
+        partitions = [('2025-08-01', 'ATVPDKIKX0DER', '11')]
+        
+        self.processor.resync(make_models()[:1], partitions)
+        
+        mock_db.delete_product_analytics_partitions.assert_called_once_with(
+            partitions, [(date(2025, 8, 1), 'B01TEST001', make_models()[0].sku)])
+
+
+if __name__ == '__main__':
+    unittest.main()
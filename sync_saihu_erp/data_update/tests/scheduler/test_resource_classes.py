@@ -0,0 +1,117 @@
+"""
+调度任务资源类别测试
+"""
+
+import threading
+import time
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.scheduler.resource_classes import (
+    PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, PriorityGate, ResourceClassRegistry
+)
+from src.scheduler.task_scheduler import TaskScheduler
+
+
+def noop():
+    """空任务"""
+
+
+class TestPriorityGate(unittest.TestCase):
+    """优先级闸门测试"""
+
+    def run_in_gate(self, gate, priority, name, order, hold=0.0):
+        """在闸门内执行并记录开始顺序"""
+        with gate.slot(priority):
+            order.append(name)
+            time.sleep(hold)
+
+    def test_waiters_released_by_priority(self):
+        """槽位释放后按优先级而非到达顺序放行"""
+        gate = PriorityGate('api', max_concurrency=1)
+        order = []
+        release = threading.Event()
+
+        def blocker():
+            with gate.slot(PRIORITY_NORMAL):
+                release.wait()
+
+        threads = [threading.Thread(target=blocker)]
+        threads[0].start()
+        while gate.running == 0:
+            time.sleep(0.001)
+
+        for name, priority in (('backfill', PRIORITY_LOW), ('normal', PRIORITY_NORMAL), ('fba', PRIORITY_HIGH)):
+            thread = threading.Thread(target=self.run_in_gate, args=(gate, priority, name, order))
+            thread.start()
+            threads.append(thread)
+            while gate.queue_depth < len(threads) - 1:
+                time.sleep(0.001)
+
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ['fba', 'normal', 'backfill'])
+        self.assertEqual(gate.max_queue_depth, 3)
+        self.assertEqual(gate.to_dict()['completed'], 4)
+
+    def test_reserved_slot_prevents_starvation(self):
+        """长时间低优先级任务占满普通槽位时，高优先级任务仍可使用预留槽位"""
+        gate = PriorityGate('api', max_concurrency=2, reserved_slots=1)
+        order = []
+        release = threading.Event()
+
+        def backfill():
+            with gate.slot(PRIORITY_LOW):
+                order.append('backfill')
+                release.wait()
+
+        threads = [threading.Thread(target=backfill) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while gate.running + gate.queue_depth < 2:
+            time.sleep(0.001)
+
+        critical = threading.Thread(target=self.run_in_gate, args=(gate, PRIORITY_HIGH, 'fba', order))
+        critical.start()
+        critical.join(timeout=2)
+
+        self.assertFalse(critical.is_alive())
+        self.assertEqual(order, ['backfill', 'fba'])
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ['backfill', 'fba', 'backfill'])
+
+
+class TestResourceClassRegistry(unittest.TestCase):
+    """资源类别注册表测试"""
+
+    def test_config_overrides_and_metrics(self):
+        """配置覆盖默认值，并输出各类别 Prometheus 指标"""
+        registry = ResourceClassRegistry({'api': {'max_concurrency': 3}, 'report': {'max_concurrency': 1}})
+
+        self.assertEqual(registry.gate('api').max_concurrency, 3)
+        self.assertEqual(registry.gate('report').max_concurrency, 1)
+        self.assertIn('saihu_sync_resource_queue_depth{resource_class="cpu"} 0', registry.to_prometheus())
+        with self.assertRaises(ValueError):
+            registry.gate('gpu')
+
+    def test_task_scheduler_routes_to_class_executor(self):
+        """指定资源类别的任务路由到对应执行器"""
+        scheduler = TaskScheduler(job_store='memory')
+        scheduler.add_interval_job(noop, minutes=5, job_id='backfill', resource_class='api', priority=PRIORITY_LOW)
+
+        job = scheduler.scheduler.get_job('backfill')
+        self.assertEqual(job.executor, 'api')
+        self.assertEqual(job.args[1:4], ('api', PRIORITY_LOW, 'backfill'))
+
+
+if __name__ == '__main__':
+    unittest.main()
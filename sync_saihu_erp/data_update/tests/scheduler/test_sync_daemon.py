@@ -0,0 +1,129 @@
+"""
+常驻同步服务测试
+"""
+
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from urllib.request import urlopen
+from urllib.error import HTTPError
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.scheduler.sync_daemon import DatasetSpec, SyncDaemon, page_fingerprint
+from src.scheduler.task_scheduler import TaskScheduler
+
+
+class TestPageFingerprint(unittest.TestCase):
+    """首页指纹测试"""
+
+    def test_fingerprint_tracks_rows_and_totals(self):
+        """首页数据或分页总数变化时指纹变化"""
+        page = {'rows': [{'sku': 'A', 'qty': 1}], 'totalPage': 3, 'totalSize': 250}
+        same = page_fingerprint(dict(page))
+        self.assertEqual(page_fingerprint(page), same)
+        self.assertNotEqual(page_fingerprint(dict(page, totalSize=251)), same)
+        self.assertNotEqual(page_fingerprint(dict(page, rows=[{'sku': 'A', 'qty': 2}])), same)
+        self.assertNotEqual(page_fingerprint(page, {'end_date': '2025-08-02'}), same)
+        self.assertIsNone(page_fingerprint(None))
+
+
+class TestSyncDaemon(unittest.TestCase):
+    """变更探测调度测试"""
+
+    def setUp(self):
+        """测试初始化"""
+        self.fingerprint = 'v1'
+        self.sync = MagicMock(return_value=True)
+        self.daemon = SyncDaemon([
+            DatasetSpec(name='fba', sync=self.sync, probe=lambda: self.fingerprint)
+        ], scheduler=MagicMock(), state_file='')
+
+    def test_unchanged_dataset_skips_full_pull(self):
+        """指纹未变化时只探测不拉取"""
+        self.assertEqual(self.daemon.run_dataset('fba')['action'], 'synced')
+        self.assertEqual(self.daemon.run_dataset('fba')['action'], 'skipped')
+        self.fingerprint = 'v2'
+        self.assertEqual(self.daemon.run_dataset('fba')['action'], 'synced')
+
+        state = self.daemon.states['fba']
+        self.assertEqual((state.probes, state.syncs, state.skipped), (3, 2, 1))
+        self.assertEqual(self.sync.call_count, 2)
+
+    def test_stale_dataset_is_pulled_even_if_unchanged(self):
+        """超过最长陈旧时间时即使指纹相同也全量拉取"""
+        self.daemon.run_dataset('fba')
+        state = self.daemon.states['fba']
+        state.last_sync_at = (datetime.now() - timedelta(minutes=241)).isoformat()
+
+        self.assertEqual(self.daemon.run_dataset('fba')['action'], 'synced')
+
+    def test_failed_sync_does_not_commit_fingerprint(self):
+        """全量拉取失败时不记录新指纹，下次重新拉取"""
+        self.sync.return_value = False
+        self.daemon.run_dataset('fba')
+        self.assertIsNone(self.daemon.states['fba'].fingerprint)
+        self.assertEqual(self.daemon.run_dataset('fba')['action'], 'synced')
+
+    def test_state_is_persisted(self):
+        """指纹和同步时间可在重启后恢复"""
+        path = os.path.join(project_root, 'logs', f'test_daemon_state_{os.getpid()}.json')
+        try:
+            daemon = SyncDaemon([DatasetSpec(name='fba', sync=self.sync, probe=lambda: 'v1')],
+                                scheduler=MagicMock(), state_file=path)
+            daemon.run_dataset('fba')
+
+            restored = SyncDaemon([DatasetSpec(name='fba', sync=self.sync, probe=lambda: 'v1')],
+                                  scheduler=MagicMock(), state_file=path)
+            self.assertEqual(restored.run_dataset('fba')['action'], 'skipped')
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_health_endpoint(self):
+        """健康检查接口按调度器和陈旧情况返回状态码"""
+        self.daemon.scheduler.is_running = True
+        self.daemon.started_at = datetime.now()
+        server = self.daemon.serve_health(host='127.0.0.1', port=0)
+        base = f"http://127.0.0.1:{server.server_port}"
+        try:
+            with urlopen(f"{base}/health") as response:
+                self.assertEqual(response.status, 200)
+                self.assertEqual(json.loads(response.read())['status'], 'ok')
+
+            with urlopen(f"{base}/status") as response:
+                self.assertIn('fba', json.loads(response.read())['datasets'])
+
+            self.daemon.states['fba'].last_sync_at = (datetime.now() - timedelta(days=1)).isoformat()
+            with self.assertRaises(HTTPError) as ctx:
+                urlopen(f"{base}/health")
+            self.assertEqual(ctx.exception.code, 503)
+        finally:
+            self.daemon.stop()
+
+
+class TestSyncDaemonScheduler(unittest.TestCase):
+    """使用真实调度器启动"""
+
+    def test_start_registers_interval_jobs(self):
+        """start 在 memory 作业存储的调度器上按各数据集间隔注册作业"""
+        daemon = SyncDaemon([
+            DatasetSpec(name='fba', sync=MagicMock(return_value=True), interval_minutes=15)
+        ], scheduler=TaskScheduler(job_store='memory'), state_file='')
+        daemon.start(run_immediately=False)
+        try:
+            self.assertTrue(daemon.scheduler.is_running)
+            job = daemon.scheduler.get_job_status('daemon_fba')
+            self.assertEqual(job['name'], 'daemon:fba')
+            self.assertIn('0:15:00', job['trigger'])
+        finally:
+            daemon.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+同步任务依赖图测试
+"""
+
+import threading
+import time
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.auth.rate_limiter import TokenBucket
+from src.scheduler.sync_dag import SyncDag, STATUS_ERROR, STATUS_SKIPPED
+
+
+def sleeper(seconds, result=True, log=None, name=None):
+    """构造耗时固定的任务"""
+    def run():
+        if log is not None:
+            log.append(('start', name))
+        time.sleep(seconds)
+        if log is not None:
+            log.append(('end', name))
+        return result
+    return run
+
+
+class TestSyncDag(unittest.TestCase):
+    """依赖图编排测试"""
+
+    def test_independent_tasks_run_concurrently(self):
+        """互不依赖的任务并发执行，总耗时约等于最长分支"""
+        dag = SyncDag('demo')
+        dag.add('a', sleeper(0.2))
+        dag.add('b', sleeper(0.2))
+        dag.add('c', sleeper(0.2))
+
+        report = dag.run()
+
+        self.assertEqual(report.results(), {'a': True, 'b': True, 'c': True})
+        self.assertLess(report.wall_seconds, 0.5)
+        self.assertGreater(report.serial_seconds, 0.55)
+
+    def test_dependency_order_and_critical_path(self):
+        """依赖任务在上游结束后才开始，关键路径沿最长分支回溯"""
+        log = []
+        dag = SyncDag('demo')
+        dag.add('inventory', sleeper(0.05, log=log, name='inventory'))
+        dag.add('yesterday', sleeper(0.1, log=log, name='yesterday'))
+        dag.add('last_7_days', sleeper(0.1, log=log, name='last_7_days'), depends_on=('yesterday',))
+
+        report = dag.run()
+
+        self.assertLess(log.index(('end', 'yesterday')), log.index(('start', 'last_7_days')))
+        self.assertEqual(report.critical_path, ['yesterday', 'last_7_days'])
+        self.assertGreaterEqual(report.outcomes['last_7_days'].started, report.outcomes['yesterday'].finished)
+
+    def test_failure_skips_only_strict_dependents(self):
+        """依赖失败时，requires_success 的下游被跳过，仅约束顺序的下游照常执行"""
+        def boom():
+            raise RuntimeError('api down')
+
+        dag = SyncDag('demo')
+        dag.add('analytics', boom)
+        dag.add('refresh', sleeper(0), depends_on=('analytics',))
+        dag.add('merge', sleeper(0), depends_on=('analytics',), requires_success=True)
+        dag.add('deals', sleeper(0), depends_on=('merge',), requires_success=True)
+
+        report = dag.run()
+
+        self.assertEqual(report.outcomes['analytics'].status, STATUS_ERROR)
+        self.assertTrue(report.outcomes['refresh'].succeeded)
+        self.assertEqual(report.outcomes['merge'].status, STATUS_SKIPPED)
+        self.assertEqual(report.outcomes['deals'].status, STATUS_SKIPPED)
+
+    def test_dependencies_must_be_added_first(self):
+        """依赖必须先添加，保证无环"""
+        dag = SyncDag('demo')
+        with self.assertRaises(ValueError):
+            dag.add('b', sleeper(0), depends_on=('a',))
+
+
+class TestTokenBucket(unittest.TestCase):
+    """共享令牌桶测试"""
+
+    def test_disabled_bucket_never_blocks(self):
+        """rate <= 0 时不限速"""
+        bucket = TokenBucket(rate=0)
+        self.assertTrue(all(bucket.acquire(timeout=0) for _ in range(100)))
+
+    def test_rate_is_shared_across_threads(self):
+        """多个线程共享同一额度"""
+        bucket = TokenBucket(rate=50, burst=1)
+        acquired = []
+
+        def worker():
+            for _ in range(5):
+                bucket.acquire()
+                acquired.append(time.monotonic())
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(acquired), 15)
+        # 首个令牌来自初始容量，其余 14 个按 50 次/秒补充
+        self.assertGreaterEqual(max(acquired) - started, 14 / 50 * 0.9)
+
+    def test_acquire_timeout(self):
+        """额度耗尽时按超时返回"""
+        bucket = TokenBucket(rate=0.1, burst=1)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0.05))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+"""
+同步作业测试
+"""
+
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.processors.product_analytics_processor import ProductAnalyticsProcessor
+from src.scheduler.sync_jobs import SyncJobs
+from src.services.checksum_service import ChecksumService
+from src.services.data_sync_service import DataSyncService
+
+
+def make_jobs():
+    """构造不连接赛狐API的同步作业"""
+    jobs = SyncJobs.__new__(SyncJobs)
+    jobs.logger = MagicMock()
+    jobs.product_analytics_processor = MagicMock()
+    jobs.inventory_merge_processor = MagicMock()
+    jobs.product_analytics_scraper = MagicMock()
+    return jobs
+
+
+@patch.object(SyncJobs, '_export_metrics')
+class TestInventoryMergeStep(unittest.TestCase):
+    """依赖图中的库存点合并和快照生成"""
+
+    def test_merge_reads_stored_analytics_per_day(self, mock_export):
+        """python 引擎逐日载入已入库的产品分析数据后合并"""
+        jobs = make_jobs()
+        jobs.inventory_merge_processor.engine = 'python'
+        jobs.product_analytics_processor.load_merge_data.side_effect = lambda d: [{'asin': 'B01', 'data_date': d}]
+        jobs.inventory_merge_processor.process.return_value = {'status': 'success', 'merge_summary': {'total_points': 3}}
+
+        result = jobs.merge_inventory_points(days=2)
+
+        dates = [(date.today() - timedelta(days=i)).strftime('%Y-%m-%d') for i in (1, 2)]
+        merged_dates = [c.args[1] for c in jobs.inventory_merge_processor.process.call_args_list]
+        self.assertEqual(merged_dates, dates)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['merge_summary'], {'total_points': 3})
+
+    def test_sql_engine_merges_in_database(self, mock_export):
+        """sql 引擎直接由 product_analytics 生成库存点，不载入数据"""
+        jobs = make_jobs()
+        jobs.inventory_merge_processor.engine = 'sql'
+        jobs.inventory_merge_processor.process.return_value = {'status': 'error', 'error': 'boom'}
+
+        result = jobs.merge_inventory_points(days=1)
+
+        jobs.product_analytics_processor.load_merge_data.assert_not_called()
+        self.assertEqual(jobs.inventory_merge_processor.process.call_args.args[0], [])
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(result['merge_summary'], {})
+
+    def test_deals_generated_for_refreshed_range(self, mock_export):
+        """快照按同步覆盖的日期区间一次生成"""
+        jobs = make_jobs()
+        generator = MagicMock()
+        generator.generate_inventory_deals_range.return_value = True
+        module = MagicMock(InventoryDealsGenerator=MagicMock(return_value=generator))
+
+        with patch.object(SyncJobs, '_load_inventory_deals_module', return_value=module):
+            result = jobs.generate_inventory_deals(days=7)
+
+        end_date = date.today() - timedelta(days=1)
+        generator.generate_inventory_deals_range.assert_called_once_with(end_date - timedelta(days=6), end_date)
+        self.assertEqual(result['status'], 'success')
+
+    def test_deals_script_loads(self, mock_export):
+        """默认路径指向仓库根目录的快照生成脚本"""
+        module = SyncJobs._load_inventory_deals_module()
+        self.assertTrue(hasattr(module, 'InventoryDealsGenerator'))
+        # 脚本只执行一次，之后复用已加载的模块
+        self.assertIs(SyncJobs._load_inventory_deals_module(), module)
+
+
+def analytics_row(shop_id, asin, sales=1):
+    return {'asin': asin, 'sku': asin, 'marketplace_id': 'US', 'shop_id': shop_id,
+            'data_date': '2025-08-01', 'sales_amount': sales}
+
+
+@patch('src.scheduler.sync_jobs.checksum_service')
+class TestReconcile(unittest.TestCase):
+    """对账重新同步"""
+
+    def setUp(self):
+        """已保存店铺 1、2 的校验和；赛狐整天数据中店铺 1 有变化、店铺 2 不再出现"""
+        self.builder = ChecksumService(enabled=True)
+        self.jobs = make_jobs()
+        self.jobs.product_analytics_scraper.scrape_raw_by_date.return_value = {'status': 'success', 'rows': ['raw']}
+        self.fresh = [analytics_row('1', 'B01', sales=2)]
+        self.jobs.product_analytics_processor.prepare_raw.side_effect = \
+            lambda rows, data_date: list(self.fresh) if rows == ['raw'] else list(rows)
+        self.jobs.product_analytics_processor.to_merge_data.side_effect = list
+        self.jobs.product_analytics_processor.resync.return_value = {'saved_count': 1, 'deleted_asin_count': 1}
+        self.jobs.inventory_merge_processor.process.return_value = {'status': 'success'}
+        self.stored = self.builder.build_tree([analytics_row('1', 'B01'), analytics_row('2', 'B02')])
+
+    def reconcile_result(self):
+        fresh_tree = self.builder.build_tree(self.fresh)
+        divergent, compared = fresh_tree.diff(self.stored)
+        return {'divergent_buckets': divergent, 'records': list(self.fresh),
+                'compared_nodes': compared, 'fresh_tree': fresh_tree}
+
+    def test_missing_shop_refetched_then_removed(self, mock_checksums):
+        """只存在于已保存校验和中的店铺先单独重新抓取，仍无数据才删除"""
+        mock_checksums.reconcile.return_value = self.reconcile_result()
+        self.jobs.product_analytics_scraper.fetch_raw_by_shards.return_value = []
+
+        result = self.jobs.reconcile_product_analytics('2025-08-01')
+
+        self.assertEqual(result['status'], 'success')
+        self.jobs.product_analytics_scraper.fetch_raw_by_shards.assert_called_once_with('2025-08-01', [('2', 'US')])
+        records, partitions = self.jobs.product_analytics_processor.resync.call_args.args
+        self.assertEqual(records, self.fresh)
+        self.assertEqual(sorted(partitions), [('2025-08-01', 'US', '1'), ('2025-08-01', 'US', '2')])
+        self.assertEqual(result['removed_buckets'], [['2025-08-01', 'US', '2']])
+        mock_checksums.save.assert_called_once()
+
+    def test_refetched_shop_is_written(self, mock_checksums):
+        """单独抓取到数据的店铺写入并计入校验和，不删除"""
+        mock_checksums.reconcile.return_value = self.reconcile_result()
+        refetched = [analytics_row('2', 'B02')]
+        self.jobs.product_analytics_scraper.fetch_raw_by_shards.return_value = refetched
+
+        result = self.jobs.reconcile_product_analytics('2025-08-01')
+
+        records, partitions = self.jobs.product_analytics_processor.resync.call_args.args
+        self.assertEqual(records, self.fresh + refetched)
+        self.assertEqual(sorted(partitions), [('2025-08-01', 'US', '1'), ('2025-08-01', 'US', '2')])
+        self.assertEqual(result['removed_buckets'], [])
+        fresh_tree = mock_checksums.save.call_args.args[0]
+        self.assertIn(('2025-08-01', 'US', '2'), fresh_tree.leaves)
+
+    def test_failed_resync_keeps_checksums(self, mock_checksums):
+        """写入失败时不保存校验和，下次对账仍能发现不一致"""
+        mock_checksums.reconcile.return_value = self.reconcile_result()
+        self.jobs.product_analytics_scraper.fetch_raw_by_shards.return_value = []
+        self.jobs.product_analytics_processor.resync.side_effect = Exception('upsert failed')
+
+        result = self.jobs.reconcile_product_analytics('2025-08-01')
+
+        self.assertEqual(result['status'], 'error')
+        mock_checksums.save.assert_not_called()
+        self.jobs.inventory_merge_processor.process.assert_not_called()
+
+
+class FakeAnalyticsTable:
+    """内存中的 product_analytics 表，按 (日期, asin, sku) 唯一"""
+
+    def __init__(self, records):
+        self.rows = {}
+        self.upsert_product_analytics(records, None)
+
+    @staticmethod
+    def key(record):
+        return str(record.data_date), record.asin, record.sku
+
+    def upsert_product_analytics(self, records, target_date):
+        for record in records:
+            self.rows[self.key(record)] = record
+        return len(records)
+
+    def delete_product_analytics_partitions(self, partitions, keep_keys=()):
+        partitions = {tuple(str(v) for v in p) for p in partitions}
+        keep = {(str(d), asin, sku) for d, asin, sku in keep_keys}
+        stale = [k for k, r in self.rows.items()
+                 if (str(r.data_date), r.marketplace_id, r.shop_id) in partitions and k not in keep]
+        for k in stale:
+            del self.rows[k]
+        return len(stale)
+
+
+class MemoryChecksumService(ChecksumService):
+    """校验和保存在内存中"""
+
+    def __init__(self):
+        super().__init__(enabled=True)
+        self.stored = self.build_tree([])
+
+    def save(self, tree, buckets=None):
+        stored = self.build_tree([])
+        for bucket, leaf in self.stored.leaves.items():
+            if bucket not in buckets:
+                stored.set_leaf(bucket, *leaf)
+        for bucket in buckets:
+            if bucket in tree.leaves:
+                stored.set_leaf(bucket, *tree.leaves[bucket])
+        self.stored = stored
+        return len(buckets)
+
+    def load_tree(self, data_date):
+        return self.stored
+
+
+class TestReconcileReplacesBuckets(unittest.TestCase):
+    """对账后不一致的分区整体替换为赛狐的数据"""
+
+    def test_row_dropped_upstream_is_deleted(self):
+        """店铺在赛狐仍存在但少了一条记录：本地该记录被删除，下次对账不再发现不一致"""
+        row = lambda asin: SimpleNamespace(asin=asin, sku=asin, marketplace_id='US', shop_id='1',
+                                           data_date='2025-08-01', sales_amount=1)
+        table = FakeAnalyticsTable([row('B01'), row('B02')])
+        checksums = MemoryChecksumService()
+        checksums.save(checksums.build_tree(table.rows.values()), [('2025-08-01', 'US', '1')])
+
+        jobs = make_jobs()
+        jobs.product_analytics_processor = ProductAnalyticsProcessor()
+        jobs.product_analytics_scraper.scrape_raw_by_date.return_value = {'status': 'success', 'rows': ['raw']}
+        jobs.inventory_merge_processor.process.return_value = {'status': 'success'}
+        upstream = [row('B01')]
+
+        with patch('src.scheduler.sync_jobs.checksum_service', checksums), \
+                patch('src.processors.product_analytics_processor.db_manager', table), \
+                patch.object(ProductAnalyticsProcessor, 'prepare_raw', side_effect=lambda rows, d: list(upstream)), \
+                patch.object(ProductAnalyticsProcessor, 'to_merge_data', side_effect=list):
+            first = jobs.reconcile_product_analytics('2025-08-01')
+            second = jobs.reconcile_product_analytics('2025-08-01')
+
+        self.assertEqual(first['status'], 'success')
+        self.assertEqual(first['divergent_buckets'], [['2025-08-01', 'US', '1']])
+        self.assertEqual(set(table.rows), {('2025-08-01', 'B01', 'B01')})
+        self.assertEqual(second['divergent_buckets'], [])
+
+
+class TestSyncAllDataDag(unittest.TestCase):
+    """完整同步的依赖关系"""
+
+    def test_merge_and_deals_run_after_analytics(self):
+        """库存点合并和快照在两项产品分析同步结束后才开始"""
+        events = []
+        lock = threading.Lock()
+
+        def task(name, result=True, seconds=0.05):
+            def run():
+                with lock:
+                    events.append(('start', name))
+                time.sleep(seconds)
+                with lock:
+                    events.append(('end', name))
+                return result
+            return run
+
+        service = DataSyncService.__new__(DataSyncService)
+        service.sync_fba_inventory_today = task('fba')
+        service.sync_warehouse_inventory_today = task('warehouse')
+        service.sync_product_analytics_yesterday = task('yesterday')
+        service.sync_product_analytics_last_seven_days = task('seven_days')
+        service._sync_jobs = MagicMock()
+        service._sync_jobs.merge_inventory_points.side_effect = lambda days: task('merge', {'status': 'success'})()
+        service._sync_jobs.generate_inventory_deals.side_effect = lambda days: task('deals', {'status': 'success'})()
+
+        results = service.sync_all_data()
+
+        self.assertTrue(all(results.values()))
+        self.assertEqual(set(results), {'fba_inventory', 'warehouse_inventory', 'product_analytics_yesterday',
+                                        'product_analytics_last_7_days', 'inventory_merge', 'inventory_deals'})
+        analytics_done = max(events.index(('end', 'yesterday')), events.index(('end', 'seven_days')))
+        self.assertGreater(events.index(('start', 'merge')), analytics_done)
+        self.assertGreater(events.index(('start', 'deals')), analytics_done)
+        service._sync_jobs.merge_inventory_points.assert_called_once_with(days=7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+任务调度器作业存储测试
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.scheduler.task_scheduler import TaskScheduler
+
+
+def noop():
+    """空任务"""
+
+
+class TestTaskSchedulerJobStore(unittest.TestCase):
+    """可配置作业存储测试"""
+
+    def test_scheduler_is_created_lazily(self):
+        """构造时不创建 APScheduler 实例，也不连接作业存储"""
+        with patch('src.scheduler.task_scheduler.DatabaseConfig') as db_config:
+            scheduler = TaskScheduler(job_store='postgresql')
+            status = scheduler.get_scheduler_status()
+
+        db_config.get_connection_url.assert_not_called()
+        self.assertIsNone(scheduler._scheduler)
+        self.assertEqual(status['state'], 'not_created')
+        self.assertFalse(scheduler.is_running)
+
+    def test_memory_store(self):
+        """memory 作业存储可直接添加并启动任务"""
+        scheduler = TaskScheduler(job_store='memory')
+        scheduler.add_interval_job(noop, minutes=5, job_id='noop')
+        scheduler.start()
+        try:
+            self.assertTrue(scheduler.is_running)
+            self.assertEqual([job['id'] for job in scheduler.list_jobs()], ['noop'])
+        finally:
+            scheduler.shutdown(wait=False)
+
+    def test_sqlite_store_persists_jobs(self):
+        """sqlite 作业存储写入本地文件"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'jobs.sqlite')
+            with patch('src.scheduler.task_scheduler.settings.get',
+                       side_effect=lambda key, default=None: path if key == 'scheduler.job_store_path' else default):
+                scheduler = TaskScheduler(job_store='sqlite')
+                scheduler.add_interval_job(noop, minutes=5, job_id='noop')
+                scheduler.start()
+                scheduler.shutdown(wait=False)
+
+            self.assertTrue(os.path.exists(path))
+
+    def test_unknown_store_raises(self):
+        """不支持的作业存储类型抛出异常"""
+        scheduler = TaskScheduler(job_store='redis')
+        with self.assertRaises(ValueError):
+            scheduler.scheduler
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+产品分析分片并行抓取测试
+"""
+
+import threading
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.scrapers.sharded_fetcher import (
+    IncompleteFetchError, ShardedProductAnalyticsFetcher, fetch_pages
+)
+from src.utils.instrumentation import current_run, track_run
+
+
+def row(asin, shop_id, marketplace_id):
+    return {'asin': asin, 'shopIdList': [shop_id], 'marketplaceIdList': [marketplace_id]}
+
+
+class FakeClient:
+    """模拟赛狐API客户端：按 店铺/站点 过滤并分页，可指定失败次数"""
+
+    def __init__(self, rows, failures=None):
+        self.rows = rows
+        self.failures = dict(failures or {})
+        self.lock = threading.Lock()
+        self.calls = []
+        self.runs = set()
+
+    def fetch_product_analytics(self, start_date, end_date, page_no=1, page_size=100, **kwargs):
+        shops = kwargs.get('shopIdList')
+        marketplaces = kwargs.get('marketplaceIdList')
+        key = (shops[0] if shops else None, page_no)
+        with self.lock:
+            self.calls.append(key)
+            self.runs.add(current_run())
+            if self.failures.get(key, 0) > 0:
+                self.failures[key] -= 1
+                return None
+        matched = [r for r in self.rows
+                   if (not shops or r['shopIdList'][0] in shops)
+                   and (not marketplaces or r['marketplaceIdList'][0] in marketplaces)]
+        start = (page_no - 1) * page_size
+        return {
+            'rows': matched[start:start + page_size],
+            'totalSize': len(matched),
+            'totalPage': (len(matched) + page_size - 1) // page_size,
+        }
+
+
+ROWS = [
+    row('B01', '12', 'ATVPDKIKX0DER'), row('B02', '11', 'ATVPDKIKX0DER'),
+    row('B03', '11', 'A1PA6795UKMFR9'), row('B04', '12', 'ATVPDKIKX0DER'),
+    row('B05', '11', 'ATVPDKIKX0DER'),
+]
+SHARD_ROWS = [{'shop_id': '12', 'marketplace_id': 'ATVPDKIKX0DER'},
+              {'shop_id': '11', 'marketplace_id': 'ATVPDKIKX0DER'},
+              {'shop_id': '11', 'marketplace_id': 'A1PA6795UKMFR9'}]
+
+
+@patch('src.scrapers.sharded_fetcher.time.sleep')
+@patch('src.scrapers.sharded_fetcher.db_manager')
+class TestShardedFetcher(unittest.TestCase):
+    """分片并行抓取测试"""
+
+    def setUp(self):
+        ShardedProductAnalyticsFetcher.clear_cache()
+
+    def fetcher(self, client):
+        return ShardedProductAnalyticsFetcher(client, workers=3, page_size=1, shard_retries=1)
+
+    def test_merges_shards_in_key_order(self, mock_db, mock_sleep):
+        """分片结果按 (店铺, 站点) 排序合并，与线程完成顺序无关"""
+        mock_db.execute_query.return_value = SHARD_ROWS
+        rows = self.fetcher(FakeClient(ROWS)).fetch_by_date('2025-08-01')
+        self.assertEqual([r['asin'] for r in rows], ['B03', 'B02', 'B05', 'B01', 'B04'])
+
+    def test_shard_list_cached(self, mock_db, mock_sleep):
+        """分片列表只查询一次"""
+        mock_db.execute_query.return_value = SHARD_ROWS
+        fetcher = self.fetcher(FakeClient(ROWS))
+        fetcher.fetch_by_date('2025-08-01')
+        fetcher.fetch_by_date('2025-08-02')
+        self.assertEqual(mock_db.execute_query.call_count, 1)
+
+    def test_failed_page_retried_within_shard(self, mock_db, mock_sleep):
+        """单页失败只重试该页"""
+        mock_db.execute_query.return_value = SHARD_ROWS
+        client = FakeClient(ROWS, failures={('12', 2): 2})
+        rows = self.fetcher(client).fetch_by_date('2025-08-01')
+        self.assertEqual(len(rows), len(ROWS))
+        self.assertEqual(client.calls.count(('11', 1)), 2)
+        self.assertEqual(client.calls.count(('12', 2)), 3)
+
+    def test_exhausted_shard_raises(self, mock_db, mock_sleep):
+        """分片重试耗尽时抛出异常，不返回截断的数据"""
+        mock_db.execute_query.return_value = SHARD_ROWS
+        client = FakeClient(ROWS, failures={('12', 2): 100})
+        with self.assertRaises(IncompleteFetchError):
+            self.fetcher(client).fetch_by_date('2025-08-01')
+
+    def test_unknown_shop_falls_back_to_unsharded(self, mock_db, mock_sleep):
+        """出现分片列表之外的店铺时回退为整体抓取并刷新分片列表"""
+        mock_db.execute_query.return_value = SHARD_ROWS
+        rows = self.fetcher(FakeClient(ROWS + [row('B06', '99', 'ATVPDKIKX0DER')])).fetch_by_date('2025-08-01')
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(mock_db.execute_query.call_count, 2)
+
+    def test_unknown_shop_learned_from_api(self, mock_db, mock_sleep):
+        """回退抓取返回的新店铺加入分片列表，下一次直接分片抓取，无需等待入库"""
+        mock_db.execute_query.return_value = SHARD_ROWS
+        client = FakeClient(ROWS + [row('B06', '99', 'ATVPDKIKX0DER')])
+        fetcher = self.fetcher(client)
+        fetcher.fetch_by_date('2025-08-01')
+        client.calls.clear()
+
+        rows = fetcher.fetch_by_date('2025-08-02')
+
+        self.assertEqual(len(rows), 6)
+        self.assertIn(('99', 1), client.calls)
+        self.assertNotIn((None, 2), client.calls)
+        self.assertIn(('99', 'ATVPDKIKX0DER'), fetcher.list_shards())
+
+    def test_no_shards_learns_from_unsharded(self, mock_db, mock_sleep):
+        """从未入库的日期先不分片抓取，之后按返回的店铺分片"""
+        mock_db.execute_query.return_value = []
+        fetcher = self.fetcher(FakeClient(ROWS))
+        fetcher.fetch_by_date('2025-08-01')
+        self.assertEqual(fetcher.list_shards(), sorted((s['shop_id'], s['marketplace_id']) for s in SHARD_ROWS))
+
+    def test_shards_run_in_caller_context(self, mock_db, mock_sleep):
+        """分片线程沿用调用方上下文，请求计入当前任务埋点"""
+        mock_db.execute_query.return_value = SHARD_ROWS
+        client = FakeClient(ROWS)
+        with track_run('shard-test', 'product_analytics') as run:
+            self.fetcher(client).fetch_by_date('2025-08-01')
+        self.assertEqual(client.runs, {run})
+
+    def test_no_shards_fetches_unsharded(self, mock_db, mock_sleep):
+        mock_db.execute_query.return_value = []
+        rows = self.fetcher(FakeClient(ROWS)).fetch_by_date('2025-08-01')
+        self.assertEqual([r['asin'] for r in rows], ['B01', 'B02', 'B03', 'B04', 'B05'])
+
+    def test_fetch_pages_detects_short_result(self, mock_db, mock_sleep):
+        """返回条数少于 totalSize 时视为不完整"""
+        def fetch(page_no, **kwargs):
+            return {'rows': [{'asin': 'B01'}], 'totalSize': 3, 'totalPage': 1}
+        with self.assertRaises(IncompleteFetchError):
+            fetch_pages(fetch)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+产品分析累计汇总服务测试
+"""
+
+import unittest
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.services.analytics_rollup_service import AnalyticsRollupService, REFRESH_DAY_SQL
+
+
+@patch('src.services.analytics_rollup_service.schema_registry')
+@patch('src.services.analytics_rollup_service.db_manager')
+class TestAnalyticsRollupService(unittest.TestCase):
+    """累计汇总服务测试"""
+
+    def cursor_of(self, mock_db):
+        """取出事务内的游标"""
+        conn = mock_db.get_db_transaction.return_value.__enter__.return_value
+        return conn.cursor.return_value.__enter__.return_value
+
+    def test_disabled_service_does_nothing(self, mock_db, mock_registry):
+        """未开启时保存数据不访问累计表"""
+        service = AnalyticsRollupService(enabled=False)
+
+        self.assertEqual(service.record_saved([SimpleNamespace(asin='B01', data_date='2025-08-01')]), 0)
+        mock_db.get_db_transaction.assert_not_called()
+
+    def test_restated_days_refreshed_in_date_order(self, mock_db, mock_registry):
+        """按日期升序逐日重述，同一事务内先加锁"""
+        service = AnalyticsRollupService(enabled=True)
+        saved = [
+            SimpleNamespace(asin='B02', data_date='2025-08-02'),
+            SimpleNamespace(asin='B01', data_date='2025-08-01'),
+            SimpleNamespace(asin='B01', data_date='2025-08-02'),
+            SimpleNamespace(asin=None, data_date='2025-08-03'),
+        ]
+
+        self.assertEqual(service.record_saved(saved), 2)
+
+        calls = self.cursor_of(mock_db).execute.call_args_list
+        self.assertIn('pg_advisory_xact_lock', calls[0][0][0])
+        self.assertEqual([c[0][1] for c in calls[1:]], [
+            {'data_date': '2025-08-01', 'asins': ['B01']},
+            {'data_date': '2025-08-02', 'asins': ['B01', 'B02']},
+        ])
+        self.assertTrue(all(c[0][0] is REFRESH_DAY_SQL for c in calls[1:]))
+
+    def test_refresh_failure_is_logged_not_raised(self, mock_db, mock_registry):
+        """累计表更新失败不影响产品分析数据保存"""
+        mock_db.get_db_transaction.side_effect = Exception('connection lost')
+        service = AnalyticsRollupService(enabled=True)
+
+        self.assertEqual(service.record_saved([SimpleNamespace(asin='B01', data_date='2025-08-01')]), 0)
+
+    def test_window_totals_uses_two_boundaries(self, mock_db, mock_registry):
+        """窗口汇总只需窗口两端的累计值"""
+        service = AnalyticsRollupService(enabled=True)
+
+        service.window_totals('2025-08-30', 14, asins=['B01'])
+
+        params = mock_db.execute_query.call_args[0][1]
+        self.assertEqual(params, {'end_date': date(2025, 8, 30), 'before_date': date(2025, 8, 16), 'asins': ['B01']})
+        with self.assertRaises(ValueError):
+            service.window_totals('2025-08-30', 0)
+
+    def test_empty_asin_filter_returns_nothing(self, mock_db, mock_registry):
+        """asins 为空列表时返回空结果，不查询全部 ASIN"""
+        service = AnalyticsRollupService(enabled=True)
+
+        self.assertEqual(service.window_totals('2025-08-30', 7, asins=[]), [])
+        mock_db.execute_query.assert_not_called()
+
+        service.window_totals('2025-08-30', 7)
+        self.assertIsNone(mock_db.execute_query.call_args[0][1]['asins'])
+
+
+if __name__ == '__main__':
+    unittest.main()
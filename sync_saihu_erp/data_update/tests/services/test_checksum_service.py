@@ -0,0 +1,87 @@
+"""
+产品分析分区校验和服务测试
+"""
+
+import unittest
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.services.checksum_service import ChecksumService, _to_signed
+
+
+def analytics(asin, marketplace_id, shop_id, sales_amount):
+    """构造产品分析模型的替身"""
+    return SimpleNamespace(asin=asin, marketplace_id=marketplace_id, shop_id=shop_id,
+                           data_date=date(2025, 8, 1), sales_amount=Decimal(sales_amount), sales_quantity=3)
+
+
+@patch('src.services.checksum_service.schema_registry')
+@patch('src.services.checksum_service.db_manager')
+class TestChecksumService(unittest.TestCase):
+    """校验和服务测试"""
+    
+    def setUp(self):
+        self.service = ChecksumService(enabled=True)
+        self.stored = [
+            analytics('B0TEST0001', 'ATVPDKIKX0DER', '11', '10.00'),
+            analytics('B0TEST0002', 'ATVPDKIKX0DER', '12', '20.00'),
+            analytics('B0TEST0003', 'A1PA6795UKMFR9', '13', '30.00'),
+        ]
+    
+    def stored_rows(self):
+        """模拟校验和表中的叶子桶"""
+        tree = self.service.build_tree(self.stored)
+        return [
+            {'data_date': date(2025, 8, 1), 'marketplace_id': bucket[1], 'shop_id': bucket[2],
+             'digest': _to_signed(digest), 'record_count': count}
+            for bucket, (digest, count) in tree.leaves.items()
+        ]
+    
+    def test_reconcile_returns_only_divergent_buckets(self, mock_db, mock_registry):
+        """只返回校验和不一致店铺的记录"""
+        mock_db.execute_query.return_value = self.stored_rows()
+        fresh = [self.stored[0], analytics('B0TEST0002', 'ATVPDKIKX0DER', '12', '25.00'), self.stored[2]]
+        
+        result = self.service.reconcile('2025-08-01', fresh)
+        
+        self.assertEqual(result['divergent_buckets'], [('2025-08-01', 'ATVPDKIKX0DER', '12')])
+        self.assertEqual([r.asin for r in result['records']], ['B0TEST0002'])
+    
+    def test_unchanged_day_needs_no_resync(self, mock_db, mock_registry):
+        """数据一致时只比较根节点"""
+        mock_db.execute_query.return_value = self.stored_rows()
+        
+        result = self.service.reconcile('2025-08-01', list(reversed(self.stored)))
+        
+        self.assertEqual(result['divergent_buckets'], [])
+        self.assertEqual(result['compared_nodes'], 1)
+    
+    def test_record_replaces_leaves_of_synced_dates(self, mock_db, mock_registry):
+        """入库后按日期整体替换叶子桶"""
+        cursor = mock_db.get_db_transaction.return_value.__enter__.return_value \
+            .cursor.return_value.__enter__.return_value
+        
+        with patch('psycopg2.extras.execute_values') as mock_execute_values:
+            self.assertEqual(self.service.record(self.stored), 3)
+        
+        delete_sql, delete_params = cursor.execute.call_args[0]
+        self.assertIn('data_date = ANY', delete_sql)
+        self.assertEqual(delete_params, (['2025-08-01'],))
+        self.assertEqual(len(mock_execute_values.call_args[0][2]), 3)
+    
+    def test_disabled_service_records_nothing(self, mock_db, mock_registry):
+        """未开启时不写入校验和"""
+        self.assertEqual(ChecksumService(enabled=False).record(self.stored), 0)
+        mock_db.get_db_transaction.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+数据完整性验证服务测试
+"""
+
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.services.data_validator import DataIntegrityValidator
+
+
+def record(asin='B01TEST001', **values):
+    """构造一条有效的库存记录"""
+    data = {
+        'asin': asin, 'productName': 'Test', 'salesPerson': 'Alice',
+        'totalInventory': 15, 'fbaAvailable': 10, 'fbaInTransit': 5, 'averageSales': 1.5
+    }
+    data.update(values)
+    return data
+
+
+class TestDataIntegrityValidator(unittest.TestCase):
+    """库存数据校验测试"""
+    
+    def test_counts_per_rule_and_field(self):
+        """按规则和字段计数，有效/无效记录统计正确"""
+        records = [
+            record(),
+            record(productName=None, totalInventory=-1),
+            record(asin='BAD', fbaAvailable='10', averageSales=-2),
+        ]
+        
+        result = DataIntegrityValidator().validate_inventory_data(iter(records))
+        
+        self.assertFalse(result.is_valid)
+        self.assertEqual(result.stats['total_records'], 3)
+        self.assertEqual(result.stats['valid_records'], 1)
+        self.assertEqual(result.stats['missing_fields'], {'productName': 1})
+        self.assertEqual(result.stats['data_type_issues'], {'fbaAvailable': 1})
+        self.assertEqual(result.stats['rule_violations']['negative_inventory'], 1)
+        self.assertEqual(result.stats['rule_violations']['suspicious_asin'], 1)
+        self.assertEqual(result.stats['error_count'], 3)
+        self.assertIn("记录1: 缺失必需字段 'productName'", result.errors)
+    
+    def test_samples_are_bounded(self):
+        """大量问题记录只保留有限条示例，计数仍完整"""
+        records = (record(asin='BAD', averageSales=-1) for _ in range(10000))
+        
+        result = DataIntegrityValidator(max_samples=5).validate_inventory_data(records)
+        
+        self.assertEqual(len(result.errors), 5)
+        self.assertEqual(len(result.warnings), 5)
+        self.assertEqual(result.stats['error_count'], 10000)
+        self.assertEqual(result.stats['rule_violations']['suspicious_asin'], 10000)
+    
+    def test_early_abort_on_error_rate(self):
+        """无效记录占比超过阈值时提前停止"""
+        records = [record(totalInventory=-1) for _ in range(500)] + [record() for _ in range(500)]
+        validator = DataIntegrityValidator(abort_error_rate=0.5, abort_min_records=100)
+        
+        result = validator.validate_inventory_data(records)
+        
+        self.assertTrue(result.aborted)
+        self.assertFalse(result.is_valid)
+        self.assertEqual(result.stats['total_records'], 100)
+    
+    def test_empty_input(self):
+        """无数据时校验失败"""
+        result = DataIntegrityValidator().validate_inventory_data([])
+        self.assertFalse(result.is_valid)
+        self.assertEqual(result.errors, ["无数据需要验证"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+库存点合并汇总服务测试
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.services.merge_summary_service import MergeSummaryService
+
+
+class TestMergeSummaryService(unittest.TestCase):
+    """合并汇总服务测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.service = MergeSummaryService(materialize=False)
+        self.points = [
+            {'marketplace': '欧盟', 'is_turnover_exceeded': True, 'is_out_of_stock': False, 'is_effective_point': True},
+            {'marketplace': 'US', 'is_turnover_exceeded': False, 'is_out_of_stock': True, 'is_effective_point': False},
+            {'marketplace': 'UK', 'is_turnover_exceeded': True, 'is_out_of_stock': True, 'is_effective_point': True},
+            {'marketplace': 'JP', 'is_turnover_exceeded': False, 'is_out_of_stock': False, 'is_effective_point': False},
+        ]
+    
+    def test_summarize_points_in_memory(self):
+        """内存汇总与原五条COUNT查询的字段一致"""
+        summary = self.service.summarize_points(self.points, '2025-08-01')
+        
+        self.assertEqual(summary, {
+            'data_date': '2025-08-01',
+            'total_points': 4,
+            'eu_points': 1,
+            'non_eu_points': 3,
+            'turnover_exceeded': 2,
+            'out_of_stock': 2,
+            'effective_points': 2,
+            'effectiveness_rate': 0.5
+        })
+    
+    @patch('src.services.merge_summary_service.db_manager')
+    def test_get_summary_uses_single_query(self, mock_db):
+        """数据库汇总只发出一条查询"""
+        mock_db.execute_single.return_value = {
+            'total_points': 10, 'eu_points': 4, 'turnover_exceeded': 3,
+            'out_of_stock': 2, 'effective_points': 5
+        }
+        
+        summary = self.service.get_summary('2025-08-01')
+        
+        mock_db.execute_single.assert_called_once()
+        mock_db.execute_query.assert_not_called()
+        self.assertEqual(summary['non_eu_points'], 6)
+        self.assertEqual(summary['effectiveness_rate'], 0.5)
+    
+    @patch('src.services.merge_summary_service.db_manager')
+    def test_record_skipped_when_not_materialized(self, mock_db):
+        """未开启物化时不写汇总表"""
+        self.service.record(self.service.summarize_points(self.points, '2025-08-01'))
+        
+        mock_db.execute_update.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
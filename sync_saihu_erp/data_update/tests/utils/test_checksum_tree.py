@@ -0,0 +1,72 @@
+"""
+分区校验和树测试
+"""
+
+import random
+import unittest
+import sys
+import os
+from datetime import date
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.utils.checksum_tree import ChecksumTree
+
+FIELDS = ('asin', 'shop_id', 'sales_amount')
+PARTITION = ('data_date', 'marketplace_id', 'shop_id')
+
+
+def rows():
+    """三个店铺、两个站点的样例数据"""
+    return [
+        {'asin': f'B0{i:08d}', 'data_date': date(2025, 8, 1), 'marketplace_id': market, 'shop_id': shop,
+         'sales_amount': Decimal('10.5') * i}
+        for i, (market, shop) in enumerate([('US', '1'), ('US', '2'), ('DE', '3')] * 4)
+    ]
+
+
+class TestChecksumTree(unittest.TestCase):
+    """校验和树测试"""
+    
+    def test_order_independent_and_incremental(self):
+        """记录顺序不影响摘要；逐条增删与重新构建结果一致"""
+        records = rows()
+        tree = ChecksumTree.from_records(records, FIELDS, PARTITION)
+        shuffled = records[:]
+        random.Random(7).shuffle(shuffled)
+        self.assertEqual(tree.nodes(), ChecksumTree.from_records(shuffled, FIELDS, PARTITION).nodes())
+        
+        extra = dict(records[0], asin='B0NEW00001')
+        tree.add(extra)
+        tree.remove(records[1])
+        rebuilt = ChecksumTree.from_records([extra] + [r for r in records if r is not records[1]], FIELDS, PARTITION)
+        self.assertEqual(tree.nodes(), rebuilt.nodes())
+        self.assertEqual(tree.node()[1], len(records))
+    
+    def test_diff_finds_only_divergent_leaves(self):
+        """只有数据变化的店铺被识别为不一致，一致的站点不向下比较"""
+        records = rows()
+        stored = ChecksumTree.from_records(records, FIELDS, PARTITION)
+        changed = [dict(r) for r in records]
+        changed[1]['sales_amount'] = Decimal('99')
+        fresh = ChecksumTree.from_records(changed + [dict(records[0], shop_id='9')], FIELDS, PARTITION)
+        
+        divergent, compared = fresh.diff(stored)
+        
+        self.assertEqual(divergent, [('2025-08-01', 'US', '2'), ('2025-08-01', 'US', '9')])
+        self.assertEqual(compared, 1 + 1 + 2 + 3)
+        self.assertEqual(stored.diff(stored), ([], 1))
+    
+    def test_numeric_formatting_is_canonical(self):
+        """Decimal、float 与存储精度无关的等值数字摘要相同"""
+        tree = ChecksumTree(FIELDS, PARTITION)
+        a = {'asin': 'B0TEST0001', 'sales_amount': Decimal('12.50')}
+        b = {'asin': 'B0TEST0001', 'sales_amount': 12.5}
+        self.assertEqual(tree.digest(a), tree.digest(b))
+
+
+if __name__ == '__main__':
+    unittest.main()
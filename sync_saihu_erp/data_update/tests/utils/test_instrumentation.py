@@ -0,0 +1,74 @@
+"""
+同步链路埋点测试
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.utils.instrumentation import (
+    MetricsRegistry, current_run, record_api_latency, record_db_round_trip, stage, track_run
+)
+
+
+class TestInstrumentation(unittest.TestCase):
+    """埋点工具测试"""
+    
+    def test_stage_records_rows_bytes_and_round_trips(self):
+        """阶段统计行数、字节数，API延迟和数据库往返计入当前任务"""
+        with track_run('task-1', 'product_analytics') as run:
+            with stage('fetch') as s:
+                record_api_latency('/api/demo', 0.3, ok=True, size=1024)
+                record_api_latency('/api/demo', 12.0, ok=False)
+                s.rows = 100
+            with stage('persist') as s:
+                record_db_round_trip(3)
+                s.rows = 100
+        
+        metrics = run.to_dict()
+        self.assertEqual(metrics['stages']['fetch']['rows'], 100)
+        self.assertEqual(metrics['stages']['fetch']['bytes'], 1024)
+        self.assertEqual(metrics['db_round_trips'], 3)
+        self.assertEqual(metrics['api_calls'], 2)
+        latency = metrics['api_latency']['/api/demo']
+        self.assertEqual(latency['errors'], 1)
+        self.assertEqual(latency['buckets']['0.5'], 1)
+        self.assertEqual(latency['buckets']['30.0'], 1)
+        self.assertIsNone(current_run())
+    
+    def test_noop_without_run(self):
+        """未开启任务埋点时各记录函数不报错"""
+        with stage('clean') as s:
+            s.rows = 5
+        record_api_latency('/api/demo', 0.1)
+        record_db_round_trip()
+        self.assertIsNone(current_run())
+    
+    def test_prometheus_textfile(self):
+        """累计指标可导出为 Prometheus 文本格式"""
+        registry = MetricsRegistry()
+        with track_run('task-2', 'product_analytics') as run:
+            with stage('merge') as s:
+                s.rows = 10
+            record_api_latency('/api/demo', 0.2)
+        registry.merge_run(run)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'sync.prom')
+            registry.write_textfile(path)
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        
+        self.assertIn('saihu_sync_runs_total{task_type="product_analytics"} 1', text)
+        self.assertIn('saihu_sync_stage_rows_total{task_type="product_analytics",stage="merge"} 10', text)
+        self.assertIn('saihu_sync_api_latency_seconds_bucket{endpoint="/api/demo",le="+Inf"} 1', text)
+        self.assertIn('saihu_sync_api_latency_seconds_count{endpoint="/api/demo"} 1', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
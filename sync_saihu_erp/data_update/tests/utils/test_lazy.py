@@ -0,0 +1,72 @@
+"""
+延迟加载工具测试
+"""
+
+import subprocess
+import unittest
+import sys
+import os
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.utils.lazy import LazyObject
+
+
+class Counter:
+    """记录构造次数的示例单例"""
+
+    created = 0
+
+    def __init__(self):
+        Counter.created += 1
+        self.value = 1
+
+
+class TestLazyObject(unittest.TestCase):
+    """延迟单例代理测试"""
+
+    def setUp(self):
+        Counter.created = 0
+
+    def test_construction_deferred_until_first_use(self):
+        """首次访问属性时才构造，且只构造一次"""
+        proxy = LazyObject(Counter)
+        self.assertFalse(proxy.is_resolved)
+        self.assertEqual(Counter.created, 0)
+
+        self.assertEqual(proxy.value, 1)
+        proxy.value = 2
+        self.assertEqual(proxy.value, 2)
+        self.assertTrue(proxy.is_resolved)
+        self.assertEqual(Counter.created, 1)
+
+
+class TestLazyPackageImports(unittest.TestCase):
+    """包级导入不提前加载重量级依赖"""
+
+    def loaded_after_import(self, module):
+        """在全新解释器中导入模块，返回已加载的重量级依赖"""
+        code = (
+            f"import sys; import {module}; "
+            "print(','.join(m for m in ('sqlalchemy', 'psycopg2', 'apscheduler', 'yaml') if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=project_root,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+
+    def test_models_and_database_are_light(self):
+        """导入 src.models / src.database 不加载 SQLAlchemy 和 psycopg2"""
+        self.assertEqual(self.loaded_after_import('src.models'), '')
+        self.assertEqual(self.loaded_after_import('src.database'), '')
+
+    def test_lazy_export_resolves_on_access(self):
+        """包级导出按需解析"""
+        import src.processors
+        self.assertIsNotNone(src.processors.ProductAnalyticsProcessor)
+        self.assertIn('ProductAnalyticsProcessor', dir(src.processors))
+
+
+if __name__ == '__main__':
+    unittest.main()
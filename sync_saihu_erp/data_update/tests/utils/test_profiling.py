@@ -0,0 +1,70 @@
+"""
+任务剖析工具测试
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+from src.utils.profiling import JobProfiler, ProfilingConfig
+
+
+class TestJobProfiler(unittest.TestCase):
+    """任务剖析器测试"""
+    
+    def setUp(self):
+        """测试初始化"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = ProfilingConfig()
+        self.config.enabled = True
+        self.config.output_dir = self.tmp.name
+        self.config.top_allocations = 5
+    
+    def tearDown(self):
+        """清理临时目录"""
+        self.tmp.cleanup()
+    
+    def test_profile_writes_outputs(self):
+        """剖析结果包含CPU剖析、热点函数、内存分配和摘要"""
+        profiler = JobProfiler(self.config)
+        
+        with profiler.profile('demo_job') as output_dir:
+            data = [str(i) * 10 for i in range(10000)]
+        
+        self.assertIsNotNone(output_dir)
+        self.assertTrue(os.path.basename(output_dir).startswith('demo_job_'))
+        for name in ('cpu.prof', 'cpu_top.txt', 'allocations_top.txt', 'summary.json'):
+            self.assertTrue(os.path.exists(os.path.join(output_dir, name)), name)
+        self.assertEqual(len(data), 10000)
+    
+    def test_sampling_one_in_n(self):
+        """每 N 次运行只剖析一次"""
+        self.config.sample_every = 3
+        profiler = JobProfiler(self.config)
+        
+        sampled = [profiler.should_profile('demo_job') for _ in range(6)]
+        
+        self.assertEqual(sampled, [True, False, False, True, False, False])
+    
+    def test_disabled_and_nested_runs_skip(self):
+        """未开启时不剖析；已有剖析进行中时嵌套调用跳过"""
+        self.config.enabled = False
+        self.assertFalse(JobProfiler(self.config).should_profile('demo_job'))
+        
+        self.config.enabled = True
+        profiler = JobProfiler(self.config)
+        with profiler.profile('outer') as outer_dir:
+            with profiler.profile('inner') as inner_dir:
+                pass
+        
+        self.assertIsNotNone(outer_dir)
+        self.assertIsNone(inner_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()